@@ -1,5 +1,49 @@
-from django.contrib import admin
-from .models import Vehicle, Contract, Inspection, VehiclePhoto, VehicleDocument
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from . import caching, importer, receivables
+from .models import Vehicle, Contract, Inspection, VehiclePhoto, VehicleDocument, PaymentScheduleItem, Payment, \
+    ContractStatusChange, ApiToken
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    COUNT(*) по всей большой таблице — полный проход. Для списка без фильтров
+    на PostgreSQL берём оценку числа строк из статистики (pg_class.reltuples);
+    с фильтрами, на небольших таблицах и на других базах — обычный count().
+    """
+    # Меньше этого числа оценка неточна, а настоящий COUNT(*) и так быстрый
+    EXACT_BELOW = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.EXACT_BELOW:
+                return row[0]
+
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Список для таблиц на сотни тысяч строк: оценка вместо COUNT(*) и без
+    второго подсчёта «всего записей» при поиске и фильтрах.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
 
 
 # --- ИНЛАЙНЫ (Вставки внутри карточки авто) ---
@@ -21,12 +65,13 @@ class VehicleDocumentInline(admin.TabularInline):
 # --- АДМИНКА АВТОМОБИЛЕЙ ---
 
 @admin.register(Vehicle)
-class VehicleAdmin(admin.ModelAdmin):
+class VehicleAdmin(LargeTableAdmin):
     # Столбцы в списке
     list_display = ('brand', 'model_name', 'license_plate', 'year', 'overall_status', 'wialon_imei_display')
     # Кликабельные ссылки
     list_display_links = ('brand', 'model_name')
-    # Поиск
+    # Поиск по вхождению (icontains); на PostgreSQL его держат триграммные индексы
+    # UPPER(...) gin_trgm_ops (миграция 0023), а не полный проход таблицы
     search_fields = ('vin', 'brand', 'model_name', 'license_plate', 'wialon_imei')
     # Фильтры справа
     list_filter = ('overall_status', 'body_type', 'transmission')
@@ -67,12 +112,20 @@ class VehicleAdmin(admin.ModelAdmin):
             'fields': (
                 'window_operation', 'sound_signal_operation',
                 'windscreen_wipers_wiper_motor', 'headlights_sidelights_turn_signals',
-                'stove_in_the_salon', 'Alarms_locks_keys'
+                'stove_in_the_salon', 'alarms_locks_keys'
             )
         }),
     )
 
     inlines = [VehiclePhotoInline, VehicleDocumentInline]
+    actions = ['link_wialon']
+
+    @admin.action(description="Найти Wialon ID по IMEI")
+    def link_wialon(self, request, queryset):
+        # Один запрос в Wialon на все выбранные машины вместо запроса на каждую
+        pairs = list(queryset.exclude(wialon_imei__isnull=True).exclude(wialon_imei='').values_list('vin', 'wialon_imei'))
+        linked, _ = importer.link_wialon_ids(pairs)
+        self.message_user(request, f"Привязано к Wialon: {linked} из {len(pairs)} с IMEI")
 
     # Красивое отображение IMEI в списке
     def wialon_imei_display(self, obj):
@@ -83,30 +136,146 @@ class VehicleAdmin(admin.ModelAdmin):
 
 # --- АДМИНКА ДОГОВОРОВ ---
 
+class PaymentScheduleInline(admin.TabularInline):
+    # График строится автоматически (app/ledger.py), руками его не правим
+    model = PaymentScheduleItem
+    extra = 0
+    can_delete = False
+    readonly_fields = ('number', 'due_date', 'amount', 'paid_amount')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
+class PaymentInline(admin.TabularInline):
+    model = Payment
+    extra = 0
+    fields = ('paid_at', 'amount', 'comment', 'created_by')
+    readonly_fields = ('created_by',)
+
+
+class ContractStatusChangeInline(admin.TabularInline):
+    # Журнал пишет пакетная проверка статусов, здесь только просмотр
+    model = ContractStatusChange
+    extra = 0
+    can_delete = False
+    readonly_fields = ('changed_at', 'old_status', 'new_status', 'reason', 'debt_amount')
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(Contract)
-class ContractAdmin(admin.ModelAdmin):
+class ContractAdmin(LargeTableAdmin):
     # ИСПРАВЛЕНО: заменили 'status_badge' на 'status'
-    list_display = ('contract_number', 'vehicle', 'client', 'status', 'start_date', 'payment_due_day')
+    list_display = ('contract_number', 'vehicle', 'client', 'status', 'start_date', 'payment_due_day', 'debt_amount')
+    # Машина и клиент в __str__ — одним JOIN, а не запросом на строку
+    list_select_related = ('vehicle', 'client')
 
-    # Теперь это сработает, так как поле 'status' есть в списке выше
-    list_editable = ('status',)
+    # Статус меняется действиями ниже одним UPDATE: list_editable сохранял
+    # каждую строку через Contract.save() с пересчётом взноса и сигналами
+    actions = ['mark_active', 'mark_debt', 'mark_completed', 'mark_terminated']
 
     list_filter = ('status', 'start_date', 'payment_due_day')
+    # Поиск по вхождению — по триграммным индексам (app 0023, user 0003)
     search_fields = (
-    'contract_number', 'client__username', 'client__first_name', 'client__last_name', 'vehicle__license_plate')
+        'contract_number', 'client__username', 'client__first_name', 'client__last_name',
+        'vehicle__license_plate', 'vehicle__vin',
+    )
     date_hierarchy = 'created_at'
     autocomplete_fields = ['vehicle', 'client']
+    readonly_fields = ('scheduled_total', 'due_total', 'paid_total', 'debt_amount', 'next_due_date')
+
+    inlines = [PaymentScheduleInline, PaymentInline, ContractStatusChangeInline]
+
+    def save_formset(self, request, form, formset, change):
+        # Запоминаем, кто внёс платёж
+        for instance in formset.save(commit=False):
+            if isinstance(instance, Payment) and instance.created_by_id is None:
+                instance.created_by = request.user
+            instance.save()
+        for obj in formset.deleted_objects:
+            obj.delete()
+
+    def change_status(self, request, queryset, status):
+        """
+        Смена статуса выбранных договоров одним UPDATE с записью в журнал.
+        Сигналы не срабатывают, поэтому кэши карточек и дебиторки сбрасываем сами.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            # Строки читаются под блокировкой, как в update_contract_statuses: иначе
+            # параллельная смена статуса попала бы в журнал с устаревшим old_status
+            rows = list(
+                Contract.objects.select_for_update()
+                .filter(pk__in=queryset.values('pk'))
+                .exclude(status=status)
+                .order_by('pk')
+                .values_list('pk', 'status', 'vehicle_id', 'debt_amount')
+            )
+            if not rows:
+                self.message_user(request, "Статус уже установлен у всех выбранных договоров", messages.INFO)
+                return
+
+            Contract.objects.filter(pk__in=[row[0] for row in rows]).update(status=status, updated_at=now)
+            ContractStatusChange.objects.bulk_create([
+                ContractStatusChange(
+                    contract_id=pk,
+                    old_status=old_status,
+                    new_status=status,
+                    reason=f"Изменено вручную: {request.user.username}",
+                    debt_amount=debt_amount,
+                )
+                for pk, old_status, _, debt_amount in rows
+            ], batch_size=1000)
+
+            vehicle_ids = {row[2] for row in rows}
+            Vehicle.objects.filter(pk__in=vehicle_ids).update(updated_at=now)
+
+        for vehicle_id in vehicle_ids:
+            caching.bump_vehicle_version(vehicle_id)
+        receivables.invalidate_receivables_report()
+
+        label = dict(Contract.STATUS_CHOICES)[status]
+        self.message_user(request, f"Статус «{label}» установлен у договоров: {len(rows)}")
+
+    @admin.action(description="Статус: Действует")
+    def mark_active(self, request, queryset):
+        self.change_status(request, queryset, 'active')
+
+    @admin.action(description="Статус: Есть задолженность")
+    def mark_debt(self, request, queryset):
+        self.change_status(request, queryset, 'debt')
+
+    @admin.action(description="Статус: Завершен успешно")
+    def mark_completed(self, request, queryset):
+        self.change_status(request, queryset, 'completed')
+
+    @admin.action(description="Статус: Расторгнут досрочно")
+    def mark_terminated(self, request, queryset):
+        self.change_status(request, queryset, 'terminated')
 
 
 # --- АДМИНКА ОСМОТРОВ ---
 
 @admin.register(Inspection)
-class InspectionAdmin(admin.ModelAdmin):
+class InspectionAdmin(LargeTableAdmin):
     list_display = ('vehicle', 'date', 'inspector', 'short_comment')
+    list_select_related = ('vehicle', 'inspector')
     list_filter = ('date', 'inspector')
     search_fields = ('vehicle__license_plate', 'vehicle__vin')
 
     def short_comment(self, obj):
         return (obj.comment[:50] + '...') if obj.comment else "-"
 
-    short_comment.short_description = "Комментарий"
\ No newline at end of file
+    short_comment.short_description = "Комментарий"
+
+
+# --- КЛЮЧИ API ---
+
+@admin.register(ApiToken)
+class ApiTokenAdmin(admin.ModelAdmin):
+    list_display = ('name', 'is_active', 'created_at', 'last_used_at')
+    list_filter = ('is_active',)
+    # Ключ создаётся при сохранении и показывается в карточке, чтобы передать его интеграции
+    readonly_fields = ('key', 'created_at', 'last_used_at')
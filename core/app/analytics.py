@@ -0,0 +1,180 @@
+"""
+Аналитика неисправностей по автопарку.
+
+Последние диагностические листы всех машин грузятся одним запросом
+в булеву матрицу NumPy (машины × пункты чек-листа), дальше все подсчёты
+по группам (марка, модель, год, пробег) — векторные операции без циклов по отчётам.
+"""
+import numpy as np
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from . import caching, checklist, metrics
+from .models import DiagnosticReport, Vehicle
+
+CACHE_TIMEOUT = 15 * 60
+CACHE_VERSION_KEY = 'fleet_defects:version'
+
+# Границы диапазонов пробега, км
+MILEAGE_BANDS = (50_000, 100_000, 150_000, 200_000, 300_000)
+
+GROUP_CHOICES = (
+    ('brand', 'Марка'),
+    ('model', 'Модель'),
+    ('year', 'Год выпуска'),
+    ('mileage', 'Пробег'),
+)
+
+TOP_ITEMS = 10
+
+ITEM_VERSIONS = np.array([item.version for item in checklist.CHECKLIST_ITEMS], dtype=np.int16)
+ITEM_LABELS = [item.label for item in checklist.CHECKLIST_ITEMS]
+BIT_SHIFTS = np.arange(checklist.BITS_PER_WORD, dtype=np.int64)
+
+
+def load_latest_matrix(brand=None, model_name=None, year=None):
+    """
+    Последний диагностический лист каждой машины -> (атрибуты машин, матрица дефектов, матрица проверенных пунктов).
+    Один SQL-запрос, который идёт от машин: для каждой машины id последнего листа
+    берётся по индексу (vehicle, -created_at), затем листы читаются по первичному ключу.
+    Стоимость растёт с числом машин, а не с историей диагностик.
+    """
+    latest = (
+        DiagnosticReport.objects
+        .filter(vehicle=OuterRef('pk'))
+        .order_by('-created_at', '-pk')
+        .values('pk')[:1]
+    )
+    vehicles = Vehicle.objects.all()
+
+    if brand:
+        vehicles = vehicles.filter(brand__iexact=brand)
+    if model_name:
+        vehicles = vehicles.filter(model_name__iexact=model_name)
+    if year:
+        vehicles = vehicles.filter(year=year)
+
+    latest_ids = vehicles.order_by().annotate(latest_report_id=Subquery(latest)).values('latest_report_id')
+    queryset = DiagnosticReport.objects.filter(pk__in=latest_ids)
+
+    rows = list(queryset.order_by().values_list(
+        'vehicle__brand', 'vehicle__model_name', 'vehicle__year', 'vehicle__mileage',
+        'checklist_version', *checklist.WORD_FIELDS
+    ))
+
+    n_items = len(checklist.CHECKLIST_ITEMS)
+    if not rows:
+        empty = np.zeros((0, n_items), dtype=bool)
+        return {'brand': np.array([]), 'model': np.array([]), 'year': np.array([]), 'mileage': np.array([])}, empty, empty
+
+    columns = list(zip(*rows))
+    attributes = {
+        'brand': np.array([value.strip().title() for value in columns[0]]),
+        'model': np.array([f"{b.strip().title()} {m.strip()}" for b, m in zip(columns[0], columns[1])]),
+        'year': np.array(columns[2], dtype=np.int32),
+        'mileage': np.array(columns[3], dtype=np.int64),
+    }
+    versions = np.array(columns[4], dtype=np.int16)
+    words = np.array(columns[5:], dtype=np.int64).T
+
+    # (машины, колонки, 63 бита) -> (машины, пункты)
+    bits = (words[:, :, None] >> BIT_SHIFTS) & 1
+    defects = bits.reshape(len(rows), -1)[:, :n_items].astype(bool)
+
+    # Пункт, добавленный в реестр позже отчёта, в этом отчёте не проверялся
+    inspected = versions[:, None] >= ITEM_VERSIONS[None, :]
+
+    return attributes, defects & inspected, inspected
+
+
+def mileage_band_labels(mileage):
+    edges = (0,) + MILEAGE_BANDS
+    labels = [f"{low // 1000}–{high // 1000} тыс. км" for low, high in zip(edges, edges[1:])]
+    labels.append(f"от {MILEAGE_BANDS[-1] // 1000} тыс. км")
+    # Префикс с номером диапазона сохраняет порядок при сортировке
+    return np.array([f"{i:02d}|{label}" for i, label in enumerate(labels)])[np.digitize(mileage, MILEAGE_BANDS)]
+
+
+def group_frequencies(keys, defects, inspected):
+    """
+    Суммы дефектов по группам без цикла по машинам:
+    сортируем строки по группе и складываем отрезки через np.add.reduceat.
+    """
+    group_keys, inverse = np.unique(keys, return_inverse=True)
+    order = np.argsort(inverse, kind='stable')
+    starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+
+    defect_sums = np.add.reduceat(defects[order].astype(np.int32), starts, axis=0)
+    inspected_sums = np.add.reduceat(inspected[order].astype(np.int32), starts, axis=0)
+    vehicles = np.bincount(inverse)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.where(inspected_sums > 0, defect_sums / inspected_sums, 0.0)
+
+    return group_keys, vehicles, defect_sums, shares
+
+
+def _top_items(counts, shares, limit=TOP_ITEMS):
+    order = np.argsort(-shares, kind='stable')[:limit]
+    return [
+        {
+            'name': checklist.CHECKLIST_ITEMS[i].name,
+            'label': ITEM_LABELS[i],
+            'count': int(counts[i]),
+            'percent': round(float(shares[i]) * 100, 1),
+        }
+        for i in order if counts[i] > 0
+    ]
+
+
+def build_defect_report(group_by='brand', brand=None, model_name=None, year=None):
+    attributes, defects, inspected = load_latest_matrix(brand, model_name, year)
+    total = defects.shape[0]
+
+    report = {
+        'group_by': group_by,
+        'vehicles': total,
+        'generated_at': timezone.now(),
+        'fleet': [],
+        'groups': [],
+    }
+    if not total:
+        return report
+
+    fleet_counts = defects.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        fleet_shares = np.where(inspected.sum(axis=0) > 0, fleet_counts / inspected.sum(axis=0), 0.0)
+    report['fleet'] = _top_items(fleet_counts, fleet_shares, limit=len(ITEM_LABELS))
+
+    keys = mileage_band_labels(attributes['mileage']) if group_by == 'mileage' else attributes[group_by].astype(str)
+    group_keys, vehicles, defect_sums, shares = group_frequencies(keys, defects, inspected)
+
+    for key, count, sums, group_shares in zip(group_keys, vehicles, defect_sums, shares):
+        report['groups'].append({
+            'key': str(key).split('|', 1)[-1],
+            'vehicles': int(count),
+            'defects_per_vehicle': round(float(sums.sum()) / int(count), 1),
+            'top': _top_items(sums, group_shares),
+        })
+
+    if group_by != 'mileage':
+        report['groups'].sort(key=lambda group: -group['vehicles'])
+
+    return report
+
+
+def invalidate_defect_report():
+    caching.bump_version(CACHE_VERSION_KEY)
+
+
+def cached_defect_report(group_by='brand', brand=None, model_name=None, year=None):
+    """
+    Отчёт кэшируется; новый диагностический лист сбрасывает кэш (см. app/signals.py).
+    """
+    version = metrics.cache_get_or_set(CACHE_VERSION_KEY, 1, None)
+    key = f"fleet_defects:{version}:{group_by}:{brand or ''}:{model_name or ''}:{year or ''}"
+    return metrics.cache_get_or_set(
+        key,
+        lambda: build_defect_report(group_by, brand, model_name, year),
+        CACHE_TIMEOUT
+    )
@@ -0,0 +1,362 @@
+"""
+API только для чтения для внешних систем (BI, страховая): /api/v1/...
+
+- ?fields=vin,brand — только нужные поля, в запрос уходит .only();
+- ?include=contracts — вложенные связи: прямые (FK) через select_related,
+  обратные — одним prefetch-запросом на страницу;
+- курсорная пагинация по (updated_at, pk): ?cursor= из ответа, ?limit= до 1000;
+- ?updated_since=2026-10-01T00:00:00Z — только изменённое с этого момента
+  (включительно: лучше получить запись дважды, чем пропустить);
+- удаления — отдельным списком /api/v1/deleted/?resource=vehicles&updated_since=...:
+  ресурс и ключ удалённого объекта, updated_at — время удаления.
+
+Доступ — по ключу ApiToken (заголовок Authorization: Token <key>) или сессией сотрудника.
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import FileField, Prefetch, Q
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from user.models import User
+from . import checklist
+from .models import ApiTombstone, ApiToken, Contract, DiagnosticReport, Inspection, Vehicle
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# last_used_at у ключа пишем не чаще раза в минуту, а не на каждый запрос
+TOKEN_TOUCH_INTERVAL = datetime.timedelta(minutes=1)
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Resource:
+    """
+    Описание выдачи одной модели. Простые поля берутся из модели автоматически
+    (кроме файлов и exclude) или списком fields, computed — вычисляемые:
+    имя -> (нужные поля модели, функция).
+    relations — что можно запросить через ?include=: имя связи -> Resource.
+    filters — поля для точного отбора в списке (?vehicle=VIN).
+    """
+    model = None
+    fields = ()
+    exclude = ()
+    computed = {}
+    relations = {}
+    filters = ()
+
+    def __init__(self):
+        self.plain = {
+            field.name: field
+            for field in self.model._meta.concrete_fields
+            if not isinstance(field, FileField) and field.name not in self.exclude
+            and (not self.fields or field.name in self.fields)
+        }
+        self.field_names = [*self.plain, *self.computed]
+
+    def parse_fields(self, raw):
+        if not raw:
+            return self.field_names
+        names = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.field_names]
+        if unknown:
+            raise ApiError(f"Неизвестные поля: {', '.join(unknown)}")
+        # pk отдаём всегда — по нему клиент сопоставляет записи
+        pk_name = self.model._meta.pk.name
+        return names if pk_name in names else [pk_name, *names]
+
+    def parse_include(self, raw):
+        names = [name.strip() for name in (raw or '').split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.relations]
+        if unknown:
+            raise ApiError(f"Нельзя включить: {', '.join(unknown)}")
+        return names
+
+    def model_fields(self, names):
+        """Поля модели для .only() под список полей выдачи."""
+        fields = set()
+        for name in names:
+            if name in self.plain:
+                fields.add(name)
+            else:
+                fields.update(self.computed[name][0])
+        return fields
+
+    def queryset(self, names, include):
+        only = self.model_fields(names) | {'updated_at'}
+        select, prefetch = [], []
+
+        for name in include:
+            nested = self.relations[name]
+            relation = self.model._meta.get_field(name)
+            nested_fields = nested.model_fields(nested.field_names)
+
+            if relation.concrete:
+                # Прямая связь: join и поля связанной модели в том же запросе
+                select.append(name)
+                only.add(name)
+                only.update(f'{name}__{field}' for field in nested_fields)
+            else:
+                # Обратная связь: один запрос на всю страницу
+                fk_name = relation.field.name
+                prefetch.append(Prefetch(
+                    name,
+                    queryset=nested.model.objects.only(*nested_fields, fk_name).order_by('pk'),
+                ))
+
+        return (
+            self.model.objects
+            .select_related(*select)
+            .prefetch_related(*prefetch)
+            .only(*only)
+        )
+
+    def value(self, obj, name):
+        if name in self.computed:
+            return self.computed[name][1](obj)
+        field = self.plain[name]
+        return getattr(obj, field.attname)
+
+    def serialize(self, obj, names, include=()):
+        data = {name: self.value(obj, name) for name in names}
+        for name in include:
+            nested = self.relations[name]
+            related = getattr(obj, name)
+            if self.model._meta.get_field(name).concrete:
+                data[name] = nested.serialize(related, nested.field_names) if related else None
+            else:
+                data[name] = [nested.serialize(item, nested.field_names) for item in related.all()]
+        return data
+
+
+class ClientResource(Resource):
+    model = User
+    exclude = ('password', 'is_superuser', 'is_staff', 'is_active', 'is_staff_member', 'last_login')
+
+
+class VehicleBriefResource(Resource):
+    """Машина внутри договора, диагностики или осмотра — без технических подробностей."""
+    model = Vehicle
+    fields = ('vin', 'brand', 'model_name', 'year', 'license_plate', 'health_score', 'updated_at')
+
+
+class ContractResource(Resource):
+    model = Contract
+    computed = {
+        'remaining_amount': (('scheduled_total', 'paid_total'), lambda contract: contract.remaining_amount),
+    }
+    relations = {
+        'vehicle': VehicleBriefResource(),
+        'client': ClientResource(),
+    }
+    filters = ('vehicle', 'client', 'status')
+
+
+class DiagnosticReportResource(Resource):
+    model = DiagnosticReport
+    exclude = checklist.WORD_FIELDS
+    computed = {
+        'defects': (checklist.WORD_FIELDS, lambda report: list(report.defects)),
+    }
+    relations = {
+        'vehicle': VehicleBriefResource(),
+    }
+    filters = ('vehicle',)
+
+
+class InspectionResource(Resource):
+    model = Inspection
+    relations = {
+        'vehicle': VehicleBriefResource(),
+    }
+    filters = ('vehicle',)
+
+
+class VehicleResource(Resource):
+    model = Vehicle
+    relations = {
+        'contracts': ContractResource(),
+        'diagnostic_reports': DiagnosticReportResource(),
+        'inspections': InspectionResource(),
+    }
+    filters = ('brand', 'overall_status')
+
+
+class TombstoneResource(Resource):
+    """Удалённые объекты: resource — из какого списка, object_pk — ключ объекта в нём."""
+    model = ApiTombstone
+    filters = ('resource',)
+
+
+RESOURCES = {
+    'vehicles': VehicleResource(),
+    'contracts': ContractResource(),
+    'diagnostics': DiagnosticReportResource(),
+    'inspections': InspectionResource(),
+}
+
+# Модель -> имя ресурса; по нему пишется ApiTombstone при удалении (app/signals.py)
+RESOURCE_NAMES = {resource.model: name for name, resource in RESOURCES.items()}
+
+RESOURCES['deleted'] = TombstoneResource()
+
+
+def encode_cursor(obj):
+    # Время — полностью, с микросекундами: DjangoJSONEncoder обрезает их до миллисекунд
+    payload = json.dumps([obj.updated_at.isoformat(), obj.pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(raw):
+    try:
+        updated_at, pk = json.loads(base64.urlsafe_b64decode(raw.encode()))
+        updated_at = datetime.datetime.fromisoformat(updated_at)
+    except (ValueError, TypeError, binascii.Error):
+        raise ApiError("Некорректный cursor")
+    # Ключ — только число или строка: иначе (список, словарь) фильтр упал бы с 500
+    if isinstance(pk, bool) or not isinstance(pk, (int, str)):
+        raise ApiError("Некорректный cursor")
+    return updated_at, pk
+
+
+def parse_limit(raw):
+    if not raw:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ApiError("limit должен быть числом")
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def parse_updated_since(raw):
+    value = parse_datetime(raw)
+    if value is None:
+        raise ApiError("updated_since: нужна дата и время ISO 8601, например 2026-10-01T00:00:00Z")
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, datetime.timezone.utc)
+    return value
+
+
+def authenticate(request):
+    """Ключ из заголовка Authorization: Token <key> или сессия сотрудника."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        token = ApiToken.objects.filter(key=header[6:].strip(), is_active=True).first()
+        if token is None:
+            return False
+        now = timezone.now()
+        if token.last_used_at is None or now - token.last_used_at > TOKEN_TOUCH_INTERVAL:
+            ApiToken.objects.filter(pk=token.pk).update(last_used_at=now)
+        return True
+
+    user = request.user
+    return user.is_authenticated and (user.is_staff_member or user.is_superuser)
+
+
+def api_view(func):
+    @require_GET
+    def wrapper(request, *args, **kwargs):
+        if not authenticate(request):
+            return JsonResponse({'error': "Нужен ключ API: заголовок Authorization: Token <key>"}, status=401)
+        try:
+            return func(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=e.status)
+    wrapper.__name__ = func.__name__
+    wrapper.__doc__ = func.__doc__
+    return wrapper
+
+
+def _get_resource(name):
+    resource = RESOURCES.get(name)
+    if resource is None:
+        raise ApiError("Нет такого ресурса", status=404)
+    return resource
+
+
+@api_view
+def resource_list(request, resource_name):
+    resource = _get_resource(resource_name)
+    params = request.GET
+
+    names = resource.parse_fields(params.get('fields'))
+    include = resource.parse_include(params.get('include'))
+    limit = parse_limit(params.get('limit'))
+
+    queryset = resource.queryset(names, include).order_by('updated_at', 'pk')
+
+    try:
+        for name in resource.filters:
+            if name in params:
+                queryset = queryset.filter(**{name: params[name]})
+    except (ValueError, TypeError):
+        raise ApiError("Некорректное значение фильтра")
+    if params.get('updated_since'):
+        queryset = queryset.filter(updated_at__gte=parse_updated_since(params['updated_since']))
+    if params.get('cursor'):
+        updated_at, pk = decode_cursor(params['cursor'])
+        try:
+            pk = resource.model._meta.pk.to_python(pk)
+        except ValidationError:
+            raise ApiError("Некорректный cursor")
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, pk__gt=pk))
+
+    # Лишняя запись — признак, что есть следующая страница; COUNT(*) не нужен
+    page = list(queryset[:limit + 1])
+    has_next = len(page) > limit
+    page = page[:limit]
+
+    next_cursor = encode_cursor(page[-1]) if has_next else None
+    next_url = None
+    if next_cursor:
+        query = params.copy()
+        query['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(f"{request.path}?{query.urlencode()}")
+
+    return JsonResponse({
+        'results': [resource.serialize(obj, names, include) for obj in page],
+        'next_cursor': next_cursor,
+        'next': next_url,
+    })
+
+
+@api_view
+def resource_detail(request, resource_name, pk):
+    resource = _get_resource(resource_name)
+    names = resource.parse_fields(request.GET.get('fields'))
+    include = resource.parse_include(request.GET.get('include'))
+
+    try:
+        obj = resource.queryset(names, include).filter(pk=pk).first()
+    except (ValueError, TypeError):
+        obj = None
+    if obj is None:
+        raise ApiError("Не найдено", status=404)
+    return JsonResponse(resource.serialize(obj, names, include))
+
+
+@api_view
+def api_index(request):
+    """Список ресурсов и их полей — для настройки интеграций."""
+    return JsonResponse({
+        name: {
+            'url': reverse('app:api_list', kwargs={'resource_name': name}),
+            'fields': resource.field_names,
+            'include': list(resource.relations),
+            'filters': list(resource.filters),
+        }
+        for name, resource in RESOURCES.items()
+    })
@@ -0,0 +1,127 @@
+"""
+Кэш карточки автомобиля.
+
+У каждой машины есть номер версии в кэше. Ключи данных и фрагментов шаблона
+включают этот номер, а сигналы (app/signals.py) увеличивают его при любом
+изменении машины, фото, документов, договоров, осмотров и диагностик.
+Старые ключи не удаляются — они просто перестают читаться и истекают по таймауту.
+
+Версия увеличивается только после фиксации транзакции (bump_version): иначе
+параллельный запрос прочитал бы новую версию, но ещё старые строки, и закэшировал
+бы их под новым ключом на VEHICLE_CACHE_TIMEOUT.
+"""
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import defects, metrics
+from .models import Contract, Vehicle
+from .utils import get_wialon_location
+
+VEHICLE_CACHE_TIMEOUT = 60 * 60
+
+# Координаты опрашиваются каждые 30 секунд с каждой открытой карточки,
+# поэтому в Wialon ходим не чаще раза в LOCATION_CACHE_TIMEOUT на машину
+LOCATION_CACHE_TIMEOUT = 15
+
+
+def _version_key(vehicle_id):
+    return f'vehicle:{vehicle_id}:version'
+
+
+def vehicle_version(vehicle_id):
+    """Текущая версия или None, если её ещё нет в кэше."""
+    return metrics.cache_get(_version_key(vehicle_id))
+
+
+def _incr_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Версии ещё нет в кэше — значит, и закэшированных данных по ней нет
+        cache.set(key, 1, None)
+
+
+def bump_version(key):
+    """
+    Увеличивает номер версии в кэше после фиксации текущей транзакции
+    (вне транзакции — сразу). При откате версия не меняется.
+    """
+    transaction.on_commit(partial(_incr_version, key))
+
+
+def bump_vehicle_version(vehicle_id):
+    bump_version(_version_key(vehicle_id))
+
+
+def touch_vehicle(vehicle_id):
+    """
+    Изменилось что-то на карточке, кроме самой машины: сдвигаем updated_at
+    (по нему отдаётся Last-Modified) и сбрасываем кэш карточки.
+    """
+    Vehicle.objects.filter(pk=vehicle_id).update(updated_at=timezone.now())
+    bump_vehicle_version(vehicle_id)
+
+
+def _load_vehicle_page(vehicle_id):
+    vehicle = Vehicle.objects.filter(pk=vehicle_id).first()
+    if vehicle is None:
+        return None
+
+    latest = vehicle.diagnostic_reports.order_by('-created_at', '-pk').first()
+    contracts = list(vehicle.contracts.select_related('client'))
+
+    return {
+        'vehicle': vehicle,
+        'photos': list(vehicle.photos.all()),
+        'documents': list(vehicle.documents.all()),
+        'current_contract': next((c for c in contracts if c.status in Contract.OPEN_STATUSES), None),
+        # Клиенты, которым можно открыть карточку
+        'client_ids': {c.client_id for c in contracts},
+        'inspections': list(vehicle.inspections.select_related('inspector').order_by('-date')),
+        'latest_diagnostic': latest,
+        'diagnostic_diff': defects.diff_reports(defects.previous_report(latest), latest) if latest else None,
+        'open_defects': list(vehicle.defects.open().order_by('opened_at')),
+    }
+
+
+def vehicle_page(vehicle_id):
+    """
+    Всё, что нужно карточке автомобиля, одним объектом из кэша.
+    Тёплая карточка не делает ни одного запроса к БД. None — машины нет.
+    """
+    version = vehicle_version(vehicle_id)
+    if version is not None:
+        data = metrics.cache_get(f'vehicle:{vehicle_id}:{version}:page')
+        if data is not None:
+            return data
+
+    data = _load_vehicle_page(vehicle_id)
+    if data is None:
+        # Ключ версии заводим только для существующих машин: запросы
+        # по несуществующим VIN не должны засорять кэш
+        return None
+
+    if version is None:
+        version = 1
+        if not cache.add(_version_key(vehicle_id), version, None):
+            # Версию тем временем завёл другой запрос или сигнал — загруженное могло
+            # устареть, читаем заново уже под существующей версией
+            return vehicle_page(vehicle_id)
+
+    data['cache_version'] = version
+    cache.set(f'vehicle:{vehicle_id}:{version}:page', data, VEHICLE_CACHE_TIMEOUT)
+    return data
+
+
+def vehicle_location(wialon_id):
+    """Координаты из Wialon с коротким кэшем. Ошибки не кэшируются."""
+    key = f'wialon:{wialon_id}:location'
+    location = metrics.cache_get(key)
+    if location is None:
+        location = get_wialon_location(wialon_id)
+        if location:
+            cache.set(key, location, LOCATION_CACHE_TIMEOUT)
+    return location
@@ -0,0 +1,400 @@
+"""
+Реестр пунктов диагностического листа (DiagnosticReport).
+
+Отметки хранятся не отдельными BooleanField, а битами в целых колонках
+defect_bits_0..2. Номер бита = позиция пункта в CHECKLIST_ITEMS, поэтому:
+  * новые пункты добавляются только в конец с новым номером версии;
+  * порядок существующих пунктов не меняется, а ненужные пункты не удаляются —
+    иначе старые отчёты прочитаются неправильно.
+Добавление пункта не требует миграции, пока хватает CAPACITY бит.
+"""
+from functools import lru_cache
+from typing import NamedTuple
+
+# 63 бита на колонку: BigIntegerField знаковый, старший бит не трогаем
+BITS_PER_WORD = 63
+WORD_FIELDS = ('defect_bits_0', 'defect_bits_1', 'defect_bits_2')
+CAPACITY = BITS_PER_WORD * len(WORD_FIELDS)
+
+
+class ChecklistItem(NamedTuple):
+    name: str
+    label: str
+    # С какой версии реестра пункт есть в листе
+    version: int = 1
+
+
+CHECKLIST_ITEMS = (
+    # 1. ТОРМОЗНАЯ СИСТЕМА
+    ChecklistItem('brake_front_hose_l', "Торм. шланг передний (L)"),
+    ChecklistItem('brake_front_hose_r', "Торм. шланг передний (R)"),
+    ChecklistItem('brake_front_disc_l', "Торм. диск передний (L)"),
+    ChecklistItem('brake_front_disc_r', "Торм. диск передний (R)"),
+    ChecklistItem('brake_front_pads_l', "Торм. колодки передние (L)"),
+    ChecklistItem('brake_front_pads_r', "Торм. колодки передние (R)"),
+    ChecklistItem('brake_rear_hose_l', "Торм. шланг задний (L)"),
+    ChecklistItem('brake_rear_hose_r', "Торм. шланг задний (R)"),
+    ChecklistItem('brake_rear_disc_l', "Торм. диск задний (L)"),
+    ChecklistItem('brake_rear_disc_r', "Торм. диск задний (R)"),
+    ChecklistItem('brake_rear_pads_l', "Торм. колодки задние (L)"),
+    ChecklistItem('brake_rear_pads_r', "Торм. колодки задние (R)"),
+
+    # 2. ПОДВЕСКА ПЕРЕДНЯЯ
+    ChecklistItem('susp_front_shock_l', "Амортизатор передний (L)"),
+    ChecklistItem('susp_front_shock_r', "Амортизатор передний (R)"),
+    ChecklistItem('susp_front_mount_l', "Опора стойки аморт. перед (L)"),
+    ChecklistItem('susp_front_mount_r', "Опора стойки аморт. перед (R)"),
+    ChecklistItem('susp_front_boot_l', "Пыльник/отбойник перед (L)"),
+    ChecklistItem('susp_front_boot_r', "Пыльник/отбойник перед (R)"),
+    ChecklistItem('susp_front_spring_l', "Пружина передняя (L)"),
+    ChecklistItem('susp_front_spring_r', "Пружина передняя (R)"),
+    ChecklistItem('susp_front_ball_lower_l', "Шаровая нижняя перед (L)"),
+    ChecklistItem('susp_front_ball_lower_r', "Шаровая нижняя перед (R)"),
+    ChecklistItem('susp_front_ball_upper_l', "Шаровая верхняя перед (L)"),
+    ChecklistItem('susp_front_ball_upper_r', "Шаровая верхняя перед (R)"),
+    ChecklistItem('susp_front_bearing_l', "Подшипник ступицы перед (L)"),
+    ChecklistItem('susp_front_bearing_r', "Подшипник ступицы перед (R)"),
+    ChecklistItem('susp_front_sb_upper_f_l', "С/б верх. рыч. передний (L)"),
+    ChecklistItem('susp_front_sb_upper_f_r', "С/б верх. рыч. передний (R)"),
+    ChecklistItem('susp_front_sb_upper_r_l', "С/б верх. рыч. задний (L)"),
+    ChecklistItem('susp_front_sb_upper_r_r', "С/б верх. рыч. задний (R)"),
+    ChecklistItem('susp_front_sb_lower_f_l', "С/б нижн. рыч. передний (L)"),
+    ChecklistItem('susp_front_sb_lower_f_r', "С/б нижн. рыч. передний (R)"),
+    ChecklistItem('susp_front_sb_lower_r_l', "С/б нижн. рыч. задний (L)"),
+    ChecklistItem('susp_front_sb_lower_r_r', "С/б нижн. рыч. задний (R)"),
+
+    # 3. ПОДВЕСКА ЗАДНЯЯ
+    ChecklistItem('susp_rear_shock_l', "Амортизатор задний (L)"),
+    ChecklistItem('susp_rear_shock_r', "Амортизатор задний (R)"),
+    ChecklistItem('susp_rear_mount_l', "Опора стойки аморт. зад (L)"),
+    ChecklistItem('susp_rear_mount_r', "Опора стойки аморт. зад (R)"),
+    ChecklistItem('susp_rear_boot_l', "Пыльник/отбойник зад (L)"),
+    ChecklistItem('susp_rear_boot_r', "Пыльник/отбойник зад (R)"),
+    ChecklistItem('susp_rear_spring_l', "Пружина задняя (L)"),
+    ChecklistItem('susp_rear_spring_r', "Пружина задняя (R)"),
+    ChecklistItem('susp_rear_ball_lower_l', "Шаровая нижняя зад (L)"),
+    ChecklistItem('susp_rear_ball_lower_r', "Шаровая нижняя зад (R)"),
+    ChecklistItem('susp_rear_ball_upper_l', "Шаровая верхняя зад (L)"),
+    ChecklistItem('susp_rear_ball_upper_r', "Шаровая верхняя зад (R)"),
+    ChecklistItem('susp_rear_bearing_l', "Подшипник ступицы зад (L)"),
+    ChecklistItem('susp_rear_bearing_r', "Подшипник ступицы зад (R)"),
+    ChecklistItem('susp_rear_sb_upper_trans_f_l', "С/б верх.попереч. перед/внутр (L)"),
+    ChecklistItem('susp_rear_sb_upper_trans_f_r', "С/б верх.попереч. перед/внутр (R)"),
+    ChecklistItem('susp_rear_sb_upper_trans_r_l', "С/б верх.попереч. зад/наруж (L)"),
+    ChecklistItem('susp_rear_sb_upper_trans_r_r', "С/б верх.попереч. зад/наруж (R)"),
+    ChecklistItem('susp_rear_sb_lower_trans_f_l', "С/б нижн.попереч. перед/внутр (L)"),
+    ChecklistItem('susp_rear_sb_lower_trans_f_r', "С/б нижн.попереч. перед/внутр (R)"),
+    ChecklistItem('susp_rear_sb_lower_trans_r_l', "С/б нижн.попереч. зад/наруж (L)"),
+    ChecklistItem('susp_rear_sb_lower_trans_r_r', "С/б нижн.попереч. зад/наруж (R)"),
+    ChecklistItem('susp_rear_sb_upper_long_f_l', "С/б верх.продольн. передний (L)"),
+    ChecklistItem('susp_rear_sb_upper_long_f_r', "С/б верх.продольн. передний (R)"),
+    ChecklistItem('susp_rear_sb_upper_long_r_l', "С/б верх.продольн. задний (L)"),
+    ChecklistItem('susp_rear_sb_upper_long_r_r', "С/б верх.продольн. задний (R)"),
+    ChecklistItem('susp_rear_sb_lower_long_f_l', "С/б нижн.продольн. передний (L)"),
+    ChecklistItem('susp_rear_sb_lower_long_f_r', "С/б нижн.продольн. передний (R)"),
+    ChecklistItem('susp_rear_sb_lower_long_r_l', "С/б нижн.продольн. задний (L)"),
+    ChecklistItem('susp_rear_sb_lower_long_r_r', "С/б нижн.продольн. задний (R)"),
+
+    # 4. РУЛЕВОЕ УПРАВЛЕНИЕ И ПРИВОДА (ПЕРЕД)
+    ChecklistItem('susp_front_stabilizer_l', "Стабилизатор передний (L)"),
+    ChecklistItem('susp_front_stabilizer_r', "Стабилизатор передний (R)"),
+    ChecklistItem('susp_front_stab_bushing_l', "Втулки стабилизатора перед (L)"),
+    ChecklistItem('susp_front_stab_bushing_r', "Втулки стабилизатора перед (R)"),
+    ChecklistItem('susp_front_stab_link_l', "Стойка стаб. (Солдатик) перед (L)"),
+    ChecklistItem('susp_front_stab_link_r', "Стойка стаб. (Солдатик) перед (R)"),
+    ChecklistItem('susp_front_stab_link_bushing_l', "Втулки стоек стаб. перед (L)"),
+    ChecklistItem('susp_front_stab_link_bushing_r', "Втулки стоек стаб. перед (R)"),
+    ChecklistItem('steering_ujoint', "Крестовина рул. вала"),
+    ChecklistItem('steering_rack', "Рулевая рейка"),
+    ChecklistItem('steering_tip_l', "Рулевой наконечник (L)"),
+    ChecklistItem('steering_tip_r', "Рулевой наконечник (R)"),
+    ChecklistItem('steering_tie_rod_l', "Рулевая тяга (L)"),
+    ChecklistItem('steering_tie_rod_r', "Рулевая тяга (R)"),
+    ChecklistItem('drive_front_cv_outer_l', "Наружный гранат перед (L)"),
+    ChecklistItem('drive_front_cv_outer_r', "Наружный гранат перед (R)"),
+    ChecklistItem('drive_front_cv_inner_l', "Внутренний гранат перед (L)"),
+    ChecklistItem('drive_front_cv_inner_r', "Внутренний гранат перед (R)"),
+    ChecklistItem('susp_front_camber_arm_l', "Развальный рычаг перед (L)"),
+    ChecklistItem('susp_front_camber_arm_r', "Развальный рычаг перед (R)"),
+    ChecklistItem('brake_front_caliper_l', "Суппорт передний (L)"),
+    ChecklistItem('brake_front_caliper_r', "Суппорт передний (R)"),
+
+    # 5. ДОПОЛНИТЕЛЬНО (ЗАДНЯЯ ЧАСТЬ)
+    ChecklistItem('susp_rear_beam_bushing_l', "Сайлентблок балки (L)"),
+    ChecklistItem('susp_rear_beam_bushing_r', "Сайлентблок балки (R)"),
+    ChecklistItem('susp_rear_stab_bushing_l', "Втулки стабилизатора зад (L)"),
+    ChecklistItem('susp_rear_stab_bushing_r', "Втулки стабилизатора зад (R)"),
+    ChecklistItem('susp_rear_stab_link_l', "Стойки стабилизатора зад (L)"),
+    ChecklistItem('susp_rear_stab_link_r', "Стойки стабилизатора зад (R)"),
+    ChecklistItem('susp_rear_stab_link_bushing_l', "Втулка стоек стаб. зад (L)"),
+    ChecklistItem('susp_rear_stab_link_bushing_r', "Втулка стоек стаб. зад (R)"),
+    ChecklistItem('drive_rear_cv_outer_l', "Наружный гранат зад (L)"),
+    ChecklistItem('drive_rear_cv_outer_r', "Наружный гранат зад (R)"),
+    ChecklistItem('drive_rear_cv_inner_l', "Внутренний гранат зад (L)"),
+    ChecklistItem('drive_rear_cv_inner_r', "Внутренний гранат зад (R)"),
+    ChecklistItem('susp_rear_camber_arm_l', "Развальный рычаг зад (L)"),
+    ChecklistItem('susp_rear_camber_arm_r', "Развальный рычаг зад (R)"),
+    ChecklistItem('susp_rear_soldatik_l', "Солдатик задний (L)"),
+    ChecklistItem('susp_rear_soldatik_r', "Солдатик задний (R)"),
+    ChecklistItem('brake_rear_caliper_l', "Суппорт задний (L)"),
+    ChecklistItem('brake_rear_caliper_r', "Суппорт задний (R)"),
+
+    # 6. НАВЕСНОЕ ОБОРУДОВАНИЕ (ОБЩЕЕ)
+    ChecklistItem('steering_gur', "ГУР (Гидроусилитель)"),
+    ChecklistItem('ac_compressor', "Кондиционер"),
+    ChecklistItem('alternator', "Генератор"),
+)
+
+CHECKLIST_VERSION = max(item.version for item in CHECKLIST_ITEMS)
+
+ITEM_INDEX = {item.name: index for index, item in enumerate(CHECKLIST_ITEMS)}
+
+ITEMS_BY_NAME = {item.name: item for item in CHECKLIST_ITEMS}
+
+assert len(CHECKLIST_ITEMS) <= CAPACITY, "Пункты не помещаются в defect_bits_*: нужна ещё одна колонка"
+assert len(ITEM_INDEX) == len(CHECKLIST_ITEMS), "Имена пунктов должны быть уникальными"
+
+
+# --- Раскладка листа: по ней строятся и форма, и PDF ---
+
+class ChecklistRow(NamedTuple):
+    label: str
+    # (L, R), один пункт на всю строку или () — подзаголовок внутри таблицы
+    fields: tuple = ()
+    # Что пишем в PDF, если пункт отмечен / не отмечен
+    mark: str = 'ЗАМЕНА'
+    ok_text: str = 'OK'
+    # Подпись в PDF, если она короче, чем в форме
+    short_label: str = ''
+    strong: bool = False
+    # В PDF — одной строкой со следующим пунктом, по ячейке на каждый ("Рейка / Крестовина")
+    pdf_join_next: bool = False
+
+
+class ChecklistSection(NamedTuple):
+    title: str
+    rows: tuple
+    pdf_title: str = ''
+
+
+def _pair(label, prefix, mark='ЗАМЕНА', **kwargs):
+    return ChecklistRow(label, (f'{prefix}_l', f'{prefix}_r'), mark, **kwargs)
+
+
+def _silent_block(label, short_label, prefix):
+    # У сайлентблоков в PDF ставится только крестик, цвет показывает состояние
+    return ChecklistRow(label, (f'{prefix}_l', f'{prefix}_r'), 'X', 'X', short_label)
+
+
+CHECKLIST_LAYOUT = (
+    ('Передняя ось', (
+        ChecklistSection('Тормозная система', (
+            _pair('Шланг тормозной', 'brake_front_hose'),
+            _pair('Диск тормозной', 'brake_front_disc'),
+            _pair('Колодки', 'brake_front_pads'),
+            _pair('Суппорт', 'brake_front_caliper', 'ДЕФЕКТ'),
+        )),
+        ChecklistSection('Подвеска', (
+            _pair('Амортизатор', 'susp_front_shock'),
+            _pair('Опора стойки', 'susp_front_mount'),
+            _pair('Пыльник/отбойник', 'susp_front_boot', short_label='Пыльник / Отбойник'),
+            _pair('Пружина', 'susp_front_spring'),
+            _pair('Шаровая нижняя', 'susp_front_ball_lower'),
+            _pair('Шаровая верхняя', 'susp_front_ball_upper'),
+            _pair('Подшипник ступицы', 'susp_front_bearing'),
+            _pair('Развальный рычаг', 'susp_front_camber_arm'),
+        )),
+        ChecklistSection('Рулевое и Стабилизация', (
+            _pair('Стабилизатор (Сам)', 'susp_front_stabilizer', strong=True),
+            _pair('Втулки стабилизатора', 'susp_front_stab_bushing', short_label='Втулки стаб.'),
+            _pair('Стойка стаб. (Солдатик)', 'susp_front_stab_link'),
+            _pair('Втулки стоек стаб.', 'susp_front_stab_link_bushing'),
+            _pair('Рулевая тяга', 'steering_tie_rod'),
+            _pair('Рулевой наконечник', 'steering_tip'),
+            ChecklistRow(
+                'Рулевая рейка', ('steering_rack',), 'ДЕФЕКТ',
+                short_label='Рейка / Крестовина', strong=True, pdf_join_next=True,
+            ),
+            ChecklistRow('Крестовина рул. вала', ('steering_ujoint',), 'ЛЮФТ', strong=True),
+        )),
+        ChecklistSection('Привод (ШРУСы)', (
+            _pair('Наружная граната', 'drive_front_cv_outer', short_label='Граната наружная'),
+            _pair('Внутренняя граната', 'drive_front_cv_inner', short_label='Граната внутренняя'),
+        )),
+        ChecklistSection('Сайлентблоки', (
+            ChecklistRow('Верхний рычаг'),
+            _silent_block('Передний с/б', 'Верх. рычаг (Передний)', 'susp_front_sb_upper_f'),
+            _silent_block('Задний с/б', 'Верх. рычаг (Задний)', 'susp_front_sb_upper_r'),
+            ChecklistRow('Нижний рычаг'),
+            _silent_block('Передний с/б', 'Нижн. рычаг (Передний)', 'susp_front_sb_lower_f'),
+            _silent_block('Задний с/б', 'Нижн. рычаг (Задний)', 'susp_front_sb_lower_r'),
+        ), pdf_title='Сайлентблоки (Перед)'),
+    )),
+    ('Задняя ось', (
+        ChecklistSection('Тормозная система', (
+            _pair('Шланг тормозной', 'brake_rear_hose'),
+            _pair('Диск тормозной', 'brake_rear_disc', short_label='Диск / Барабан'),
+            _pair('Колодки', 'brake_rear_pads'),
+            _pair('Суппорт', 'brake_rear_caliper', 'ДЕФЕКТ'),
+        )),
+        ChecklistSection('Подвеска', (
+            _pair('Амортизатор', 'susp_rear_shock'),
+            _pair('Опора стойки', 'susp_rear_mount'),
+            _pair('Пыльник/отбойник', 'susp_rear_boot', short_label='Пыльник / Отбойник'),
+            _pair('Пружина', 'susp_rear_spring'),
+            _pair('Шаровая нижняя', 'susp_rear_ball_lower'),
+            _pair('Шаровая верхняя', 'susp_rear_ball_upper'),
+            _pair('Подшипник ступицы', 'susp_rear_bearing'),
+            _pair('Развальный рычаг', 'susp_rear_camber_arm'),
+        )),
+        ChecklistSection('Стабилизация и Балка', (
+            _pair('Сайлентблок балки', 'susp_rear_beam_bushing', 'ДЕФЕКТ', strong=True),
+            _pair('Втулки стабилизатора', 'susp_rear_stab_bushing'),
+            _pair('Стойки стабилизатора', 'susp_rear_stab_link'),
+            _pair('Втулка стоек стаб.', 'susp_rear_stab_link_bushing', short_label='Втулки стоек стаб.'),
+            _pair('Солдатик (Задний)', 'susp_rear_soldatik'),
+        )),
+        ChecklistSection('Привод (ШРУСы Задние)', (
+            _pair('Наружная граната', 'drive_rear_cv_outer', short_label='Граната наружная'),
+            _pair('Внутренняя граната', 'drive_rear_cv_inner', short_label='Граната внутренняя'),
+        )),
+        ChecklistSection('Сайлентблоки', (
+            ChecklistRow('Верхний поперечный'),
+            _silent_block('Передний (внутр)', 'Верх. попереч. (Внутр)', 'susp_rear_sb_upper_trans_f'),
+            _silent_block('Задний (наруж)', 'Верх. попереч. (Наруж)', 'susp_rear_sb_upper_trans_r'),
+            ChecklistRow('Нижний поперечный'),
+            _silent_block('Передний (внутр)', 'Нижн. попереч. (Внутр)', 'susp_rear_sb_lower_trans_f'),
+            _silent_block('Задний (наруж)', 'Нижн. попереч. (Наруж)', 'susp_rear_sb_lower_trans_r'),
+            ChecklistRow('Верхний продольный'),
+            _silent_block('Передний', 'Верх. продольн. (Перед)', 'susp_rear_sb_upper_long_f'),
+            _silent_block('Задний', 'Верх. продольн. (Зад)', 'susp_rear_sb_upper_long_r'),
+            ChecklistRow('Нижний продольный'),
+            _silent_block('Передний', 'Нижн. продольн. (Перед)', 'susp_rear_sb_lower_long_f'),
+            _silent_block('Задний', 'Нижн. продольн. (Зад)', 'susp_rear_sb_lower_long_r'),
+        ), pdf_title='Сайлентблоки (Зад)'),
+    )),
+)
+
+# Навесное оборудование выводится отдельной строкой под осями
+EQUIPMENT_ROWS = (
+    ChecklistRow('ГУР (Гидроусилитель)', ('steering_gur',), 'ДЕФЕКТ', short_label='ГУР'),
+    ChecklistRow('Кондиционер (Компрессор)', ('ac_compressor',), 'НЕ РАБОТАЕТ', short_label='Кондиционер'),
+    ChecklistRow('Генератор', ('alternator',), 'РЕМОНТ'),
+)
+
+_LAYOUT_FIELDS = [
+    name
+    for _, sections in CHECKLIST_LAYOUT
+    for section in sections
+    for row in section.rows
+    for name in row.fields
+] + [name for row in EQUIPMENT_ROWS for name in row.fields]
+
+assert sorted(_LAYOUT_FIELDS) == sorted(ITEM_INDEX), "Каждый пункт реестра должен быть в раскладке ровно один раз"
+
+
+def current_version():
+    # Вызываемый default для моделей: новая версия реестра не требует миграции.
+    # На функцию ссылается миграция 0013 — её не переносить и не переименовывать
+    return CHECKLIST_VERSION
+
+
+def items_for_version(version):
+    """Пункты, которые были в листе на момент заполнения отчёта версии version."""
+    return [item for item in CHECKLIST_ITEMS if item.version <= version]
+
+
+@lru_cache(maxsize=None)
+def version_mask(version):
+    """Колонки с битами всех пунктов, которые проверялись в листе версии version."""
+    return pack(item.name for item in items_for_version(version))
+
+
+def locate(name):
+    """Колонка и битовая маска пункта."""
+    index = ITEM_INDEX[name]
+    return WORD_FIELDS[index // BITS_PER_WORD], 1 << (index % BITS_PER_WORD)
+
+
+def masks_by_word(names):
+    """Объединённые маски нескольких пунктов по колонкам: {'defect_bits_0': mask, ...}."""
+    masks = {}
+    for name in names:
+        word, mask = locate(name)
+        masks[word] = masks.get(word, 0) | mask
+    return masks
+
+
+def pack(names):
+    """Набор отмеченных пунктов -> значения колонок (по порядку WORD_FIELDS)."""
+    words = [0] * len(WORD_FIELDS)
+    for name in names:
+        index = ITEM_INDEX[name]
+        words[index // BITS_PER_WORD] |= 1 << (index % BITS_PER_WORD)
+    return tuple(words)
+
+
+def unpack(words):
+    """Значения колонок -> список имён отмеченных пунктов (в порядке реестра)."""
+    names = []
+    for word_index, word in enumerate(words):
+        base = word_index * BITS_PER_WORD
+        while word:
+            low_bit = word & -word
+            index = base + low_bit.bit_length() - 1
+            if index < len(CHECKLIST_ITEMS):
+                names.append(CHECKLIST_ITEMS[index].name)
+            word ^= low_bit
+    return names
+
+
+def count(words):
+    return sum(bin(word).count('1') for word in words)
+
+
+def _build_row(row, cell, for_pdf):
+    return {
+        'label': (row.short_label or row.label) if for_pdf else row.label,
+        'header': not row.fields,
+        'wide': len(row.fields) == 1,
+        'strong': row.strong,
+        'cells': [cell(name, row) for name in row.fields],
+    }
+
+
+def _build_rows(rows, cell, for_pdf):
+    built = []
+    join = False
+    for row in rows:
+        current = _build_row(row, cell, for_pdf)
+        if join:
+            built[-1]['cells'] += current['cells']
+            built[-1]['wide'] = False
+        else:
+            built.append(current)
+        join = for_pdf and row.pdf_join_next
+    return built
+
+
+def build_sheet(cell, for_pdf=False):
+    """
+    Раскладка с подставленными значениями: cell(name, row) возвращает то,
+    что шаблон выведет в ячейке (поле формы или отметку для PDF).
+    Шаблону остаётся пройти циклом — без отдельного {% if %} на каждый пункт.
+    """
+    axes = [
+        {
+            'title': axis_title,
+            'sections': [
+                {
+                    'title': (section.pdf_title or section.title) if for_pdf else section.title,
+                    'rows': _build_rows(section.rows, cell, for_pdf),
+                }
+                for section in sections
+            ],
+        }
+        for axis_title, sections in CHECKLIST_LAYOUT
+    ]
+    equipment = [_build_row(row, cell, for_pdf) for row in EQUIPMENT_ROWS]
+    return axes, equipment
+
@@ -0,0 +1,75 @@
+"""
+Валидаторы для условных GET-запросов (ETag / Last-Modified).
+
+Функции подставляются в django.views.decorators.http.condition и считаются
+до вызова представления: если браузер прислал тот же ETag, отдаётся 304
+без рендеринга шаблона и без основных запросов к БД. None — проверку
+пропускаем, и представление отрабатывает как обычно (редирект на вход, 403, 404).
+"""
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+
+from . import caching
+from .models import Contract
+
+
+def _can_validate(request):
+    # Непоказанные сообщения должны попасть на страницу, а не потеряться за 304
+    return request.user.is_authenticated and not len(get_messages(request))
+
+
+def _vehicle_page(request, pk):
+    if not _can_validate(request):
+        return None
+
+    page = caching.vehicle_page(pk)
+    if page is None:
+        return None
+
+    user = request.user
+    if not (user.is_staff_member or user.is_superuser) and user.pk not in page['client_ids']:
+        return None
+    return page
+
+
+def vehicle_detail_etag(request, pk):
+    page = _vehicle_page(request, pk)
+    if page is None:
+        return None
+    # Страница зависит от пользователя (меню, кнопки менеджера), поэтому он входит в ETag
+    return f"vehicle-{pk}-{page['cache_version']}-{request.user.pk}"
+
+
+def vehicle_detail_last_modified(request, pk):
+    page = _vehicle_page(request, pk)
+    return page['vehicle'].updated_at if page else None
+
+
+def _dashboard_state(request):
+    if not _can_validate(request):
+        return None
+
+    # Кэшируем на объекте запроса: condition вызывает обе функции подряд
+    if not hasattr(request, '_dashboard_state'):
+        request._dashboard_state = Contract.objects.filter(client=request.user).aggregate(
+            count=Count('pk'),
+            contract=Max('updated_at'),
+            vehicle=Max('vehicle__updated_at'),
+        )
+    return request._dashboard_state
+
+
+def client_dashboard_etag(request):
+    state = _dashboard_state(request)
+    if state is None:
+        return None
+    # Количество договоров ловит удаление, которое не сдвигает максимумы
+    stamps = [value.timestamp() if value else 0 for value in (state['contract'], state['vehicle'])]
+    return f"dashboard-{request.user.pk}-{state['count']}-{stamps[0]}-{stamps[1]}"
+
+
+def client_dashboard_last_modified(request):
+    state = _dashboard_state(request)
+    if state is None:
+        return None
+    return max(filter(None, (state['contract'], state['vehicle'])), default=None)
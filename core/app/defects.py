@@ -0,0 +1,144 @@
+"""
+Сравнение диагностик автомобиля и учёт открытых замечаний.
+
+Отметки отчёта — биты (см. app/checklist.py), поэтому разница двух отчётов
+считается несколькими побитовыми операциями над колонками, без перебора пунктов.
+"""
+from typing import NamedTuple
+
+from django.db import transaction
+
+from . import checklist
+from .models import DiagnosticReport, VehicleDefect
+
+
+class ReportDiff(NamedTuple):
+    new: list
+    resolved: list
+    still_open: list
+
+
+def diff_words(previous, current, inspected):
+    """
+    previous, current — колонки двух отчётов подряд, inspected — пункты, которые
+    проверялись в текущем отчёте. Пункт, которого не было в листе, не считается устранённым.
+    """
+    new = tuple(c & ~p for p, c in zip(previous, current))
+    resolved = tuple(p & ~c & m for p, c, m in zip(previous, current, inspected))
+    still_open = tuple(p & (c | ~m) for p, c, m in zip(previous, current, inspected))
+    return new, resolved, still_open
+
+
+def diff_reports(previous, current):
+    """Что изменилось между двумя диагностиками. previous может быть None (первый осмотр)."""
+    previous_words = previous.defect_words if previous else (0,) * len(checklist.WORD_FIELDS)
+    new, resolved, still_open = diff_words(
+        previous_words,
+        current.defect_words,
+        checklist.version_mask(current.checklist_version)
+    )
+    return ReportDiff(checklist.unpack(new), checklist.unpack(resolved), checklist.unpack(still_open))
+
+
+def previous_report(report):
+    return (
+        DiagnosticReport.objects
+        .filter(vehicle_id=report.vehicle_id)
+        .before(report)
+        .order_by('-created_at', '-pk')
+        .first()
+    )
+
+
+def _is_latest(report):
+    return not (
+        DiagnosticReport.objects
+        .filter(vehicle_id=report.vehicle_id)
+        .after(report)
+        .exists()
+    )
+
+
+@transaction.atomic
+def apply_report(report):
+    """
+    Новая (последняя) диагностика: открываем появившиеся замечания
+    и закрываем устранённые. Трогаем только открытые записи этой машины.
+    """
+    open_defects = dict(
+        VehicleDefect.objects.open()
+        .select_for_update()
+        .filter(vehicle_id=report.vehicle_id)
+        .values_list('item', 'pk')
+    )
+
+    new, resolved, _ = diff_words(
+        checklist.pack(open_defects),
+        report.defect_words,
+        checklist.version_mask(report.checklist_version)
+    )
+
+    VehicleDefect.objects.bulk_create([
+        VehicleDefect(
+            vehicle_id=report.vehicle_id,
+            item=name,
+            opened_report=report,
+            opened_at=report.created_at,
+        )
+        for name in checklist.unpack(new)
+    ])
+
+    resolved_names = checklist.unpack(resolved)
+    if resolved_names:
+        VehicleDefect.objects.filter(pk__in=[open_defects[name] for name in resolved_names]).update(
+            closed_report=report,
+            closed_at=report.created_at
+        )
+
+
+@transaction.atomic
+def rebuild_vehicle_defects(vehicle_id):
+    """
+    Пересобирает замечания машины по всей истории диагностик.
+    Нужна только когда история меняется задним числом: правка или удаление отчёта.
+    """
+    VehicleDefect.objects.filter(vehicle_id=vehicle_id).delete()
+
+    reports = (
+        DiagnosticReport.objects
+        .filter(vehicle_id=vehicle_id)
+        .order_by('created_at', 'pk')
+        .values_list('pk', 'created_at', 'checklist_version', *checklist.WORD_FIELDS)
+    )
+
+    episodes = {}
+    finished = []
+    previous = (0,) * len(checklist.WORD_FIELDS)
+
+    for pk, created_at, version, *words in reports.iterator():
+        new, resolved, still_open = diff_words(previous, words, checklist.version_mask(version))
+
+        for name in checklist.unpack(resolved):
+            episode = episodes.pop(name)
+            episode.closed_report_id = pk
+            episode.closed_at = created_at
+            finished.append(episode)
+
+        for name in checklist.unpack(new):
+            episodes[name] = VehicleDefect(
+                vehicle_id=vehicle_id,
+                item=name,
+                opened_report_id=pk,
+                opened_at=created_at
+            )
+
+        previous = tuple(n | s for n, s in zip(new, still_open))
+
+    VehicleDefect.objects.bulk_create(finished + list(episodes.values()))
+
+
+def sync_report(report, created):
+    if created and _is_latest(report):
+        apply_report(report)
+    else:
+        rebuild_vehicle_defects(report.vehicle_id)
@@ -0,0 +1,182 @@
+"""
+Выгрузка автопарка, клиентов и договоров в CSV/XLSX для бухгалтерии.
+
+Строки читаются через .values_list(...).iterator(chunk_size=...) — без создания
+моделей и без загрузки всей выборки в память. CSV отдаётся StreamingHttpResponse
+и начинает скачиваться сразу. XLSX собирается openpyxl в режиме write_only
+во временный файл на диске (zip-архив нельзя отдавать по частям до конца записи)
+и отдаётся файлом.
+
+Текст, начинающийся с '=', '+', '-' или '@', Excel и LibreOffice считают
+формулой (CSV/формульная инъекция через поля, которые заполняют клиенты).
+Такие значения выгружаются с апострофом впереди — в обоих форматах.
+"""
+import csv
+import datetime
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from user.models import User
+from .models import Contract, Vehicle
+
+CHUNK_SIZE = 2000
+
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+VEHICLE_FIELDS = [
+    'vin', 'brand', 'model_name', 'year', 'license_plate', 'color', 'price',
+    'body_type', 'engine_type', 'engine_volume', 'transmission', 'drive_type', 'mileage',
+    'overall_status', 'health_score', 'wialon_imei', 'wialon_id', 'full_name_of_contractor', 'created_at',
+]
+
+CLIENT_FIELDS = [
+    'username', 'client_profile__full_name', 'email', 'phone',
+    'client_profile__email', 'client_profile__phone',
+    'client_profile__passport_series', 'client_profile__passport_number', 'client_profile__passport_date',
+    'client_profile__registration_address', 'client_profile__comment', 'date_joined',
+]
+
+CONTRACT_FIELDS = [
+    'contract_number', 'status', 'start_date', 'end_date',
+    'vehicle__vin', 'vehicle__brand', 'vehicle__model_name', 'vehicle__license_plate',
+    'client__username', 'client__client_profile__full_name', 'client__phone',
+    'total_amount', 'initial_payment', 'monthly_payment', 'payment_due_day',
+    'scheduled_total', 'paid_total', 'debt_amount', 'next_due_date', 'manager__username',
+]
+
+
+class _Echo:
+    """Псевдофайл для csv.writer: writerow возвращает готовую строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def _resolve(model, path):
+    """'client__client_profile__full_name' -> (поле, подпись с названием связи)."""
+    names = path.split('__')
+    titles = []
+    for name in names[:-1]:
+        relation = model._meta.get_field(name)
+        model = relation.related_model
+        # У обратной связи (user.client_profile) подписи нет — берём название модели
+        titles.append(str(relation.verbose_name if relation.concrete else model._meta.verbose_name))
+    field = model._meta.get_field(names[-1])
+    titles.append(str(field.verbose_name))
+    return field, ': '.join(titles)
+
+
+def _converter(field):
+    if field.choices:
+        labels = {value: str(label) for value, label in field.choices}
+        return lambda value: labels.get(value, value)
+    if field.get_internal_type() == 'BooleanField':
+        return lambda value: 'Да' if value else 'Нет'
+    if field.get_internal_type() == 'DateTimeField':
+        # Excel не понимает даты с часовым поясом — выгружаем местное время
+        return lambda value: timezone.localtime(value).replace(tzinfo=None) if value else value
+    return None
+
+
+def columns(model, paths, overrides=None):
+    """
+    Подписи столбцов и функции приведения значений для списка полей.
+    overrides — подписи для полей без русского verbose_name (username, created_at).
+    """
+    overrides = overrides or {}
+    titles, converters = [], []
+    for path in paths:
+        field, title = _resolve(model, path)
+        titles.append(overrides.get(path, title))
+        converters.append(_converter(field))
+    return paths, titles, converters
+
+
+def _escape_formula(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_rows(queryset, spec):
+    paths, _, converters = spec
+    convert = [(i, func) for i, func in enumerate(converters) if func]
+
+    for row in queryset.values_list(*paths).iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        for i, func in convert:
+            row[i] = func(row[i])
+        yield [_escape_formula(value) for value in row]
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%d.%m.%Y %H:%M')
+    if isinstance(value, datetime.date):
+        return value.strftime('%d.%m.%Y')
+    return value
+
+
+def csv_response(queryset, spec, filename):
+    writer = csv.writer(_Echo(), delimiter=';')
+
+    def stream():
+        # BOM и ';' — чтобы русский Excel открыл файл без мастера импорта
+        yield '\ufeff' + writer.writerow(spec[1])
+        lines = []
+        for row in iter_rows(queryset, spec):
+            lines.append(writer.writerow([_csv_value(value) for value in row]))
+            if len(lines) >= CHUNK_SIZE:
+                yield ''.join(lines)
+                lines = []
+        if lines:
+            yield ''.join(lines)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
+def xlsx_response(queryset, spec, filename, sheet_title):
+    # openpyxl нужен только для выгрузок и импорта, поэтому импортируем по месту
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append(spec[1])
+    for row in iter_rows(queryset, spec):
+        sheet.append(row)
+
+    # Строки write_only уже лежат во временных файлах openpyxl, итоговый архив — тоже на диске
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+
+
+def export_response(queryset, spec, filename, file_format, sheet_title):
+    filename = f"{filename}_{timezone.localdate():%Y%m%d}"
+    if file_format == 'xlsx':
+        return xlsx_response(queryset, spec, filename, sheet_title)
+    return csv_response(queryset, spec, filename)
+
+
+VEHICLE_COLUMNS = columns(Vehicle, VEHICLE_FIELDS, {
+    'created_at': "Дата добавления",
+})
+CLIENT_COLUMNS = columns(User, CLIENT_FIELDS, {
+    'username': "Логин",
+    'email': "Email",
+    'date_joined': "Дата регистрации",
+})
+CONTRACT_COLUMNS = columns(Contract, CONTRACT_FIELDS, {
+    'client__username': "Клиент: Логин",
+    'manager__username': "Менеджер",
+})
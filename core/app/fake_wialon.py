@@ -0,0 +1,347 @@
+"""
+Локальная замена Wialon Remote API (ajax.html) для тестов и нагрузочных прогонов.
+
+    python manage.py fake_wialon --units 5000 --latency-ms 80 --error-rate 0.02
+    WIALON_BASE_URL=http://127.0.0.1:8765/wialon/ajax.html python manage.py runserver
+
+Поддерживаются вызовы, которые делает app/utils.py и find_wialon_ids.py:
+token/login, core/logout, core/search_item, core/search_items и загрузка
+сообщений messages/load_interval. Объекты ездят по кругу вокруг Бишкека,
+положение считается от текущего времени, поэтому координаты меняются между запросами.
+
+Как у настоящего Wialon: сессия (sid) истекает после session_ttl секунд
+без запросов (ошибка 1), неизвестный объект — ошибка 7, uid (IMEI) отдаётся
+только с флагом 0x100, последнее сообщение и координаты — с флагом 0x400.
+Задержка ответа, доля ошибок Wialon и доля ответов HTTP 503 настраиваются.
+"""
+import fnmatch
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+AJAX_PATH = '/wialon/ajax.html'
+
+FLAG_BASE = 0x1
+FLAG_ADVANCED = 0x100
+FLAG_LAST_MESSAGE = 0x400
+
+# Коды ошибок Wialon
+ERROR_INVALID_SESSION = 1
+ERROR_INVALID_SERVICE = 2
+ERROR_INVALID_INPUT = 4
+ERROR_REQUEST_FAILED = 5
+ERROR_ACCESS_DENIED = 7
+ERROR_INVALID_TOKEN = 8
+
+# Центр, вокруг которого ездят объекты (Бишкек), и градусы широты в километре
+CENTER = (42.8746, 74.5698)
+KM_PER_DEGREE = 111.0
+
+# Сообщения в истории — раз в столько секунд; за один запрос — не больше стольких
+MESSAGE_INTERVAL = 30
+MAX_MESSAGES = 10000
+
+
+@dataclass
+class Unit:
+    id: int
+    uid: str
+    name: str
+    radius: float  # км
+    speed: float  # км/ч; 0 — стоит на месте
+    phase: float  # рад
+
+    def position(self, moment):
+        angle = self.phase + (moment * self.speed / 3600 / self.radius if self.speed else 0)
+        lat = CENTER[0] + self.radius / KM_PER_DEGREE * math.sin(angle)
+        lon = CENTER[1] + self.radius / (KM_PER_DEGREE * math.cos(math.radians(CENTER[0]))) * math.cos(angle)
+        # Движение против часовой стрелки: курс перпендикулярен радиусу
+        course = round(math.degrees(-angle)) % 360 if self.speed else 0
+        return {
+            'y': round(lat, 6),
+            'x': round(lon, 6),
+            'z': 780,
+            's': round(self.speed),
+            'c': course,
+            'sc': 12,
+        }
+
+    def message(self, moment):
+        moment = int(moment)
+        return {
+            't': moment,
+            'f': 1,
+            'tp': 'ud',
+            'pos': self.position(moment),
+            'i': 0,
+            'lc': 0,
+            'p': {'ignition': int(bool(self.speed)), 'pwr_ext': 12.6},
+        }
+
+
+class FakeWialon:
+    """
+    Состояние и логика API без HTTP: call() — ответ на один вызов svc.
+    Так же его можно звать напрямую из тестов, без сервера.
+    """
+
+    def __init__(self, units, token='', latency=0.0, jitter=0.0, error_rate=0.0, http_error_rate=0.0,
+                 session_ttl=300, seed=0, clock=time.time):
+        self.units = {unit.id: unit for unit in units}
+        self.by_uid = {unit.uid: unit for unit in units if unit.uid}
+        self.token = token
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.http_error_rate = http_error_rate
+        self.session_ttl = session_ttl
+        self.clock = clock
+        self.rng = random.Random(seed)
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.calls = Counter()
+
+    @classmethod
+    def simulated(cls, count, seed=0, first_id=10_000_000, uid_prefix='86000', **options):
+        """
+        count движущихся объектов. ID и IMEI по умолчанию совпадают с машинами
+        generate_fleet --seed 0: ID 10000000 + n, IMEI 86000 + n из десяти цифр.
+        """
+        rng = random.Random(seed)
+        units = [
+            Unit(
+                id=first_id + n,
+                uid=f'{uid_prefix}{n:010d}',
+                name=f'Unit {n}',
+                radius=rng.uniform(0.5, 15),
+                # Около трети машин стоит
+                speed=0 if rng.random() < 0.3 else rng.uniform(10, 90),
+                phase=rng.uniform(0, 2 * math.pi),
+            )
+            for n in range(count)
+        ]
+        return cls(units, seed=seed, **options)
+
+    @classmethod
+    def from_vehicles(cls, vehicles, seed=0, first_id=20_000_000, **options):
+        """
+        Объекты для машин из базы: (wialon_id, wialon_imei, гос. номер).
+        Машинам без wialon_id выдаётся новый ID — их можно привязать по IMEI.
+        """
+        rng = random.Random(seed)
+        units = []
+        for n, (wialon_id, imei, plate) in enumerate(vehicles):
+            units.append(Unit(
+                id=int(wialon_id) if wialon_id and str(wialon_id).isdigit() else first_id + n,
+                uid=str(imei or ''),
+                name=plate or str(imei or wialon_id),
+                radius=rng.uniform(0.5, 15),
+                speed=0 if rng.random() < 0.3 else rng.uniform(10, 90),
+                phase=rng.uniform(0, 2 * math.pi),
+            ))
+        return cls(units, seed=seed, **options)
+
+    # --- Сессии ---
+
+    def login(self, params):
+        token = params.get('token')
+        if not token or (self.token and token != self.token):
+            return {'error': ERROR_INVALID_TOKEN}
+        sid = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[sid] = self.clock()
+        return {
+            'eid': sid,
+            'host': '127.0.0.1',
+            'tm': int(self.clock()),
+            'user': {'nm': 'fake', 'cls': 1, 'id': 1},
+        }
+
+    def touch(self, sid):
+        """Живая сессия продлевается, истёкшая удаляется. False — сессии нет."""
+        now = self.clock()
+        with self.lock:
+            last = self.sessions.get(sid)
+            if last is None:
+                return False
+            if now - last > self.session_ttl:
+                del self.sessions[sid]
+                return False
+            self.sessions[sid] = now
+            return True
+
+    def logout(self, sid):
+        with self.lock:
+            self.sessions.pop(sid, None)
+        return {'error': 0}
+
+    # --- Объекты ---
+
+    def item(self, unit, flags, moment):
+        data = {}
+        if flags & FLAG_BASE:
+            data.update({'nm': unit.name, 'cls': 2, 'id': unit.id, 'mu': 0, 'uacl': -1})
+        if flags & FLAG_ADVANCED:
+            data.update({'uid': unit.uid, 'hw': 1, 'ph': '', 'ph2': '', 'psw': ''})
+        if flags & FLAG_LAST_MESSAGE:
+            message = unit.message(moment)
+            data.update({'lmsg': message, 'pos': message['pos']})
+        return data
+
+    def search_item(self, params):
+        try:
+            unit = self.units.get(int(params['id']))
+        except (KeyError, TypeError, ValueError):
+            return {'error': ERROR_INVALID_INPUT}
+        if unit is None:
+            return {'error': ERROR_ACCESS_DENIED}
+        flags = int(params.get('flags', FLAG_BASE))
+        return {'item': self.item(unit, flags, self.clock()), 'flags': flags}
+
+    def search_items(self, params):
+        spec = params.get('spec') or {}
+        if spec.get('itemsType') != 'avl_unit':
+            return {'error': ERROR_INVALID_INPUT}
+
+        prop, mask = spec.get('propName', 'sys_name'), str(spec.get('propValueMask', '*'))
+        if prop == 'sys_unique_id' and not any(char in mask for char in '*?['):
+            # Точный поиск по IMEI — по индексу, без перебора тысяч объектов
+            found = [self.by_uid[mask]] if mask in self.by_uid else []
+        else:
+            value = {
+                'sys_name': lambda unit: unit.name,
+                'sys_unique_id': lambda unit: unit.uid,
+                'sys_id': lambda unit: str(unit.id),
+            }.get(prop)
+            if value is None:
+                return {'error': ERROR_INVALID_INPUT}
+            found = [unit for unit in self.units.values() if fnmatch.fnmatchcase(value(unit), mask)]
+
+        found.sort(key=lambda unit: unit.name if spec.get('sortType') == 'sys_name' else unit.id)
+
+        # to=0 — все найденные
+        start, end = int(params.get('from', 0)), int(params.get('to', 0))
+        page = found[start:end + 1] if end else found[start:]
+        flags = int(params.get('flags', FLAG_BASE))
+        moment = self.clock()
+        return {
+            'searchSpec': spec,
+            'dataFlags': flags,
+            'totalItemsCount': len(found),
+            'indexFrom': start,
+            'indexTo': start + len(page) - 1 if page else 0,
+            'items': [self.item(unit, flags, moment) for unit in page],
+        }
+
+    def load_interval(self, params):
+        try:
+            unit = self.units.get(int(params['itemId']))
+            time_from, time_to = int(params['timeFrom']), int(params['timeTo'])
+        except (KeyError, TypeError, ValueError):
+            return {'error': ERROR_INVALID_INPUT}
+        if unit is None:
+            return {'error': ERROR_ACCESS_DENIED}
+
+        limit = min(int(params.get('loadCount', MAX_MESSAGES)), MAX_MESSAGES)
+        time_to = min(time_to, int(self.clock()))
+        # Сообщения на границах MESSAGE_INTERVAL: повторный запрос того же интервала даёт то же самое
+        first = -(-time_from // MESSAGE_INTERVAL) * MESSAGE_INTERVAL
+        messages = [unit.message(moment) for moment in range(first, time_to + 1, MESSAGE_INTERVAL)[:limit]]
+        return {'count': len(messages), 'messages': messages}
+
+    # --- Разбор вызова ---
+
+    def call(self, svc, params, sid=None):
+        """Ответ на один вызов API словарём (как JSON в теле ответа)."""
+        self.calls[svc] += 1
+
+        if svc == 'token/login':
+            return self.login(params)
+
+        handlers = {
+            'core/logout': lambda: self.logout(sid),
+            'core/search_item': lambda: self.search_item(params),
+            'core/search_items': lambda: self.search_items(params),
+            'messages/load_interval': lambda: self.load_interval(params),
+        }
+        if svc not in handlers:
+            return {'error': ERROR_INVALID_SERVICE}
+        if not self.touch(sid):
+            return {'error': ERROR_INVALID_SESSION}
+        if self.error_rate and self.rng.random() < self.error_rate:
+            return {'error': ERROR_REQUEST_FAILED}
+        return handlers[svc]()
+
+    def respond(self, query):
+        """
+        Ответ на HTTP-запрос с разобранной строкой запроса (dict из parse_qs):
+        (HTTP-статус, тело). Здесь же задержка и ответы 503.
+        """
+        if self.latency or self.jitter:
+            time.sleep(max(self.latency + self.rng.uniform(-self.jitter, self.jitter), 0))
+        if self.http_error_rate and self.rng.random() < self.http_error_rate:
+            self.calls['http_503'] += 1
+            return 503, 'Service Unavailable'
+
+        svc = query.get('svc', [''])[0]
+        try:
+            params = json.loads(query.get('params', ['{}'])[0] or '{}')
+        except ValueError:
+            return 200, json.dumps({'error': ERROR_INVALID_INPUT})
+        if not isinstance(params, dict):
+            return 200, json.dumps({'error': ERROR_INVALID_INPUT})
+        return 200, json.dumps(self.call(svc, params, query.get('sid', [None])[0]))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'FakeWialon/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.reply(url.path, parse_qs(url.query))
+
+    def do_POST(self):
+        # Wialon принимает параметры и в теле формы (application/x-www-form-urlencoded)
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        query = parse_qs(url.query)
+        query.update(parse_qs(self.rfile.read(length).decode()))
+        self.reply(url.path, query)
+
+    def reply(self, path, query):
+        if path != AJAX_PATH:
+            status, body = 404, 'Not Found'
+        else:
+            status, body = self.server.fake.respond(query)
+
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json' if status == 200 else 'text/plain')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(fake, host='127.0.0.1', port=8765, verbose=False):
+    """HTTP-сервер с fake; port=0 — свободный порт (server.server_address)."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.fake = fake
+    server.verbose = verbose
+    return server
+
+
+def base_url(server):
+    host, port = server.server_address[:2]
+    return f'http://{host}:{port}{AJAX_PATH}'
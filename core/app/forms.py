@@ -1,5 +1,6 @@
 from django import forms
-from .models import Vehicle, VehicleDocument, Contract, DiagnosticReport
+from .models import Vehicle, VehicleDocument, Contract, DiagnosticReport, Payment
+from . import checklist
 
 
 class MultipleFileInput(forms.ClearableFileInput):
@@ -60,6 +61,11 @@ class VehicleForm(forms.ModelForm):
     class Meta:
         model = Vehicle
         fields = '__all__'
+        # Большие файлы загружаются частями (static/js/chunked_upload.js)
+        widgets = {
+            'video': forms.ClearableFileInput(attrs={'data-chunked-target': 'video'}),
+            'computer_assessment': forms.ClearableFileInput(attrs={'data-chunked-target': 'computer_assessment'}),
+        }
 
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
@@ -71,10 +77,30 @@ class VehicleForm(forms.ModelForm):
                     field.widget.attrs['class'] = 'form-control'
 
 
+
+class VehicleImportForm(forms.ModelForm):
+    """
+    Поля строки импорта (app/importer.py). Файлы в таблице не передаются,
+    а уникальность VIN импорт проверяет сам — одним запросом на пачку строк.
+    """
+    class Meta:
+        model = Vehicle
+        exclude = ['video', 'computer_assessment']
+
+
+class VehicleImportUploadForm(forms.Form):
+    file = forms.FileField(
+        label="Файл CSV или XLSX",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+
 class VehicleDocumentForm(forms.ModelForm):
     class Meta:
         model = VehicleDocument
         fields = ['title', 'file']
+        widgets = {
+            'file': forms.ClearableFileInput(attrs={'data-chunked-target': 'document'}),
+        }
 
         def __init__(self, *args, **kwargs):
             super().__init__(*args, **kwargs)
@@ -83,9 +109,32 @@ class VehicleDocumentForm(forms.ModelForm):
 
 
 class DiagnosticReportForm(forms.ModelForm):
+    """
+    Галочки строятся по реестру app/checklist.py, а не по полям модели:
+    отметки хранятся битами в defect_bits_*.
+    """
     class Meta:
         model = DiagnosticReport
-        exclude = ['vehicle', 'date', 'mechanic']
+        fields = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for item in checklist.CHECKLIST_ITEMS:
+            self.fields[item.name] = forms.BooleanField(
+                label=item.label,
+                required=False,
+                initial=getattr(self.instance, item.name)
+            )
+
+    def save(self, commit=True):
+        for item in checklist.CHECKLIST_ITEMS:
+            setattr(self.instance, item.name, self.cleaned_data.get(item.name, False))
+        self.instance.checklist_version = checklist.CHECKLIST_VERSION
+        return super().save(commit)
+
+    def sheet(self):
+        """Раскладка листа с полями формы в ячейках (см. checklist.build_sheet)."""
+        return checklist.build_sheet(lambda name, row: self[name])
 
 
 class ContractCreationForm(forms.ModelForm):
@@ -115,6 +164,20 @@ class ContractCreationForm(forms.ModelForm):
                 field.widget.attrs['placeholder'] = 'Высчитается автоматически'
 
 
+class PaymentForm(forms.ModelForm):
+    class Meta:
+        model = Payment
+        fields = ['amount', 'paid_at', 'comment']
+        widgets = {
+            'paid_at': forms.DateInput(attrs={'type': 'date'}, format='%Y-%m-%d'),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for field in self.fields.values():
+            field.widget.attrs['class'] = 'form-control'
+
+
 class ContractChangeForm(forms.ModelForm):
     class Meta:
         model = Contract
@@ -0,0 +1,546 @@
+"""
+Синтетический автопарк для нагрузочных тестов: manage.py generate_fleet --scale N.
+
+На единицу масштаба — 1000 машин с фотографиями, 500 клиентов с анкетами,
+около 2000 договоров во всех статусах с графиком и платежами, по ~12 диагностик
+и ~8 осмотров на машину. --scale 100 даёт 100 тысяч машин, 200 тысяч договоров
+и миллионы диагностик и осмотров.
+
+Данные пишутся пачками через bulk_create, по транзакции на пачку машин.
+save() и сигналы не вызываются (Wialon, номера договоров по одному, пересчёт
+графика): итоги договоров, замечания и оценки состояния считаются здесь же теми же
+функциями, что и в приложении, а номера договоров берутся блоками из счётчика.
+При одном seed и одной дате --today получаются одни и те же данные.
+"""
+import calendar
+import datetime
+import io
+import random
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from user.models import ClientProfile, User
+from . import checklist, defects, health
+from .models import (
+    Contract, ContractNumberCounter, ContractStatusChange, DiagnosticReport, Inspection,
+    Payment, PaymentScheduleItem, StoredFile, Vehicle, VehicleDefect, VehiclePhoto,
+)
+from .ledger import MONEY, schedule_rows, summarize
+from .storage import content_addressed_storage
+
+VEHICLES_PER_SCALE = 1000
+CLIENTS_PER_SCALE = 500
+STAFF_PER_SCALE = 10
+
+# Средние на машину; фактическое число — от 0 до удвоенного среднего
+DIAGNOSTICS_PER_VEHICLE = 12
+INSPECTIONS_PER_VEHICLE = 8
+PHOTOS_PER_VEHICLE = 4
+# Сколько договоров было у машины: в среднем около двух
+CONTRACT_COUNT_WEIGHTS = {0: 10, 1: 25, 2: 30, 3: 20, 4: 15}
+
+# Статус последнего договора машины и более ранних (те уже закрыты)
+LAST_CONTRACT_STATUSES = {'active': 45, 'debt': 12, 'completed': 30, 'terminated': 13}
+PAST_CONTRACT_STATUSES = {'completed': 80, 'terminated': 20}
+
+CHUNK_SIZE = 500
+BATCH_SIZE = 2000
+PLACEHOLDER_PHOTOS = 12
+
+# Марка, модель, цена нового авто ($), кузов, объёмы двигателя, WMI (начало VIN), доля в парке
+MODELS = [
+    ('Toyota', 'Camry', 30000, 'sedan', ('2.5', '3.5'), 'JTN', 18),
+    ('Toyota', 'Land Cruiser Prado', 55000, 'suv', ('2.7', '4.0'), 'JTE', 6),
+    ('Toyota', 'RAV4', 32000, 'suv', ('2.0', '2.5'), 'JTM', 8),
+    ('Hyundai', 'Sonata', 24000, 'sedan', ('2.0', '2.4'), 'KMH', 12),
+    ('Hyundai', 'Tucson', 27000, 'suv', ('2.0',), 'KM8', 6),
+    ('Kia', 'K5', 25000, 'sedan', ('2.0', '2.5'), 'KNA', 8),
+    ('Lexus', 'RX 350', 52000, 'suv', ('3.5',), 'JTJ', 5),
+    ('Honda', 'Fit', 12000, 'hatchback', ('1.3', '1.5'), 'JHM', 9),
+    ('Mercedes-Benz', 'E 200', 45000, 'sedan', ('2.0',), 'WDD', 5),
+    ('Chevrolet', 'Cobalt', 13000, 'sedan', ('1.5',), 'XWB', 10),
+    ('Volkswagen', 'Polo', 15000, 'sedan', ('1.6',), 'XW8', 7),
+    ('Subaru', 'Outback', 30000, 'wagon', ('2.5',), 'JF1', 6),
+]
+
+FIRST_NAMES = [
+    'Азамат', 'Бакыт', 'Нурлан', 'Эрлан', 'Тимур', 'Алексей', 'Дмитрий', 'Сергей',
+    'Айгуль', 'Жылдыз', 'Нургуль', 'Елена', 'Анна', 'Мария', 'Чынгыз', 'Руслан',
+]
+LAST_NAMES = [
+    'Асанов', 'Токтогулов', 'Исаков', 'Садыков', 'Жумабеков', 'Иванов', 'Петров',
+    'Ким', 'Осмонов', 'Мамытов', 'Кузнецов', 'Абдыкадыров', 'Бейшеналиев', 'Орлов',
+]
+CITIES = ['г. Бишкек', 'г. Ош', 'г. Каракол', 'г. Токмок', 'г. Кара-Балта', 'г. Джалал-Абад']
+STREETS = ['ул. Киевская', 'пр. Чуй', 'ул. Ахунбаева', 'пр. Манаса', 'ул. Токтогула', 'ул. Льва Толстого']
+COLORS = ['Белый', 'Чёрный', 'Серебристый', 'Серый', 'Синий', 'Красный', 'Бежевый']
+CONTRACTORS = ['ОсОО «АвтоЛизинг»', 'ИП Садыков Б.', 'ОсОО «Кар Сервис»', 'ИП Ким А.']
+
+ENGINE_NOTES = ['Без замечаний', 'Подтекание масла', 'Требуется замена ремня ГРМ', 'Стук на холодную']
+BODY_NOTES = ['Без замечаний', 'Мелкие сколы', 'Вмятина на двери', 'Царапины на бампере', 'Следы ремонта']
+SUSPENSION_NOTES = ['Люфтов нет', 'Износ сайлентблоков', 'Стук стойки стабилизатора', 'Требуется развал-схождение']
+
+VIN_CHARS = 'ABCDEFGHJKLMNPRSTUVWXYZ0123456789'
+PLATE_LETTERS = 'ABEKMHOPCTX'
+
+
+class GeneratorError(ValueError):
+    pass
+
+
+def _weighted(rng, weights):
+    return rng.choices(list(weights), list(weights.values()))[0]
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return datetime.date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """
+    Отключает auto_now/auto_now_add у полей моделей: даты договоров, платежей
+    и диагностик берутся из сгенерированной истории, а не текущим временем.
+    """
+    fields = [
+        field
+        for model in models
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class FleetGenerator:
+    def __init__(self, scale, seed=0, today=None, photos=True, password='fleet',
+                 chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, progress=None):
+        if scale <= 0:
+            raise GeneratorError("Масштаб должен быть больше нуля")
+
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.now = timezone.now()
+        self.today = today or timezone.localdate()
+        self.vehicle_count = max(round(scale * VEHICLES_PER_SCALE), 1)
+        self.client_count = max(round(scale * CLIENTS_PER_SCALE), 1)
+        self.staff_count = max(round(scale * STAFF_PER_SCALE), 2)
+        self.photos = photos
+        self.password = password
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.progress = progress
+        self.stats = Counter()
+
+        self.items = [item.name for item in checklist.items_for_version(checklist.current_version())]
+        self.version = checklist.current_version()
+        self.inspected = checklist.version_mask(self.version)
+
+    def moment(self, day):
+        """Случайное время рабочего дня: даты в истории не совпадают до секунды."""
+        naive = datetime.datetime.combine(day, datetime.time(9)) + datetime.timedelta(
+            seconds=self.rng.randint(0, 9 * 3600)
+        )
+        # История не должна заходить в будущее, даже если сегодняшний день ещё не кончился
+        return min(timezone.make_aware(naive), self.now)
+
+    def days_ago(self, low, high):
+        return self.today - datetime.timedelta(days=self.rng.randint(low, high))
+
+    def generate(self):
+        """Создаёт весь автопарк. Возвращает Counter: название модели -> сколько записей создано."""
+        if User.objects.filter(username=f'staff_{self.seed}_0').exists():
+            raise GeneratorError(f"Данные с seed {self.seed} уже сгенерированы, укажите другой --seed")
+
+        with manual_timestamps(
+            User, ClientProfile, Vehicle, VehiclePhoto, Contract, PaymentScheduleItem, Payment,
+            ContractStatusChange, DiagnosticReport, Inspection,
+        ):
+            self.password_hash = make_password(self.password)
+            with transaction.atomic():
+                self.staff_ids = self.create_users()
+            self.photo_names = self.create_placeholder_photos() if self.photos else []
+            self.photo_uses = Counter()
+
+            for start in range(0, self.vehicle_count, self.chunk_size):
+                count = min(self.chunk_size, self.vehicle_count - start)
+                with transaction.atomic():
+                    self.create_vehicles(start, count)
+                if self.progress:
+                    self.progress(start + count, self.vehicle_count)
+
+            # save() хранилища уже добавил по ссылке на каждое сохранение файла
+            for name, saved in Counter(self.photo_names).items():
+                StoredFile.objects.filter(pk=name).update(ref_count=F('ref_count') + self.photo_uses[name] - saved)
+        return self.stats
+
+    def count(self, model, objects):
+        self.stats[str(model._meta.verbose_name_plural)] += len(objects)
+        return model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    # --- Сотрудники и клиенты ---
+
+    def full_name(self):
+        first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+        # Фамилии в списке мужские; для женских имён — женская форма
+        if first[-1] in 'ьая' and last[-1] == 'в':
+            last += 'а'
+        return f"{last} {first}"
+
+    def phone(self):
+        return f"+996{self.rng.choice(['555', '700', '770', '550', '990'])}{self.rng.randint(0, 999999):06d}"
+
+    def create_users(self):
+        staff = self.count(User, [
+            User(
+                username=f'staff_{self.seed}_{i}',
+                password=self.password_hash,
+                first_name=self.rng.choice(FIRST_NAMES),
+                is_staff_member=True,
+                phone=self.phone(),
+                date_joined=self.moment(self.days_ago(400, 2500)),
+            )
+            for i in range(self.staff_count)
+        ])
+
+        clients = []
+        for i in range(self.client_count):
+            clients.append(User(
+                username=f'client_{self.seed}_{i}',
+                password=self.password_hash,
+                phone=self.phone(),
+                email=f'client{self.seed}.{i}@example.com',
+                date_joined=self.moment(self.days_ago(0, 2500)),
+            ))
+        clients = self.count(User, clients)
+
+        self.count(ClientProfile, [
+            ClientProfile(
+                user=user,
+                full_name=self.full_name(),
+                email=user.email,
+                phone=user.phone,
+                passport_series=self.rng.choice(['ID', 'AN', 'AC']),
+                passport_number=f'{self.rng.randint(0, 9999999):07d}',
+                passport_date=self.days_ago(365, 3650),
+                registration_address=f"{self.rng.choice(CITIES)}, {self.rng.choice(STREETS)}, {self.rng.randint(1, 200)}",
+                created_at=user.date_joined,
+            )
+            for user in clients
+        ])
+        self.client_ids = [user.pk for user in clients]
+        return [user.pk for user in staff]
+
+    def create_placeholder_photos(self):
+        """Несколько настоящих JPEG в хранилище: на них ссылаются все фотографии машин."""
+        # Pillow нужен только генератору, поэтому импортируем по месту
+        from PIL import Image, ImageDraw
+
+        names = []
+        for i in range(PLACEHOLDER_PHOTOS):
+            image = Image.new('RGB', (640, 480), tuple(self.rng.randint(60, 220) for _ in range(3)))
+            ImageDraw.Draw(image).rectangle((120, 200, 520, 360), outline=(255, 255, 255), width=6)
+            data = io.BytesIO()
+            image.save(data, 'JPEG', quality=70)
+            names.append(content_addressed_storage.save(
+                f'vehicle_gallery/placeholder_{i}.jpg', ContentFile(data.getvalue())
+            ))
+        return names
+
+    # --- Машины ---
+
+    def vin(self, wmi):
+        return wmi + ''.join(self.rng.choice(VIN_CHARS) for _ in range(17 - len(wmi)))
+
+    def plate(self):
+        letters = ''.join(self.rng.choice(PLATE_LETTERS) for _ in range(3))
+        return f"{self.rng.randint(1, 9):02d}KG{self.rng.randint(100, 999)}{letters}"
+
+    def vehicle(self, index):
+        rng = self.rng
+        brand, model_name, new_price, body_type, volumes, wmi, _ = rng.choices(MODELS, [m[-1] for m in MODELS])[0]
+        age = min(int(rng.expovariate(1 / 6)), 20)
+        mileage = max(int(age * rng.gauss(18000, 6000)), rng.randint(100, 5000))
+        # Оценки узлов падают с пробегом
+        wear = min(mileage // 80000, 3)
+
+        def rating():
+            return max(1, min(5, 5 - wear + rng.choice([-1, 0, 0, 0, 1])))
+
+        return Vehicle(
+            vin=self.vin(wmi),
+            wialon_imei=f'86{self.seed % 1000:03d}{index:010d}',
+            wialon_id=str(10_000_000 + index) if rng.random() < 0.85 else None,
+            full_name_of_contractor=rng.choice(CONTRACTORS),
+            brand=brand,
+            model_name=model_name,
+            color=rng.choice(COLORS),
+            price=int(new_price * 0.88 ** age * rng.uniform(0.9, 1.1)),
+            year=self.today.year - age,
+            license_plate=self.plate(),
+            body_type=body_type,
+            engine_type=rng.choices(['petrol', 'diesel', 'hybrid', 'GAS'], [75, 10, 10, 5])[0],
+            engine_volume=Decimal(rng.choice(volumes)),
+            engine_rating=rating(),
+            transmission=rng.choices(['automatic', 'manual', 'cvt', 'robot'], [65, 15, 15, 5])[0],
+            transmission_rating=rating(),
+            drive_type=rng.choices(['fwd', 'awd', 'rwd'], [60, 35, 5])[0] if body_type != 'suv' else 'awd',
+            mileage=mileage,
+            tire_tread=rng.choice(['', '3 мм', '5 мм', '7 мм']),
+            chassis_rating=rating(),
+            overall_status=rng.choices(['ok', 'repair', 'broken'], [85, 12, 3])[0],
+            switching_state_of_transmission=rng.random() > 0.05,
+            noise_in_engine_operation=rng.random() < 0.1 * (wear + 1),
+            chassis_steering_of_the_car=rng.random() > 0.05,
+            window_operation=rng.random() > 0.03,
+            stove_in_the_salon=rng.random() > 0.03,
+        )
+
+    def create_vehicles(self, start, count):
+        vehicles, contracts, reports = [], [], []
+        for index in range(start, start + count):
+            vehicle = self.vehicle(index)
+            history = self.contract_history(vehicle)
+            added = min([contract.start_date for contract in history] + [self.days_ago(30, 2000)])
+            vehicle.created_at = self.moment(added - datetime.timedelta(days=self.rng.randint(1, 30)))
+
+            vehicle_reports = self.diagnostics(vehicle)
+            words = vehicle_reports[-1].defect_words if vehicle_reports else None
+            for name, value in health.compute(vehicle, words).items():
+                setattr(vehicle, name, value)
+            vehicle.updated_at = max(
+                [vehicle.created_at] + [report.created_at for report in vehicle_reports[-1:]]
+            )
+
+            vehicles.append(vehicle)
+            contracts.extend(history)
+            reports.append(vehicle_reports)
+
+        self.count(Vehicle, vehicles)
+        self.create_photos(vehicles)
+        self.create_contracts(contracts)
+        self.create_diagnostics(reports)
+        self.create_inspections(vehicles)
+
+    def create_photos(self, vehicles):
+        if not self.photo_names:
+            return
+        photos = []
+        for vehicle in vehicles:
+            for _ in range(self.rng.randint(0, 2 * PHOTOS_PER_VEHICLE)):
+                name = self.rng.choice(self.photo_names)
+                self.photo_uses[name] += 1
+                photos.append(VehiclePhoto(vehicle=vehicle, image=name, uploaded_at=vehicle.created_at))
+        self.count(VehiclePhoto, photos)
+
+    # --- Договоры ---
+
+    def contract_history(self, vehicle):
+        """
+        Договоры машины от последнего к первым, без пересечений: открытым
+        (active/debt) может быть только последний.
+        """
+        rng = self.rng
+        history = []
+        cursor = self.today
+        for position in range(_weighted(rng, CONTRACT_COUNT_WEIGHTS)):
+            months = rng.choice([12, 24, 36])
+            status = _weighted(rng, LAST_CONTRACT_STATUSES if position == 0 else PAST_CONTRACT_STATUSES)
+            if status in Contract.OPEN_STATUSES:
+                # У должника к сегодняшнему дню уже наступило несколько платежей
+                earliest = 20 if status == 'active' else 100
+                start = self.today - datetime.timedelta(days=rng.randint(earliest, months * 30 - 20))
+            else:
+                end = cursor - datetime.timedelta(days=rng.randint(0, 120))
+                start = _add_months(end, -months)
+            percent = Decimal(rng.choice([0, 10, 20, 30]))
+            total = Decimal(vehicle.price)
+            initial = (total * percent / 100).quantize(MONEY)
+            markup = 1 + Decimal('0.18') * months / 12
+
+            history.append(Contract(
+                vehicle=vehicle,
+                client_id=rng.choice(self.client_ids),
+                manager_id=rng.choice(self.staff_ids),
+                start_date=start,
+                end_date=_add_months(start, months),
+                initial_payment_percent=percent,
+                total_amount=total,
+                initial_payment=initial,
+                monthly_payment=((total - initial) * markup / months).quantize(MONEY),
+                payment_due_day=rng.randint(1, 28),
+                status=status,
+                created_at=self.moment(start - datetime.timedelta(days=rng.randint(0, 3))),
+            ))
+            cursor = start - datetime.timedelta(days=rng.randint(3, 90))
+        history.reverse()
+        return history
+
+    def payments(self, contract, rows):
+        """
+        Какие строки графика оплачены: у действующих — всё наступившее, у должников —
+        всё, кроме последних 1–4 платежей, у завершённых — весь график,
+        у расторгнутых — до даты расторжения.
+        """
+        due = [row for row in rows if row.due_date <= self.today]
+        if contract.status == 'completed':
+            return rows
+        if contract.status == 'debt':
+            return due[:max(len(due) - self.rng.randint(1, 4), 0)]
+        if contract.status == 'terminated':
+            return due[:int(len(due) * self.rng.uniform(0.3, 0.9))]
+        return due
+
+    def create_contracts(self, contracts):
+        # Номера — блоком из счётчика на каждый день, как при обычном оформлении
+        by_day = defaultdict(list)
+        for contract in contracts:
+            by_day[contract.start_date].append(contract)
+        for day, day_contracts in by_day.items():
+            numbers = ContractNumberCounter.objects.allocate(count=len(day_contracts), day=day)
+            for contract, value in zip(day_contracts, numbers):
+                contract.contract_number = Contract.format_number(day, value)
+
+        schedules, payments = [], []
+        for contract in contracts:
+            rows = [
+                PaymentScheduleItem(number=number, due_date=due_date, amount=amount)
+                for number, due_date, amount in schedule_rows(contract)
+            ]
+            contract_payments = []
+            for row in self.payments(contract, rows):
+                row.paid_amount = row.amount
+                paid_at = min(row.due_date + datetime.timedelta(days=self.rng.randint(-5, 7)), self.today)
+                contract_payments.append(Payment(
+                    amount=row.amount,
+                    paid_at=paid_at,
+                    created_by_id=contract.manager_id,
+                    created_at=self.moment(paid_at),
+                ))
+
+            paid_total = sum((payment.amount for payment in contract_payments), Decimal(0))
+            summary = summarize([(row.due_date, row.amount, row.paid_amount) for row in rows], paid_total, self.today)
+            for name, value in summary.items():
+                setattr(contract, name, value)
+            contract.paid_total = paid_total
+            contract.updated_at = max([contract.created_at] + [payment.created_at for payment in contract_payments])
+            schedules.append(rows)
+            payments.append(contract_payments)
+
+        self.count(Contract, contracts)
+        for contract, rows, contract_payments in zip(contracts, schedules, payments):
+            for item in rows + contract_payments:
+                item.contract = contract
+        self.count(PaymentScheduleItem, [row for rows in schedules for row in rows])
+        self.count(Payment, [payment for items in payments for payment in items])
+
+        # Закрытые и просроченные договоры попадали в журнал статусов
+        self.count(ContractStatusChange, [
+            ContractStatusChange(
+                contract=contract,
+                old_status='active',
+                new_status=contract.status,
+                debt_amount=contract.debt_amount,
+                changed_at=contract.updated_at,
+            )
+            for contract in contracts if contract.status != 'active'
+        ])
+
+    # --- Диагностики и осмотры ---
+
+    def diagnostics(self, vehicle):
+        """
+        Диагностики машины по порядку: часть замечаний устраняется к следующему
+        осмотру, появляются новые. Объекты ещё не сохранены.
+        """
+        rng = self.rng
+        added = vehicle.created_at.date()
+        span = max((self.today - added).days, 1)
+        moments = sorted(
+            self.moment(added + datetime.timedelta(days=rng.randint(0, span)))
+            for _ in range(rng.randint(0, 2 * DIAGNOSTICS_PER_VEHICLE))
+        )
+
+        reports = []
+        open_items = set()
+        for created_at in moments:
+            # sorted: порядок обхода множества строк меняется от запуска к запуску
+            open_items = {name for name in sorted(open_items) if rng.random() > 0.6}
+            open_items.update(rng.sample(self.items, rng.choices([0, 1, 2, 4], [50, 30, 15, 5])[0]))
+            words = checklist.pack(open_items)
+            reports.append(DiagnosticReport(
+                vehicle=vehicle,
+                mechanic_id=rng.choice(self.staff_ids),
+                date=created_at.date(),
+                created_at=created_at,
+                updated_at=created_at,
+                checklist_version=self.version,
+                defect_count=checklist.count(words),
+                **dict(zip(checklist.WORD_FIELDS, words)),
+            ))
+        return reports
+
+    def create_diagnostics(self, reports_by_vehicle):
+        self.count(DiagnosticReport, [report for reports in reports_by_vehicle for report in reports])
+
+        # Замечания — так же, как defects.rebuild_vehicle_defects, но без чтения из базы
+        found = []
+        for reports in reports_by_vehicle:
+            episodes = {}
+            previous = (0,) * len(checklist.WORD_FIELDS)
+            for report in reports:
+                new, resolved, still_open = defects.diff_words(previous, report.defect_words, self.inspected)
+                for name in checklist.unpack(resolved):
+                    episode = episodes.pop(name)
+                    episode.closed_report = report
+                    episode.closed_at = report.created_at
+                    found.append(episode)
+                for name in checklist.unpack(new):
+                    episodes[name] = VehicleDefect(
+                        vehicle_id=report.vehicle_id,
+                        item=name,
+                        opened_report=report,
+                        opened_at=report.created_at,
+                    )
+                previous = tuple(n | s for n, s in zip(new, still_open))
+            found.extend(episodes.values())
+        self.count(VehicleDefect, found)
+
+    def create_inspections(self, vehicles):
+        rng = self.rng
+        inspections = []
+        for vehicle in vehicles:
+            added = vehicle.created_at.date()
+            span = max((self.today - added).days, 1)
+            for _ in range(rng.randint(0, 2 * INSPECTIONS_PER_VEHICLE)):
+                date = self.moment(added + datetime.timedelta(days=rng.randint(0, span)))
+                inspections.append(Inspection(
+                    vehicle=vehicle,
+                    inspector_id=rng.choice(self.staff_ids),
+                    date=date,
+                    updated_at=date,
+                    engine_summary=rng.choice(ENGINE_NOTES),
+                    body_summary=rng.choice(BODY_NOTES),
+                    suspension_summary=rng.choice(SUSPENSION_NOTES),
+                ))
+        self.count(Inspection, inspections)
+
+
+def generate_fleet(scale, seed=0, **options):
+    """Синтетический автопарк масштаба scale (см. FleetGenerator). Возвращает Counter созданных записей."""
+    return FleetGenerator(scale, seed, **options).generate()
@@ -0,0 +1,158 @@
+"""
+Оценка состояния автомобиля (0–100).
+
+Итог складывается из подоценок: двигатель, КПП, ходовая, оборудование и
+последняя диагностика. Всё хранится в полях Vehicle.health_* и пересчитывается
+при сохранении машины или её диагностики, поэтому сортировка и фильтр
+на дашборде идут по индексу, а не считаются в шаблоне для каждой строки.
+"""
+from . import checklist
+
+# Вес подоценки в итоговой оценке
+WEIGHTS = {
+    'engine': 0.25,
+    'transmission': 0.2,
+    'chassis': 0.2,
+    'equipment': 0.1,
+    'diagnostic': 0.25,
+}
+
+# Общий статус ограничивает оценку сверху: машина в ремонте не может быть "хорошей"
+STATUS_CAPS = {
+    'ok': 100,
+    'repair': 60,
+    'broken': 30,
+}
+
+# Во сколько раз снижается подоценка узла, если отмечена его неисправность
+FLAG_PENALTY = 0.7
+
+# Флаги оборудования: True — работает
+EQUIPMENT_FLAGS = (
+    'window_operation',
+    'sound_signal_operation',
+    'windscreen_wipers_wiper_motor',
+    'headlights_sidelights_turn_signals',
+    'stove_in_the_salon',
+    'alarms_locks_keys',
+)
+
+# Сколько баллов диагностики снимает одно замечание (по префиксу имени пункта)
+DEFECT_WEIGHTS = (
+    ('brake_', 8),
+    ('steering_', 6),
+    ('drive_', 5),
+    ('susp_front_sb_', 2),
+    ('susp_rear_sb_', 2),
+    ('susp_', 4),
+)
+DEFAULT_DEFECT_WEIGHT = 5
+
+CONDITION_CHOICES = (
+    ('good', 'Хорошее', 80, 100),
+    ('fair', 'Среднее', 50, 79),
+    ('poor', 'Плохое', 0, 49),
+)
+
+# Поля Vehicle, от которых зависит оценка
+SOURCE_FIELDS = (
+    'engine_rating', 'transmission_rating', 'chassis_rating', 'overall_status',
+    'noise_in_engine_operation', 'switching_state_of_transmission', 'chassis_steering_of_the_car',
+) + EQUIPMENT_FLAGS
+
+SCORE_FIELDS = (
+    'health_score', 'health_engine', 'health_transmission',
+    'health_chassis', 'health_equipment', 'health_diagnostic',
+)
+
+
+def _defect_weight(name):
+    for prefix, weight in DEFECT_WEIGHTS:
+        if name.startswith(prefix):
+            return weight
+    return DEFAULT_DEFECT_WEIGHT
+
+
+# Вес каждого пункта по его номеру бита
+ITEM_WEIGHTS = tuple(_defect_weight(item.name) for item in checklist.CHECKLIST_ITEMS)
+
+
+def _rating_score(rating):
+    # Оценка 1–5 -> 0–100
+    return (min(max(rating or 1, 1), 5) - 1) * 25
+
+
+def diagnostic_score(words):
+    """Баллы последней диагностики; words — колонки defect_bits_* или None, если диагностик нет."""
+    if not words:
+        return 100
+    penalty = sum(ITEM_WEIGHTS[checklist.ITEM_INDEX[name]] for name in checklist.unpack(words))
+    return max(100 - penalty, 0)
+
+
+def compute(vehicle, words=None):
+    """
+    Подоценки и итог для машины. words — колонки последней диагностики.
+    Возвращает словарь {поле Vehicle: значение} по SCORE_FIELDS.
+    """
+    engine = _rating_score(vehicle.engine_rating)
+    if vehicle.noise_in_engine_operation:
+        engine *= FLAG_PENALTY
+
+    transmission = _rating_score(vehicle.transmission_rating)
+    if not vehicle.switching_state_of_transmission:
+        transmission *= FLAG_PENALTY
+
+    chassis = _rating_score(vehicle.chassis_rating)
+    if not vehicle.chassis_steering_of_the_car:
+        chassis *= FLAG_PENALTY
+
+    equipment = 100 * sum(bool(getattr(vehicle, flag)) for flag in EQUIPMENT_FLAGS) / len(EQUIPMENT_FLAGS)
+    diagnostic = diagnostic_score(words)
+
+    parts = {
+        'engine': engine,
+        'transmission': transmission,
+        'chassis': chassis,
+        'equipment': equipment,
+        'diagnostic': diagnostic,
+    }
+    total = sum(parts[name] * weight for name, weight in WEIGHTS.items())
+    total = min(total, STATUS_CAPS.get(vehicle.overall_status, 100))
+
+    scores = {f'health_{name}': round(value) for name, value in parts.items()}
+    scores['health_score'] = round(total)
+    return scores
+
+
+def latest_words(vehicle_id):
+    from .models import DiagnosticReport
+
+    return (
+        DiagnosticReport.objects
+        .filter(vehicle_id=vehicle_id)
+        .order_by('-created_at', '-pk')
+        .values_list(*checklist.WORD_FIELDS)
+        .first()
+    )
+
+
+def refresh_vehicle(vehicle_id):
+    """
+    Пересчёт после изменения диагностики. Пишем только поля оценки через update():
+    Vehicle.save() заново сходил бы в Wialon.
+    """
+    from .models import Vehicle
+
+    vehicle = Vehicle.objects.filter(pk=vehicle_id).only(*SOURCE_FIELDS).first()
+    if vehicle is None:
+        return
+    Vehicle.objects.filter(pk=vehicle_id).update(**compute(vehicle, latest_words(vehicle_id)))
+
+
+def condition_range(condition):
+    """Границы оценки для фильтра дашборда или None."""
+    for value, _, low, high in CONDITION_CHOICES:
+        if value == condition:
+            return low, high
+    return None
@@ -0,0 +1,324 @@
+"""
+Массовый импорт автомобилей из CSV/XLSX.
+
+Файл читается потоково, строка за строкой (csv.reader или openpyxl в режиме
+read_only), и проверяется пачками: поля — полями VehicleImportForm, дубли VIN —
+одним запросом на пачку. Пачка сохраняется через bulk_create в своей транзакции,
+поэтому ошибка в одной строке не откатывает остальные. Vehicle.save() не вызывается:
+оценка состояния считается здесь же, а Wialon ID ищется одним запросом на весь
+файл после вставки (utils.find_wialon_ids_by_imei) — или позже, командой link_wialon.
+"""
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import caching, health
+from .forms import VehicleImportForm
+from .models import Vehicle
+from .utils import find_wialon_ids_by_imei
+
+BATCH_SIZE = 500
+
+TRUE_VALUES = {'1', 'да', 'true', 'yes', 'y', '+', 'исправно', 'есть'}
+FALSE_VALUES = {'0', 'нет', 'false', 'no', 'n', '-', 'неисправно'}
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+@dataclass
+class ImportResult:
+    created: int = 0
+    rows: int = 0
+    wialon_linked: int = 0
+    # Машины с IMEI, которого нет в аккаунте Wialon
+    wialon_missing: int = 0
+    # Машины с IMEI, привязка которых отложена (link_wialon=False)
+    wialon_pending: int = 0
+    errors: list = field(default_factory=list)
+
+    def add_error(self, row_number, message):
+        self.errors.append((row_number, message))
+
+
+def _column_aliases():
+    """Заголовок столбца -> имя поля: принимаем и имя поля, и подпись из модели."""
+    aliases = {}
+    for name, form_field in VehicleImportForm.base_fields.items():
+        aliases[name.lower()] = name
+        aliases[str(form_field.label).strip().lower()] = name
+    return aliases
+
+
+def _choice_lookup():
+    """Для полей с выбором: подпись ('Автомат') и значение ('automatic') -> значение."""
+    lookup = {}
+    for model_field in Vehicle._meta.fields:
+        if model_field.choices:
+            options = {}
+            for value, label in model_field.choices:
+                options[str(value).lower()] = value
+                options[str(label).lower()] = value
+            lookup[model_field.name] = options
+    return lookup
+
+
+def _boolean_fields():
+    return {f.name for f in Vehicle._meta.fields if f.get_internal_type() == 'BooleanField'}
+
+
+def _defaults():
+    """Значения по умолчанию из модели — для пустых ячеек и отсутствующих столбцов."""
+    return {
+        name: Vehicle._meta.get_field(name).get_default()
+        for name in VehicleImportForm.base_fields
+        if Vehicle._meta.get_field(name).has_default()
+    }
+
+
+def _read_csv(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+
+    reader = csv.reader(text, dialect)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield header
+    yield from reader
+
+
+def _read_xlsx(stream):
+    # openpyxl нужен только для импорта, поэтому импортируем по месту
+    from openpyxl import load_workbook
+
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFileError(f"Не удалось открыть XLSX: {e}")
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ['' if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def iter_rows(stream, filename):
+    """
+    Строки файла словарями {поле: значение} с номером строки в файле.
+    Ничего не держит в памяти целиком.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.csv':
+        rows = _read_csv(stream)
+    elif extension in ('.xlsx', '.xlsm'):
+        rows = _read_xlsx(stream)
+    else:
+        raise ImportFileError("Поддерживаются только файлы CSV и XLSX")
+
+    header = next(rows, None)
+    if not header:
+        raise ImportFileError("Файл пустой")
+
+    aliases = _column_aliases()
+    columns = [aliases.get(str(title).strip().lower()) for title in header]
+    if 'vin' not in columns:
+        raise ImportFileError("В файле нет столбца VIN")
+
+    for row_number, row in enumerate(rows, start=2):
+        if not any(str(value).strip() for value in row):
+            continue
+        yield row_number, {name: value for name, value in zip(columns, row) if name}
+
+
+def normalize(data, choices, booleans, defaults):
+    """
+    Значения из таблицы -> данные для формы: да/нет, подписи вариантов, запятые в числах.
+    Непонятное значение галочки — ValueError с текстом для отчёта.
+    """
+    values = dict(defaults)
+    for name, value in data.items():
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        value = '' if value is None else str(value).strip()
+        if not value:
+            continue
+
+        if name in booleans:
+            if value.lower() in TRUE_VALUES:
+                value = True
+            elif value.lower() in FALSE_VALUES:
+                value = False
+            else:
+                raise ValueError(f"{VehicleImportForm.base_fields[name].label}: непонятное значение «{value}»")
+        elif name in choices:
+            value = choices[name].get(value.lower(), value)
+        elif name == 'engine_volume':
+            value = value.replace(',', '.')
+        elif name == 'vin':
+            value = value.upper()
+        values[name] = value
+    return values
+
+
+def clean_row(data):
+    """
+    Проверка одной строки полями VehicleImportForm и валидаторами модели.
+    Экземпляр формы на каждую строку не создаётся: на 10 тысячах строк
+    копирование полей формы занимает больше времени, чем сама проверка.
+    Возвращает (Vehicle, None) или (None, текст ошибки).
+    """
+    cleaned = {}
+    errors = []
+    for name, form_field in VehicleImportForm.base_fields.items():
+        try:
+            value = form_field.clean(data.get(name))
+            Vehicle._meta.get_field(name).run_validators(value)
+        except ValidationError as e:
+            errors.append(f"{form_field.label}: {' '.join(e.messages)}")
+        else:
+            cleaned[name] = value
+
+    if errors:
+        return None, '; '.join(errors)
+    return Vehicle(**cleaned), None
+
+
+def _validate_batch(batch, result, seen_vins):
+    """
+    Проверка пачки: поля — clean_row, уникальность VIN — одним запросом на пачку.
+    Возвращает пары (номер строки, Vehicle).
+    """
+    vins = [data.get('vin', '') for _, data in batch]
+    existing = set(Vehicle.objects.filter(pk__in=vins).values_list('pk', flat=True))
+
+    vehicles = []
+    for row_number, data in batch:
+        vehicle, error = clean_row(data)
+        if error:
+            result.add_error(row_number, error)
+            continue
+
+        if vehicle.vin in existing:
+            result.add_error(row_number, f"Автомобиль с VIN {vehicle.vin} уже есть в базе")
+            continue
+        if vehicle.vin in seen_vins:
+            result.add_error(row_number, f"VIN {vehicle.vin} повторяется в файле")
+            continue
+        seen_vins.add(vehicle.vin)
+
+        for name, value in health.compute(vehicle, None).items():
+            setattr(vehicle, name, value)
+        vehicles.append((row_number, vehicle))
+    return vehicles
+
+
+def _insert_batch(rows, result, batch_size):
+    """
+    bulk_create пачки в своей транзакции. Если тот же VIN тем временем добавили
+    в другом запросе (IntegrityError), такие строки уходят в ошибки, а остальные
+    вставляются повторно. Возвращает сохранённые машины.
+    """
+    try:
+        with transaction.atomic():
+            Vehicle.objects.bulk_create([vehicle for _, vehicle in rows], batch_size=batch_size)
+        return [vehicle for _, vehicle in rows]
+    except IntegrityError:
+        pass
+
+    taken = set(Vehicle.objects.filter(pk__in=[vehicle.vin for _, vehicle in rows]).values_list('pk', flat=True))
+    remaining = []
+    for row_number, vehicle in rows:
+        if vehicle.vin in taken:
+            result.add_error(row_number, f"Автомобиль с VIN {vehicle.vin} уже есть в базе (добавлен во время импорта)")
+        else:
+            remaining.append((row_number, vehicle))
+    if not remaining:
+        return []
+
+    try:
+        with transaction.atomic():
+            Vehicle.objects.bulk_create([vehicle for _, vehicle in remaining], batch_size=batch_size)
+    except IntegrityError as e:
+        for row_number, _ in remaining:
+            result.add_error(row_number, f"Не удалось сохранить: {e}")
+        return []
+    return [vehicle for _, vehicle in remaining]
+
+
+def link_wialon_ids(pairs, batch_size=BATCH_SIZE):
+    """
+    Wialon ID по IMEI для пар (VIN, IMEI) — один запрос в Wialon и bulk_update.
+    Возвращает (привязано, не найдено в Wialon).
+    """
+    pairs = list(pairs)
+    found = find_wialon_ids_by_imei(imei for _, imei in pairs)
+    now = timezone.now()
+    vehicles = [
+        Vehicle(pk=vin, wialon_id=str(found[imei]), updated_at=now)
+        for vin, imei in pairs if imei in found
+    ]
+
+    # bulk_update без сигналов: updated_at (для API) и кэш карточек — сами
+    Vehicle.objects.bulk_update(vehicles, ['wialon_id', 'updated_at'], batch_size=batch_size)
+    for vehicle in vehicles:
+        caching.bump_vehicle_version(vehicle.pk)
+    return len(vehicles), len(pairs) - len(vehicles)
+
+
+def import_vehicles(stream, filename, batch_size=BATCH_SIZE, link_wialon=True, dry_run=False):
+    """
+    Импорт из открытого бинарного файла. Возвращает ImportResult
+    с числом созданных машин и ошибками по номерам строк.
+    """
+    result = ImportResult()
+    choices = _choice_lookup()
+    booleans = _boolean_fields()
+    defaults = _defaults()
+    seen_vins = set()
+    pending_wialon = []
+
+    def flush(batch):
+        rows = _validate_batch(batch, result, seen_vins)
+        if not rows or dry_run:
+            result.created += len(rows)
+            return
+        vehicles = _insert_batch(rows, result, batch_size)
+        result.created += len(vehicles)
+        pending_wialon.extend((v.vin, v.wialon_imei) for v in vehicles if v.wialon_imei)
+
+    batch = []
+    for row_number, data in iter_rows(stream, filename):
+        result.rows += 1
+        try:
+            batch.append((row_number, normalize(data, choices, booleans, defaults)))
+        except ValueError as e:
+            result.add_error(row_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    # Ошибки разбора значений попадают в список раньше ошибок проверки своей пачки
+    result.errors.sort()
+
+    if not pending_wialon:
+        return result
+    if link_wialon:
+        result.wialon_linked, result.wialon_missing = link_wialon_ids(pending_wialon, batch_size)
+    else:
+        result.wialon_pending = len(pending_wialon)
+    return result
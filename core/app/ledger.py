@@ -0,0 +1,181 @@
+"""
+График платежей и баланс договора.
+
+График строится при сохранении договора и записывается одним bulk_create.
+Платёж распределяется по неоплаченным строкам в порядке сроков, а итоги
+(оплачено, начислено, долг) хранятся в полях Contract — долг клиента
+берётся из индексированной колонки, без суммирования истории.
+"""
+import calendar
+import datetime
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import caching
+from .models import Contract, Payment, PaymentScheduleItem
+
+MONEY = Decimal('0.01')
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def _due_date(year, month, day):
+    # 31-е число в коротком месяце переносится на последний день месяца
+    return datetime.date(year, month, min(max(day, 1), calendar.monthrange(year, month)[1]))
+
+
+def schedule_rows(contract):
+    """
+    График договора списком (номер, срок, сумма): первоначальный взнос в день
+    начала и ежемесячные платежи в день оплаты каждого следующего месяца до конца договора.
+    """
+    start, end = _as_date(contract.start_date), _as_date(contract.end_date)
+    rows = []
+
+    initial = Decimal(contract.initial_payment or 0).quantize(MONEY)
+    if initial > 0:
+        rows.append((0, start, initial))
+
+    monthly = Decimal(contract.monthly_payment or 0).quantize(MONEY)
+    if monthly <= 0:
+        return rows
+
+    year, month = start.year, start.month
+    number = 1
+    while True:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        due = _due_date(year, month, contract.payment_due_day or 1)
+        if due > end:
+            break
+        rows.append((number, due, monthly))
+        number += 1
+    return rows
+
+
+def summarize(rows, paid_total, today=None):
+    """
+    Итоги договора по строкам графика (срок, сумма, оплачено) и сумме платежей.
+    Возвращает словарь полей Contract.
+    """
+    today = today or timezone.localdate()
+    scheduled = due = Decimal(0)
+    next_due = None
+
+    for due_date, amount, paid in rows:
+        scheduled += amount
+        if due_date <= today:
+            due += amount
+        if paid < amount and (next_due is None or due_date < next_due):
+            next_due = due_date
+
+    return {
+        'scheduled_total': scheduled,
+        'due_total': due,
+        'paid_total': paid_total,
+        'debt_amount': max(due - paid_total, Decimal(0)),
+        'next_due_date': next_due,
+    }
+
+
+def refresh_balance(contract_id, today=None):
+    """Пересчитывает итоги одного договора по его графику (десятки строк)."""
+    contract = Contract.objects.filter(pk=contract_id).values('paid_total', 'vehicle_id').first()
+    if contract is None:
+        return
+
+    rows = PaymentScheduleItem.objects.filter(contract_id=contract_id).values_list('due_date', 'amount', 'paid_amount')
+    Contract.objects.filter(pk=contract_id).update(
+        updated_at=timezone.now(), **summarize(rows, contract['paid_total'], today)
+    )
+    # Долг показывается на карточке автомобиля, а update() сигналов не шлёт
+    caching.touch_vehicle(contract['vehicle_id'])
+
+
+def _allocate(rows, amount):
+    """Раскладывает сумму по строкам графика по порядку. Возвращает изменённые строки."""
+    changed = []
+    for row in rows:
+        if amount <= 0:
+            break
+        take = min(amount, row.amount - row.paid_amount)
+        if take <= 0:
+            continue
+        row.paid_amount += take
+        amount -= take
+        changed.append(row)
+    return changed
+
+
+def sync_schedule(contract):
+    """
+    Приводит график к условиям договора. Если сроки и суммы не менялись,
+    обходится одним запросом; иначе график пересоздаётся и платежи раскладываются заново.
+    """
+    expected = schedule_rows(contract)
+    existing = list(contract.schedule.order_by('number').values_list('number', 'due_date', 'amount'))
+    if existing == expected:
+        return False
+
+    with transaction.atomic():
+        contract.schedule.all().delete()
+        PaymentScheduleItem.objects.bulk_create([
+            PaymentScheduleItem(contract=contract, number=number, due_date=due_date, amount=amount)
+            for number, due_date, amount in expected
+        ])
+        rebuild_contract(contract.pk)
+    return True
+
+
+def apply_payment(payment):
+    """Новый платёж: гасим строки графика по порядку сроков и сдвигаем итоги договора."""
+    with transaction.atomic():
+        rows = list(
+            PaymentScheduleItem.objects
+            .select_for_update()
+            .filter(contract_id=payment.contract_id, paid_amount__lt=F('amount'))
+            .order_by('due_date', 'number')
+        )
+        PaymentScheduleItem.objects.bulk_update(_allocate(rows, payment.amount), ['paid_amount'])
+
+        # Переплата остаётся в paid_total и уменьшает будущий долг
+        Contract.objects.filter(pk=payment.contract_id).update(paid_total=F('paid_total') + payment.amount)
+        refresh_balance(payment.contract_id)
+
+
+def rebuild_contract(contract_id):
+    """
+    Раскладывает все платежи договора заново. Нужно после удаления или
+    исправления платежа и после пересоздания графика.
+    """
+    with transaction.atomic():
+        rows = list(
+            PaymentScheduleItem.objects
+            .select_for_update()
+            .filter(contract_id=contract_id)
+            .order_by('due_date', 'number')
+        )
+        for row in rows:
+            row.paid_amount = Decimal(0)
+
+        paid_total = Payment.objects.filter(contract_id=contract_id).aggregate(total=Sum('amount'))['total'] or Decimal(0)
+        _allocate(rows, paid_total)
+        PaymentScheduleItem.objects.bulk_update(rows, ['paid_amount'])
+
+        Contract.objects.filter(pk=contract_id).update(paid_total=paid_total)
+        refresh_balance(contract_id)
+
+
+def client_debt(client):
+    """Суммарный долг клиента по всем договорам (по индексу client + debt_amount)."""
+    return (
+        Contract.objects
+        .filter(client=client, debt_amount__gt=0)
+        .aggregate(total=Sum('debt_amount'))['total'] or Decimal(0)
+    )
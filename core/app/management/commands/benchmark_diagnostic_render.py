@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+
+from app.forms import DiagnosticReportForm
+from app.models import DiagnosticReport
+from app.sheet import render_pdf_sheet
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет рендеринг шаблонов диагностического листа (PDF-шаблон и форма): "
+        "среднее время на один рендер и размер HTML. WeasyPrint не вызывается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--report',
+            type=int,
+            help="ID диагностического листа (по умолчанию — последний)"
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=200,
+            help="Сколько раз рендерить каждый шаблон (по умолчанию 200)"
+        )
+        parser.add_argument(
+            '--template',
+            default='app/diagnostic_pdf.html',
+            help="PDF-шаблон для замера, например старая версия для сравнения"
+        )
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        queryset = DiagnosticReport.objects.select_related('vehicle')
+
+        if options['report']:
+            report = queryset.filter(pk=options['report']).first()
+        else:
+            report = queryset.order_by('-created_at').first()
+        if report is None:
+            raise CommandError("Нет диагностического листа для замера")
+
+        def pdf_context():
+            return {'report': report, 'vehicle': report.vehicle, 'sheet': render_pdf_sheet(report)}
+
+        def form_context():
+            form = DiagnosticReportForm(instance=report)
+            axes, equipment = form.sheet()
+            return {'form': form, 'vehicle': report.vehicle, 'axes': axes, 'equipment': equipment}
+
+        self.stdout.write(f"Лист #{report.pk}, замечаний: {report.defect_count}, рендеров: {iterations}")
+        self.measure(options['template'], pdf_context, iterations)
+        self.measure('app/diagnostic_form.html', form_context, iterations)
+
+    def measure(self, template_name, make_context, iterations):
+        """Печатает и возвращает среднее время одного рендера, мс."""
+        template = get_template(template_name)
+
+        # Первый рендер прогревает загрузчики и кэш шаблонов
+        html = template.render(make_context())
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            template.render(make_context())
+        per_render = (time.perf_counter() - started) / iterations * 1000
+
+        self.stdout.write(
+            f"{template_name}: {per_render:.2f} мс на рендер, "
+            f"HTML {len(html.encode()) / 1024:.1f} КБ"
+        )
+        return per_render
@@ -0,0 +1,226 @@
+import os
+import time
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, FileField
+
+from app.models import ChunkedUpload, StoredFile
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одно "
+        "FileField/ImageField в приложениях app и user."
+    )
+
+    APP_LABELS = ('app', 'user')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Только показать, что будет удалено"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Сколько файлов проверять и удалять за один проход (по умолчанию 500)"
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=60,
+            help="Не трогать файлы, изменённые менее N минут назад: их запись в БД может быть ещё не сохранена"
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.min_mtime = time.time() - options['min_age'] * 60
+        self.file_fields = self.collect_file_fields()
+        batch_size = options['batch_size']
+
+        # найдено, удалено, обнулено счётчиков, байт
+        totals = [0, 0, 0, 0]
+        batch = []
+
+        # Разность «файлы на диске − ссылки в БД» считается пачками: ни дерево файлов,
+        # ни множество ссылок целиком в память не загружаются
+        for name in self.old_files():
+            batch.append(name)
+            if len(batch) >= batch_size:
+                totals = [a + b for a, b in zip(totals, self.process_batch(batch))]
+                batch = []
+
+        if batch:
+            totals = [a + b for a, b in zip(totals, self.process_batch(batch))]
+        found, deleted, reset, freed = totals
+
+        if not self.dry_run:
+            fixed = self.fix_ref_counts(batch_size)
+            if fixed:
+                self.stdout.write(f"Исправлено счётчиков ссылок: {fixed}")
+        if reset:
+            self.stdout.write(
+                f"Обнулено счётчиков у файлов без ссылок: {reset} (удалятся при следующем запуске)"
+            )
+
+        verb = "Будет удалено" if self.dry_run else "Удалено"
+        self.stdout.write(self.style.SUCCESS(
+            f"Найдено лишних файлов: {found}. {verb}: {found if self.dry_run else deleted} "
+            f"({freed / 1024 / 1024:.1f} МБ)"
+        ))
+
+    def collect_file_fields(self):
+        return [
+            (model, field)
+            for label in self.APP_LABELS
+            for model in apps.get_app_config(label).get_models()
+            for field in model._meta.get_fields()
+            if isinstance(field, FileField)
+        ]
+
+    def old_files(self):
+        """
+        Обходит дерево MEDIA_ROOT и отдаёт имена файлов старше --min-age.
+        Время изменения — период ожидания: ContentAddressedStorage обновляет его
+        и при повторной загрузке уже существующего файла.
+        """
+        root = os.path.abspath(settings.MEDIA_ROOT)
+
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                if self.is_old(path):
+                    yield os.path.relpath(path, root).replace(os.sep, '/')
+
+    def is_old(self, path):
+        try:
+            return os.stat(path).st_mtime <= self.min_mtime
+        except FileNotFoundError:
+            return False
+
+    def reference_counts(self, names):
+        """Сколько раз каждое из names встречается в файловых полях, плюс заготовки загрузок."""
+        counts = {}
+        for model, field in self.file_fields:
+            rows = (
+                model._default_manager
+                .filter(**{f'{field.name}__in': names})
+                .values_list(field.name)
+                .annotate(count=Count('pk'))
+                .order_by()
+            )
+            for name, count in rows:
+                counts[name] = counts.get(name, 0) + count
+
+        # Файлы-заготовки незавершённых загрузок частями тоже нужны
+        parts = {}
+        for name in names:
+            directory, _, filename = name.rpartition('/')
+            if directory == settings.CHUNKED_UPLOAD_DIR and filename.endswith('.part'):
+                try:
+                    parts[uuid.UUID(filename[:-len('.part')])] = name
+                except ValueError:
+                    continue
+        if parts:
+            for upload_id in ChunkedUpload.objects.filter(pk__in=parts, status='uploading').values_list('pk', flat=True):
+                counts[parts[upload_id]] = counts.get(parts[upload_id], 0) + 1
+
+        return counts
+
+    def process_batch(self, names):
+        """(найдено, удалено, обнулено счётчиков, байт) по одной пачке имён."""
+        candidates = [name for name in names if name not in self.reference_counts(names)]
+        if not candidates:
+            return 0, 0, 0, 0
+
+        root = os.path.abspath(settings.MEDIA_ROOT)
+        if self.dry_run:
+            freed = 0
+            for name in candidates:
+                self.stdout.write(f"  {name}")
+                freed += self.file_size(os.path.join(root, name))
+            return len(candidates), 0, 0, freed
+
+        deleted = reset = freed = 0
+        # Та же блокировка строк StoredFile, что у ContentAddressedStorage._save и delete():
+        # параллельная загрузка, сославшаяся на файл, либо уже видна, либо ждёт нас
+        with transaction.atomic():
+            stored = {
+                row.name: row
+                for row in StoredFile.objects.select_for_update().filter(name__in=candidates)
+            }
+            referenced = self.reference_counts(candidates)
+
+            for name in candidates:
+                if name in referenced:
+                    continue
+                row = stored.get(name)
+                if row is not None and row.ref_count != 0:
+                    # Ссылок в БД нет, а счётчик не ноль — разошёлся. Обнуляем и ждём следующего
+                    # запуска: до него файл мог снова понадобиться и обновить время изменения
+                    StoredFile.objects.filter(name=name).update(ref_count=0)
+                    reset += 1
+                    continue
+
+                path = os.path.join(root, name)
+                if not self.is_old(path):
+                    continue
+                size = self.file_size(path)
+                try:
+                    os.remove(path)
+                    deleted += 1
+                    freed += size
+                except FileNotFoundError:
+                    pass
+                if row is not None:
+                    row.delete()
+
+        return len(candidates), deleted, reset, freed
+
+    @staticmethod
+    def file_size(path):
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return 0
+
+    def fix_ref_counts(self, batch_size):
+        """
+        Счётчики ссылок могли разойтись (замена фото в админке, удаление через queryset.update).
+        Сверяем их с реальным числом ссылок пачками, каждую — под блокировкой строк.
+        """
+        fixed = 0
+        names = StoredFile.objects.order_by('name').values_list('name', flat=True).iterator(chunk_size=5000)
+        batch = []
+
+        for name in names:
+            batch.append(name)
+            if len(batch) >= batch_size:
+                fixed += self.fix_ref_count_batch(batch)
+                batch = []
+        if batch:
+            fixed += self.fix_ref_count_batch(batch)
+
+        return fixed
+
+    def fix_ref_count_batch(self, names):
+        to_update = []
+        with transaction.atomic():
+            rows = list(StoredFile.objects.select_for_update().filter(name__in=names).only('name', 'ref_count'))
+            actual = self.reference_counts(names)
+            for stored in rows:
+                count = actual.get(stored.name, 0)
+                # Нулевые счётчики обрабатывает удаление файлов, здесь — только живые ссылки
+                if count and stored.ref_count != count:
+                    stored.ref_count = count
+                    to_update.append(stored)
+            if to_update:
+                StoredFile.objects.bulk_update(to_update, ['ref_count'])
+        return len(to_update)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет брошенные загрузки частями — без новых частей дольше "
+        "CHUNKED_UPLOAD_EXPIRY_HOURS — вместе с файлами-заготовками. Запускать раз в сутки (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Только показать, сколько загрузок будет удалено"
+        )
+
+    def handle(self, *args, **options):
+        count = expire_uploads(dry_run=options['dry_run'])
+        verb = "Будет удалено" if options['dry_run'] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} брошенных загрузок (старше {settings.CHUNKED_UPLOAD_EXPIRY_HOURS} ч): {count}"
+        ))
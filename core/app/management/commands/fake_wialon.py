@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app import fake_wialon
+from app.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = (
+        "Запускает локальную замену Wialon API с движущимися объектами — для тестов "
+        "и нагрузочных прогонов без настоящего сервиса. Сайт направляется на неё "
+        "переменной окружения WIALON_BASE_URL (адрес печатается при запуске)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help="Адрес (по умолчанию 127.0.0.1)")
+        parser.add_argument('--port', type=int, default=8765, help="Порт (по умолчанию 8765)")
+        parser.add_argument(
+            '--units',
+            type=int,
+            default=1000,
+            help="Сколько объектов сымитировать (по умолчанию 1000); ID и IMEI — как у generate_fleet --seed 0"
+        )
+        parser.add_argument(
+            '--from-db',
+            action='store_true',
+            help="Объекты по машинам из базы с заполненным IMEI вместо --units"
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Seed маршрутов и ошибок (по умолчанию 0)")
+        parser.add_argument('--token', default='', help="Принимать только этот токен (по умолчанию любой)")
+        parser.add_argument('--latency-ms', type=float, default=0, help="Задержка каждого ответа, мс")
+        parser.add_argument('--jitter-ms', type=float, default=0, help="Случайный разброс задержки, ± мс")
+        parser.add_argument(
+            '--error-rate',
+            type=float,
+            default=0,
+            help="Доля вызовов с ошибкой Wialon 5 (0..1)"
+        )
+        parser.add_argument(
+            '--http-error-rate',
+            type=float,
+            default=0,
+            help="Доля ответов HTTP 503 (0..1)"
+        )
+        parser.add_argument(
+            '--session-ttl',
+            type=float,
+            default=300,
+            help="Через сколько секунд без запросов сессия истекает (по умолчанию 300, как у Wialon)"
+        )
+        parser.add_argument('--verbose-log', action='store_true', help="Печатать каждый HTTP-запрос")
+
+    def handle(self, *args, **options):
+        for name in ('error_rate', 'http_error_rate'):
+            if not 0 <= options[name] <= 1:
+                raise CommandError(f"--{name.replace('_', '-')} должен быть от 0 до 1")
+
+        settings = {
+            'seed': options['seed'],
+            'token': options['token'],
+            'latency': options['latency_ms'] / 1000,
+            'jitter': options['jitter_ms'] / 1000,
+            'error_rate': options['error_rate'],
+            'http_error_rate': options['http_error_rate'],
+            'session_ttl': options['session_ttl'],
+        }
+        if options['from_db']:
+            vehicles = Vehicle.objects.exclude(wialon_imei__isnull=True).exclude(wialon_imei='')
+            fake = fake_wialon.FakeWialon.from_vehicles(
+                vehicles.values_list('wialon_id', 'wialon_imei', 'license_plate').iterator(),
+                **settings
+            )
+        else:
+            fake = fake_wialon.FakeWialon.simulated(options['units'], **settings)
+
+        try:
+            server = fake_wialon.make_server(fake, options['host'], options['port'], options['verbose_log'])
+        except OSError as e:
+            raise CommandError(f"Не удалось занять {options['host']}:{options['port']}: {e}")
+
+        self.stdout.write(f"Объектов: {len(fake.units)}")
+        self.stdout.write(self.style.SUCCESS(f"WIALON_BASE_URL={fake_wialon.base_url(server)}"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+        for svc, count in sorted(fake.calls.items()):
+            self.stdout.write(f"  {svc}: {count}")
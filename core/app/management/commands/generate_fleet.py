@@ -0,0 +1,79 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import generator
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическим автопарком для нагрузочных тестов. На единицу масштаба — "
+        f"{generator.VEHICLES_PER_SCALE} машин с фотографиями, {generator.CLIENTS_PER_SCALE} клиентов, "
+        "около 2000 договоров во всех статусах, по ~12 диагностик и ~8 осмотров на машину. "
+        "Данные добавляются к существующим; при одном --seed и --today получаются одинаковыми."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=float,
+            default=1,
+            help="Масштаб: 1 — тысяча машин, 100 — сто тысяч (можно дробный, например 0.1)"
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help="Seed генератора случайных чисел (по умолчанию 0)"
+        )
+        parser.add_argument(
+            '--today',
+            help="Дата, на которую строится история, ГГГГ-ММ-ДД (по умолчанию сегодня)"
+        )
+        parser.add_argument(
+            '--skip-photos',
+            action='store_true',
+            help="Не создавать фотографии машин (и файлы в MEDIA_ROOT)"
+        )
+        parser.add_argument(
+            '--password',
+            default='fleet',
+            help="Пароль всех созданных пользователей (по умолчанию fleet)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=generator.CHUNK_SIZE,
+            help=f"Сколько машин со всей историей сохранять в одной транзакции (по умолчанию {generator.CHUNK_SIZE})"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            today = datetime.date.fromisoformat(options['today']) if options['today'] else None
+        except ValueError:
+            raise CommandError("Дата должна быть в формате ГГГГ-ММ-ДД")
+
+        started = time.monotonic()
+
+        def progress(done, total):
+            self.stdout.write(f"Машин: {done}/{total} ({time.monotonic() - started:.0f} с)")
+
+        try:
+            stats = generator.generate_fleet(
+                options['scale'],
+                options['seed'],
+                today=today,
+                photos=not options['skip_photos'],
+                password=options['password'],
+                chunk_size=options['chunk_size'],
+                progress=progress,
+            )
+        except generator.GeneratorError as e:
+            raise CommandError(str(e))
+
+        for name, count in stats.items():
+            self.stdout.write(f"  {name}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано записей: {sum(stats.values())} ({time.monotonic() - started:.1f} с)"
+        ))
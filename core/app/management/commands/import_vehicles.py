@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app import importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Массовый импорт автомобилей из CSV или XLSX. Заголовки столбцов — имена полей "
+        "или подписи из формы ('VIN-номер', 'Марка', ...). Строки с ошибками пропускаются "
+        "и выводятся с номерами, остальные сохраняются пачками."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Путь к файлу .csv или .xlsx")
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importer.BATCH_SIZE,
+            help=f"Сколько строк проверять и сохранять за раз (по умолчанию {importer.BATCH_SIZE})"
+        )
+        parser.add_argument(
+            '--skip-wialon',
+            action='store_true',
+            help="Не искать Wialon ID по IMEI после импорта"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Только проверить файл, ничего не сохранять"
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        try:
+            with open(options['path'], 'rb') as stream:
+                result = importer.import_vehicles(
+                    stream,
+                    options['path'],
+                    batch_size=options['batch_size'],
+                    link_wialon=not options['skip_wialon'],
+                    dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(f"Не удалось открыть файл: {e}")
+        except importer.ImportFileError as e:
+            raise CommandError(str(e))
+
+        for row_number, message in result.errors:
+            self.stderr.write(f"Строка {row_number}: {message}")
+
+        summary = (
+            f"Строк: {result.rows}, {'прошло проверку' if options['dry_run'] else 'создано'}: {result.created}, "
+            f"ошибок: {len(result.errors)}, привязано к Wialon: {result.wialon_linked} "
+            f"({time.monotonic() - started:.1f} с)"
+        )
+        if result.wialon_missing:
+            self.stderr.write(f"Не найдено в Wialon IMEI: {result.wialon_missing}")
+        if result.wialon_pending:
+            self.stdout.write(f"Ждут привязки к Wialon: {result.wialon_pending} (manage.py link_wialon)")
+        self.stdout.write(self.style.SUCCESS(summary) if not result.errors else self.style.WARNING(summary))
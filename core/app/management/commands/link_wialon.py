@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from app import importer
+from app.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = (
+        "Ищет Wialon ID по IMEI для машин, у которых IMEI указан, а ID ещё нет "
+        "(например, после импорта со страницы загрузки). Один запрос в Wialon на все машины."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importer.BATCH_SIZE,
+            help=f"Сколько машин обновлять за раз (по умолчанию {importer.BATCH_SIZE})"
+        )
+
+    def handle(self, *args, **options):
+        pairs = list(
+            Vehicle.objects
+            .exclude(wialon_imei__isnull=True).exclude(wialon_imei='')
+            .filter(Q(wialon_id__isnull=True) | Q(wialon_id=''))
+            .values_list('vin', 'wialon_imei')
+        )
+        if not pairs:
+            self.stdout.write("Машин без Wialon ID нет")
+            return
+
+        linked, missing = importer.link_wialon_ids(pairs, options['batch_size'])
+        if missing:
+            self.stderr.write(f"Не найдено в Wialon IMEI: {missing}")
+        self.stdout.write(self.style.SUCCESS(f"Привязано к Wialon: {linked} из {len(pairs)}"))
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from app import caching, checklist, health
+from app.models import Vehicle, DiagnosticReport
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает оценку состояния всех автомобилей. Нужен после изменения "
+        "весов в app/health.py; при обычной работе оценка обновляется сама."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help="Сколько машин сохранять за один запрос (по умолчанию 500)"
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Колонки последней диагностики подтягиваем подзапросом — один запрос на весь парк
+        latest = DiagnosticReport.objects.filter(vehicle=OuterRef('pk')).order_by('-created_at', '-pk')
+        vehicles = Vehicle.objects.only(*health.SOURCE_FIELDS, *health.SCORE_FIELDS, 'updated_at').annotate(**{
+            f'latest_{field}': Subquery(latest.values(field)[:1]) for field in checklist.WORD_FIELDS
+        })
+
+        total = changed = 0
+        batch = []
+
+        for vehicle in vehicles.iterator(chunk_size=batch_size):
+            total += 1
+            words = tuple(getattr(vehicle, f'latest_{field}') for field in checklist.WORD_FIELDS)
+            scores = health.compute(vehicle, words if words[0] is not None else None)
+
+            if all(getattr(vehicle, field) == value for field, value in scores.items()):
+                continue
+
+            for field, value in scores.items():
+                setattr(vehicle, field, value)
+            # Оценка видна в API (?updated_since=) и на карточке — сдвигаем отметку изменения
+            vehicle.updated_at = timezone.now()
+            batch.append(vehicle)
+
+            if len(batch) >= batch_size:
+                changed += self.save_batch(batch)
+                batch = []
+
+        if batch:
+            changed += self.save_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Проверено машин: {total}, обновлено: {changed}"))
+
+    @staticmethod
+    def save_batch(batch):
+        # bulk_update не вызывает Vehicle.save(), поэтому в Wialon не ходим,
+        # но и сигналов нет — кэш карточек сбрасываем сами
+        Vehicle.objects.bulk_update(batch, [*health.SCORE_FIELDS, 'updated_at'])
+        for vehicle in batch:
+            caching.bump_vehicle_version(vehicle.pk)
+        return len(batch)
@@ -0,0 +1,156 @@
+import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from app import caching, receivables
+from app.models import Contract, ContractStatusChange, PaymentScheduleItem
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+# SQLite возвращает суммы без дробной части ("2000"), PostgreSQL — "2000.00"
+CENTS = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = (
+        "Проверяет все действующие договоры по срокам и оплатам: пересчитывает долг "
+        "на сегодня, переводит просроченные в 'debt', погашенные обратно в 'active', "
+        "закончившиеся и оплаченные в 'completed'. Запускать раз в сутки (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help="Дата проверки ГГГГ-ММ-ДД (по умолчанию сегодня)"
+        )
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=0,
+            help="Сколько дней после срока платежа не считать договор просроченным"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help="Сколько договоров сохранять за один запрос (по умолчанию 1000)"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Только показать, что изменится"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            today = datetime.date.fromisoformat(options['date']) if options['date'] else timezone.localdate()
+        except ValueError:
+            raise CommandError("Дата должна быть в формате ГГГГ-ММ-ДД")
+        overdue_from = today - datetime.timedelta(days=options['grace_days'])
+
+        # Пересчёт и запись — в одной транзакции под блокировкой строк договоров:
+        # платёж (ledger.apply_payment) или ручная смена статуса в админке дождутся
+        # конца проверки, а не будут затёрты посчитанным до них долгом или статусом
+        with transaction.atomic():
+            changes = list(self.evaluate(today, overdue_from, lock=not options['dry_run']))
+            status_changes = [row for row in changes if row['status'] != row['target']]
+
+            for row in status_changes:
+                self.stdout.write(
+                    f"{row['contract_number']}: {row['status']} → {row['target']} "
+                    f"(долг {row['debt']})"
+                )
+
+            if options['dry_run']:
+                self.stdout.write(f"Пересчитать: {len(changes)}, сменить статус: {len(status_changes)} (без сохранения)")
+                return
+
+            self.apply(changes, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Пересчитано договоров: {len(changes)}, сменён статус: {len(status_changes)}"
+        ))
+
+    def evaluate(self, today, overdue_from, lock=False):
+        """
+        Один запрос на весь портфель: суммы по графику считаются подзапросами,
+        новый статус — выражением Case. Возвращаются только договоры, где что-то меняется;
+        с lock=True их строки блокируются до конца транзакции (SELECT ... FOR UPDATE).
+        """
+        schedule = PaymentScheduleItem.objects.filter(contract=OuterRef('pk')).order_by().values('contract')
+
+        def scheduled_until(date):
+            return Coalesce(
+                Subquery(schedule.filter(due_date__lte=date).annotate(total=Sum('amount')).values('total')),
+                Value(Decimal(0)),
+                output_field=MONEY
+            )
+
+        contracts = (
+            Contract.objects
+            .filter(status__in=Contract.OPEN_STATUSES)
+            .annotate(
+                new_due=scheduled_until(today),
+                new_debt=Greatest(F('new_due') - F('paid_total'), Value(Decimal(0)), output_field=MONEY),
+                overdue=Greatest(scheduled_until(overdue_from) - F('paid_total'), Value(Decimal(0)), output_field=MONEY),
+            )
+            .annotate(target=Case(
+                When(end_date__lt=today, scheduled_total__lte=F('paid_total'), then=Value('completed')),
+                When(overdue__gt=0, then=Value('debt')),
+                default=Value('active'),
+            ))
+            .filter(~Q(status=F('target')) | ~Q(due_total=F('new_due')) | ~Q(debt_amount=F('new_debt')))
+        )
+        if lock:
+            contracts = contracts.select_for_update()
+
+        for row in contracts.values('pk', 'contract_number', 'vehicle_id', 'status', 'target', 'new_due', 'new_debt'):
+            yield {
+                'pk': row['pk'],
+                'contract_number': row['contract_number'],
+                'vehicle_id': row['vehicle_id'],
+                'status': row['status'],
+                'target': row['target'],
+                'due': Decimal(row['new_due']).quantize(CENTS),
+                'debt': Decimal(row['new_debt']).quantize(CENTS),
+            }
+
+    def apply(self, changes, batch_size):
+        """Записывает итоги evaluate(). Вызывать в той же транзакции, что и evaluate(lock=True)."""
+        now = timezone.now()
+        contracts = [
+            Contract(pk=row['pk'], status=row['target'], due_total=row['due'], debt_amount=row['debt'], updated_at=now)
+            for row in changes
+        ]
+        log = [
+            ContractStatusChange(
+                contract_id=row['pk'],
+                old_status=row['status'],
+                new_status=row['target'],
+                reason=self.reason(row),
+                debt_amount=row['debt'],
+            )
+            for row in changes if row['status'] != row['target']
+        ]
+
+        # bulk_update не вызывает save() и сигналы: кэши сбрасываем ниже сами
+        # (версии сдвинутся после фиксации транзакции)
+        Contract.objects.bulk_update(contracts, ['status', 'due_total', 'debt_amount', 'updated_at'], batch_size=batch_size)
+        ContractStatusChange.objects.bulk_create(log, batch_size=batch_size)
+
+        for vehicle_id in {row['vehicle_id'] for row in changes}:
+            caching.bump_vehicle_version(vehicle_id)
+        if changes:
+            receivables.invalidate_receivables_report()
+
+    @staticmethod
+    def reason(row):
+        if row['target'] == 'completed':
+            return "Срок договора истёк, оплачен полностью"
+        if row['target'] == 'debt':
+            return f"Просрочен платёж, долг {row['debt']}"
+        return "Задолженность погашена"
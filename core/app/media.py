@@ -0,0 +1,166 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import Vehicle, VehiclePhoto, VehicleDocument
+
+STREAM_BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+# Каталоги с личными данными клиента: их не кэшируем нигде, кроме браузера
+PRIVATE_DIRS = ('passports/', 'avatars/')
+
+
+def _owner_filter(prefix, name):
+    """
+    По каталогу файла находим запись, которой он принадлежит,
+    и путь до клиента, у которого есть на неё права.
+    Возвращает (queryset, lookup клиента) или None для неизвестных каталогов.
+    """
+    User = get_user_model()
+
+    if prefix in PRIVATE_DIRS:
+        return (
+            User.objects.filter(Q(avatar=name) | Q(passport_front=name) | Q(passport_back=name)),
+            'pk'
+        )
+    if prefix == 'vehicle_gallery/':
+        return VehiclePhoto.objects.filter(image=name), 'vehicle__contracts__client'
+    if prefix == 'vehicle_docs/':
+        return VehicleDocument.objects.filter(file=name), 'vehicle__contracts__client'
+    if prefix == 'vehicle_videos/':
+        return Vehicle.objects.filter(video=name), 'contracts__client'
+    if prefix == 'assessment/':
+        return Vehicle.objects.filter(computer_assessment=name), 'contracts__client'
+    return None
+
+
+def can_access_media(user, name):
+    """
+    Сотрудники видят все файлы.
+    Клиент — только свои фото/паспорта и медиа автомобилей по своим договорам.
+    """
+    if not user.is_authenticated:
+        return False
+    if user.is_staff_member or user.is_superuser:
+        return True
+
+    prefix = name.split('/', 1)[0] + '/'
+    owner = _owner_filter(prefix, name)
+    if owner is None:
+        return False
+
+    queryset, client_lookup = owner
+    return queryset.filter(**{client_lookup: user.pk}).exists()
+
+
+def parse_range(header, size):
+    """
+    Разбирает заголовок Range (поддерживаем один диапазон — этого хватает для перемотки видео).
+    Возвращает (start, end) включительно, None если заголовка нет или он не поддерживается,
+    и False если диапазон за пределами файла.
+    """
+    match = RANGE_RE.match(header or '')
+    if not match:
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        # bytes=-500 — последние 500 байт
+        length = int(end)
+        if length == 0:
+            return False
+        start, end = max(size - length, 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        return False
+
+    return start, end
+
+
+def _file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def media_response(request, name, path):
+    """
+    Отдаёт уже проверенный файл.
+    Если перед Django стоит nginx/Apache, передаём ему саму отдачу через
+    X-Accel-Redirect / X-Sendfile, иначе стримим сами с поддержкой Range и 304.
+    """
+    stat = os.stat(path)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    etag = quote_etag(f"{int(stat.st_mtime):x}-{stat.st_size:x}")
+    last_modified = int(stat.st_mtime)
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        response = not_modified
+    elif settings.MEDIA_ACCEL_REDIRECT_PREFIX:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(name)
+    elif settings.MEDIA_SENDFILE_HEADER:
+        response = HttpResponse(content_type=content_type)
+        response[settings.MEDIA_SENDFILE_HEADER] = os.path.abspath(path)
+    else:
+        response = _streaming_response(request, path, stat.st_size, content_type, etag)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Accept-Ranges'] = 'bytes'
+
+    prefix = name.split('/', 1)[0] + '/'
+    if prefix in PRIVATE_DIRS:
+        response['Cache-Control'] = 'private, no-cache'
+    else:
+        response['Cache-Control'] = f'private, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+    return response
+
+
+def _streaming_response(request, path, size, content_type, etag):
+    byte_range = parse_range(request.headers.get('Range'), size)
+
+    # If-Range: диапазон отдаём только если файл не поменялся с прошлого раза
+    if_range = request.headers.get('If-Range')
+    if byte_range and if_range and if_range != etag:
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None:
+        # FileResponse использует wsgi.file_wrapper (sendfile в gunicorn)
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(_file_range(path, start, length), status=206, content_type=content_type)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = str(length)
+    return response
@@ -0,0 +1,175 @@
+"""
+Метрики приложения в текстовом формате Prometheus: /metrics.
+
+- время ответа и число SQL-запросов по страницам (имя URL) — из профилировщика (app/profiler.py);
+- внешние HTTP-запросы (Wialon, mashina.kg, lalafo.kg) по хосту и коду ответа;
+- время сборки PDF, размеры загруженных файлов;
+- попадания в кэш по виду ключа: vehicle, wialon, receivables, fleet_defects...
+  Доля попаданий: sum(rate(app_cache_requests_total{result="hit"}[5m])) / sum(rate(app_cache_requests_total[5m])).
+
+Ничего не подменяется: чтения кэша считаются там, где код читает через
+cache_get()/cache_get_or_set(), а внешние запросы — там, где они идут через
+ObservedSession. Фрагменты шаблонов ({% cache %}) в метрику не попадают.
+
+Под gunicorn у каждого воркера свои счётчики. Если задан PROMETHEUS_MULTIPROC_DIR
+(его выставляет gunicorn.conf.py), воркеры пишут их в файлы общего каталога,
+а /metrics складывает все файлы. Без переменной — счётчики процесса (runserver, тесты).
+Доступ — как к API: ключ ApiToken (Authorization: Token <key>) или сессия сотрудника.
+"""
+import os
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+# Имя страницы для запросов, не попавших ни в один URL (404)
+UNRESOLVED_VIEW = '<unresolved>'
+
+# Выгрузки и импорт идут десятки секунд, поэтому корзины длиннее стандартных
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+PDF_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30)
+UPLOAD_BUCKETS = tuple(2 ** power for power in range(10, 32, 2))  # 1 КБ … 2 ГБ
+
+REQUEST_SECONDS = Histogram(
+    'app_request_duration_seconds', "Время ответа страницы",
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+REQUESTS = Counter(
+    'app_requests', "Ответы страниц по кодам",
+    ['view', 'method', 'status'],
+)
+REQUEST_QUERIES = Histogram(
+    'app_request_db_queries', "SQL-запросов за ответ",
+    ['view'], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    'app_request_db_seconds', "Время в базе за ответ",
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_SECONDS = Histogram(
+    'app_outbound_http_duration_seconds', "Время внешнего HTTP-запроса",
+    ['host'], buckets=LATENCY_BUCKETS,
+)
+OUTBOUND_REQUESTS = Counter(
+    'app_outbound_http_requests', "Внешние HTTP-запросы по хосту и коду ответа (error — нет ответа)",
+    ['host', 'status'],
+)
+PDF_SECONDS = Histogram(
+    'app_pdf_render_seconds', "Время сборки PDF",
+    ['document'], buckets=PDF_BUCKETS,
+)
+UPLOAD_BYTES = Histogram(
+    'app_upload_bytes', "Размер загруженного файла",
+    ['kind'], buckets=UPLOAD_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'app_cache_requests', "Чтения из кэша по виду ключа",
+    ['cache', 'result'],
+)
+
+_MISSING = object()
+
+
+def enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+def observe_request(view_name, method, status, profile, total):
+    """Итоги запроса от ProfilerMiddleware."""
+    if not enabled():
+        return
+    view = view_name or UNRESOLVED_VIEW
+    REQUEST_SECONDS.labels(view, method).observe(total)
+    REQUESTS.labels(view, method, str(status)).inc()
+    REQUEST_QUERIES.labels(view).observe(profile.queries)
+    REQUEST_DB_SECONDS.labels(view).observe(profile.db_time)
+
+
+def observe_upload(kind, size):
+    if enabled() and size is not None:
+        UPLOAD_BYTES.labels(kind).observe(size)
+
+
+def cache_label(key):
+    """
+    Вид ключа без идентификаторов, чтобы у метрики не было метки на каждую машину:
+    'vehicle:VIN:3:page' -> 'vehicle', 'vehicle:VIN:version' -> 'vehicle:version',
+    'template.cache.vehicle_gallery.<md5>' -> 'template.cache.vehicle_gallery'.
+    """
+    key = str(key)
+    if key.startswith('template.cache.'):
+        return key.rsplit('.', 1)[0]
+    prefix = key.split(':', 1)[0]
+    return f'{prefix}:version' if key.endswith(':version') else prefix
+
+
+def observe_cache(key, hit):
+    if enabled():
+        CACHE_REQUESTS.labels(cache_label(key), 'hit' if hit else 'miss').inc()
+
+
+def cache_get(key, default=None):
+    """cache.get() с учётом попадания."""
+    value = cache.get(key, _MISSING)
+    observe_cache(key, value is not _MISSING)
+    return default if value is _MISSING else value
+
+
+def cache_get_or_set(key, default, timeout=DEFAULT_TIMEOUT):
+    """
+    cache.get_or_set() с учётом попадания: промах считается один раз,
+    без второго чтения, которое get_or_set() делает после add().
+    """
+    value = cache.get(key, _MISSING)
+    observe_cache(key, value is not _MISSING)
+    if value is not _MISSING:
+        return value
+
+    if callable(default):
+        default = default()
+    cache.add(key, default, timeout)
+    # Если ключ тем временем добавил другой запрос — отдаём его значение
+    return cache.get(key, default)
+
+
+class ObservedSession(requests.Session):
+    """requests.Session, которая считает каждый запрос, включая переходы по редиректам."""
+
+    def send(self, request, **kwargs):
+        if not enabled():
+            return super().send(request, **kwargs)
+
+        host = urlsplit(request.url).hostname or ''
+        status = 'error'
+        started = time.perf_counter()
+        try:
+            response = super().send(request, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            OUTBOUND_SECONDS.labels(host).observe(time.perf_counter() - started)
+            OUTBOUND_REQUESTS.labels(host, status).inc()
+
+
+def render():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def metrics_view(request):
+    # api -> models -> utils -> metrics: на уровне модуля импорт был бы циклическим
+    from .api import authenticate
+
+    if not authenticate(request):
+        return HttpResponse("Нужен ключ API: заголовок Authorization: Token <key>", status=401, content_type='text/plain')
+    return HttpResponse(render(), content_type=CONTENT_TYPE_LATEST)
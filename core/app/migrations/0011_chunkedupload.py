@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:27
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_contract_initial_payment_percent_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChunkedUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('target', models.CharField(choices=[('video', 'Видео обзор'), ('computer_assessment', 'Компьютерная диагностика'), ('document', 'Документ')], max_length=30, verbose_name='Куда загружается')),
+                ('title', models.CharField(blank=True, max_length=100, verbose_name='Название документа')),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('total_size', models.PositiveBigIntegerField(verbose_name='Размер файла (байт)')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='Загружено (байт)')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='Контрольная сумма SHA-256')),
+                ('status', models.CharField(choices=[('uploading', 'Загружается'), ('complete', 'Завершена')], default='uploading', max_length=20, verbose_name='Статус')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Сотрудник')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunked_uploads', to='app.vehicle', verbose_name='Автомобиль')),
+            ],
+            options={
+                'verbose_name': 'Загрузка частями',
+                'verbose_name_plural': 'Загрузки частями',
+            },
+        ),
+    ]
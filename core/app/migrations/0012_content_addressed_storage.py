@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:29
+
+import app.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Путь в хранилище')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер (байт)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Количество ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+            },
+        ),
+        migrations.AlterField(
+            model_name='vehicledocument',
+            name='file',
+            field=models.FileField(storage=app.storage.get_content_addressed_storage, upload_to='vehicle_docs/', verbose_name='Файл (PDF)'),
+        ),
+        migrations.AlterField(
+            model_name='vehiclephoto',
+            name='image',
+            field=models.ImageField(storage=app.storage.get_content_addressed_storage, upload_to='vehicle_gallery/', verbose_name='Фотография'),
+        ),
+    ]
@@ -0,0 +1,579 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:30
+
+import app.checklist
+from django.conf import settings
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Реестр чек-листа на момент этой миграции (app/checklist.py, версия 1): номер бита —
+# позиция пункта. Скопирован сюда, чтобы миграция не зависела от дальнейших правок реестра.
+ITEM_NAMES = (
+    'brake_front_hose_l', 'brake_front_hose_r', 'brake_front_disc_l', 'brake_front_disc_r',
+    'brake_front_pads_l', 'brake_front_pads_r', 'brake_rear_hose_l', 'brake_rear_hose_r', 'brake_rear_disc_l',
+    'brake_rear_disc_r', 'brake_rear_pads_l', 'brake_rear_pads_r', 'susp_front_shock_l', 'susp_front_shock_r',
+    'susp_front_mount_l', 'susp_front_mount_r', 'susp_front_boot_l', 'susp_front_boot_r',
+    'susp_front_spring_l', 'susp_front_spring_r', 'susp_front_ball_lower_l', 'susp_front_ball_lower_r',
+    'susp_front_ball_upper_l', 'susp_front_ball_upper_r', 'susp_front_bearing_l', 'susp_front_bearing_r',
+    'susp_front_sb_upper_f_l', 'susp_front_sb_upper_f_r', 'susp_front_sb_upper_r_l',
+    'susp_front_sb_upper_r_r', 'susp_front_sb_lower_f_l', 'susp_front_sb_lower_f_r',
+    'susp_front_sb_lower_r_l', 'susp_front_sb_lower_r_r', 'susp_rear_shock_l', 'susp_rear_shock_r',
+    'susp_rear_mount_l', 'susp_rear_mount_r', 'susp_rear_boot_l', 'susp_rear_boot_r', 'susp_rear_spring_l',
+    'susp_rear_spring_r', 'susp_rear_ball_lower_l', 'susp_rear_ball_lower_r', 'susp_rear_ball_upper_l',
+    'susp_rear_ball_upper_r', 'susp_rear_bearing_l', 'susp_rear_bearing_r', 'susp_rear_sb_upper_trans_f_l',
+    'susp_rear_sb_upper_trans_f_r', 'susp_rear_sb_upper_trans_r_l', 'susp_rear_sb_upper_trans_r_r',
+    'susp_rear_sb_lower_trans_f_l', 'susp_rear_sb_lower_trans_f_r', 'susp_rear_sb_lower_trans_r_l',
+    'susp_rear_sb_lower_trans_r_r', 'susp_rear_sb_upper_long_f_l', 'susp_rear_sb_upper_long_f_r',
+    'susp_rear_sb_upper_long_r_l', 'susp_rear_sb_upper_long_r_r', 'susp_rear_sb_lower_long_f_l',
+    'susp_rear_sb_lower_long_f_r', 'susp_rear_sb_lower_long_r_l', 'susp_rear_sb_lower_long_r_r',
+    'susp_front_stabilizer_l', 'susp_front_stabilizer_r', 'susp_front_stab_bushing_l',
+    'susp_front_stab_bushing_r', 'susp_front_stab_link_l', 'susp_front_stab_link_r',
+    'susp_front_stab_link_bushing_l', 'susp_front_stab_link_bushing_r', 'steering_ujoint', 'steering_rack',
+    'steering_tip_l', 'steering_tip_r', 'steering_tie_rod_l', 'steering_tie_rod_r', 'drive_front_cv_outer_l',
+    'drive_front_cv_outer_r', 'drive_front_cv_inner_l', 'drive_front_cv_inner_r', 'susp_front_camber_arm_l',
+    'susp_front_camber_arm_r', 'brake_front_caliper_l', 'brake_front_caliper_r', 'susp_rear_beam_bushing_l',
+    'susp_rear_beam_bushing_r', 'susp_rear_stab_bushing_l', 'susp_rear_stab_bushing_r',
+    'susp_rear_stab_link_l', 'susp_rear_stab_link_r', 'susp_rear_stab_link_bushing_l',
+    'susp_rear_stab_link_bushing_r', 'drive_rear_cv_outer_l', 'drive_rear_cv_outer_r',
+    'drive_rear_cv_inner_l', 'drive_rear_cv_inner_r', 'susp_rear_camber_arm_l', 'susp_rear_camber_arm_r',
+    'susp_rear_soldatik_l', 'susp_rear_soldatik_r', 'brake_rear_caliper_l', 'brake_rear_caliper_r',
+    'steering_gur', 'ac_compressor', 'alternator',
+)
+BITS_PER_WORD = 63
+WORD_FIELDS = ('defect_bits_0', 'defect_bits_1', 'defect_bits_2')
+ITEM_INDEX = {name: index for index, name in enumerate(ITEM_NAMES)}
+
+
+def pack(names):
+    words = [0] * len(WORD_FIELDS)
+    for name in names:
+        index = ITEM_INDEX[name]
+        words[index // BITS_PER_WORD] |= 1 << (index % BITS_PER_WORD)
+    return tuple(words)
+
+
+def unpack(words):
+    names = []
+    for word_index, word in enumerate(words):
+        base = word_index * BITS_PER_WORD
+        while word:
+            low_bit = word & -word
+            index = base + low_bit.bit_length() - 1
+            if index < len(ITEM_NAMES):
+                names.append(ITEM_NAMES[index])
+            word ^= low_bit
+    return names
+
+
+def count(words):
+    return sum(bin(word).count('1') for word in words)
+
+
+def pack_checklist(apps, schema_editor):
+    """Переносим 107 галочек в битовые колонки."""
+    DiagnosticReport = apps.get_model('app', 'DiagnosticReport')
+    names = list(ITEM_NAMES)
+
+    batch = []
+    for report in DiagnosticReport.objects.only('pk', *names).iterator(chunk_size=BATCH_SIZE):
+        words = pack(name for name in names if getattr(report, name))
+        for field, value in zip(WORD_FIELDS, words):
+            setattr(report, field, value)
+        report.defect_count = count(words)
+        report.checklist_version = 1
+        batch.append(report)
+
+        if len(batch) >= BATCH_SIZE:
+            DiagnosticReport.objects.bulk_update(batch, [*WORD_FIELDS, 'defect_count', 'checklist_version'])
+            batch = []
+
+    if batch:
+        DiagnosticReport.objects.bulk_update(batch, [*WORD_FIELDS, 'defect_count', 'checklist_version'])
+
+
+def unpack_checklist(apps, schema_editor):
+    DiagnosticReport = apps.get_model('app', 'DiagnosticReport')
+    names = list(ITEM_NAMES)
+
+    batch = []
+    for report in DiagnosticReport.objects.iterator(chunk_size=BATCH_SIZE):
+        checked = set(unpack(getattr(report, field) for field in WORD_FIELDS))
+        for name in names:
+            setattr(report, name, name in checked)
+        batch.append(report)
+
+        if len(batch) >= BATCH_SIZE:
+            DiagnosticReport.objects.bulk_update(batch, names)
+            batch = []
+
+    if batch:
+        DiagnosticReport.objects.bulk_update(batch, names)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_content_addressed_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='diagnosticreport',
+            name='checklist_version',
+            field=models.PositiveSmallIntegerField(default=app.checklist.current_version, verbose_name='Версия чек-листа'),
+        ),
+        migrations.AddField(
+            model_name='diagnosticreport',
+            name='defect_bits_0',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='diagnosticreport',
+            name='defect_bits_1',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='diagnosticreport',
+            name='defect_bits_2',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='diagnosticreport',
+            name='defect_count',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, verbose_name='Количество замечаний'),
+        ),
+        migrations.AddIndex(
+            model_name='diagnosticreport',
+            index=models.Index(fields=['vehicle', '-created_at'], name='diag_vehicle_created_idx'),
+        ),
+        migrations.RunPython(pack_checklist, unpack_checklist),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='ac_compressor',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='alternator',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_caliper_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_caliper_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_disc_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_disc_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_hose_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_hose_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_pads_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_front_pads_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_caliper_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_caliper_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_disc_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_disc_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_hose_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_hose_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_pads_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='brake_rear_pads_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_front_cv_inner_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_front_cv_inner_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_front_cv_outer_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_front_cv_outer_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_rear_cv_inner_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_rear_cv_inner_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_rear_cv_outer_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='drive_rear_cv_outer_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_gur',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_rack',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_tie_rod_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_tie_rod_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_tip_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_tip_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='steering_ujoint',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_ball_lower_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_ball_lower_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_ball_upper_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_ball_upper_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_bearing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_bearing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_boot_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_boot_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_camber_arm_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_camber_arm_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_mount_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_mount_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_lower_f_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_lower_f_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_lower_r_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_lower_r_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_upper_f_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_upper_f_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_upper_r_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_sb_upper_r_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_shock_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_shock_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_spring_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_spring_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stab_bushing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stab_bushing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stab_link_bushing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stab_link_bushing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stab_link_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stab_link_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stabilizer_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_front_stabilizer_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_ball_lower_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_ball_lower_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_ball_upper_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_ball_upper_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_beam_bushing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_beam_bushing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_bearing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_bearing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_boot_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_boot_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_camber_arm_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_camber_arm_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_mount_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_mount_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_long_f_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_long_f_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_long_r_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_long_r_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_trans_f_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_trans_f_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_trans_r_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_lower_trans_r_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_long_f_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_long_f_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_long_r_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_long_r_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_trans_f_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_trans_f_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_trans_r_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_sb_upper_trans_r_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_shock_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_shock_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_soldatik_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_soldatik_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_spring_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_spring_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_stab_bushing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_stab_bushing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_stab_link_bushing_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_stab_link_bushing_r',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_stab_link_l',
+        ),
+        migrations.RemoveField(
+            model_name='diagnosticreport',
+            name='susp_rear_stab_link_r',
+        ),
+    ]
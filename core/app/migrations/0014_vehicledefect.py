@@ -0,0 +1,128 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# Пункты чек-листа версии 1 — как в 0013_diagnosticreport_defect_bits
+ITEM_NAMES = (
+    'brake_front_hose_l', 'brake_front_hose_r', 'brake_front_disc_l', 'brake_front_disc_r',
+    'brake_front_pads_l', 'brake_front_pads_r', 'brake_rear_hose_l', 'brake_rear_hose_r', 'brake_rear_disc_l',
+    'brake_rear_disc_r', 'brake_rear_pads_l', 'brake_rear_pads_r', 'susp_front_shock_l', 'susp_front_shock_r',
+    'susp_front_mount_l', 'susp_front_mount_r', 'susp_front_boot_l', 'susp_front_boot_r',
+    'susp_front_spring_l', 'susp_front_spring_r', 'susp_front_ball_lower_l', 'susp_front_ball_lower_r',
+    'susp_front_ball_upper_l', 'susp_front_ball_upper_r', 'susp_front_bearing_l', 'susp_front_bearing_r',
+    'susp_front_sb_upper_f_l', 'susp_front_sb_upper_f_r', 'susp_front_sb_upper_r_l',
+    'susp_front_sb_upper_r_r', 'susp_front_sb_lower_f_l', 'susp_front_sb_lower_f_r',
+    'susp_front_sb_lower_r_l', 'susp_front_sb_lower_r_r', 'susp_rear_shock_l', 'susp_rear_shock_r',
+    'susp_rear_mount_l', 'susp_rear_mount_r', 'susp_rear_boot_l', 'susp_rear_boot_r', 'susp_rear_spring_l',
+    'susp_rear_spring_r', 'susp_rear_ball_lower_l', 'susp_rear_ball_lower_r', 'susp_rear_ball_upper_l',
+    'susp_rear_ball_upper_r', 'susp_rear_bearing_l', 'susp_rear_bearing_r', 'susp_rear_sb_upper_trans_f_l',
+    'susp_rear_sb_upper_trans_f_r', 'susp_rear_sb_upper_trans_r_l', 'susp_rear_sb_upper_trans_r_r',
+    'susp_rear_sb_lower_trans_f_l', 'susp_rear_sb_lower_trans_f_r', 'susp_rear_sb_lower_trans_r_l',
+    'susp_rear_sb_lower_trans_r_r', 'susp_rear_sb_upper_long_f_l', 'susp_rear_sb_upper_long_f_r',
+    'susp_rear_sb_upper_long_r_l', 'susp_rear_sb_upper_long_r_r', 'susp_rear_sb_lower_long_f_l',
+    'susp_rear_sb_lower_long_f_r', 'susp_rear_sb_lower_long_r_l', 'susp_rear_sb_lower_long_r_r',
+    'susp_front_stabilizer_l', 'susp_front_stabilizer_r', 'susp_front_stab_bushing_l',
+    'susp_front_stab_bushing_r', 'susp_front_stab_link_l', 'susp_front_stab_link_r',
+    'susp_front_stab_link_bushing_l', 'susp_front_stab_link_bushing_r', 'steering_ujoint', 'steering_rack',
+    'steering_tip_l', 'steering_tip_r', 'steering_tie_rod_l', 'steering_tie_rod_r', 'drive_front_cv_outer_l',
+    'drive_front_cv_outer_r', 'drive_front_cv_inner_l', 'drive_front_cv_inner_r', 'susp_front_camber_arm_l',
+    'susp_front_camber_arm_r', 'brake_front_caliper_l', 'brake_front_caliper_r', 'susp_rear_beam_bushing_l',
+    'susp_rear_beam_bushing_r', 'susp_rear_stab_bushing_l', 'susp_rear_stab_bushing_r',
+    'susp_rear_stab_link_l', 'susp_rear_stab_link_r', 'susp_rear_stab_link_bushing_l',
+    'susp_rear_stab_link_bushing_r', 'drive_rear_cv_outer_l', 'drive_rear_cv_outer_r',
+    'drive_rear_cv_inner_l', 'drive_rear_cv_inner_r', 'susp_rear_camber_arm_l', 'susp_rear_camber_arm_r',
+    'susp_rear_soldatik_l', 'susp_rear_soldatik_r', 'brake_rear_caliper_l', 'brake_rear_caliper_r',
+    'steering_gur', 'ac_compressor', 'alternator',
+)
+BITS_PER_WORD = 63
+WORD_FIELDS = ('defect_bits_0', 'defect_bits_1', 'defect_bits_2')
+
+
+def unpack(words):
+    names = []
+    for word_index, word in enumerate(words):
+        base = word_index * BITS_PER_WORD
+        while word:
+            low_bit = word & -word
+            index = base + low_bit.bit_length() - 1
+            if index < len(ITEM_NAMES):
+                names.append(ITEM_NAMES[index])
+            word ^= low_bit
+    return names
+
+
+def build_defects(apps, schema_editor):
+    """Восстанавливаем периоды замечаний по уже сохранённым диагностикам, одним проходом."""
+    DiagnosticReport = apps.get_model('app', 'DiagnosticReport')
+    VehicleDefect = apps.get_model('app', 'VehicleDefect')
+
+    reports = (
+        DiagnosticReport.objects
+        .order_by('vehicle_id', 'created_at', 'pk')
+        .values_list('pk', 'vehicle_id', 'created_at', *WORD_FIELDS)
+    )
+
+    batch = []
+    current_vehicle = None
+    episodes = {}
+
+    for pk, vehicle_id, created_at, *words in reports.iterator(chunk_size=BATCH_SIZE):
+        if vehicle_id != current_vehicle:
+            batch.extend(episodes.values())
+            episodes = {}
+            current_vehicle = vehicle_id
+
+        flagged = set(unpack(words))
+        # До этой миграции других версий листа не было: все отчёты версии 1
+        inspected = set(ITEM_NAMES)
+
+        for name in [name for name in episodes if name in inspected and name not in flagged]:
+            episode = episodes.pop(name)
+            episode.closed_report_id = pk
+            episode.closed_at = created_at
+            batch.append(episode)
+
+        for name in flagged - episodes.keys():
+            episodes[name] = VehicleDefect(
+                vehicle_id=vehicle_id, item=name, opened_report_id=pk, opened_at=created_at
+            )
+
+        if len(batch) >= BATCH_SIZE:
+            VehicleDefect.objects.bulk_create(batch)
+            batch = []
+
+    batch.extend(episodes.values())
+    VehicleDefect.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_diagnosticreport_defect_bits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleDefect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item', models.CharField(max_length=50, verbose_name='Пункт чек-листа')),
+                ('opened_at', models.DateTimeField(verbose_name='Открыто с')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Устранено')),
+                ('closed_report', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_defects', to='app.diagnosticreport', verbose_name='Устранено в диагностике')),
+                ('opened_report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opened_defects', to='app.diagnosticreport', verbose_name='Выявлено в диагностике')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='defects', to='app.vehicle', verbose_name='Автомобиль')),
+            ],
+            options={
+                'verbose_name': 'Замечание по автомобилю',
+                'verbose_name_plural': 'Замечания по автомобилям',
+                'ordering': ['opened_at'],
+                'indexes': [models.Index(fields=['vehicle', 'closed_at'], name='defect_vehicle_closed_idx'), models.Index(fields=['closed_at', 'opened_at'], name='defect_closed_opened_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('closed_at__isnull', True)), fields=('vehicle', 'item'), name='defect_one_open_per_item')],
+            },
+        ),
+        migrations.RunPython(build_defects, migrations.RunPython.noop),
+    ]
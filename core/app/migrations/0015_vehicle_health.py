@@ -0,0 +1,203 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:38
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 500
+
+# Формула оценки на момент миграции (app/health.py). Дальше оценки пересчитывает
+# команда recompute_health по текущей формуле, а здесь она не должна меняться.
+ITEM_NAMES = (
+    'brake_front_hose_l', 'brake_front_hose_r', 'brake_front_disc_l', 'brake_front_disc_r',
+    'brake_front_pads_l', 'brake_front_pads_r', 'brake_rear_hose_l', 'brake_rear_hose_r', 'brake_rear_disc_l',
+    'brake_rear_disc_r', 'brake_rear_pads_l', 'brake_rear_pads_r', 'susp_front_shock_l', 'susp_front_shock_r',
+    'susp_front_mount_l', 'susp_front_mount_r', 'susp_front_boot_l', 'susp_front_boot_r',
+    'susp_front_spring_l', 'susp_front_spring_r', 'susp_front_ball_lower_l', 'susp_front_ball_lower_r',
+    'susp_front_ball_upper_l', 'susp_front_ball_upper_r', 'susp_front_bearing_l', 'susp_front_bearing_r',
+    'susp_front_sb_upper_f_l', 'susp_front_sb_upper_f_r', 'susp_front_sb_upper_r_l',
+    'susp_front_sb_upper_r_r', 'susp_front_sb_lower_f_l', 'susp_front_sb_lower_f_r',
+    'susp_front_sb_lower_r_l', 'susp_front_sb_lower_r_r', 'susp_rear_shock_l', 'susp_rear_shock_r',
+    'susp_rear_mount_l', 'susp_rear_mount_r', 'susp_rear_boot_l', 'susp_rear_boot_r', 'susp_rear_spring_l',
+    'susp_rear_spring_r', 'susp_rear_ball_lower_l', 'susp_rear_ball_lower_r', 'susp_rear_ball_upper_l',
+    'susp_rear_ball_upper_r', 'susp_rear_bearing_l', 'susp_rear_bearing_r', 'susp_rear_sb_upper_trans_f_l',
+    'susp_rear_sb_upper_trans_f_r', 'susp_rear_sb_upper_trans_r_l', 'susp_rear_sb_upper_trans_r_r',
+    'susp_rear_sb_lower_trans_f_l', 'susp_rear_sb_lower_trans_f_r', 'susp_rear_sb_lower_trans_r_l',
+    'susp_rear_sb_lower_trans_r_r', 'susp_rear_sb_upper_long_f_l', 'susp_rear_sb_upper_long_f_r',
+    'susp_rear_sb_upper_long_r_l', 'susp_rear_sb_upper_long_r_r', 'susp_rear_sb_lower_long_f_l',
+    'susp_rear_sb_lower_long_f_r', 'susp_rear_sb_lower_long_r_l', 'susp_rear_sb_lower_long_r_r',
+    'susp_front_stabilizer_l', 'susp_front_stabilizer_r', 'susp_front_stab_bushing_l',
+    'susp_front_stab_bushing_r', 'susp_front_stab_link_l', 'susp_front_stab_link_r',
+    'susp_front_stab_link_bushing_l', 'susp_front_stab_link_bushing_r', 'steering_ujoint', 'steering_rack',
+    'steering_tip_l', 'steering_tip_r', 'steering_tie_rod_l', 'steering_tie_rod_r', 'drive_front_cv_outer_l',
+    'drive_front_cv_outer_r', 'drive_front_cv_inner_l', 'drive_front_cv_inner_r', 'susp_front_camber_arm_l',
+    'susp_front_camber_arm_r', 'brake_front_caliper_l', 'brake_front_caliper_r', 'susp_rear_beam_bushing_l',
+    'susp_rear_beam_bushing_r', 'susp_rear_stab_bushing_l', 'susp_rear_stab_bushing_r',
+    'susp_rear_stab_link_l', 'susp_rear_stab_link_r', 'susp_rear_stab_link_bushing_l',
+    'susp_rear_stab_link_bushing_r', 'drive_rear_cv_outer_l', 'drive_rear_cv_outer_r',
+    'drive_rear_cv_inner_l', 'drive_rear_cv_inner_r', 'susp_rear_camber_arm_l', 'susp_rear_camber_arm_r',
+    'susp_rear_soldatik_l', 'susp_rear_soldatik_r', 'brake_rear_caliper_l', 'brake_rear_caliper_r',
+    'steering_gur', 'ac_compressor', 'alternator',
+)
+BITS_PER_WORD = 63
+WORD_FIELDS = ('defect_bits_0', 'defect_bits_1', 'defect_bits_2')
+
+WEIGHTS = {
+    'engine': 0.25,
+    'transmission': 0.2,
+    'chassis': 0.2,
+    'equipment': 0.1,
+    'diagnostic': 0.25,
+}
+STATUS_CAPS = {'ok': 100, 'repair': 60, 'broken': 30}
+FLAG_PENALTY = 0.7
+EQUIPMENT_FLAGS = (
+    'window_operation',
+    'sound_signal_operation',
+    'windscreen_wipers_wiper_motor',
+    'headlights_sidelights_turn_signals',
+    'stove_in_the_salon',
+    'alarms_locks_keys',
+)
+DEFECT_WEIGHTS = (
+    ('brake_', 8),
+    ('steering_', 6),
+    ('drive_', 5),
+    ('susp_front_sb_', 2),
+    ('susp_rear_sb_', 2),
+    ('susp_', 4),
+)
+DEFAULT_DEFECT_WEIGHT = 5
+
+SOURCE_FIELDS = (
+    'engine_rating', 'transmission_rating', 'chassis_rating', 'overall_status',
+    'noise_in_engine_operation', 'switching_state_of_transmission', 'chassis_steering_of_the_car',
+) + EQUIPMENT_FLAGS
+SCORE_FIELDS = (
+    'health_score', 'health_engine', 'health_transmission',
+    'health_chassis', 'health_equipment', 'health_diagnostic',
+)
+
+
+def _defect_weight(name):
+    for prefix, weight in DEFECT_WEIGHTS:
+        if name.startswith(prefix):
+            return weight
+    return DEFAULT_DEFECT_WEIGHT
+
+
+ITEM_WEIGHTS = tuple(_defect_weight(name) for name in ITEM_NAMES)
+
+
+def _rating_score(rating):
+    return (min(max(rating or 1, 1), 5) - 1) * 25
+
+
+def diagnostic_score(words):
+    if not words:
+        return 100
+    penalty = 0
+    for word_index, word in enumerate(words):
+        base = word_index * BITS_PER_WORD
+        while word:
+            low_bit = word & -word
+            index = base + low_bit.bit_length() - 1
+            if index < len(ITEM_NAMES):
+                penalty += ITEM_WEIGHTS[index]
+            word ^= low_bit
+    return max(100 - penalty, 0)
+
+
+def compute(vehicle, words=None):
+    engine = _rating_score(vehicle.engine_rating)
+    if vehicle.noise_in_engine_operation:
+        engine *= FLAG_PENALTY
+
+    transmission = _rating_score(vehicle.transmission_rating)
+    if not vehicle.switching_state_of_transmission:
+        transmission *= FLAG_PENALTY
+
+    chassis = _rating_score(vehicle.chassis_rating)
+    if not vehicle.chassis_steering_of_the_car:
+        chassis *= FLAG_PENALTY
+
+    equipment = 100 * sum(bool(getattr(vehicle, flag)) for flag in EQUIPMENT_FLAGS) / len(EQUIPMENT_FLAGS)
+
+    parts = {
+        'engine': engine,
+        'transmission': transmission,
+        'chassis': chassis,
+        'equipment': equipment,
+        'diagnostic': diagnostic_score(words),
+    }
+    total = sum(parts[name] * weight for name, weight in WEIGHTS.items())
+    total = min(total, STATUS_CAPS.get(vehicle.overall_status, 100))
+
+    scores = {f'health_{name}': round(value) for name, value in parts.items()}
+    scores['health_score'] = round(total)
+    return scores
+
+
+def compute_health(apps, schema_editor):
+    Vehicle = apps.get_model('app', 'Vehicle')
+    DiagnosticReport = apps.get_model('app', 'DiagnosticReport')
+
+    latest = DiagnosticReport.objects.filter(vehicle=OuterRef('pk')).order_by('-created_at', '-pk')
+    vehicles = Vehicle.objects.only(*SOURCE_FIELDS).annotate(**{
+        field: Subquery(latest.values(field)[:1]) for field in WORD_FIELDS
+    })
+
+    batch = []
+    for vehicle in vehicles.iterator(chunk_size=BATCH_SIZE):
+        words = tuple(getattr(vehicle, field) for field in WORD_FIELDS)
+        scores = compute(vehicle, words if words[0] is not None else None)
+        for field, value in scores.items():
+            setattr(vehicle, field, value)
+        batch.append(vehicle)
+
+        if len(batch) >= BATCH_SIZE:
+            Vehicle.objects.bulk_update(batch, SCORE_FIELDS)
+            batch = []
+
+    if batch:
+        Vehicle.objects.bulk_update(batch, SCORE_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_vehicledefect'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vehicle',
+            name='health_chassis',
+            field=models.PositiveSmallIntegerField(default=100, editable=False, verbose_name='Оценка ходовой'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='health_diagnostic',
+            field=models.PositiveSmallIntegerField(default=100, editable=False, verbose_name='Оценка по диагностике'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='health_engine',
+            field=models.PositiveSmallIntegerField(default=100, editable=False, verbose_name='Оценка двигателя'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='health_equipment',
+            field=models.PositiveSmallIntegerField(default=100, editable=False, verbose_name='Оценка оборудования'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='health_score',
+            field=models.PositiveSmallIntegerField(db_index=True, default=100, editable=False, verbose_name='Оценка состояния'),
+        ),
+        migrations.AddField(
+            model_name='vehicle',
+            name='health_transmission',
+            field=models.PositiveSmallIntegerField(default=100, editable=False, verbose_name='Оценка КПП'),
+        ),
+        migrations.RunPython(compute_health, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,192 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:44
+
+import calendar
+import datetime
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+MONEY = Decimal('0.01')
+
+
+# Построение графика и итогов — как в app/ledger.py на момент миграции.
+# Импортировать ledger нельзя: он тянет за собой app.models с текущими полями.
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def _due_date(year, month, day):
+    return datetime.date(year, month, min(max(day, 1), calendar.monthrange(year, month)[1]))
+
+
+def schedule_rows(contract):
+    start, end = _as_date(contract.start_date), _as_date(contract.end_date)
+    rows = []
+
+    initial = Decimal(contract.initial_payment or 0).quantize(MONEY)
+    if initial > 0:
+        rows.append((0, start, initial))
+
+    monthly = Decimal(contract.monthly_payment or 0).quantize(MONEY)
+    if monthly <= 0:
+        return rows
+
+    year, month = start.year, start.month
+    number = 1
+    while True:
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        due = _due_date(year, month, contract.payment_due_day or 1)
+        if due > end:
+            break
+        rows.append((number, due, monthly))
+        number += 1
+    return rows
+
+
+def summarize(rows, paid_total):
+    today = timezone.localdate()
+    scheduled = due = Decimal(0)
+    next_due = None
+
+    for due_date, amount, paid in rows:
+        scheduled += amount
+        if due_date <= today:
+            due += amount
+        if paid < amount and (next_due is None or due_date < next_due):
+            next_due = due_date
+
+    return {
+        'scheduled_total': scheduled,
+        'due_total': due,
+        'paid_total': paid_total,
+        'debt_amount': max(due - paid_total, Decimal(0)),
+        'next_due_date': next_due,
+    }
+
+
+def build_schedules(apps, schema_editor):
+    """Графики для уже заключённых договоров; платежей до этой миграции не велось."""
+    Contract = apps.get_model('app', 'Contract')
+    PaymentScheduleItem = apps.get_model('app', 'PaymentScheduleItem')
+
+    items = []
+    for contract in Contract.objects.iterator(chunk_size=BATCH_SIZE):
+        rows = schedule_rows(contract)
+        items.extend(
+            PaymentScheduleItem(contract_id=contract.pk, number=number, due_date=due_date, amount=amount)
+            for number, due_date, amount in rows
+        )
+        totals = summarize([(due_date, amount, Decimal(0)) for _, due_date, amount in rows], Decimal(0))
+        Contract.objects.filter(pk=contract.pk).update(**totals)
+
+        if len(items) >= BATCH_SIZE:
+            PaymentScheduleItem.objects.bulk_create(items)
+            items = []
+
+    PaymentScheduleItem.objects.bulk_create(items)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Сумма')),
+                ('paid_at', models.DateField(default=django.utils.timezone.localdate, verbose_name='Дата оплаты')),
+                ('comment', models.CharField(blank=True, max_length=255, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Платёж',
+                'verbose_name_plural': 'Платежи',
+                'ordering': ['paid_at', 'pk'],
+            },
+        ),
+        migrations.CreateModel(
+            name='PaymentScheduleItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveSmallIntegerField(verbose_name='№ платежа')),
+                ('due_date', models.DateField(verbose_name='Срок оплаты')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма')),
+                ('paid_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Оплачено')),
+            ],
+            options={
+                'verbose_name': 'Платёж по графику',
+                'verbose_name_plural': 'График платежей',
+                'ordering': ['due_date', 'number'],
+            },
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='debt_amount',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Задолженность'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='due_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Начислено к оплате'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='next_due_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Ближайший неоплаченный платёж'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='paid_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Оплачено'),
+        ),
+        migrations.AddField(
+            model_name='contract',
+            name='scheduled_total',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12, verbose_name='Сумма по графику'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['client', 'debt_amount'], name='contract_client_debt_idx'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='contract',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payments', to='app.contract', verbose_name='Договор'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='created_by',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='recorded_payments', to=settings.AUTH_USER_MODEL, verbose_name='Принял'),
+        ),
+        migrations.AddField(
+            model_name='paymentscheduleitem',
+            name='contract',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='app.contract', verbose_name='Договор'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['contract', 'paid_at'], name='payment_contract_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='paymentscheduleitem',
+            index=models.Index(fields=['contract', 'due_date'], name='schedule_contract_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentscheduleitem',
+            constraint=models.UniqueConstraint(fields=('contract', 'number'), name='schedule_unique_number'),
+        ),
+        migrations.RunPython(build_schedules, migrations.RunPython.noop),
+    ]
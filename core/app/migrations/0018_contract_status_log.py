@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_payment_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_status', models.CharField(choices=[('active', 'Действует'), ('completed', 'Завершен успешно'), ('terminated', 'Расторгнут досрочно'), ('debt', 'Есть задолженность')], max_length=20, verbose_name='Было')),
+                ('new_status', models.CharField(choices=[('active', 'Действует'), ('completed', 'Завершен успешно'), ('terminated', 'Расторгнут досрочно'), ('debt', 'Есть задолженность')], max_length=20, verbose_name='Стало')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='Причина')),
+                ('debt_amount', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Задолженность на момент проверки')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('contract', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_changes', to='app.contract', verbose_name='Договор')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса договора',
+                'verbose_name_plural': 'История статусов договоров',
+                'ordering': ['-changed_at'],
+            },
+        ),
+    ]
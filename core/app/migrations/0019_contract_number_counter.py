@@ -0,0 +1,55 @@
+# Generated by Django 6.0.2 on 2026-10-19 04:49
+
+import datetime
+import re
+
+from django.db import migrations, models
+
+NUMBER_RE = re.compile(r'^L-(\d{2})(\d{2})(\d{4})-(\d+)$')
+
+
+def seed_counters(apps, schema_editor):
+    """
+    Раньше номер за день был случайным: счётчик начинаем с наибольшего
+    уже занятого номера, чтобы новые номера с ним не пересеклись.
+    """
+    Contract = apps.get_model('app', 'Contract')
+    ContractNumberCounter = apps.get_model('app', 'ContractNumberCounter')
+
+    last_values = {}
+    for number in Contract.objects.values_list('contract_number', flat=True).iterator():
+        match = NUMBER_RE.match(number or '')
+        if not match:
+            continue
+        day, month, year, value = map(int, match.groups())
+        try:
+            key = datetime.date(year, month, day)
+        except ValueError:
+            continue
+        last_values[key] = max(last_values.get(key, 0), value)
+
+    ContractNumberCounter.objects.bulk_create(
+        ContractNumberCounter(day=day, last_value=value) for day, value in last_values.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0018_contract_status_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractNumberCounter',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False, verbose_name='День')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Последний выданный номер')),
+            ],
+            options={
+                'verbose_name': 'Счётчик номеров договоров',
+                'verbose_name_plural': 'Счётчики номеров договоров',
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
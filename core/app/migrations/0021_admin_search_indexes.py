@@ -0,0 +1,43 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:05
+
+from django.db import migrations
+
+# Поиск в админке по началу значения (search_fields с '^') превращается в
+# UPPER("поле"::text) LIKE 'ABC%'. Обычный индекс для такого условия не подходит,
+# нужен индекс по тому же выражению с text_pattern_ops. Это возможность PostgreSQL,
+# на SQLite (разработка) миграция ничего не делает.
+INDEXES = [
+    ('app_vehicle_vin_upper_like', 'app_vehicle', 'vin'),
+    ('app_vehicle_plate_upper_like', 'app_vehicle', 'license_plate'),
+    ('app_vehicle_imei_upper_like', 'app_vehicle', 'wialon_imei'),
+    ('app_contract_number_upper_like', 'app_contract', 'contract_number'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY нельзя выполнять в транзакции; зато таблица не блокируется на запись
+    atomic = False
+
+    dependencies = [
+        ('app', '0020_api_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0021_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=30, verbose_name='Ресурс API')),
+                ('object_pk', models.CharField(max_length=64, verbose_name='Ключ объекта')),
+                ('updated_at', models.DateTimeField(auto_now_add=True, verbose_name='Удалён')),
+            ],
+            options={
+                'verbose_name': 'Удалённый объект',
+                'verbose_name_plural': 'Удалённые объекты',
+                'indexes': [models.Index(fields=['updated_at', 'id'], name='tombstone_updated_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# Поиск в админке по вхождению (search_fields без префиксов) — это
+# UPPER("поле"::text) LIKE UPPER('%abc%'). Индексы text_pattern_ops из 0021 годятся
+# только для поиска по началу значения, поэтому заменяем их триграммными
+# (pg_trgm, GIN) по тому же выражению: с ними LIKE '%abc%' идёт по индексу,
+# если в строке поиска от трёх символов. Только PostgreSQL, на SQLite ничего не делает.
+PREFIX_INDEXES = [
+    ('app_vehicle_vin_upper_like', 'app_vehicle', 'vin'),
+    ('app_vehicle_plate_upper_like', 'app_vehicle', 'license_plate'),
+    ('app_vehicle_imei_upper_like', 'app_vehicle', 'wialon_imei'),
+    ('app_contract_number_upper_like', 'app_contract', 'contract_number'),
+]
+
+TRIGRAM_INDEXES = [
+    ('app_vehicle_vin_upper_trgm', 'app_vehicle', 'vin'),
+    ('app_vehicle_brand_upper_trgm', 'app_vehicle', 'brand'),
+    ('app_vehicle_model_name_upper_trgm', 'app_vehicle', 'model_name'),
+    ('app_vehicle_plate_upper_trgm', 'app_vehicle', 'license_plate'),
+    ('app_vehicle_imei_upper_trgm', 'app_vehicle', 'wialon_imei'),
+    ('app_contract_number_upper_trgm', 'app_contract', 'contract_number'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+    for name, _, _ in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}"::text) text_pattern_ops)'
+        )
+    # Расширение не удаляем: им могут пользоваться и другие индексы
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    # CONCURRENTLY нельзя выполнять в транзакции
+    atomic = False
+
+    dependencies = [
+        ('app', '0022_api_tombstones'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
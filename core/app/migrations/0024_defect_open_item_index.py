@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-19 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0023_admin_search_trigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicledefect',
+            index=models.Index(condition=models.Q(('closed_at__isnull', True)), fields=['item'], name='defect_open_item_idx'),
+        ),
+    ]
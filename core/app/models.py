@@ -1,13 +1,17 @@
-from django.db import models
+from django.db import connection, models
+from django.db.models import F, Q
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
+import datetime
 import os
-import string
-import random
+import secrets
+import uuid
 
 from .utils import find_wialon_id_by_imei
+from .storage import ContentAddressedFilesMixin, get_content_addressed_storage
+from . import checklist, health
 
 
 class Vehicle(models.Model):
@@ -180,6 +184,10 @@ class Vehicle(models.Model):
     created_at = models.DateTimeField(
         auto_now_add=True
     )
+    # Меняется и при изменении фото, документов, договоров и диагностик (см. app/signals.py)
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
 
     # Техническое состояние автомобиля
     switching_state_of_transmission = models.BooleanField(
@@ -219,9 +227,26 @@ class Vehicle(models.Model):
         verbose_name="Сигнализация, замки и ключи"
     )
 
+    # Оценка состояния 0–100, считается в app/health.py при сохранении
+    health_score = models.PositiveSmallIntegerField(
+        default=100,
+        db_index=True,
+        editable=False,
+        verbose_name="Оценка состояния"
+    )
+    health_engine = models.PositiveSmallIntegerField(default=100, editable=False, verbose_name="Оценка двигателя")
+    health_transmission = models.PositiveSmallIntegerField(default=100, editable=False, verbose_name="Оценка КПП")
+    health_chassis = models.PositiveSmallIntegerField(default=100, editable=False, verbose_name="Оценка ходовой")
+    health_equipment = models.PositiveSmallIntegerField(default=100, editable=False, verbose_name="Оценка оборудования")
+    health_diagnostic = models.PositiveSmallIntegerField(default=100, editable=False, verbose_name="Оценка по диагностике")
+
     class Meta:
         verbose_name = "Автомобиль"
         verbose_name_plural = "Автомобили"
+        indexes = [
+            # Порядок выдачи и курсор в API (app/api.py)
+            models.Index(fields=['updated_at', 'vin'], name='vehicle_updated_idx'),
+        ]
 
 
     def save(self, *args, **kwargs):
@@ -239,19 +264,36 @@ class Vehicle(models.Model):
         else:
             # Если стерли IMEI, стираем и ID
             self.wialon_id = None
-            
+
+        self.update_health()
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(health.SOURCE_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | set(health.SCORE_FIELDS)
+
         super().save(*args, **kwargs)
 
+    def update_health(self):
+        words = None if self._state.adding else health.latest_words(self.pk)
+        for field, value in health.compute(self, words).items():
+            setattr(self, field, value)
+
 
     def get_cover_image(self):
-        first_photo = self.photos.first()
+        # Список машин сотрудника подгружает фото и открытые договоры заранее (StaffDashboardView)
+        if hasattr(self, 'prefetched_photos'):
+            first_photo = self.prefetched_photos[0] if self.prefetched_photos else None
+        else:
+            first_photo = self.photos.order_by('pk').first()
         if first_photo:
             return first_photo.image.url
         return None
 
     @property
     def current_contract(self):
-        return self.contracts.filter(status='active').first()
+        if hasattr(self, 'open_contracts'):
+            return self.open_contracts[0] if self.open_contracts else None
+        return self.contracts.filter(status__in=Contract.OPEN_STATUSES).order_by('pk').first()
 
     def __str__(self):
         # Пример вывода: BMW X5 (3.0 Diesel) - A123AA77
@@ -259,7 +301,7 @@ class Vehicle(models.Model):
         return f"{self.brand} {self.model_name} ({engine_info}) - {self.license_plate}"
 
 
-class VehicleDocument(models.Model):
+class VehicleDocument(ContentAddressedFilesMixin, models.Model):
     vehicle = models.ForeignKey(
         Vehicle,
         on_delete=models.CASCADE,
@@ -272,6 +314,7 @@ class VehicleDocument(models.Model):
     )
     file = models.FileField(
         upload_to='vehicle_docs/',
+        storage=get_content_addressed_storage,
         verbose_name="Файл (PDF)"
     )
     uploaded_at = models.DateTimeField(
@@ -286,7 +329,7 @@ class VehicleDocument(models.Model):
         verbose_name_plural = "Документы"
 
 
-class VehiclePhoto(models.Model):
+class VehiclePhoto(ContentAddressedFilesMixin, models.Model):
     vehicle = models.ForeignKey(
         Vehicle,
         on_delete=models.CASCADE,
@@ -295,6 +338,7 @@ class VehiclePhoto(models.Model):
     )
     image = models.ImageField(
         upload_to='vehicle_gallery/',
+        storage=get_content_addressed_storage,
         verbose_name="Фотография"
     )
     uploaded_at = models.DateTimeField(
@@ -306,6 +350,53 @@ class VehiclePhoto(models.Model):
         verbose_name_plural = "Галерея фотографий"
 
 
+class DiagnosticReportQuerySet(models.QuerySet):
+    """
+    Поиск по отметкам чек-листа через битовые маски.
+    Пункты из одной колонки проверяются одной операцией.
+
+    Условие defect_bits_N & mask индексом не покрывается: по всем отчётам это
+    проход по таблице, поэтому его стоит сужать (по машине, по дате).
+    По индексу идут только with_any_defect() без аргументов и without_defects() —
+    через defect_count. "У каких машин сейчас открыт пункт X" — VehicleDefect.objects.open().
+    """
+
+    def with_defect(self, *names):
+        """Отчёты, где отмечены ВСЕ перечисленные пункты."""
+        queryset = self
+        for word, mask in checklist.masks_by_word(names).items():
+            alias = f'{word}_all'
+            queryset = queryset.alias(**{alias: F(word).bitand(mask)}).filter(**{alias: mask})
+        return queryset
+
+    def with_any_defect(self, *names):
+        """Отчёты, где отмечен ХОТЯ БЫ ОДИН из пунктов (без аргументов — любой пункт)."""
+        if not names:
+            return self.filter(defect_count__gt=0)
+
+        condition = Q()
+        aliases = {}
+        for word, mask in checklist.masks_by_word(names).items():
+            alias = f'{word}_any'
+            aliases[alias] = F(word).bitand(mask)
+            condition |= Q(**{f'{alias}__gt': 0})
+        return self.alias(**aliases).filter(condition)
+
+    def without_defects(self):
+        return self.filter(defect_count=0)
+
+    def before(self, report):
+        """Отчёты, сделанные раньше report (порядок — created_at, затем pk)."""
+        return self.filter(
+            Q(created_at__lt=report.created_at) | Q(created_at=report.created_at, pk__lt=report.pk)
+        )
+
+    def after(self, report):
+        return self.filter(
+            Q(created_at__gt=report.created_at) | Q(created_at=report.created_at, pk__gt=report.pk)
+        )
+
+
 class DiagnosticReport(models.Model):
     vehicle = models.ForeignKey(
         Vehicle,
@@ -322,220 +413,155 @@ class DiagnosticReport(models.Model):
     )
     date = models.DateField(auto_now_add=True, verbose_name="Дата осмотра")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
-    # ==================================================
-    # 1. ТОРМОЗНАЯ СИСТЕМА
-    # ==================================================
-
-    # --- Передняя ---
-    brake_front_hose_l = models.BooleanField(default=False, verbose_name="Торм. шланг передний (L)")
-    brake_front_hose_r = models.BooleanField(default=False, verbose_name="Торм. шланг передний (R)")
-
-    brake_front_disc_l = models.BooleanField(default=False, verbose_name="Торм. диск передний (L)")
-    brake_front_disc_r = models.BooleanField(default=False, verbose_name="Торм. диск передний (R)")
-
-    brake_front_pads_l = models.BooleanField(default=False, verbose_name="Торм. колодки передние (L)")
-    brake_front_pads_r = models.BooleanField(default=False, verbose_name="Торм. колодки передние (R)")
-
-    # --- Задняя ---
-    brake_rear_hose_l = models.BooleanField(default=False, verbose_name="Торм. шланг задний (L)")
-    brake_rear_hose_r = models.BooleanField(default=False, verbose_name="Торм. шланг задний (R)")
-
-    brake_rear_disc_l = models.BooleanField(default=False, verbose_name="Торм. диск задний (L)")
-    brake_rear_disc_r = models.BooleanField(default=False, verbose_name="Торм. диск задний (R)")
-
-    brake_rear_pads_l = models.BooleanField(default=False, verbose_name="Торм. колодки задние (L)")
-    brake_rear_pads_r = models.BooleanField(default=False, verbose_name="Торм. колодки задние (R)")
-
-    # ==================================================
-    # 2. ПОДВЕСКА ПЕРЕДНЯЯ
-    # ==================================================
-
-    susp_front_shock_l = models.BooleanField(default=False, verbose_name="Амортизатор передний (L)")
-    susp_front_shock_r = models.BooleanField(default=False, verbose_name="Амортизатор передний (R)")
-
-    susp_front_mount_l = models.BooleanField(default=False, verbose_name="Опора стойки аморт. перед (L)")
-    susp_front_mount_r = models.BooleanField(default=False, verbose_name="Опора стойки аморт. перед (R)")
-
-    susp_front_boot_l = models.BooleanField(default=False, verbose_name="Пыльник/отбойник перед (L)")
-    susp_front_boot_r = models.BooleanField(default=False, verbose_name="Пыльник/отбойник перед (R)")
-
-    susp_front_spring_l = models.BooleanField(default=False, verbose_name="Пружина передняя (L)")
-    susp_front_spring_r = models.BooleanField(default=False, verbose_name="Пружина передняя (R)")
-
-    susp_front_ball_lower_l = models.BooleanField(default=False, verbose_name="Шаровая нижняя перед (L)")
-    susp_front_ball_lower_r = models.BooleanField(default=False, verbose_name="Шаровая нижняя перед (R)")
-
-    susp_front_ball_upper_l = models.BooleanField(default=False, verbose_name="Шаровая верхняя перед (L)")
-    susp_front_ball_upper_r = models.BooleanField(default=False, verbose_name="Шаровая верхняя перед (R)")
-
-    susp_front_bearing_l = models.BooleanField(default=False, verbose_name="Подшипник ступицы перед (L)")
-    susp_front_bearing_r = models.BooleanField(default=False, verbose_name="Подшипник ступицы перед (R)")
-
-    # Сайлентблоки ВЕРХНЕГО рычага (перед)
-    susp_front_sb_upper_f_l = models.BooleanField(default=False, verbose_name="С/б верх. рыч. передний (L)")
-    susp_front_sb_upper_f_r = models.BooleanField(default=False, verbose_name="С/б верх. рыч. передний (R)")
-
-    susp_front_sb_upper_r_l = models.BooleanField(default=False, verbose_name="С/б верх. рыч. задний (L)")
-    susp_front_sb_upper_r_r = models.BooleanField(default=False, verbose_name="С/б верх. рыч. задний (R)")
-
-    # Сайлентблоки НИЖНЕГО рычага (перед)
-    susp_front_sb_lower_f_l = models.BooleanField(default=False, verbose_name="С/б нижн. рыч. передний (L)")
-    susp_front_sb_lower_f_r = models.BooleanField(default=False, verbose_name="С/б нижн. рыч. передний (R)")
-
-    susp_front_sb_lower_r_l = models.BooleanField(default=False, verbose_name="С/б нижн. рыч. задний (L)")
-    susp_front_sb_lower_r_r = models.BooleanField(default=False, verbose_name="С/б нижн. рыч. задний (R)")
-
-    # ==================================================
-    # 3. ПОДВЕСКА ЗАДНЯЯ
-    # ==================================================
-
-    susp_rear_shock_l = models.BooleanField(default=False, verbose_name="Амортизатор задний (L)")
-    susp_rear_shock_r = models.BooleanField(default=False, verbose_name="Амортизатор задний (R)")
-
-    susp_rear_mount_l = models.BooleanField(default=False, verbose_name="Опора стойки аморт. зад (L)")
-    susp_rear_mount_r = models.BooleanField(default=False, verbose_name="Опора стойки аморт. зад (R)")
-
-    susp_rear_boot_l = models.BooleanField(default=False, verbose_name="Пыльник/отбойник зад (L)")
-    susp_rear_boot_r = models.BooleanField(default=False, verbose_name="Пыльник/отбойник зад (R)")
-
-    susp_rear_spring_l = models.BooleanField(default=False, verbose_name="Пружина задняя (L)")
-    susp_rear_spring_r = models.BooleanField(default=False, verbose_name="Пружина задняя (R)")
-
-    susp_rear_ball_lower_l = models.BooleanField(default=False, verbose_name="Шаровая нижняя зад (L)")
-    susp_rear_ball_lower_r = models.BooleanField(default=False, verbose_name="Шаровая нижняя зад (R)")
-
-    susp_rear_ball_upper_l = models.BooleanField(default=False, verbose_name="Шаровая верхняя зад (L)")
-    susp_rear_ball_upper_r = models.BooleanField(default=False, verbose_name="Шаровая верхняя зад (R)")
-
-    susp_rear_bearing_l = models.BooleanField(default=False, verbose_name="Подшипник ступицы зад (L)")
-    susp_rear_bearing_r = models.BooleanField(default=False, verbose_name="Подшипник ступицы зад (R)")
-
-    # --- Сайлентблоки ВЕРХНЕГО ПОПЕРЕЧНОГО рычага (Зад) ---
-    # Передний/внутренний
-    susp_rear_sb_upper_trans_f_l = models.BooleanField(default=False, verbose_name="С/б верх.попереч. перед/внутр (L)")
-    susp_rear_sb_upper_trans_f_r = models.BooleanField(default=False, verbose_name="С/б верх.попереч. перед/внутр (R)")
-    # Задний/наружный
-    susp_rear_sb_upper_trans_r_l = models.BooleanField(default=False, verbose_name="С/б верх.попереч. зад/наруж (L)")
-    susp_rear_sb_upper_trans_r_r = models.BooleanField(default=False, verbose_name="С/б верх.попереч. зад/наруж (R)")
-
-    # --- Сайлентблоки НИЖНЕГО ПОПЕРЕЧНОГО рычага (Зад) ---
-    # Передний/внутренний
-    susp_rear_sb_lower_trans_f_l = models.BooleanField(default=False, verbose_name="С/б нижн.попереч. перед/внутр (L)")
-    susp_rear_sb_lower_trans_f_r = models.BooleanField(default=False, verbose_name="С/б нижн.попереч. перед/внутр (R)")
-    # Задний/наружный
-    susp_rear_sb_lower_trans_r_l = models.BooleanField(default=False, verbose_name="С/б нижн.попереч. зад/наруж (L)")
-    susp_rear_sb_lower_trans_r_r = models.BooleanField(default=False, verbose_name="С/б нижн.попереч. зад/наруж (R)")
-
-    # --- Сайлентблоки ВЕРХНЕГО ПРОДОЛЬНОГО рычага (Зад) ---
-    susp_rear_sb_upper_long_f_l = models.BooleanField(default=False, verbose_name="С/б верх.продольн. передний (L)")
-    susp_rear_sb_upper_long_f_r = models.BooleanField(default=False, verbose_name="С/б верх.продольн. передний (R)")
-
-    susp_rear_sb_upper_long_r_l = models.BooleanField(default=False, verbose_name="С/б верх.продольн. задний (L)")
-    susp_rear_sb_upper_long_r_r = models.BooleanField(default=False, verbose_name="С/б верх.продольн. задний (R)")
-
-    # --- Сайлентблоки НИЖНЕГО ПРОДОЛЬНОГО рычага (Зад) ---
-    susp_rear_sb_lower_long_f_l = models.BooleanField(default=False, verbose_name="С/б нижн.продольн. передний (L)")
-    susp_rear_sb_lower_long_f_r = models.BooleanField(default=False, verbose_name="С/б нижн.продольн. передний (R)")
-
-    susp_rear_sb_lower_long_r_l = models.BooleanField(default=False, verbose_name="С/б нижн.продольн. задний (L)")
-    susp_rear_sb_lower_long_r_r = models.BooleanField(default=False, verbose_name="С/б нижн.продольн. задний (R)")
+    # Отметки чек-листа ("нужна замена/ремонт") — биты, см. app/checklist.py.
+    # Читаются и пишутся по старым именам: report.brake_front_hose_l = True
+    checklist_version = models.PositiveSmallIntegerField(
+        default=checklist.current_version,
+        verbose_name="Версия чек-листа"
+    )
+    defect_bits_0 = models.BigIntegerField(default=0)
+    defect_bits_1 = models.BigIntegerField(default=0)
+    defect_bits_2 = models.BigIntegerField(default=0)
+    defect_count = models.PositiveSmallIntegerField(
+        default=0,
+        db_index=True,
+        verbose_name="Количество замечаний"
+    )
 
-    # ==================================================
-    # 4. РУЛЕВОЕ УПРАВЛЕНИЕ И ПРИВОДА (ПЕРЕД)
-    # ==================================================
+    objects = DiagnosticReportQuerySet.as_manager()
 
-    # Стабилизатор и его компоненты
-    susp_front_stabilizer_l = models.BooleanField(default=False, verbose_name="Стабилизатор передний (L)")
-    susp_front_stabilizer_r = models.BooleanField(default=False, verbose_name="Стабилизатор передний (R)")
+    class Meta:
+        verbose_name = "Диагностический лист"
+        verbose_name_plural = "Диагностические листы"
+        ordering = ['-date', '-created_at']
+        indexes = [
+            models.Index(fields=['vehicle', '-created_at'], name='diag_vehicle_created_idx'),
+            models.Index(fields=['updated_at', 'id'], name='diag_updated_idx'),
+        ]
 
-    susp_front_stab_bushing_l = models.BooleanField(default=False, verbose_name="Втулки стабилизатора перед (L)")
-    susp_front_stab_bushing_r = models.BooleanField(default=False, verbose_name="Втулки стабилизатора перед (R)")
+    @property
+    def defect_words(self):
+        return tuple(getattr(self, field) for field in checklist.WORD_FIELDS)
 
-    # "Солдатик" - это стойка стабилизатора
-    susp_front_stab_link_l = models.BooleanField(default=False, verbose_name="Стойка стаб. (Солдатик) перед (L)")
-    susp_front_stab_link_r = models.BooleanField(default=False, verbose_name="Стойка стаб. (Солдатик) перед (R)")
+    @property
+    def defects(self):
+        """Имена отмеченных пунктов."""
+        return checklist.unpack(self.defect_words)
 
-    susp_front_stab_link_bushing_l = models.BooleanField(default=False, verbose_name="Втулки стоек стаб. перед (L)")
-    susp_front_stab_link_bushing_r = models.BooleanField(default=False, verbose_name="Втулки стоек стаб. перед (R)")
+    def save(self, *args, **kwargs):
+        self.defect_count = checklist.count(self.defect_words)
 
-    # Рулевое
-    steering_ujoint = models.BooleanField(default=False, verbose_name="Крестовина рул. вала")  # Обычно одна
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            # updated_at нужен синхронизации через API (updated_since)
+            extra = {'updated_at'}
+            if set(update_fields) & set(checklist.WORD_FIELDS):
+                extra.add('defect_count')
+            kwargs['update_fields'] = set(update_fields) | extra
 
-    steering_rack = models.BooleanField(default=False,
-                                        verbose_name="Рулевая рейка")  # Обычно диагностируется целиком, но можно добавить L/R если нужно
+        super().save(*args, **kwargs)
 
-    steering_tip_l = models.BooleanField(default=False, verbose_name="Рулевой наконечник (L)")
-    steering_tip_r = models.BooleanField(default=False, verbose_name="Рулевой наконечник (R)")
+    def __str__(self):
+        return f"Диагностика {self.vehicle} от {self.date}"
 
-    steering_tie_rod_l = models.BooleanField(default=False, verbose_name="Рулевая тяга (L)")
-    steering_tie_rod_r = models.BooleanField(default=False, verbose_name="Рулевая тяга (R)")
 
-    # Гранаты (ШРУС) - Передние
-    drive_front_cv_outer_l = models.BooleanField(default=False, verbose_name="Наружный гранат перед (L)")
-    drive_front_cv_outer_r = models.BooleanField(default=False, verbose_name="Наружный гранат перед (R)")
+def _checklist_property(name):
+    word, mask = checklist.locate(name)
 
-    drive_front_cv_inner_l = models.BooleanField(default=False, verbose_name="Внутренний гранат перед (L)")
-    drive_front_cv_inner_r = models.BooleanField(default=False, verbose_name="Внутренний гранат перед (R)")
+    def getter(self):
+        return bool(getattr(self, word) & mask)
 
-    # Дополнительно из левой колонки
-    susp_front_camber_arm_l = models.BooleanField(default=False, verbose_name="Развальный рычаг перед (L)")
-    susp_front_camber_arm_r = models.BooleanField(default=False, verbose_name="Развальный рычаг перед (R)")
+    def setter(self, value):
+        current = getattr(self, word)
+        setattr(self, word, current | mask if value else current & ~mask)
 
-    brake_front_caliper_l = models.BooleanField(default=False, verbose_name="Суппорт передний (L)")
-    brake_front_caliper_r = models.BooleanField(default=False, verbose_name="Суппорт передний (R)")
+    return property(getter, setter, doc=checklist.ITEMS_BY_NAME[name].label)
 
-    # ==================================================
-    # 5. ДОПОЛНИТЕЛЬНО (ЗАДНЯЯ ЧАСТЬ)
-    # ==================================================
 
-    # Сайлентблоки балки
-    susp_rear_beam_bushing_l = models.BooleanField(default=False, verbose_name="Сайлентблок балки (L)")
-    susp_rear_beam_bushing_r = models.BooleanField(default=False, verbose_name="Сайлентблок балки (R)")
+# Старые имена полей остаются как свойства: шаблоны, формы и
+# DiagnosticReport(brake_front_hose_l=True) работают как раньше
+for _item in checklist.CHECKLIST_ITEMS:
+    setattr(DiagnosticReport, _item.name, _checklist_property(_item.name))
 
-    # Стабилизатор задний
-    susp_rear_stab_bushing_l = models.BooleanField(default=False, verbose_name="Втулки стабилизатора зад (L)")
-    susp_rear_stab_bushing_r = models.BooleanField(default=False, verbose_name="Втулки стабилизатора зад (R)")
 
-    susp_rear_stab_link_l = models.BooleanField(default=False, verbose_name="Стойки стабилизатора зад (L)")
-    susp_rear_stab_link_r = models.BooleanField(default=False, verbose_name="Стойки стабилизатора зад (R)")
+class VehicleDefectQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(closed_at__isnull=True)
 
-    susp_rear_stab_link_bushing_l = models.BooleanField(default=False, verbose_name="Втулка стоек стаб. зад (L)")
-    susp_rear_stab_link_bushing_r = models.BooleanField(default=False, verbose_name="Втулка стоек стаб. зад (R)")
+    def open_longer_than(self, days):
+        """Замечания, которые не устранены дольше days дней."""
+        return self.open().filter(opened_at__lte=timezone.now() - timezone.timedelta(days=days))
 
-    # Гранаты (ШРУС) - Задние (для 4WD/RWD)
-    drive_rear_cv_outer_l = models.BooleanField(default=False, verbose_name="Наружный гранат зад (L)")
-    drive_rear_cv_outer_r = models.BooleanField(default=False, verbose_name="Наружный гранат зад (R)")
 
-    drive_rear_cv_inner_l = models.BooleanField(default=False, verbose_name="Внутренний гранат зад (L)")
-    drive_rear_cv_inner_r = models.BooleanField(default=False, verbose_name="Внутренний гранат зад (R)")
+class VehicleDefect(models.Model):
+    """
+    Период, когда пункт чек-листа был отмечен у автомобиля:
+    от диагностики, где замечание появилось, до диагностики, где его уже нет.
+    Записи ведутся при сохранении DiagnosticReport (см. app/defects.py),
+    поэтому "открыто с" не нужно каждый раз искать по всей истории.
+    """
+    vehicle = models.ForeignKey(
+        Vehicle,
+        on_delete=models.CASCADE,
+        related_name='defects',
+        verbose_name="Автомобиль"
+    )
+    item = models.CharField(max_length=50, verbose_name="Пункт чек-листа")
 
-    # Дополнительно из правой колонки
-    susp_rear_camber_arm_l = models.BooleanField(default=False, verbose_name="Развальный рычаг зад (L)")
-    susp_rear_camber_arm_r = models.BooleanField(default=False, verbose_name="Развальный рычаг зад (R)")
+    opened_report = models.ForeignKey(
+        DiagnosticReport,
+        on_delete=models.CASCADE,
+        related_name='opened_defects',
+        verbose_name="Выявлено в диагностике"
+    )
+    opened_at = models.DateTimeField(verbose_name="Открыто с")
 
-    # "Солдатик" задний (обычно дублирует стойку стаба, но в листе есть отдельно)
-    susp_rear_soldatik_l = models.BooleanField(default=False, verbose_name="Солдатик задний (L)")
-    susp_rear_soldatik_r = models.BooleanField(default=False, verbose_name="Солдатик задний (R)")
+    closed_report = models.ForeignKey(
+        DiagnosticReport,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='closed_defects',
+        verbose_name="Устранено в диагностике"
+    )
+    closed_at = models.DateTimeField(null=True, blank=True, verbose_name="Устранено")
 
-    brake_rear_caliper_l = models.BooleanField(default=False, verbose_name="Суппорт задний (L)")
-    brake_rear_caliper_r = models.BooleanField(default=False, verbose_name="Суппорт задний (R)")
+    objects = VehicleDefectQuerySet.as_manager()
 
-    # ==================================================
-    # 6. НАВЕСНОЕ ОБОРУДОВАНИЕ (ОБЩЕЕ)
-    # ==================================================
+    class Meta:
+        verbose_name = "Замечание по автомобилю"
+        verbose_name_plural = "Замечания по автомобилям"
+        ordering = ['opened_at']
+        indexes = [
+            models.Index(fields=['vehicle', 'closed_at'], name='defect_vehicle_closed_idx'),
+            models.Index(fields=['closed_at', 'opened_at'], name='defect_closed_opened_idx'),
+            # Открытые замечания по пункту: VehicleDefect.objects.open().filter(item=...)
+            models.Index(fields=['item'], condition=Q(closed_at__isnull=True), name='defect_open_item_idx'),
+        ]
+        constraints = [
+            # Один и тот же пункт не может быть открыт дважды
+            models.UniqueConstraint(
+                fields=['vehicle', 'item'],
+                condition=Q(closed_at__isnull=True),
+                name='defect_one_open_per_item'
+            ),
+        ]
 
-    steering_gur = models.BooleanField(default=False, verbose_name="ГУР (Гидроусилитель)")
-    ac_compressor = models.BooleanField(default=False, verbose_name="Кондиционер")
-    alternator = models.BooleanField(default=False, verbose_name="Генератор")
+    @property
+    def label(self):
+        item = checklist.ITEMS_BY_NAME.get(self.item)
+        return item.label if item else self.item
 
-    class Meta:
-        verbose_name = "Диагностический лист"
-        verbose_name_plural = "Диагностические листы"
-        ordering = ['-date', '-created_at']
+    @property
+    def days_open(self):
+        end = self.closed_at or timezone.now()
+        return (end - self.opened_at).days
 
     def __str__(self):
-        return f"Диагностика {self.vehicle} от {self.date}"
+        return f"{self.vehicle}: {self.label}"
+
 
 class Contract(models.Model):
     """
@@ -548,6 +574,8 @@ class Contract(models.Model):
         ('terminated', 'Расторгнут досрочно'),
         ('debt', 'Есть задолженность'),
     )
+    # Договор действует (машина занята), в том числе с задолженностью
+    OPEN_STATUSES = ('active', 'debt')
 
     vehicle = models.ForeignKey(
         Vehicle,
@@ -621,24 +649,73 @@ class Contract(models.Model):
     created_at = models.DateTimeField(
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    # Итоги по графику платежей. Ведутся в app/ledger.py при изменении графика
+    # и платежей, чтобы долг клиента был выборкой по индексу, а не пересчётом
+    scheduled_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Сумма по графику"
+    )
+    due_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Начислено к оплате"
+    )
+    paid_total = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        verbose_name="Оплачено"
+    )
+    debt_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name="Задолженность"
+    )
+    next_due_date = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Ближайший неоплаченный платёж"
+    )
 
     @property
     def is_active(self):
         return self.status == 'active'
 
+    @property
+    def remaining_amount(self):
+        return max(self.scheduled_total - self.paid_total, 0)
+
     class Meta:
         verbose_name = "Договор лизинга"
         verbose_name_plural = "Договоры лизинга"
+        indexes = [
+            models.Index(fields=['client', 'debt_amount'], name='contract_client_debt_idx'),
+            models.Index(fields=['updated_at', 'id'], name='contract_updated_idx'),
+        ]
 
 
-    def generate_unique_number(self):
-        while True:
-            date_str = timezone.now().strftime('%d%m%Y')
-            random_digits = ''.join(random.choices(string.digits, k=4))
-            new_number = f"L-{date_str}-{random_digits}"
+    @staticmethod
+    def format_number(day, value):
+        # L-ддммгггг-NNNN; после 9999 договоров за день номер просто становится длиннее
+        return f"L-{day:%d%m%Y}-{value:04d}"
 
-            if not Contract.objects.filter(contract_number=new_number).exists():
-                return new_number
+    def generate_unique_number(self):
+        day = timezone.localdate()
+        return self.format_number(day, ContractNumberCounter.objects.allocate(day=day)[0])
 
     def save(self, *args, **kwargs):
         if not self.contract_number:
@@ -659,6 +736,173 @@ class Contract(models.Model):
     def __str__(self):
         return f"Договор №{self.contract_number} ({self.client.username})"
 
+class ContractNumberCounterManager(models.Manager):
+    def allocate(self, count=1, day=None):
+        """
+        Выдаёт count подряд идущих номеров за день одним запросом:
+        INSERT ... ON CONFLICT DO UPDATE ... RETURNING атомарен и в PostgreSQL, и в SQLite,
+        поэтому два одновременных договора не получат один номер. Возвращает range.
+        """
+        day = day or timezone.localdate()
+        table = connection.ops.quote_name(self.model._meta.db_table)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (day, last_value) VALUES (%s, %s) "
+                f"ON CONFLICT (day) DO UPDATE SET last_value = {table}.last_value + excluded.last_value "
+                f"RETURNING last_value",
+                [day, count]
+            )
+            last = cursor.fetchone()[0]
+        return range(last - count + 1, last + 1)
+
+
+class ContractNumberCounter(models.Model):
+    """
+    Счётчик номеров договоров за день. Номера выдаются блоками через
+    ContractNumberCounter.objects.allocate(), например сразу на весь импорт.
+    """
+    day = models.DateField(primary_key=True, verbose_name="День")
+    last_value = models.PositiveIntegerField(default=0, verbose_name="Последний выданный номер")
+
+    objects = ContractNumberCounterManager()
+
+    class Meta:
+        verbose_name = "Счётчик номеров договоров"
+        verbose_name_plural = "Счётчики номеров договоров"
+
+    def __str__(self):
+        return f"{self.day:%d.%m.%Y}: {self.last_value}"
+
+
+class PaymentScheduleItem(models.Model):
+    """
+    Строка графика платежей по договору. Номер 0 — первоначальный взнос.
+    График создаётся пачкой при сохранении договора (см. app/ledger.py),
+    paid_amount — сколько из строки уже покрыто платежами (по порядку сроков).
+    """
+    contract = models.ForeignKey(
+        Contract,
+        on_delete=models.CASCADE,
+        related_name='schedule',
+        verbose_name="Договор"
+    )
+    number = models.PositiveSmallIntegerField(verbose_name="№ платежа")
+    due_date = models.DateField(verbose_name="Срок оплаты")
+    amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Сумма")
+    paid_amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        verbose_name="Оплачено"
+    )
+
+    class Meta:
+        verbose_name = "Платёж по графику"
+        verbose_name_plural = "График платежей"
+        ordering = ['due_date', 'number']
+        indexes = [
+            models.Index(fields=['contract', 'due_date'], name='schedule_contract_due_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['contract', 'number'], name='schedule_unique_number'),
+        ]
+
+    @property
+    def remaining(self):
+        return self.amount - self.paid_amount
+
+    @property
+    def is_paid(self):
+        return self.paid_amount >= self.amount
+
+    def __str__(self):
+        return f"{self.contract} — платёж №{self.number} до {self.due_date:%d.%m.%Y}"
+
+
+class Payment(models.Model):
+    """
+    Поступивший платёж по договору.
+    """
+    contract = models.ForeignKey(
+        Contract,
+        # Деньги уже получены — договор с платежами удалять нельзя
+        on_delete=models.PROTECT,
+        related_name='payments',
+        verbose_name="Договор"
+    )
+    amount = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name="Сумма"
+    )
+    paid_at = models.DateField(
+        default=timezone.localdate,
+        verbose_name="Дата оплаты"
+    )
+    comment = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Комментарий"
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='recorded_payments',
+        verbose_name="Принял"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = "Платёж"
+        verbose_name_plural = "Платежи"
+        ordering = ['paid_at', 'pk']
+        indexes = [
+            models.Index(fields=['contract', 'paid_at'], name='payment_contract_paid_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.amount} по договору №{self.contract.contract_number} от {self.paid_at:%d.%m.%Y}"
+
+
+class ContractStatusChange(models.Model):
+    """
+    Журнал смены статуса договора пакетной проверкой
+    (manage.py update_contract_statuses).
+    """
+    contract = models.ForeignKey(
+        Contract,
+        on_delete=models.CASCADE,
+        related_name='status_changes',
+        verbose_name="Договор"
+    )
+    old_status = models.CharField(max_length=20, choices=Contract.STATUS_CHOICES, verbose_name="Было")
+    new_status = models.CharField(max_length=20, choices=Contract.STATUS_CHOICES, verbose_name="Стало")
+    reason = models.CharField(max_length=255, blank=True, verbose_name="Причина")
+    debt_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name="Задолженность на момент проверки"
+    )
+    changed_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = "Смена статуса договора"
+        verbose_name_plural = "История статусов договоров"
+        ordering = ['-changed_at']
+
+    def __str__(self):
+        return f"{self.contract}: {self.get_old_status_display()} → {self.get_new_status_display()}"
+
+
 class Inspection(models.Model):
     """
     История осмотров
@@ -682,6 +926,9 @@ class Inspection(models.Model):
         auto_now_add=True,
         verbose_name="Дата осмотра"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
 
     # Комментарии к состоянию авто
     engine_summary = models.TextField(
@@ -706,6 +953,213 @@ class Inspection(models.Model):
         verbose_name = "Осмотр"
         verbose_name_plural = "Осмотры"
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='inspection_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Осмотр {self.vehicle.vin} от {self.date.strftime('%d.%m.%Y')}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Загрузка большого файла частями (с докачкой после обрыва связи).
+    Части пишутся сразу в файл-заготовку в MEDIA_ROOT, к модели файл
+    привязывается только после полной загрузки и проверки.
+    """
+
+    TARGET_CHOICES = (
+        ('video', 'Видео обзор'),
+        ('computer_assessment', 'Компьютерная диагностика'),
+        ('document', 'Документ'),
+    )
+
+    STATUS_CHOICES = (
+        ('uploading', 'Загружается'),
+        ('complete', 'Завершена'),
+    )
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    vehicle = models.ForeignKey(
+        Vehicle,
+        on_delete=models.CASCADE,
+        related_name='chunked_uploads',
+        verbose_name="Автомобиль"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        verbose_name="Сотрудник"
+    )
+    target = models.CharField(
+        max_length=30,
+        choices=TARGET_CHOICES,
+        verbose_name="Куда загружается"
+    )
+    title = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name="Название документа"
+    )
+    filename = models.CharField(
+        max_length=255,
+        verbose_name="Имя файла"
+    )
+    total_size = models.PositiveBigIntegerField(
+        verbose_name="Размер файла (байт)"
+    )
+    offset = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Загружено (байт)"
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name="Контрольная сумма SHA-256"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='uploading',
+        verbose_name="Статус"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = "Загрузка частями"
+        verbose_name_plural = "Загрузки частями"
+
+    @property
+    def part_name(self):
+        return f"{settings.CHUNKED_UPLOAD_DIR}/{self.pk}.part"
+
+    @property
+    def is_expired(self):
+        """Новых частей не было дольше CHUNKED_UPLOAD_EXPIRY_HOURS — загрузка брошена."""
+        if self.status != 'uploading':
+            return False
+        age = timezone.now() - self.updated_at
+        return age > datetime.timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+
+    @property
+    def is_complete(self):
+        return self.status == 'complete'
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.total_size})"
+
+
+class StoredFile(models.Model):
+    """
+    Файл в хранилище с адресацией по содержимому (app.storage.ContentAddressedStorage).
+    Одинаковые фото/документы лежат на диске один раз, ref_count — сколько записей на него ссылается.
+    """
+    name = models.CharField(
+        max_length=255,
+        primary_key=True,
+        verbose_name="Путь в хранилище"
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        db_index=True,
+        verbose_name="SHA-256"
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name="Размер (байт)"
+    )
+    ref_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Количество ссылок"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+
+    class Meta:
+        verbose_name = "Файл хранилища"
+        verbose_name_plural = "Файлы хранилища"
+
+    def __str__(self):
+        return f"{self.name} (ссылок: {self.ref_count})"
+
+
+class ApiToken(models.Model):
+    """
+    Ключ доступа внешней системы к API только для чтения (app/api.py).
+    Передаётся в заголовке: Authorization: Token <key>.
+    """
+    name = models.CharField(
+        max_length=100,
+        verbose_name="Система"
+    )
+    key = models.CharField(
+        max_length=64,
+        unique=True,
+        editable=False,
+        verbose_name="Ключ"
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name="Активен"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True
+    )
+    last_used_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Последний запрос"
+    )
+
+    class Meta:
+        verbose_name = "Ключ API"
+        verbose_name_plural = "Ключи API"
+
+    def save(self, *args, **kwargs):
+        if not self.key:
+            self.key = secrets.token_hex(32)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
+class ApiTombstone(models.Model):
+    """
+    Запись об удалённом объекте для синхронизации через API: /api/v1/deleted/?updated_since=...
+    Иначе внешняя система узнала бы об удалении, только перечитав всё заново.
+    Пишется сигналом post_delete (app/signals.py); updated_at — время удаления.
+    """
+    resource = models.CharField(
+        max_length=30,
+        verbose_name="Ресурс API"
+    )
+    object_pk = models.CharField(
+        max_length=64,
+        verbose_name="Ключ объекта"
+    )
+    updated_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Удалён"
+    )
+
+    class Meta:
+        verbose_name = "Удалённый объект"
+        verbose_name_plural = "Удалённые объекты"
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='tombstone_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resource} {self.object_pk}"
@@ -0,0 +1,188 @@
+"""
+Профилировщик запросов: сколько SQL-запросов и времени в базе, в шаблонах
+и во внешних HTTP-вызовах (Wialon, парсинг сайтов) ушло на каждую страницу.
+
+Итоги сравниваются с бюджетом страницы из settings.PERF_BUDGETS (по имени URL,
+например 'app:vehicle_detail'). Превышение пишется в лог app.profiler вместе
+с самыми частыми запросами: N+1 видно по одному запросу, повторённому десятки раз.
+Отдельно, с выборкой, пишется журнал медленных запросов (app.profiler.slow).
+Итоги каждого запроса уходят и в метрики Prometheus (app/metrics.py).
+"""
+import contextvars
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+import requests
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+from . import metrics
+
+logger = logging.getLogger('app.profiler')
+slow_logger = logging.getLogger('app.profiler.slow')
+
+DEFAULT_BUDGET = {'queries': 50, 'db_ms': 300, 'total_ms': 1500}
+
+# Сколько самых частых запросов показывать при превышении бюджета
+TOP_FINGERPRINTS = 5
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    SQL без параметров: значения и так приходят отдельно (%s), остаётся
+    свернуть списки IN (...) разной длины и пробелы.
+    """
+    return _SPACES.sub(' ', _IN_LIST.sub('IN (...)', sql)).strip()
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.http_time = 0.0
+        self.http_calls = 0
+        self.fingerprints = Counter()
+
+    def as_dict(self, total):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 1),
+            'template_ms': round(self.template_time * 1000, 1),
+            'http_ms': round(self.http_time * 1000, 1),
+            'http_calls': self.http_calls,
+            'total_ms': round(total * 1000, 1),
+        }
+
+
+def _record_query(execute, sql, params, many, context):
+    profile = _current.get()
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        if profile is not None:
+            profile.queries += 1
+            profile.db_time += duration
+            profile.fingerprints[fingerprint(sql)] += 1
+
+        slow_ms = getattr(settings, 'PERF_SLOW_QUERY_MS', None)
+        if slow_ms is not None and duration * 1000 >= slow_ms:
+            if random.random() < getattr(settings, 'PERF_SLOW_QUERY_SAMPLE', 1.0):
+                slow_logger.warning(
+                    "%.1f ms %s: %s",
+                    duration * 1000, context['connection'].alias, fingerprint(sql)
+                )
+
+
+def _timed(method, attribute, counter=None):
+    """Обёртка метода: время вызова добавляется к полю текущего профиля."""
+    def wrapper(*args, **kwargs):
+        profile = _current.get()
+        if profile is None:
+            return method(*args, **kwargs)
+
+        # Вложенные вызовы (render_to_string внутри шаблона) не считаем дважды
+        depth_attribute = f'_{attribute}_depth'
+        depth = getattr(profile, depth_attribute, 0)
+        setattr(profile, depth_attribute, depth + 1)
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            setattr(profile, depth_attribute, depth)
+            if depth == 0:
+                setattr(profile, attribute, getattr(profile, attribute) + time.perf_counter() - started)
+                if counter:
+                    setattr(profile, counter, getattr(profile, counter) + 1)
+
+    wrapper.__wrapped__ = method
+    return wrapper
+
+
+def _install_hooks():
+    # Шаблоны: обёртка бэкенда — через неё идут render(), render_to_string() и TemplateResponse.
+    # HTTP: requests.get() и Session.get() в итоге вызывают Session.send()
+    if not hasattr(DjangoTemplate.render, '__wrapped__'):
+        DjangoTemplate.render = _timed(DjangoTemplate.render, 'template_time')
+    if not hasattr(requests.Session.send, '__wrapped__'):
+        requests.Session.send = _timed(requests.Session.send, 'http_time', 'http_calls')
+
+
+def budget_for(view_name):
+    budgets = getattr(settings, 'PERF_BUDGETS', {})
+    budget = dict(budgets.get('default', DEFAULT_BUDGET))
+    budget.update(budgets.get(view_name, {}))
+    return budget
+
+
+class ProfilerMiddleware:
+    """
+    Ставить первым в MIDDLEWARE, чтобы в итог попали запросы сессии и пользователя.
+    Для потоковых ответов считается время до начала отдачи.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PERF_PROFILER_ENABLED', True)
+        self.server_timing = getattr(settings, 'PERF_SERVER_TIMING', settings.DEBUG)
+        if self.enabled:
+            _install_hooks()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        token = _current.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(_record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        total = time.perf_counter() - profile.started
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else None
+        self.check_budget(request, view_name, profile, total)
+        metrics.observe_request(view_name, request.method, response.status_code, profile, total)
+
+        if self.server_timing:
+            timing = profile.as_dict(total)
+            response['Server-Timing'] = (
+                f"db;dur={timing['db_ms']};desc=\"{timing['queries']} queries\", "
+                f"tpl;dur={timing['template_ms']}, http;dur={timing['http_ms']}, total;dur={timing['total_ms']}"
+            )
+        return response
+
+    def check_budget(self, request, view_name, profile, total):
+        if view_name is None:
+            return
+
+        measured = profile.as_dict(total)
+        budget = budget_for(view_name)
+        exceeded = {key: (measured[key], limit) for key, limit in budget.items() if measured.get(key, 0) > limit}
+        if not exceeded:
+            return
+
+        details = ', '.join(f"{key} {value} > {limit}" for key, (value, limit) in exceeded.items())
+        top = '\n'.join(f"    {count}× {sql[:300]}" for sql, count in profile.fingerprints.most_common(TOP_FINGERPRINTS))
+        logger.warning(
+            "Превышен бюджет %s %s (%s): %s\n  Частые запросы:\n%s",
+            request.method, request.path, view_name, details, top or '    —',
+            extra={'view_name': view_name, 'metrics': measured},
+        )
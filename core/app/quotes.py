@@ -0,0 +1,100 @@
+"""
+Подбор условий лизинга.
+
+Для цены автомобиля считается сетка предложений срок × первоначальный взнос × ставка:
+аннуитетный платёж, полная стоимость, переплата и эффективная ставка. Вся сетка —
+одна операция NumPy над массивами формы (сроки, взносы, ставки), без цикла по вариантам.
+"""
+import math
+
+import numpy as np
+from django.conf import settings
+
+# Не даём запросить сетку на миллионы вариантов
+MAX_VALUES = 24
+
+
+class QuoteError(ValueError):
+    pass
+
+
+def parse_values(raw, default, cast=float, low=0, high=None):
+    """'12,24,36' -> (12.0, 24.0, 36.0). Пустая строка — значения по умолчанию."""
+    if not raw:
+        return tuple(default)
+    try:
+        values = sorted({cast(part) for part in raw.split(',') if part.strip()})
+    except ValueError:
+        raise QuoteError(f"Некорректный список: {raw}")
+    # nan не меньше low и не больше high — без этой проверки прошёл бы в сетку
+    if not all(math.isfinite(value) for value in values):
+        raise QuoteError(f"Некорректный список: {raw}")
+
+    if not values or len(values) > MAX_VALUES:
+        raise QuoteError(f"Нужно от 1 до {MAX_VALUES} значений: {raw}")
+    if values[0] < low or (high is not None and values[-1] > high):
+        raise QuoteError(f"Значения вне диапазона {low}–{high}: {raw}")
+    return tuple(values)
+
+
+def quote_grid(price, terms=None, down_percents=None, rates=None):
+    """
+    Сетка предложений. Возвращает словарь массивов формы (сроки, взносы, ставки)
+    и сами оси. Деньги округлены до копеек.
+    """
+    terms = np.array(terms or settings.LEASE_QUOTE_TERMS, dtype=np.float64)
+    down_percents = np.array(down_percents or settings.LEASE_QUOTE_DOWN_PERCENTS, dtype=np.float64)
+    rates = np.array(rates or settings.LEASE_QUOTE_RATES, dtype=np.float64)
+
+    n = terms[:, None, None]
+    down = price * down_percents[None, :, None] / 100
+    principal = price - down
+    monthly_rate = rates[None, None, :] / 1200
+
+    # Аннуитет P·r / (1 − (1 + r)^−n); при нулевой ставке — просто P / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity = principal * monthly_rate / (1 - (1 + monthly_rate) ** -n)
+    payment = np.where(monthly_rate > 0, annuity, principal / n)
+
+    total = down + payment * n
+    overpayment = total - price
+    effective_rate = ((1 + monthly_rate) ** 12 - 1) * 100
+    shape = payment.shape
+
+    return {
+        'terms': terms.astype(int),
+        'down_percents': down_percents,
+        'rates': rates,
+        'down_payment': np.round(np.broadcast_to(down, shape), 2),
+        'monthly_payment': np.round(payment, 2),
+        'total_cost': np.round(total, 2),
+        'overpayment': np.round(overpayment, 2),
+        'effective_rate': np.round(np.broadcast_to(effective_rate, shape), 2),
+    }
+
+
+def grid_as_json(price, grid):
+    """
+    Сетка для фронтенда: оси и плоский список предложений.
+    Порядок: срок, затем взнос, затем ставка.
+    """
+    t, d, r = np.meshgrid(
+        np.arange(len(grid['terms'])), np.arange(len(grid['down_percents'])), np.arange(len(grid['rates'])),
+        indexing='ij'
+    )
+    columns = {
+        'term': grid['terms'][t].ravel().tolist(),
+        'down_percent': grid['down_percents'][d].ravel().tolist(),
+        'rate': grid['rates'][r].ravel().tolist(),
+    }
+    for name in ('down_payment', 'monthly_payment', 'total_cost', 'overpayment', 'effective_rate'):
+        columns[name] = grid[name].ravel().tolist()
+
+    names = list(columns)
+    return {
+        'price': price,
+        'terms': grid['terms'].tolist(),
+        'down_percents': grid['down_percents'].tolist(),
+        'rates': grid['rates'].tolist(),
+        'offers': [dict(zip(names, values)) for values in zip(*columns.values())],
+    }
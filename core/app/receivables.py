@@ -0,0 +1,196 @@
+"""
+Дебиторская задолженность по портфелю договоров.
+
+Условия всех действующих договоров грузятся одним запросом в массивы NumPy,
+график каждого договора разворачивается в матрицу (договоры × месяцы) по тем же
+правилам, что и app/ledger.py, а оплаченное раскладывается по строкам через
+накопительные суммы. Старение долга, поступления по месяцам и разбивка по маркам —
+векторные операции без цикла по договорам. Суммы считаются в копейках (int64).
+"""
+import csv
+from decimal import Decimal
+
+import numpy as np
+from django.utils import timezone
+
+from . import caching, metrics
+from .models import Contract
+
+CACHE_TIMEOUT = 15 * 60
+CACHE_VERSION_KEY = 'receivables:version'
+
+# Границы корзин просрочки, дней
+AGING_EDGES = (30, 60, 90)
+AGING_BUCKETS = (
+    ('current', 'До 30 дней'),
+    ('30', '30–59 дней'),
+    ('60', '60–89 дней'),
+    ('90', '90 дней и более'),
+)
+
+
+def _cents(values):
+    return np.array([int((value or 0) * 100) for value in values], dtype=np.int64)
+
+
+def _money(cents):
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def load_terms():
+    """Условия действующих договоров -> словарь массивов NumPy. Один SQL-запрос."""
+    rows = list(
+        Contract.objects
+        .filter(status__in=Contract.OPEN_STATUSES)
+        .order_by()
+        .values_list(
+            'start_date', 'end_date', 'payment_due_day',
+            'initial_payment', 'monthly_payment', 'paid_total', 'vehicle__brand'
+        )
+    )
+    if not rows:
+        return None
+
+    columns = list(zip(*rows))
+    return {
+        'start': np.array(columns[0], dtype='datetime64[D]'),
+        'end': np.array(columns[1], dtype='datetime64[D]'),
+        'due_day': np.clip(np.array(columns[2], dtype=np.int64), 1, 31),
+        'initial': _cents(columns[3]),
+        'monthly': _cents(columns[4]),
+        'paid': _cents(columns[5]),
+        'brand': np.array([(value or '').strip().title() for value in columns[6]]),
+    }
+
+
+def project_schedules(start, end, due_day, initial, monthly):
+    """
+    Графики всех договоров матрицами (договоры × платежи): сроки и суммы в копейках.
+    Столбец 0 — первоначальный взнос в день начала, дальше ежемесячные платежи;
+    платежи после конца договора получают сумму 0.
+    """
+    start_month = start.astype('datetime64[M]')
+    span = (end.astype('datetime64[M]') - start_month).astype(np.int64)
+    n_months = max(int(span.max()), 0)
+
+    months = start_month[:, None] + np.arange(1, n_months + 1)
+    first_day = months.astype('datetime64[D]')
+    month_days = ((months + 1).astype('datetime64[D]') - first_day).astype(np.int64)
+    # 31-е число в коротком месяце переносится на последний день месяца
+    due = first_day + (np.minimum(due_day[:, None], month_days) - 1)
+
+    amounts = np.where(due <= end[:, None], monthly[:, None], 0)
+
+    due = np.concatenate([start[:, None], due], axis=1)
+    amounts = np.concatenate([np.maximum(initial, 0)[:, None], amounts], axis=1)
+    return due, amounts
+
+
+def unpaid_amounts(amounts, paid):
+    """Остаток по каждой строке графика: оплаченное гасит строки по порядку сроков."""
+    before = np.cumsum(amounts, axis=1) - amounts
+    covered = np.clip(paid[:, None] - before, 0, amounts)
+    return amounts - covered
+
+
+def build_receivables_report(today=None):
+    today = today or timezone.localdate()
+    report = {
+        'generated_at': timezone.now(),
+        'today': today,
+        'contracts': 0,
+        'outstanding': Decimal(0),
+        'overdue': Decimal(0),
+        'aging': [],
+        'cashflow': [],
+        'brands': [],
+    }
+
+    terms = load_terms()
+    if terms is None:
+        return report
+
+    due, amounts = project_schedules(terms['start'], terms['end'], terms['due_day'], terms['initial'], terms['monthly'])
+    unpaid = unpaid_amounts(amounts, terms['paid'])
+
+    today64 = np.datetime64(today, 'D')
+    days_overdue = (today64 - due).astype(np.int64)
+    open_rows = unpaid > 0
+    overdue_rows = open_rows & (days_overdue >= 0)
+    future_rows = open_rows & (days_overdue < 0)
+
+    overdue_by_contract = np.where(overdue_rows, unpaid, 0).sum(axis=1)
+    outstanding_by_contract = unpaid.sum(axis=1)
+
+    # Старение: сумма по сроку каждой строки, договор — по самой старой просрочке
+    buckets = np.digitize(days_overdue, AGING_EDGES)
+    bucket_amounts = np.bincount(buckets[overdue_rows], weights=unpaid[overdue_rows], minlength=len(AGING_BUCKETS))
+    oldest = np.where(overdue_rows, days_overdue, -1).max(axis=1)
+    bucket_contracts = np.bincount(np.digitize(oldest[oldest >= 0], AGING_EDGES), minlength=len(AGING_BUCKETS))
+
+    report['aging'] = [
+        {'key': key, 'label': label, 'amount': _money(amount), 'contracts': int(count)}
+        for (key, label), amount, count in zip(AGING_BUCKETS, bucket_amounts, bucket_contracts)
+    ]
+
+    # Ожидаемые поступления по месяцам (без уже просроченного)
+    months, inverse = np.unique(due[future_rows].astype('datetime64[M]'), return_inverse=True)
+    month_sums = np.bincount(inverse, weights=unpaid[future_rows], minlength=len(months))
+    report['cashflow'] = [
+        {'month': month.astype('datetime64[D]').item(), 'amount': _money(amount)}
+        for month, amount in zip(months, month_sums)
+    ]
+
+    # Риск по маркам
+    brands, inverse = np.unique(terms['brand'], return_inverse=True)
+    brand_outstanding = np.bincount(inverse, weights=outstanding_by_contract, minlength=len(brands))
+    brand_overdue = np.bincount(inverse, weights=overdue_by_contract, minlength=len(brands))
+    brand_contracts = np.bincount(inverse, minlength=len(brands))
+    total_outstanding = int(outstanding_by_contract.sum())
+
+    for i in np.argsort(-brand_outstanding, kind='stable'):
+        report['brands'].append({
+            'brand': str(brands[i]) or '—',
+            'contracts': int(brand_contracts[i]),
+            'outstanding': _money(brand_outstanding[i]),
+            'overdue': _money(brand_overdue[i]),
+            'share': round(float(brand_outstanding[i]) / total_outstanding * 100, 1) if total_outstanding else 0.0,
+        })
+
+    report['contracts'] = len(terms['start'])
+    report['outstanding'] = _money(total_outstanding)
+    report['overdue'] = _money(overdue_by_contract.sum())
+    return report
+
+
+def invalidate_receivables_report():
+    caching.bump_version(CACHE_VERSION_KEY)
+
+
+def cached_receivables_report():
+    """
+    Отчёт кэшируется до изменения договоров или платежей (см. app/signals.py);
+    дата входит в ключ, потому что просрочка растёт сама по себе.
+    """
+    version = metrics.cache_get_or_set(CACHE_VERSION_KEY, 1, None)
+    today = timezone.localdate()
+    return metrics.cache_get_or_set(
+        f"receivables:{version}:{today:%Y%m%d}",
+        lambda: build_receivables_report(today),
+        CACHE_TIMEOUT
+    )
+
+
+def write_csv(report, stream):
+    """Отчёт одной таблицей: раздел, строка, значения."""
+    writer = csv.writer(stream)
+    writer.writerow(['Раздел', 'Показатель', 'Сумма', 'Договоров', 'Просрочено', 'Доля, %'])
+
+    for bucket in report['aging']:
+        writer.writerow(['Просрочка', bucket['label'], bucket['amount'], bucket['contracts'], '', ''])
+    for row in report['cashflow']:
+        writer.writerow(['Поступления', row['month'].strftime('%m.%Y'), row['amount'], '', '', ''])
+    for row in report['brands']:
+        writer.writerow(['Марка', row['brand'], row['outstanding'], row['contracts'], row['overdue'], row['share']])
+
+    writer.writerow(['Итого', 'Остаток по договорам', report['outstanding'], report['contracts'], report['overdue'], ''])
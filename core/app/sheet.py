@@ -0,0 +1,55 @@
+"""
+Таблица чек-листа для PDF диагностического листа.
+
+Раскладка (checklist.CHECKLIST_LAYOUT) не меняется между отчётами, поэтому её
+шаблон рендерится один раз на процесс. На месте каждой ячейки остаются
+$c<номер пункта> (CSS-класс) и $t<номер пункта> (текст), которые для
+конкретного отчёта подставляются одной операцией string.Template.
+Правки шаблона includes/diagnostic_pdf_sheet.html подхватываются после перезапуска.
+"""
+from functools import lru_cache
+from string import Template
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import checklist
+
+SHEET_TEMPLATE = 'app/includes/diagnostic_pdf_sheet.html'
+
+# Строка раскладки для каждого пункта: из неё берём текст отметки
+_ROWS_BY_FIELD = {
+    name: row
+    for _, sections in checklist.CHECKLIST_LAYOUT
+    for section in sections
+    for row in section.rows
+    for name in row.fields
+}
+_ROWS_BY_FIELD.update({name: row for row in checklist.EQUIPMENT_ROWS for name in row.fields})
+
+_OK_VALUES = {}
+for _name, _row in _ROWS_BY_FIELD.items():
+    _index = checklist.ITEM_INDEX[_name]
+    _OK_VALUES[f'c{_index}'] = 'ok'
+    _OK_VALUES[f't{_index}'] = _row.ok_text
+
+
+@lru_cache(maxsize=None)
+def _skeleton():
+    def cell(name, row):
+        index = checklist.ITEM_INDEX[name]
+        return {'css': f'$c{index}', 'text': f'$t{index}'}
+
+    axes, equipment = checklist.build_sheet(cell, for_pdf=True)
+    return Template(render_to_string(SHEET_TEMPLATE, {'axes': axes, 'equipment': equipment}))
+
+
+def render_pdf_sheet(report):
+    """HTML таблиц чек-листа с отметками отчёта."""
+    values = dict(_OK_VALUES)
+    for name in checklist.unpack(report.defect_words):
+        index = checklist.ITEM_INDEX[name]
+        values[f'c{index}'] = 'checked'
+        values[f't{index}'] = _ROWS_BY_FIELD[name].mark
+    # Тексты и классы берутся только из раскладки, экранировать нечего
+    return mark_safe(_skeleton().substitute(values))
@@ -0,0 +1,103 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import analytics, api, caching, defects, health, ledger, receivables
+from .models import (
+    Vehicle, VehiclePhoto, VehicleDocument, Contract, DiagnosticReport, Inspection, Payment, ApiTombstone,
+)
+
+
+@receiver(post_delete, sender=VehiclePhoto)
+def release_photo_file(sender, instance, **kwargs):
+    # Хранилище само решит, удалять ли файл: он может быть нужен другим записям
+    if instance.image:
+        instance.image.delete(save=False)
+
+
+@receiver(post_delete, sender=VehicleDocument)
+def release_document_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
+
+
+@receiver(post_save, sender=DiagnosticReport)
+def track_report_defects(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    defects.sync_report(instance, created)
+    health.refresh_vehicle(instance.vehicle_id)
+
+
+@receiver(post_delete, sender=DiagnosticReport)
+def rebuild_report_defects(sender, instance, **kwargs):
+    # Удалили отчёт из середины истории — периоды замечаний могли сдвинуться
+    defects.rebuild_vehicle_defects(instance.vehicle_id)
+    health.refresh_vehicle(instance.vehicle_id)
+
+
+@receiver(post_save, sender=DiagnosticReport)
+@receiver(post_delete, sender=DiagnosticReport)
+def invalidate_fleet_analytics(sender, **kwargs):
+    # Новая или удалённая диагностика меняет картину по автопарку
+    analytics.invalidate_defect_report()
+
+
+@receiver(post_save, sender=Contract)
+def sync_contract_schedule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Сроки и суммы могли поменяться при редактировании договора
+    ledger.sync_schedule(instance)
+
+
+@receiver(post_save, sender=Payment)
+def track_payment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        ledger.apply_payment(instance)
+    else:
+        ledger.rebuild_contract(instance.contract_id)
+
+
+@receiver(post_delete, sender=Payment)
+def rebuild_contract_balance(sender, instance, **kwargs):
+    ledger.rebuild_contract(instance.contract_id)
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_receivables(sender, **kwargs):
+    receivables.invalidate_receivables_report()
+
+
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=DiagnosticReport)
+@receiver(post_delete, sender=Inspection)
+def record_api_tombstone(sender, instance, **kwargs):
+    # Внешние системы узнают об удалении из /api/v1/deleted/
+    ApiTombstone.objects.create(resource=api.RESOURCE_NAMES[sender], object_pk=str(instance.pk))
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+def invalidate_vehicle_cache(sender, instance, **kwargs):
+    caching.bump_vehicle_version(instance.pk)
+
+
+@receiver(post_save, sender=VehiclePhoto)
+@receiver(post_delete, sender=VehiclePhoto)
+@receiver(post_save, sender=VehicleDocument)
+@receiver(post_delete, sender=VehicleDocument)
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_save, sender=DiagnosticReport)
+@receiver(post_delete, sender=DiagnosticReport)
+@receiver(post_save, sender=Inspection)
+@receiver(post_delete, sender=Inspection)
+def invalidate_vehicle_page(sender, instance, **kwargs):
+    # Регистрируется последним: к этому моменту замечания и оценка уже пересчитаны
+    caching.touch_vehicle(instance.vehicle_id)
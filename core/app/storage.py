@@ -0,0 +1,166 @@
+import hashlib
+import os
+import tempfile
+
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+READ_BLOCK_SIZE = 64 * 1024
+
+# Временные файлы лежат внутри MEDIA_ROOT, чтобы перенос на место был простым rename
+TEMP_DIR = '.cas_tmp'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранилище, где имя файла — SHA-256 его содержимого:
+        vehicle_gallery/ab/ab12...ef.jpg
+    Каталог из upload_to сохраняется (по нему media.can_access_media проверяет права),
+    а повторная загрузка того же файла не пишет вторую копию, только увеличивает
+    счётчик ссылок в StoredFile.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Имя уже определяется содержимым — одинаковые имена и есть дубликаты
+        return name
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+
+        if hasattr(content, 'temporary_file_path'):
+            # Файл уже целиком на диске (большая загрузка) — хешируем его на месте
+            source_path = content.temporary_file_path()
+            digest, size = self._hash_file(source_path)
+            is_temporary = False
+        else:
+            source_path, digest, size = self._stream_to_temp(content)
+            is_temporary = True
+
+        final_name = '/'.join(part for part in (directory, digest[:2], digest + extension) if part)
+        final_path = self.path(final_name)
+
+        try:
+            # Проверка файла на диске и +1 к ссылкам — под той же блокировкой строки StoredFile,
+            # что и delete(): иначе загрузка могла сослаться на файл, который в этот момент удаляется
+            with transaction.atomic():
+                self._lock_reference(final_name, digest, size)
+                if os.path.exists(final_path):
+                    # Такой файл уже есть — вторую копию не храним. Время изменения обновляем:
+                    # collect_media_garbage не трогает недавно изменённые файлы
+                    if is_temporary:
+                        os.remove(source_path)
+                    os.utime(final_path)
+                else:
+                    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                    file_move_safe(source_path, final_path, allow_overwrite=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(final_path, self.file_permissions_mode)
+        except Exception:
+            if is_temporary and os.path.exists(source_path):
+                os.remove(source_path)
+            raise
+
+        return final_name
+
+    def delete(self, name):
+        """
+        Уменьшает счётчик ссылок. Сам файл удаляется, когда на него никто не ссылается.
+        Файлы, сохранённые до перехода на это хранилище, удаляются как обычно.
+        """
+        from .models import StoredFile
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is None:
+                super().delete(name)
+                return
+
+            if stored.ref_count > 1:
+                StoredFile.objects.filter(name=name).update(ref_count=F('ref_count') - 1)
+                return
+
+            stored.delete()
+            super().delete(name)
+
+    def _stream_to_temp(self, content):
+        """
+        Пишем загрузку во временный файл и одновременно считаем SHA-256 —
+        содержимое читается ровно один раз.
+        """
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        return temp_path, digest.hexdigest(), size
+
+    @staticmethod
+    def _hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest(), os.path.getsize(path)
+
+    @staticmethod
+    def _lock_reference(name, digest, size):
+        """
+        Добавляет ссылку на файл и держит строку StoredFile заблокированной
+        до конца внешней транзакции. Вызывать внутри transaction.atomic().
+        """
+        from .models import StoredFile
+
+        if StoredFile.objects.select_for_update().filter(name=name).exists():
+            StoredFile.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+            return
+        try:
+            with transaction.atomic():
+                StoredFile.objects.create(name=name, sha256=digest, size=size, ref_count=1)
+        except IntegrityError:
+            # Параллельная загрузка того же файла успела создать запись — ждём её блокировку
+            StoredFile.objects.select_for_update().filter(name=name).exists()
+            StoredFile.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+class ContentAddressedFilesMixin:
+    """
+    Для моделей с полями на ContentAddressedStorage. Ссылка в StoredFile добавляется,
+    когда поле сохраняет файл, — до INSERT самой модели. Общая транзакция откатывает
+    и её, если запись модели не удалась; файл без ссылок уберёт collect_media_garbage.
+    """
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_content_addressed_storage():
+    # Вызываемый объект, чтобы миграции не зависели от настроек хранилища.
+    # На него по пути ссылается миграция 0012: не переносить и не переименовывать,
+    # а в модуле не импортировать app.models на верхнем уровне
+    return content_addressed_storage
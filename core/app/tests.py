@@ -1,3 +1,1944 @@
-from django.test import TestCase
+"""
+Нагрузочные тесты страниц: время ответа (p50/p95) и число SQL-запросов
+для каждого URL из app/urls.py и user/urls.py на синтетическом автопарке.
 
-# Create your tests here.
+Wialon и сайты объявлений (mashina.kg, lalafo.kg) подменены на уровне
+requests: Wialon отвечает локальная замена app/fake_wialon.py, объявления
+готовятся здесь же, в сеть тесты не ходят.
+
+Страница не должна превышать бюджет профилировщика (settings.PERF_BUDGETS: запросы
+и время ответа). Итоги сравниваются с app/benchmark_baseline.json. Тест падает, если у страницы
+стало больше запросов, чем в baseline (+ BENCHMARK_QUERY_SLACK), или p50/p95
+выросли больше чем в BENCHMARK_LATENCY_RATIO раз (+ BENCHMARK_LATENCY_SLACK_MS).
+Число запросов от машины не зависит и сравнивается всегда. Время сравнивается,
+только если baseline снят на той же машине (BENCHMARK_MACHINE, по умолчанию имя
+хоста) на автопарке того же размера и с тем же BENCHMARK_REPEAT — иначе сначала снимите свой baseline.
+
+    python manage.py test app.tests
+    BENCHMARK_UPDATE=1 python manage.py test app.tests   # переписать baseline
+
+Настройки через переменные окружения:
+    BENCHMARK_FLEET             — машин в автопарке (по умолчанию 2000)
+    BENCHMARK_REPEAT            — замеров каждой страницы (по умолчанию 20)
+    BENCHMARK_SEED              — seed генератора данных
+    BENCHMARK_BASELINE          — путь к baseline
+    BENCHMARK_REPORT            — куда записать итоги прогона (JSON), если нужно
+    BENCHMARK_MACHINE           — имя машины, на которой снят baseline времени
+    BENCHMARK_LATENCY_RATIO     — допустимый рост времени, раз; 0 — время не проверять
+    BENCHMARK_WIALON_UNITS      — объектов в замене Wialon для WialonTelemetryBenchmark (по умолчанию 5000)
+    BENCHMARK_WIALON_REQUESTS   — запросов координат в параллельном замере (по умолчанию 200)
+
+Ниже — обычные тесты модулей app: по классу на модуль или сценарий.
+"""
+import base64
+import csv
+import datetime
+import gc
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import partial
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from prometheus_client import REGISTRY
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.models import ProtectedError
+from django.db.migrations.executor import MigrationExecutor
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import resolve_url
+from django.urls import reverse
+from django.utils import timezone
+
+from user import urls as user_urls
+from user.models import User
+from . import urls as app_urls
+from . import analytics, api, caching, checklist, exports, health, importer, ledger, media, metrics, profiler, quotes, receivables, utils
+from .fake_wialon import FakeWialon, base_url, make_server
+from .generator import VEHICLES_PER_SCALE, generate_fleet
+from .models import (
+    ApiTombstone, ApiToken, ChunkedUpload, Contract, ContractNumberCounter, ContractStatusChange, DiagnosticReport,
+    Inspection, Payment, StoredFile, Vehicle, VehicleDocument, VehiclePhoto,
+)
+from .storage import content_addressed_storage
+from .uploads import ChunkError, finish_upload, part_path, start_upload, write_chunk
+from .views import BaseExportView
+
+FLEET_SIZE = int(os.environ.get('BENCHMARK_FLEET', 2000))
+REPEAT = int(os.environ.get('BENCHMARK_REPEAT', 20))
+SEED = int(os.environ.get('BENCHMARK_SEED', 42))
+BASELINE_PATH = os.environ.get(
+    'BENCHMARK_BASELINE', os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+)
+REPORT_PATH = os.environ.get('BENCHMARK_REPORT')
+UPDATE_BASELINE = os.environ.get('BENCHMARK_UPDATE') == '1'
+MACHINE = os.environ.get('BENCHMARK_MACHINE') or platform.node()
+QUERY_SLACK = int(os.environ.get('BENCHMARK_QUERY_SLACK', 0))
+LATENCY_RATIO = float(os.environ.get('BENCHMARK_LATENCY_RATIO', 1.5))
+WIALON_UNITS = int(os.environ.get('BENCHMARK_WIALON_UNITS', 5000))
+WIALON_REQUESTS = int(os.environ.get('BENCHMARK_WIALON_REQUESTS', 200))
+# Запас в миллисекундах: у быстрых страниц полуторный рост укладывается в шум
+LATENCY_SLACK_MS = float(os.environ.get('BENCHMARK_LATENCY_SLACK_MS', 10))
+
+
+def build_fleet(size, seed):
+    """
+    Автопарк из size машин (app/generator.py) и объекты, на которых
+    замеряются страницы одной машины, договора и клиента.
+    """
+    started = time.perf_counter()
+    stats = generate_fleet(size / VEHICLES_PER_SCALE, seed)
+    print(f"\nАвтопарк: {sum(stats.values())} записей за {time.perf_counter() - started:.1f} с")
+
+    # Машина с действующим договором, Wialon ID и диагностиками
+    contract = (
+        Contract.objects
+        .filter(status='active', vehicle__wialon_id__gt='', vehicle__diagnostic_reports__isnull=False)
+        .select_related('vehicle', 'client')
+        .order_by('pk')
+        .first()
+    )
+    return SimpleNamespace(
+        size=size,
+        staff=User.objects.filter(is_staff_member=True).order_by('pk').first(),
+        admin=User.objects.create(username='benchmark_admin', is_staff=True, is_superuser=True),
+        client=contract.client,
+        vehicle=contract.vehicle,
+        # Машина без открытого договора — на неё можно оформить новый
+        free_vehicle=Vehicle.objects.exclude(contracts__status__in=Contract.OPEN_STATUSES).order_by('pk').first(),
+        contract=contract,
+        report=contract.vehicle.diagnostic_reports.order_by('pk').first(),
+        token=ApiToken.objects.create(name="Бенчмарк"),
+    )
+
+
+# --- Подмена внешних сервисов ---
+
+LISTING_HTML = """
+<html><head>
+<meta property="og:title" content="Toyota Camry 2019">
+<meta property="og:image" content="https://example.com/camry.jpg">
+<meta property="product:price:amount" content="21500">
+<meta property="product:price:currency" content="USD">
+</head><body>
+<h1>Toyota Camry 2019</h1>
+<div class="price-dollar">$ 21 500</div>
+<div class="main-image"><img src="https://example.com/camry.jpg"></div>
+<p>Год выпуска 2019</p><p>Пробег 84 000 км</p><p>Двигатель 2.5 бензин</p><p>Коробка автомат</p>
+<p>Год выпуска: 2019</p><p>Пробег: 84000</p><p>Объем двигателя: 2.5</p><p>Коробка передач: автомат</p>
+</body></html>
+"""
+
+
+def fake_send(wialon, adapter, request, **kwargs):
+    """
+    HTTPAdapter.send без сети: Wialon отвечает локальная замена (app/fake_wialon.py),
+    остальные сайты — страницей объявления.
+    """
+    url = urlsplit(request.url)
+    if url.netloc == urlsplit(settings.WIALON_BASE_URL).netloc:
+        status, body = wialon.respond(parse_qs(url.query))
+    else:
+        status, body = 200, LISTING_HTML
+
+    response = requests.Response()
+    response.status_code = status
+    response.url = request.url
+    response.request = request
+    response.encoding = 'utf-8'
+    response._content = body.encode()
+    return response
+
+
+# --- Описание запросов ---
+
+@dataclass
+class Case:
+    """
+    Запрос к одной странице. kwargs и data — значения или функции от автопарка.
+    setup(fleet, client) выполняется перед каждым замером и в него не входит:
+    готовит одноразовые данные и возвращает kwargs для reverse().
+    """
+    view: str
+    role: str = 'staff'
+    method: str = 'get'
+    kwargs: object = field(default_factory=dict)
+    data: object = None
+    status: int = 200
+    content_type: str = None
+    headers: dict = field(default_factory=dict)
+    setup: object = None
+
+    def resolve(self, fleet, client):
+        kwargs = self.setup(fleet, client) if self.setup else self.kwargs
+        if callable(kwargs):
+            kwargs = kwargs(fleet)
+        data = self.data(fleet) if callable(self.data) else self.data
+        return reverse(self.view, kwargs=kwargs), data
+
+
+def _vehicle(fleet):
+    return {'pk': fleet.vehicle.pk}
+
+
+def _contract(fleet):
+    return {'pk': fleet.contract.pk}
+
+
+def _new_upload(fleet, client):
+    upload = start_upload(fleet.vehicle, fleet.staff, 'document', 'act.pdf', 4)
+    return {'upload_id': upload.pk}
+
+
+def _uploaded_file(fleet, client):
+    upload = start_upload(fleet.vehicle, fleet.staff, 'document', 'act.pdf', 4)
+    with open(part_path(upload), 'wb') as f:
+        f.write(b'%PDF')
+    ChunkedUpload.objects.filter(pk=upload.pk).update(offset=4)
+    return {'upload_id': upload.pk}
+
+
+def _login_again(fleet, client):
+    client.force_login(fleet.staff)
+    return {}
+
+
+CASES = [
+    Case('app:home', status=302),
+    Case('app:vehicle_create'),
+    Case('app:vehicle_import'),
+    Case('app:client_dashboard', role='client'),
+    Case('app:vehicle_detail', kwargs=_vehicle),
+    Case('app:vehicle_edit', kwargs=_vehicle),
+    Case('app:vehicle_delete', kwargs=_vehicle),
+    Case('app:add_photo', kwargs=_vehicle),
+    Case('app:add_document', kwargs=_vehicle),
+    Case('app:contract_create', kwargs=lambda fleet: {'pk': fleet.free_vehicle.pk}),
+    Case('app:vehicle_location_api', kwargs=_vehicle),
+    Case('app:vehicle_quote_api', kwargs=_vehicle, data={'terms': '12,24,36', 'down': '10,20,30'}),
+    Case(
+        'app:chunked_upload_start', method='post', kwargs=_vehicle, status=201,
+        data={'target': 'document', 'filename': 'act.pdf', 'size': 1024, 'title': "Акт"},
+        content_type='application/json',
+    ),
+    Case('app:chunked_upload_detail', setup=_new_upload),
+    Case('app:chunked_upload_complete', method='post', setup=_uploaded_file),
+    Case('app:contract_edit', kwargs=_contract),
+    Case('app:contract_print', kwargs=_contract),
+    Case('app:contract_payments', kwargs=_contract),
+    Case('app:client_list'),
+    Case('app:client_detail', kwargs=lambda fleet: {'pk': fleet.client.pk}),
+    Case('app:diagnostic_create', kwargs=_vehicle),
+    Case('app:diagnostic_pdf', kwargs=lambda fleet: {'pk': fleet.report.pk}),
+    Case('app:compare', method='post', data=lambda fleet: {
+        'vehicle_id': fleet.vehicle.pk,
+        'urls': ['https://www.mashina.kg/details/camry', 'https://lalafo.kg/bishkek/ads/camry'],
+    }),
+    Case('app:staff_search', data={'q': 'Camry'}),
+    Case('app:staff_dashboard'),
+    Case('app:fleet_defects'),
+    Case('app:open_defects'),
+    Case('app:receivables'),
+    Case('app:receivables_csv'),
+    Case('app:export_vehicles'),
+    Case('app:export_clients'),
+    Case('app:export_contracts', data={'format': 'xlsx'}),
+    Case('app:api_index', role='token'),
+    Case('app:api_list', role='token', kwargs={'resource_name': 'vehicles'}, data={'include': 'contracts'}),
+    Case(
+        'app:api_detail', role='token', data={'include': 'diagnostic_reports,inspections'},
+        kwargs=lambda fleet: {'resource_name': 'vehicles', 'pk': fleet.vehicle.pk},
+    ),
+    Case('app:metrics', role='token'),
+    Case('user:login', role='anonymous'),
+    Case('user:logout', role='logout', method='post', status=302, setup=_login_again),
+    Case('user:create_client'),
+    Case('user:create_staff', role='admin'),
+]
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу: на десятке замеров интерполяция только вводит в заблуждение."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return None
+    with open(BASELINE_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_report(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'machine': MACHINE, 'fleet': FLEET_SIZE, 'repeat': REPEAT, 'views': results}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+@override_settings(PERF_SERVER_TIMING=False, WIALON_TOKEN='benchmark-token')
+class PageBenchmark(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Загрузки файлов пишутся во временный MEDIA_ROOT, а не в media/ проекта
+        media_root = tempfile.mkdtemp(prefix='benchmark_media_')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fleet = build_fleet(FLEET_SIZE, SEED)
+
+    def setUp(self):
+        cache.clear()
+
+        # Подменяем транспорт, а не Session.send: обёртка профилировщика над ним остаётся в замере
+        # Объекты Wialon — машины автопарка, с их wialon_id и IMEI
+        self.wialon = FakeWialon.from_vehicles(
+            Vehicle.objects.values_list('wialon_id', 'wialon_imei', 'license_plate')
+        )
+        patcher = mock.patch.object(HTTPAdapter, 'send', autospec=True, side_effect=partial(fake_send, self.wialon))
+        self.http = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.clients = {
+            'anonymous': Client(),
+            'staff': Client(),
+            'client': Client(),
+            'admin': Client(),
+            # Отдельный сотрудник для выхода: остальные сессии не должны заканчиваться
+            'logout': Client(),
+            'token': Client(headers={'Authorization': f"Token {self.fleet.token.key}"}),
+        }
+        self.clients['staff'].force_login(self.fleet.staff)
+        self.clients['client'].force_login(self.fleet.client)
+        self.clients['admin'].force_login(self.fleet.admin)
+
+    def measure(self, case):
+        client = self.clients[case.role]
+        timings, queries = [], []
+        # Полная сборка мусора до замера: иначе её пауза (~0.1 с на автопарке в памяти)
+        # попадает в p95 той страницы, на которой случайно сработал порог
+        gc.collect()
+
+        # Первый запрос — с пустым кэшем и некомпилированными шаблонами: его запросы
+        # считаются (queries), а время — нет, иначе p95 на двух десятках замеров — это он
+        for attempt in range(REPEAT + 1):
+            url, data = case.resolve(self.fleet, client)
+            options = {'headers': case.headers}
+            if case.content_type:
+                options['content_type'] = case.content_type
+
+            with CaptureQueriesContext(connection) as context:
+                started = time.perf_counter()
+                response = getattr(client, case.method)(url, data, **options)
+                # Потоковые выгрузки считаются целиком, до последнего байта
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+            response.close()
+
+            self.assertEqual(
+                response.status_code, case.status,
+                f"{case.method.upper()} {url}: {response.status_code} вместо {case.status}"
+            )
+            if attempt:
+                timings.append(elapsed * 1000)
+            queries.append(len(context.captured_queries))
+
+        return {
+            'queries': max(queries),
+            'queries_warm': queries[-1],
+            'p50_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+        }
+
+    def test_every_url_is_benchmarked(self):
+        names = {
+            f"{module.app_name}:{pattern.name}"
+            for module in (app_urls, user_urls)
+            for pattern in module.urlpatterns
+        }
+        self.assertEqual(sorted(names - {case.view for case in CASES}), [], "Для этих страниц нет замера в CASES")
+
+    def test_pages(self):
+        results = {}
+        for case in CASES:
+            with self.subTest(view=case.view):
+                results[case.view] = self.measure(case)
+        # Упавший замер не должен попасть в baseline
+        self.assertEqual(len(results), len(CASES), "Не все страницы ответили как ожидалось")
+        # Бюджеты профилировщика (settings.PERF_BUDGETS) — потолок, который baseline не поднимет:
+        # иначе записанный baseline закрепил бы N+1, о котором профилировщик пишет на проде
+        self.assertEqual(self.over_budget(results), [], "Страницы превышают PERF_BUDGETS")
+        # Wialon и парсинг объявлений действительно прошли через заглушку
+        self.assertTrue(self.http.called)
+
+        self.print_table(results)
+        if REPORT_PATH:
+            save_report(REPORT_PATH, results)
+
+        baseline = load_baseline()
+        if baseline is None or UPDATE_BASELINE:
+            save_report(BASELINE_PATH, results)
+            print(f"Baseline записан: {BASELINE_PATH}")
+            return
+
+        compare_latency = (
+            LATENCY_RATIO > 0 and baseline.get('machine') == MACHINE
+            and baseline.get('fleet') == FLEET_SIZE and baseline.get('repeat') == REPEAT
+        )
+        if not compare_latency:
+            print("Время не сравнивается: baseline снят на другой машине, автопарке или числе замеров, либо BENCHMARK_LATENCY_RATIO=0")
+
+        for view, current in results.items():
+            expected = baseline['views'].get(view)
+            if expected is None:
+                continue
+            with self.subTest(view=view):
+                for key in ('queries', 'queries_warm'):
+                    self.assertLessEqual(
+                        current[key], expected[key] + QUERY_SLACK,
+                        f"{view}: {key} {current[key]}, в baseline {expected[key]}"
+                    )
+                if compare_latency:
+                    for key in ('p50_ms', 'p95_ms'):
+                        limit = expected[key] * LATENCY_RATIO + LATENCY_SLACK_MS
+                        self.assertLessEqual(
+                            current[key], limit,
+                            f"{view}: {key} {current[key]}, допустимо до {limit:.1f} (baseline {expected[key]})"
+                        )
+
+    def over_budget(self, results):
+        problems = []
+        for view, row in results.items():
+            budget = profiler.budget_for(view)
+            if row['queries'] > budget['queries']:
+                problems.append(f"{view}: {row['queries']} запросов, бюджет {budget['queries']}")
+            if 'total_ms' in budget and row['p95_ms'] > budget['total_ms']:
+                problems.append(f"{view}: p95 {row['p95_ms']} мс, бюджет {budget['total_ms']} мс")
+        return problems
+
+    def print_table(self, results):
+        print(f"\n{'Страница':<32} {'запросы':>8} {'прогретый':>10} {'p50, мс':>9} {'p95, мс':>9}")
+        for view, row in results.items():
+            print(f"{view:<32} {row['queries']:>8} {row['queries_warm']:>10} {row['p50_ms']:>9} {row['p95_ms']:>9}")
+
+
+@override_settings(WIALON_TOKEN='benchmark-token')
+class WialonTelemetryBenchmark(SimpleTestCase):
+    """
+    Функции Wialon из app/utils.py против локальной замены по настоящему HTTP:
+    тысячи объектов, параллельные запросы, ошибки и истёкшие сессии.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.wialon = FakeWialon.simulated(WIALON_UNITS, seed=SEED, token='benchmark-token')
+        cls.server = make_server(cls.wialon, port=0)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.enterClassContext(override_settings(WIALON_BASE_URL=base_url(cls.server)))
+
+    def setUp(self):
+        self.wialon.error_rate = self.wialon.http_error_rate = 0
+
+    def test_lookup_by_imei(self):
+        expected = {unit.uid: unit.id for unit in self.wialon.units.values()}
+
+        started = time.perf_counter()
+        found = utils.find_wialon_ids_by_imei(expected)
+        elapsed = time.perf_counter() - started
+        print(f"\nWialon: {len(found)} IMEI из {len(expected)} объектов за {elapsed * 1000:.0f} мс")
+
+        self.assertEqual(found, expected)
+        uid, unit_id = next(iter(expected.items()))
+        self.assertEqual(utils.find_wialon_id_by_imei(uid), unit_id)
+        self.assertIsNone(utils.find_wialon_id_by_imei('000'))
+
+    def test_concurrent_locations(self):
+        ids = sorted(self.wialon.units)[::max(len(self.wialon.units) // WIALON_REQUESTS, 1)][:WIALON_REQUESTS]
+
+        def locate(unit_id):
+            started = time.perf_counter()
+            location = utils.get_wialon_location(unit_id)
+            return location, (time.perf_counter() - started) * 1000
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(locate, ids))
+        timings = [elapsed for _, elapsed in results]
+        print(
+            f"\nWialon: {len(ids)} координат в 16 потоков, "
+            f"p50 {statistics.median(timings):.1f} мс, p95 {percentile(timings, 95):.1f} мс"
+        )
+
+        for unit_id, (location, _) in zip(ids, results):
+            position = self.wialon.units[unit_id].position(time.time())
+            self.assertAlmostEqual(location['lat'], position['y'], places=2)
+            self.assertAlmostEqual(location['lon'], position['x'], places=2)
+
+    def test_failures_return_none(self):
+        unit_id = next(iter(self.wialon.units))
+        with redirect_stdout(io.StringIO()):
+            self.wialon.error_rate = 1
+            self.assertIsNone(utils.get_wialon_location(unit_id))
+            self.wialon.error_rate, self.wialon.http_error_rate = 0, 1
+            self.assertIsNone(utils.get_wialon_location(unit_id))
+            self.assertEqual(utils.find_wialon_ids_by_imei(['86000']), {})
+            self.wialon.http_error_rate = 0
+            with override_settings(WIALON_TOKEN='wrong'):
+                self.assertIsNone(utils.get_wialon_location(unit_id))
+            self.assertIsNone(utils.get_wialon_location(1))
+
+    def test_session_expiry_and_messages(self):
+        now = [1_800_000_000]
+        wialon = FakeWialon.simulated(3, session_ttl=300, clock=lambda: now[0])
+        sid = wialon.call('token/login', {'token': 'any'})['eid']
+        unit_id = next(iter(wialon.units))
+
+        history = wialon.call('messages/load_interval', {
+            'itemId': unit_id, 'timeFrom': now[0] - 3600, 'timeTo': now[0], 'flags': 0, 'flagsMask': 0, 'loadCount': 1000,
+        }, sid)
+        self.assertEqual(history['count'], 3600 // 30 + 1)
+        self.assertEqual(history['messages'][-1]['t'], now[0])
+
+        now[0] += 301
+        self.assertEqual(wialon.call('core/search_item', {'id': unit_id, 'flags': 0x400}, sid), {'error': 1})
+
+
+def make_vehicle(vin='TESTVIN0000000001', **fields):
+    # Без IMEI: Vehicle.save() не ходит в Wialon
+    values = dict(
+        vin=vin, brand='Toyota', model_name='Camry', license_plate=vin[-8:],
+        price=20000, year=2019, mileage=50000,
+    )
+    values.update(fields)
+    return Vehicle.objects.create(**values)
+
+
+def make_contract(vehicle, client=None, **fields):
+    # Полгода по 1000 с 15-го числа: строки графика 15.02–15.07.2024
+    values = dict(
+        start_date=datetime.date(2024, 1, 15), end_date=datetime.date(2024, 7, 15),
+        initial_payment_percent=0, total_amount=Decimal('6000'), monthly_payment=Decimal('1000'),
+        payment_due_day=15,
+    )
+    values.update(fields)
+    if client is None:
+        client = User.objects.create(username=f'client-{User.objects.count() + 1}')
+    return Contract.objects.create(vehicle=vehicle, client=client, **values)
+
+
+class FileStorageTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp(prefix='test_media_')
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media_root))
+        super().setUpClass()
+
+    def setUp(self):
+        self.vehicle = make_vehicle()
+        self.user = User.objects.create(username='uploader')
+
+
+@override_settings(CHUNKED_UPLOAD_CHUNK_SIZE=4)
+class ChunkedUploadTests(FileStorageTestCase):
+    DATA = b'0123456789'
+
+    def start(self, **kwargs):
+        return start_upload(
+            self.vehicle, self.user, 'document', 'contract.pdf', len(self.DATA),
+            sha256=hashlib.sha256(self.DATA).hexdigest(), **kwargs
+        )
+
+    def send(self, upload, start, end, data=None):
+        data = self.DATA[start:end + 1] if data is None else data
+        return write_chunk(upload, io.BytesIO(data), f'bytes {start}-{end}/{len(self.DATA)}')
+
+    def assertRejected(self, status, call, *args):
+        with self.assertRaises(ChunkError) as raised:
+            call(*args)
+        self.assertEqual(raised.exception.status, status)
+
+    def test_resume_and_finish(self):
+        upload = self.start(title='Договор')
+        self.send(upload, 0, 3)
+
+        # Клиент переподключился: смещение берётся из базы, докачка продолжается с него
+        resumed = ChunkedUpload.objects.get(pk=upload.pk)
+        self.assertEqual(resumed.offset, 4)
+        self.send(resumed, 4, 7)
+        self.assertRejected(409, finish_upload, resumed)
+        self.send(resumed, 8, 9)
+
+        document = finish_upload(resumed)
+        self.assertEqual(document.title, 'Договор')
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.DATA)
+        self.assertFalse(os.path.exists(part_path(resumed)))
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload.pk).status, 'complete')
+        self.assertRejected(409, self.send, resumed, 0, 3)
+
+    def test_conflicts(self):
+        upload = self.start()
+        self.send(upload, 0, 3)
+
+        # Повтор уже принятой части и часть с пропуском не принимаются, смещение не двигается
+        self.assertRejected(409, self.send, upload, 0, 3)
+        self.assertRejected(409, self.send, upload, 8, 9)
+        self.assertRejected(400, self.send, upload, 4, 8)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload.pk).offset, 4)
+
+        # Оборванная часть обрезается обратно
+        self.assertRejected(400, self.send, upload, 4, 7, b'45')
+        self.assertEqual(os.path.getsize(part_path(upload)), 4)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload.pk).offset, 4)
+
+    def test_checksum_mismatch_restarts(self):
+        upload = self.start()
+        self.send(upload, 0, 3)
+        self.send(upload, 4, 7)
+        self.send(upload, 8, 9, b'XX')
+
+        self.assertRejected(409, finish_upload, upload)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload.pk).offset, 0)
+        self.assertEqual(os.path.getsize(part_path(upload)), 0)
+
+
+class ContentAddressedStorageTests(FileStorageTestCase):
+    def add_document(self, data):
+        document = VehicleDocument(vehicle=self.vehicle, title='Скан')
+        document.file.save('scan.pdf', ContentFile(data), save=False)
+        document.save()
+        return document
+
+    def test_ref_count(self):
+        first = self.add_document(b'%PDF same')
+        second = self.add_document(b'%PDF same')
+        other = self.add_document(b'%PDF other')
+
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertNotEqual(first.file.name, other.file.name)
+        name = first.file.name
+        path = content_addressed_storage.path(name)
+        self.assertTrue(path.startswith(settings.MEDIA_ROOT))
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(path))), 1)
+
+        first.delete()
+        self.assertEqual(StoredFile.objects.get(name=name).ref_count, 1)
+        self.assertTrue(os.path.exists(path))
+
+        second.delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(StoredFile.objects.get(name=other.file.name).ref_count, 1)
+
+    def collect_garbage(self, *args):
+        out = io.StringIO()
+        call_command('collect_media_garbage', *args, stdout=out)
+        return out.getvalue()
+
+    def test_collect_garbage(self):
+        kept = self.add_document(b'%PDF kept')
+        # Ссылку убрали через update(): сигналов нет, счётчик остался 1
+        lost = self.add_document(b'%PDF lost')
+        VehicleDocument.objects.filter(pk=lost.pk).update(file='')
+        # Файл без записи StoredFile и без ссылок
+        stray = os.path.join(os.path.dirname(kept.file.name), 'stray.pdf')
+        with open(os.path.join(settings.MEDIA_ROOT, stray), 'wb') as f:
+            f.write(b'stray')
+
+        # Всё это загружено два часа назад, а свежий файл без ссылки пока не трогаем
+        two_hours_ago = time.time() - 2 * 60 * 60
+        for dirpath, _, filenames in os.walk(settings.MEDIA_ROOT):
+            for filename in filenames:
+                os.utime(os.path.join(dirpath, filename), (two_hours_ago, two_hours_ago))
+        fresh = os.path.join(settings.MEDIA_ROOT, os.path.dirname(kept.file.name), 'fresh.pdf')
+        with open(fresh, 'wb') as f:
+            f.write(b'fresh')
+
+        def exists(name):
+            return os.path.exists(os.path.join(settings.MEDIA_ROOT, name))
+
+        self.assertIn(lost.file.name, self.collect_garbage('--dry-run'))
+        self.assertTrue(all(exists(name) for name in (kept.file.name, lost.file.name, stray)))
+
+        # Первый проход: файл без записи удалён, разошедшийся счётчик обнулён
+        self.collect_garbage()
+        self.assertFalse(exists(stray))
+        self.assertTrue(exists(lost.file.name))
+        self.assertEqual(StoredFile.objects.get(name=lost.file.name).ref_count, 0)
+
+        # Второй проход удаляет и его; файл со ссылкой и свежий файл остаются
+        self.collect_garbage()
+        self.assertFalse(exists(lost.file.name))
+        self.assertFalse(StoredFile.objects.filter(name=lost.file.name).exists())
+        self.assertTrue(exists(kept.file.name))
+        self.assertEqual(StoredFile.objects.get(name=kept.file.name).ref_count, 1)
+        self.assertTrue(os.path.exists(fresh))
+
+
+class LedgerTests(TestCase):
+    """График и баланс договора: платежи, их исправление и удаление, переплата, смена условий."""
+
+    TODAY = datetime.date(2024, 10, 1)
+
+    def setUp(self):
+        self.contract = Contract.objects.create(
+            vehicle=make_vehicle(),
+            client=User.objects.create(username='ledger-client'),
+            start_date=datetime.date(2024, 1, 15),
+            end_date=datetime.date(2024, 7, 15),
+            initial_payment_percent=0,
+            total_amount=Decimal('6000'),
+            monthly_payment=Decimal('1000'),
+            payment_due_day=15,
+        )
+        # Все сроки графика (15.02–15.07) к TODAY уже наступили
+        self.today = mock.patch('django.utils.timezone.localdate', return_value=self.TODAY)
+        self.today.start()
+        self.addCleanup(self.today.stop)
+        ledger.rebuild_contract(self.contract.pk)
+
+    def pay(self, amount):
+        return Payment.objects.create(contract=self.contract, amount=Decimal(amount), paid_at=self.TODAY)
+
+    def assertBalance(self, paid_amounts, paid_total, debt, next_due):
+        self.contract.refresh_from_db()
+        self.assertEqual(
+            list(self.contract.schedule.order_by('number').values_list('paid_amount', flat=True)),
+            [Decimal(value) for value in paid_amounts],
+        )
+        self.assertEqual(self.contract.paid_total, Decimal(paid_total))
+        self.assertEqual(self.contract.debt_amount, Decimal(debt))
+        self.assertEqual(self.contract.next_due_date, next_due)
+
+    def test_schedule(self):
+        self.assertEqual(
+            list(self.contract.schedule.order_by('number').values_list('number', 'due_date', 'amount')),
+            [(number, datetime.date(2024, number + 1, 15), Decimal('1000')) for number in range(1, 7)],
+        )
+        self.assertBalance([0] * 6, 0, 6000, datetime.date(2024, 2, 15))
+        self.assertEqual(self.contract.scheduled_total, Decimal('6000'))
+
+    def test_payment_edit_and_delete(self):
+        payment = self.pay('2500')
+        self.assertBalance([1000, 1000, 500, 0, 0, 0], 2500, 3500, datetime.date(2024, 4, 15))
+
+        payment.amount = Decimal('1500')
+        payment.save()
+        self.assertBalance([1000, 500, 0, 0, 0, 0], 1500, 4500, datetime.date(2024, 3, 15))
+
+        second = self.pay('1000')
+        self.assertBalance([1000, 1000, 500, 0, 0, 0], 2500, 3500, datetime.date(2024, 4, 15))
+
+        payment.delete()
+        self.assertBalance([1000, 0, 0, 0, 0, 0], 1000, 5000, datetime.date(2024, 3, 15))
+
+        second.delete()
+        self.assertBalance([0] * 6, 0, 6000, datetime.date(2024, 2, 15))
+
+    def test_overpayment(self):
+        self.pay('7000')
+        # Строки закрыты по сумме, лишние 1000 остаются в paid_total, долг не уходит в минус
+        self.assertBalance([1000] * 6, 7000, 0, None)
+        self.assertEqual(ledger.client_debt(self.contract.client), Decimal(0))
+
+    def test_schedule_resync(self):
+        self.pay('2500')
+        self.assertFalse(ledger.sync_schedule(self.contract))
+
+        self.contract.refresh_from_db()
+        self.contract.monthly_payment = Decimal('2000')
+        self.contract.end_date = datetime.date(2024, 4, 15)
+        self.contract.save()
+
+        # График пересоздан (3 платежа по 2000), старый платёж разложен заново
+        self.assertEqual(
+            list(self.contract.schedule.order_by('number').values_list('due_date', 'amount')),
+            [(datetime.date(2024, month, 15), Decimal('2000')) for month in (2, 3, 4)],
+        )
+        self.assertBalance([2000, 500, 0], 2500, 3500, datetime.date(2024, 3, 15))
+        self.assertEqual(self.contract.scheduled_total, Decimal('6000'))
+
+
+class ContractNumberTests(TestCase):
+    def test_allocate(self):
+        day = datetime.date(2024, 5, 1)
+        self.assertEqual(ContractNumberCounter.objects.allocate(count=3, day=day), range(1, 4))
+        self.assertEqual(ContractNumberCounter.objects.allocate(day=day), range(4, 5))
+        # Счётчик свой у каждого дня
+        self.assertEqual(ContractNumberCounter.objects.allocate(day=datetime.date(2024, 5, 2)), range(1, 2))
+        self.assertEqual(ContractNumberCounter.objects.get(day=day).last_value, 4)
+
+    def test_contract_numbers_are_consecutive(self):
+        day = datetime.date(2024, 5, 1)
+        client = User.objects.create(username='number-client')
+        vehicle = make_vehicle()
+        with mock.patch('django.utils.timezone.localdate', return_value=day):
+            numbers = [
+                Contract.objects.create(
+                    vehicle=vehicle, client=client, start_date=day, end_date=day,
+                    total_amount=Decimal('1000'), monthly_payment=Decimal('0'),
+                ).contract_number
+                for _ in range(2)
+            ]
+        self.assertEqual(numbers, ['L-01052024-0001', 'L-01052024-0002'])
+
+
+class FleetDefectAnalyticsTests(TestCase):
+    def report(self, vehicle, created_at, *defects):
+        report = DiagnosticReport(vehicle=vehicle, **{name: True for name in defects})
+        report.save()
+        DiagnosticReport.objects.filter(pk=report.pk).update(created_at=created_at)
+        return report
+
+    def test_latest_report_per_vehicle(self):
+        moment = timezone.make_aware(datetime.datetime(2024, 5, 1, 12, 0))
+        toyota = make_vehicle()
+        honda = make_vehicle('TESTVIN0000000002', brand='Honda', model_name='Civic')
+        make_vehicle('TESTVIN0000000003', brand='Honda', model_name='Fit')
+
+        # Одинаковое время создания: последним считается лист с большим pk
+        self.report(toyota, moment, 'brake_front_hose_l')
+        self.report(toyota, moment, 'steering_rack')
+        self.report(toyota, moment, 'alternator')
+        # Лист, созданный раньше по pk, но позже по времени, — последний
+        self.report(honda, moment + datetime.timedelta(hours=1), 'steering_rack')
+        self.report(honda, moment, 'brake_front_hose_l', 'alternator')
+
+        with self.assertNumQueries(1):
+            attributes, defects, inspected = analytics.load_latest_matrix()
+
+        names = [item.name for item in checklist.CHECKLIST_ITEMS]
+        by_brand = {
+            brand: sorted(names[i] for i in row.nonzero()[0])
+            for brand, row in zip(attributes['brand'], defects)
+        }
+        # Машина без диагностики в матрицу не попадает
+        self.assertEqual(by_brand, {'Toyota': ['alternator'], 'Honda': ['steering_rack']})
+        self.assertTrue(inspected.all())
+
+        attributes, defects, _ = analytics.load_latest_matrix(brand='honda', model_name='civic')
+        self.assertEqual(list(attributes['model']), ['Honda Civic'])
+        self.assertEqual(int(defects.sum()), 1)
+
+        report = analytics.build_defect_report('brand')
+        self.assertEqual(report['vehicles'], 2)
+        self.assertEqual({item['name']: item['count'] for item in report['fleet']}, {'alternator': 1, 'steering_rack': 1})
+
+
+class VehicleCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vehicle = make_vehicle()
+
+    def test_reread_after_commit(self):
+        self.assertEqual(caching.vehicle_page(self.vehicle.pk)['vehicle'].mileage, 50000)
+        with self.assertNumQueries(0):
+            caching.vehicle_page(self.vehicle.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.vehicle.mileage = 60000
+            self.vehicle.save()
+            # До фиксации версия прежняя: другие запросы читают старую карточку из кэша
+            self.assertEqual(caching.vehicle_version(self.vehicle.pk), 1)
+        self.assertTrue(callbacks)
+
+        self.assertEqual(caching.vehicle_version(self.vehicle.pk), 2)
+        self.assertEqual(caching.vehicle_page(self.vehicle.pk)['vehicle'].mileage, 60000)
+
+    def test_related_change_after_commit(self):
+        caching.vehicle_page(self.vehicle.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_contract(self.vehicle)
+        page = caching.vehicle_page(self.vehicle.pk)
+        self.assertIsNotNone(page['current_contract'])
+
+    def test_rollback_keeps_version(self):
+        caching.vehicle_page(self.vehicle.pk)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.vehicle.mileage = 60000
+                self.vehicle.save()
+                raise RuntimeError
+        self.assertEqual(callbacks, [])
+
+        self.assertEqual(caching.vehicle_version(self.vehicle.pk), 1)
+        self.assertEqual(caching.vehicle_page(self.vehicle.pk)['vehicle'].mileage, 50000)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.mileage, 50000)
+
+    def test_missing_vehicle_is_not_cached(self):
+        self.assertIsNone(caching.vehicle_page('NOSUCHVIN00000000'))
+        self.assertIsNone(caching.vehicle_version('NOSUCHVIN00000000'))
+
+    def test_reports_invalidate_after_commit(self):
+        for key, invalidate in (
+            (analytics.CACHE_VERSION_KEY, analytics.invalidate_defect_report),
+            (receivables.CACHE_VERSION_KEY, receivables.invalidate_receivables_report),
+        ):
+            cache.set(key, 1, None)
+            with self.captureOnCommitCallbacks(execute=True):
+                invalidate()
+                self.assertEqual(cache.get(key), 1)
+            self.assertEqual(cache.get(key), 2)
+
+
+class ContractStatusCommandTests(TestCase):
+    def setUp(self):
+        self.contract = make_contract(make_vehicle())
+
+    def run_command(self, *args):
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('update_contract_statuses', *args, stdout=out)
+        self.contract.refresh_from_db()
+        return out.getvalue()
+
+    def pay(self, amount):
+        Payment.objects.create(contract=self.contract, amount=Decimal(amount), paid_at=datetime.date(2024, 3, 20))
+
+    def test_transitions_and_log(self):
+        output = self.run_command('--date', '2024-03-20')
+        self.assertIn(f"{self.contract.contract_number}: active → debt (долг 2000.00)", output)
+        self.assertEqual(self.contract.status, 'debt')
+        self.assertEqual(self.contract.due_total, Decimal('2000'))
+        self.assertEqual(self.contract.debt_amount, Decimal('2000'))
+
+        self.pay('2000')
+        self.run_command('--date', '2024-03-20')
+        self.assertEqual(self.contract.status, 'active')
+        self.assertEqual(self.contract.debt_amount, 0)
+
+        self.pay('4000')
+        self.run_command('--date', '2024-08-01')
+        self.assertEqual(self.contract.status, 'completed')
+
+        self.assertEqual(
+            list(self.contract.status_changes.order_by('pk').values_list('old_status', 'new_status', 'reason', 'debt_amount')),
+            [
+                ('active', 'debt', "Просрочен платёж, долг 2000.00", Decimal('2000')),
+                ('debt', 'active', "Задолженность погашена", Decimal('0')),
+                ('active', 'completed', "Срок договора истёк, оплачен полностью", Decimal('0')),
+            ],
+        )
+        # Завершённые договоры больше не проверяются
+        self.assertIn("Пересчитано договоров: 0", self.run_command('--date', '2024-09-01'))
+
+    def test_grace_days(self):
+        self.run_command('--date', '2024-02-20', '--grace-days', '10')
+        self.assertEqual(self.contract.status, 'active')
+        # Долг на дату считается и в льготный период
+        self.assertEqual(self.contract.debt_amount, Decimal('1000'))
+
+    def test_dry_run(self):
+        before = Contract.objects.values('status', 'due_total', 'debt_amount').get(pk=self.contract.pk)
+        output = self.run_command('--date', '2024-03-20', '--dry-run')
+        self.assertEqual(output.splitlines(), [
+            f"{self.contract.contract_number}: active → debt (долг 2000.00)",
+            "Пересчитать: 1, сменить статус: 1 (без сохранения)",
+        ])
+        self.assertEqual(Contract.objects.values('status', 'due_total', 'debt_amount').get(pk=self.contract.pk), before)
+        self.assertFalse(self.contract.status_changes.exists())
+
+    def test_bad_date(self):
+        with self.assertRaises(CommandError):
+            call_command('update_contract_statuses', '--date', '20.03.2024', stdout=io.StringIO())
+
+
+class ChecklistTests(SimpleTestCase):
+    def test_pack_unpack_roundtrip(self):
+        names = [item.name for item in checklist.CHECKLIST_ITEMS]
+        self.assertEqual(checklist.unpack(checklist.pack(names)), names)
+        self.assertEqual(checklist.count(checklist.pack(names)), len(names))
+        self.assertEqual(checklist.pack([]), (0, 0, 0))
+        self.assertEqual(checklist.unpack((0, 0, 0)), [])
+
+        # Каждый второй пункт — по порядку реестра, независимо от порядка на входе
+        subset = names[::2]
+        self.assertEqual(checklist.unpack(checklist.pack(reversed(subset))), subset)
+
+    def test_word_boundaries(self):
+        names = [item.name for item in checklist.CHECKLIST_ITEMS]
+        # Бит 63 знакового BigInteger не используется: пункт №63 — первый бит второй колонки
+        self.assertEqual(checklist.locate(names[62]), ('defect_bits_0', 1 << 62))
+        self.assertEqual(checklist.locate(names[63]), ('defect_bits_1', 1))
+        self.assertEqual(checklist.pack([names[62], names[63]]), (1 << 62, 1, 0))
+        self.assertLess(max(checklist.pack(names)), 1 << 63)
+        self.assertEqual(
+            checklist.masks_by_word([names[0], names[1], names[63]]),
+            {'defect_bits_0': 0b11, 'defect_bits_1': 1},
+        )
+
+    def test_bits_outside_registry_are_ignored(self):
+        past_end = 1 << (len(checklist.CHECKLIST_ITEMS) - checklist.BITS_PER_WORD)
+        self.assertEqual(checklist.unpack((1, past_end, 0)), [checklist.CHECKLIST_ITEMS[0].name])
+
+    def test_versions(self):
+        self.assertEqual(checklist.items_for_version(1), [
+            item for item in checklist.CHECKLIST_ITEMS if item.version == 1
+        ])
+        everything = checklist.pack(item.name for item in checklist.CHECKLIST_ITEMS)
+        self.assertEqual(checklist.version_mask(checklist.current_version()), everything)
+
+    def test_pdf_keeps_legacy_labels(self):
+        def labels(for_pdf):
+            axes, _ = checklist.build_sheet(lambda name, row: name, for_pdf=for_pdf)
+            return {
+                row['label']: row['cells']
+                for section in axes[0]['sections'] for row in section['rows']
+            }
+
+        form, pdf = labels(False), labels(True)
+        self.assertEqual(form['Рулевая рейка'], ['steering_rack'])
+        self.assertEqual(form['Крестовина рул. вала'], ['steering_ujoint'])
+        self.assertEqual(pdf['Рейка / Крестовина'], ['steering_rack', 'steering_ujoint'])
+        self.assertNotIn('Крестовина рул. вала', pdf)
+        self.assertIn('Граната наружная', pdf)
+        self.assertIn('Наружная граната', form)
+
+
+class DiagnosticReportChecklistTests(TestCase):
+    def setUp(self):
+        self.vehicle = make_vehicle()
+
+    def test_properties(self):
+        report = DiagnosticReport(vehicle=self.vehicle, brake_front_hose_l=True, alternator=True)
+        self.assertTrue(report.brake_front_hose_l)
+        self.assertFalse(report.brake_front_hose_r)
+        report.save()
+
+        report = DiagnosticReport.objects.get(pk=report.pk)
+        self.assertEqual(report.defects, ['brake_front_hose_l', 'alternator'])
+        self.assertEqual(report.defect_count, 2)
+        self.assertEqual(report.checklist_version, checklist.current_version())
+
+        report.brake_front_hose_l = False
+        report.steering_rack = True
+        report.save(update_fields=checklist.WORD_FIELDS)
+
+        report = DiagnosticReport.objects.get(pk=report.pk)
+        self.assertEqual(report.defects, ['steering_rack', 'alternator'])
+        # update_fields с колонками чек-листа обновляет и defect_count
+        self.assertEqual(report.defect_count, 2)
+        self.assertEqual(DiagnosticReport.steering_rack.__doc__, checklist.ITEMS_BY_NAME['steering_rack'].label)
+
+    def test_bitmask_filters(self):
+        both = DiagnosticReport.objects.create(vehicle=self.vehicle, brake_front_hose_l=True, alternator=True)
+        one = DiagnosticReport.objects.create(vehicle=self.vehicle, alternator=True)
+        clean = DiagnosticReport.objects.create(vehicle=self.vehicle)
+
+        def pks(queryset):
+            return set(queryset.values_list('pk', flat=True))
+
+        self.assertEqual(pks(DiagnosticReport.objects.with_defect('brake_front_hose_l', 'alternator')), {both.pk})
+        self.assertEqual(pks(DiagnosticReport.objects.with_defect('alternator')), {both.pk, one.pk})
+        self.assertEqual(pks(DiagnosticReport.objects.with_any_defect('brake_front_hose_l', 'steering_rack')), {both.pk})
+        self.assertEqual(pks(DiagnosticReport.objects.with_any_defect()), {both.pk, one.pk})
+        self.assertEqual(pks(DiagnosticReport.objects.without_defects()), {clean.pk})
+
+
+class ChecklistMigrationTests(TransactionTestCase):
+    """Миграция 0013: 107 булевых колонок -> битовые колонки и обратно."""
+
+    before = [('app', '0012_content_addressed_storage')]
+    after = [('app', '0013_diagnosticreport_defect_bits')]
+    CHECKED = ('brake_front_hose_l', 'susp_rear_sb_upper_trans_f_l', 'alternator')
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_forward_and_backward(self):
+        apps = self.migrate(self.before)
+        HistoricalVehicle = apps.get_model('app', 'Vehicle')
+        Report = apps.get_model('app', 'DiagnosticReport')
+        vehicle = HistoricalVehicle.objects.create(
+            vin='TESTVIN0000000001', brand='Toyota', model_name='Camry', license_plate='01KG001AAA',
+            price=20000, year=2019, mileage=50000,
+        )
+        checked = Report.objects.create(vehicle=vehicle, **{name: True for name in self.CHECKED}).pk
+        clean = Report.objects.create(vehicle=vehicle).pk
+
+        apps = self.migrate(self.after)
+        Report = apps.get_model('app', 'DiagnosticReport')
+        report = Report.objects.get(pk=checked)
+        words = tuple(getattr(report, field) for field in checklist.WORD_FIELDS)
+        self.assertEqual(words, checklist.pack(self.CHECKED))
+        self.assertEqual(checklist.unpack(words), list(self.CHECKED))
+        self.assertEqual((report.defect_count, report.checklist_version), (3, 1))
+        self.assertEqual(Report.objects.get(pk=clean).defect_count, 0)
+
+        apps = self.migrate(self.before)
+        Report = apps.get_model('app', 'DiagnosticReport')
+        names = [item.name for item in checklist.items_for_version(1)]
+        restored = Report.objects.values(*names).get(pk=checked)
+        self.assertEqual([name for name in names if restored[name]], list(self.CHECKED))
+        self.assertFalse(any(Report.objects.values(*names).get(pk=clean).values()))
+
+
+class MediaAccessTests(FileStorageTestCase):
+    DATA = b'0123456789'
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username='owner', passport_front='passports/owner.jpg')
+        self.other = User.objects.create(username='other', passport_front='passports/other.jpg')
+        self.staff = User.objects.create(username='staff', is_staff_member=True)
+        make_contract(self.vehicle, client=self.owner)
+        VehiclePhoto.objects.create(vehicle=self.vehicle, image='vehicle_gallery/photo.jpg')
+
+        for name in ('passports/owner.jpg', 'passports/other.jpg', 'vehicle_gallery/photo.jpg', 'misc/notes.txt'):
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(self.DATA)
+
+    def get(self, name, user=None, **headers):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        response = client.get(f'{settings.MEDIA_URL}{name}', headers=headers)
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_client_sees_only_own_files(self):
+        response = self.get('passports/owner.jpg', self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), self.DATA)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        self.assertEqual(self.get('passports/other.jpg', self.owner).status_code, 403)
+        self.assertEqual(self.get('misc/notes.txt', self.owner).status_code, 403)
+
+        # Медиа машины — клиентам по её договорам
+        response = self.get('vehicle_gallery/photo.jpg', self.owner)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], f'private, max-age={settings.MEDIA_CACHE_MAX_AGE}')
+        self.assertEqual(self.get('vehicle_gallery/photo.jpg', self.other).status_code, 403)
+
+    def test_anonymous_and_staff(self):
+        response = self.get('passports/owner.jpg')
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(resolve_url(settings.LOGIN_URL)))
+        self.assertFalse(media.can_access_media(AnonymousUser(), 'passports/owner.jpg'))
+
+        for name in ('passports/owner.jpg', 'passports/other.jpg', 'vehicle_gallery/photo.jpg', 'misc/notes.txt'):
+            self.assertEqual(self.get(name, self.staff).status_code, 200)
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.get('passports/missing.jpg', self.staff).status_code, 404)
+        self.assertEqual(self.get('../manage.py', self.staff).status_code, 404)
+
+    def test_offload_headers(self):
+        with override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'):
+            response = self.get('passports/owner.jpg', self.owner)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/passports/owner.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        with override_settings(MEDIA_SENDFILE_HEADER='X-Sendfile'):
+            response = self.get('vehicle_gallery/photo.jpg', self.owner)
+        self.assertEqual(
+            response['X-Sendfile'], os.path.abspath(os.path.join(settings.MEDIA_ROOT, 'vehicle_gallery/photo.jpg'))
+        )
+        self.assertEqual(response.content, b'')
+
+        # Отказ в доступе не передаётся серверу на отдачу
+        with override_settings(MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'):
+            response = self.get('passports/other.jpg', self.owner)
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(response.has_header('X-Accel-Redirect'))
+
+    def test_ranges(self):
+        name = 'passports/owner.jpg'
+        cases = (
+            ('bytes=0-3', 206, b'0123', 'bytes 0-3/10'),
+            ('bytes=6-', 206, b'6789', 'bytes 6-9/10'),
+            ('bytes=-3', 206, b'789', 'bytes 7-9/10'),
+            ('bytes=8-100', 206, b'89', 'bytes 8-9/10'),
+            ('bytes=10-', 416, b'', 'bytes */10'),
+            ('bytes=5-2', 416, b'', 'bytes */10'),
+            ('bytes=-0', 416, b'', 'bytes */10'),
+            # Неразборчивый и составной диапазоны игнорируются — отдаём файл целиком
+            ('bytes=abc', 200, self.DATA, None),
+            ('bytes=0-1,4-5', 200, self.DATA, None),
+            ('items=0-3', 200, self.DATA, None),
+            ('bytes=-', 200, self.DATA, None),
+        )
+        for header, status, body, content_range in cases:
+            with self.subTest(header):
+                response = self.get(name, self.owner, Range=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(self.body(response), body)
+                self.assertEqual(response.get('Content-Range'), content_range)
+
+    def test_conditional_requests(self):
+        etag = self.get('passports/owner.jpg', self.owner)['ETag']
+
+        response = self.get('passports/owner.jpg', self.owner, Range='bytes=0-3', If_Range=etag)
+        self.assertEqual((response.status_code, self.body(response)), (206, b'0123'))
+
+        # Файл поменялся с прошлого раза — диапазон не отдаём
+        response = self.get('passports/owner.jpg', self.owner, Range='bytes=0-3', If_Range='"stale"')
+        self.assertEqual((response.status_code, self.body(response)), (200, self.DATA))
+
+        self.assertEqual(self.get('passports/owner.jpg', self.owner, If_None_Match=etag).status_code, 304)
+        # 304 — только после проверки прав
+        self.assertEqual(self.get('passports/other.jpg', self.owner, If_None_Match=etag).status_code, 403)
+
+
+class ApiTests(TestCase):
+    def setUp(self):
+        self.token = ApiToken.objects.create(name='BI')
+        self.api = Client(headers={'Authorization': f'Token {self.token.key}'})
+        self.moment = timezone.make_aware(datetime.datetime(2024, 5, 1, 12, 0))
+
+    def get(self, path, client=None, **params):
+        return (client or self.api).get(f'/api/v1/{path}', params)
+
+    def make_fleet(self, count):
+        vins = [f'TESTVIN{index:010d}' for index in range(count)]
+        for vin in vins:
+            make_vehicle(vin)
+        return vins
+
+    def collect(self, path, **params):
+        """Все страницы списка по next_cursor: [[pk, ...], ...]."""
+        pages = []
+        cursor = None
+        while True:
+            query = dict(params, cursor=cursor) if cursor else params
+            data = self.get(path, **query).json()
+            pages.append([row.get('vin', row.get('id')) for row in data['results']])
+            cursor = data['next_cursor']
+            if cursor is None:
+                return pages
+
+    def test_pages_with_equal_updated_at(self):
+        vins = self.make_fleet(7)
+        # Пять машин с одинаковым updated_at: порядок внутри — по pk
+        Vehicle.objects.filter(vin__in=vins[:5]).update(updated_at=self.moment)
+        Vehicle.objects.filter(vin__in=vins[5:]).update(updated_at=self.moment + datetime.timedelta(seconds=1))
+
+        pages = self.collect('vehicles/', limit=2, fields='vin')
+        self.assertEqual(pages, [vins[0:2], vins[2:4], vins[4:6], vins[6:]])
+        self.assertEqual(self.collect('vehicles/', limit=7), [vins])
+
+    def test_cursor_survives_updates(self):
+        vins = self.make_fleet(4)
+        Vehicle.objects.update(updated_at=self.moment)
+        first = self.get('vehicles/', limit=2).json()
+
+        # Машина с прошлой страницы изменилась — придёт ещё раз в конце, остальные без пропусков
+        Vehicle.objects.filter(vin=vins[0]).update(updated_at=self.moment + datetime.timedelta(minutes=1))
+        rest = self.collect('vehicles/', limit=2, cursor=first['next_cursor'])
+        self.assertEqual(rest, [vins[2:4], [vins[0]]])
+
+    def test_bad_cursor(self):
+        make_contract(make_vehicle())
+
+        def encode(value):
+            return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+        for cursor in (
+            'garbage',
+            '!!!',
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+            encode({'a': 1}),
+            encode(5),
+            encode([self.moment.isoformat()]),
+            encode(['yesterday', 1]),
+            encode([self.moment.isoformat(), [1, 2]]),
+            encode([self.moment.isoformat(), {'pk': 1}]),
+            encode([self.moment.isoformat(), True]),
+            encode([self.moment.isoformat(), 'not-a-number']),
+        ):
+            with self.subTest(cursor):
+                response = self.get('contracts/', cursor=cursor)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('cursor', response.json()['error'])
+
+    def test_fields_and_include(self):
+        vehicle = make_vehicle()
+        contract = make_contract(vehicle)
+        DiagnosticReport.objects.create(vehicle=vehicle, alternator=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            data = self.get('vehicles/', fields='brand', include='contracts,diagnostic_reports').json()
+        row = data['results'][0]
+        self.assertEqual(set(row), {'vin', 'brand', 'contracts', 'diagnostic_reports'})
+        self.assertEqual([item['id'] for item in row['contracts']], [contract.pk])
+        self.assertEqual(row['diagnostic_reports'][0]['defects'], ['alternator'])
+
+        selects = [query['sql'] for query in queries.captured_queries if 'app_vehicle' in query['sql']]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('"mileage"', selects[0])
+
+        data = self.get(f'contracts/{contract.pk}/', fields='remaining_amount', include='vehicle,client').json()
+        self.assertEqual(data['remaining_amount'], '6000.00')
+        self.assertEqual(data['vehicle']['vin'], vehicle.vin)
+        self.assertNotIn('password', data['client'])
+
+        self.assertEqual(self.get('vehicles/', fields='vin,secret').status_code, 400)
+        self.assertEqual(self.get('vehicles/', include='photos').status_code, 400)
+        self.assertEqual(self.get('nothing/').status_code, 404)
+        self.assertEqual(self.get('contracts/', vehicle='TESTVIN0000000001', status='active').json()['results'][0]['id'], contract.pk)
+
+    def test_updated_since(self):
+        old, new = self.make_fleet(2)
+        Vehicle.objects.filter(vin=old).update(updated_at=self.moment - datetime.timedelta(seconds=1))
+        Vehicle.objects.filter(vin=new).update(updated_at=self.moment)
+
+        # Граница включительно
+        self.assertEqual(self.collect('vehicles/', updated_since='2024-05-01T12:00:00Z'), [[new]])
+        self.assertEqual(self.collect('vehicles/', updated_since='2024-05-01T11:00:00Z'), [[old, new]])
+        self.assertEqual(self.get('vehicles/', updated_since='yesterday').status_code, 400)
+
+    def test_tombstones(self):
+        vehicle = make_vehicle()
+        contract = make_contract(vehicle)
+        reports = [DiagnosticReport.objects.create(vehicle=vehicle).pk for _ in range(2)]
+        inspection = Inspection.objects.create(vehicle=vehicle).pk
+
+        # Договор защищает машину от удаления — ничего не удаляется и не записывается
+        with self.assertRaises(ProtectedError):
+            vehicle.delete()
+        self.assertFalse(ApiTombstone.objects.exists())
+
+        contract_pk = contract.pk
+        contract.delete()
+        vehicle.delete()
+
+        deleted = self.get('deleted/', limit=100).json()['results']
+        self.assertEqual(
+            sorted((row['resource'], row['object_pk']) for row in deleted),
+            sorted([
+                ('contracts', str(contract_pk)),
+                ('vehicles', 'TESTVIN0000000001'),
+                ('inspections', str(inspection)),
+                *[('diagnostics', str(pk)) for pk in reports],
+            ]),
+        )
+        only_reports = self.get('deleted/', resource='diagnostics').json()['results']
+        self.assertEqual(sorted(row['object_pk'] for row in only_reports), sorted(str(pk) for pk in reports))
+        self.assertEqual(set(api.RESOURCE_NAMES.values()), {'vehicles', 'contracts', 'diagnostics', 'inspections'})
+
+    def test_authentication(self):
+        make_vehicle()
+        self.assertEqual(self.get('vehicles/').status_code, 200)
+        self.token.refresh_from_db()
+        self.assertIsNotNone(self.token.last_used_at)
+
+        self.token.is_active = False
+        self.token.save()
+        self.assertEqual(self.get('vehicles/').status_code, 401)
+        self.assertEqual(self.get('vehicles/', Client(headers={'Authorization': 'Token wrong'})).status_code, 401)
+        self.assertEqual(self.get('vehicles/', Client()).status_code, 401)
+
+        session = Client()
+        session.force_login(User.objects.create(username='client'))
+        self.assertEqual(self.get('vehicles/', session).status_code, 401)
+        session.force_login(User.objects.create(username='manager', is_staff_member=True))
+        self.assertEqual(self.get('vehicles/', session).status_code, 200)
+        self.assertEqual(self.api.post('/api/v1/vehicles/').status_code, 405)
+
+
+class ExportTests(TestCase):
+    COLOR = exports.VEHICLE_FIELDS.index('color')
+    PHONE = exports.CLIENT_FIELDS.index('phone')
+
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='manager', is_staff_member=True))
+        make_vehicle(color='=HYPERLINK("http://evil")')
+        make_vehicle(vin='TESTVIN0000000002', color='Белый')
+        make_contract(Vehicle.objects.get(vin='TESTVIN0000000001'))
+
+    def export(self, name, file_format):
+        response = self.client.get(reverse(f'app:export_{name}'), {'format': file_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def read_csv(self, name):
+        response, content = self.export(name, 'csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertTrue(content.startswith('\ufeff'.encode()))
+        return list(csv.reader(io.StringIO(content.decode('utf-8-sig')), delimiter=';'))
+
+    def read_xlsx(self, name):
+        from openpyxl import load_workbook
+
+        response, content = self.export(name, 'xlsx')
+        self.assertIn('.xlsx', response['Content-Disposition'])
+        sheet = load_workbook(io.BytesIO(content), read_only=True).active
+        return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    def test_csv(self):
+        rows = self.read_csv('vehicles')
+        self.assertEqual(rows[0], exports.VEHICLE_COLUMNS[1])
+        self.assertEqual(len(rows), 1 + 2)
+        colors = {row[0]: row[self.COLOR] for row in rows[1:]}
+        self.assertEqual(colors['TESTVIN0000000001'], '\'=HYPERLINK("http://evil")')
+        self.assertEqual(colors['TESTVIN0000000002'], 'Белый')
+
+        rows = self.read_csv('contracts')
+        self.assertEqual(rows[0], exports.CONTRACT_COLUMNS[1])
+        self.assertEqual(len(rows), 1 + 1)
+
+    def test_xlsx(self):
+        rows = self.read_xlsx('vehicles')
+        self.assertEqual(rows[0], exports.VEHICLE_COLUMNS[1])
+        self.assertEqual(len(rows), 1 + 2)
+        colors = {row[0]: row[self.COLOR] for row in rows[1:]}
+        self.assertEqual(colors['TESTVIN0000000001'], '\'=HYPERLINK("http://evil")')
+
+        User.objects.create(username='client', phone='+79990000000')
+        rows = self.read_xlsx('clients')
+        self.assertEqual(rows[0], exports.CLIENT_COLUMNS[1])
+        # Клиент договора и новый клиент; менеджер — сотрудник и в выгрузку не попадает
+        self.assertEqual(len(rows), 1 + 2)
+        phones = {row[0]: row[self.PHONE] for row in rows[1:]}
+        self.assertEqual(phones['client'], "'+79990000000")
+
+    def test_escape_formula(self):
+        for value in ('=1+2', '+1', '-1', '@SUM(A1)'):
+            self.assertEqual(exports._escape_formula(value), "'" + value)
+        for value in ('Белый', '', -1, None, Decimal('-5')):
+            self.assertEqual(exports._escape_formula(value), value)
+
+    def test_default_queryset(self):
+        view = type('PlainExportView', (BaseExportView,), {'model': Vehicle})()
+        self.assertEqual(view.get_queryset().count(), 2)
+        with self.assertRaises(ImproperlyConfigured):
+            BaseExportView().get_queryset()
+
+    def test_staff_only(self):
+        self.client.force_login(User.objects.create(username='client'))
+        self.assertEqual(self.client.get(reverse('app:export_vehicles')).status_code, 403)
+
+
+
+class MetricsTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def count(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def cache_reads(self, kind):
+        return (
+            self.count('app_cache_requests_total', cache=kind, result='hit'),
+            self.count('app_cache_requests_total', cache=kind, result='miss'),
+        )
+
+    def test_cache_get(self):
+        before = self.cache_reads('wialon')
+        self.assertIsNone(metrics.cache_get('wialon:1:location'))
+        cache.set('wialon:1:location', {'lat': 1})
+        self.assertEqual(metrics.cache_get('wialon:1:location'), {'lat': 1})
+        # Закэшированный None — тоже попадание
+        cache.set('wialon:2:location', None)
+        self.assertEqual(metrics.cache_get('wialon:2:location', 'default'), None)
+
+        hits, misses = self.cache_reads('wialon')
+        self.assertEqual((hits - before[0], misses - before[1]), (2, 1))
+
+    def test_cache_get_or_set(self):
+        before = self.cache_reads('receivables')
+        build = mock.Mock(return_value='report')
+        self.assertEqual(metrics.cache_get_or_set('receivables:1:20240101', build), 'report')
+        self.assertEqual(metrics.cache_get_or_set('receivables:1:20240101', build), 'report')
+        build.assert_called_once_with()
+
+        hits, misses = self.cache_reads('receivables')
+        self.assertEqual((hits - before[0], misses - before[1]), (1, 1))
+
+    def test_cache_label(self):
+        self.assertEqual(metrics.cache_label('vehicle:VIN:3:page'), 'vehicle')
+        self.assertEqual(metrics.cache_label('vehicle:VIN:version'), 'vehicle:version')
+        self.assertEqual(metrics.cache_label('template.cache.vehicle_gallery.abc'), 'template.cache.vehicle_gallery')
+
+    def test_observed_session(self):
+        url = 'https://mashina.kg/details/1'
+        host = 'mashina.kg'
+        before = self.count('app_outbound_http_requests_total', host=host, status='200')
+        errors = self.count('app_outbound_http_requests_total', host=host, status='error')
+
+        with mock.patch.object(HTTPAdapter, 'send', autospec=True, side_effect=partial(fake_send, None)):
+            with metrics.ObservedSession() as session:
+                session.get(url, timeout=1)
+        with mock.patch.object(HTTPAdapter, 'send', autospec=True, side_effect=requests.ConnectionError):
+            with self.assertRaises(requests.ConnectionError):
+                metrics.ObservedSession().get(url, timeout=1)
+            # Обычная сессия не считается
+            with self.assertRaises(requests.ConnectionError):
+                requests.Session().get(url, timeout=1)
+
+        self.assertEqual(self.count('app_outbound_http_requests_total', host=host, status='200') - before, 1)
+        self.assertEqual(self.count('app_outbound_http_requests_total', host=host, status='error') - errors, 1)
+
+
+class ImporterTests(TestCase):
+    HEADER = (
+        'VIN-номер;ФИО Исполнителя;Марка;Модель;Цена;Год выпуска;Гос. номер;Пробег (км);'
+        'КПП;Привод;Объём (л);Работа стеклоподъемников'
+    )
+
+    def run_import(self, content, filename='fleet.csv', **options):
+        if isinstance(content, str):
+            content = content.encode('utf-8-sig')
+        return importer.import_vehicles(io.BytesIO(content), filename, link_wialon=False, **options)
+
+    def csv(self, *rows):
+        return '\n'.join([self.HEADER, *rows]) + '\n'
+
+    def row(self, vin, year='2019', window='да', transmission='Автомат'):
+        return f'{vin};Иванов И.И.;Toyota;Camry;15000;{year};01KG{vin[-3:]};80000;{transmission};Полный (AWD/4WD);2,5;{window}'
+
+    def test_semicolon_csv_with_russian_values(self):
+        result = self.run_import(self.csv(
+            self.row('IMPVIN00000000001'),
+            self.row('impvin00000000002', window='Нет', transmission='manual'),
+        ))
+        self.assertEqual((result.rows, result.created, result.errors), (2, 2, []))
+
+        first, second = Vehicle.objects.order_by('vin')
+        self.assertEqual(first.transmission, Vehicle.Transmission.AUTOMATIC)
+        self.assertEqual(first.drive_type, Vehicle.DriveType.AWD)
+        self.assertEqual(first.engine_volume, Decimal('2.5'))
+        self.assertIs(first.window_operation, True)
+        # VIN приводится к верхнему регистру, варианты принимаются и значением
+        self.assertEqual(second.vin, 'IMPVIN00000000002')
+        self.assertEqual(second.transmission, Vehicle.Transmission.MANUAL)
+        self.assertIs(second.window_operation, False)
+        self.assertIsNotNone(second.health_score)
+
+    def test_bad_rows_are_reported_by_number(self):
+        result = self.run_import(self.csv(
+            self.row('IMPVIN00000000001'),
+            self.row('IMPVIN00000000002', year='позапрошлый'),
+            self.row('IMPVIN00000000003', window='может быть'),
+            self.row('IMPVIN00000000004'),
+        ))
+        self.assertEqual((result.rows, result.created), (4, 2))
+        self.assertEqual([number for number, _ in result.errors], [3, 4])
+        self.assertIn('Год выпуска', result.errors[0][1])
+        self.assertIn('«может быть»', result.errors[1][1])
+        self.assertEqual(
+            list(Vehicle.objects.order_by('vin').values_list('vin', flat=True)),
+            ['IMPVIN00000000001', 'IMPVIN00000000004'],
+        )
+
+    def test_duplicate_vins(self):
+        make_vehicle(vin='IMPVIN00000000009')
+        result = self.run_import(self.csv(
+            self.row('IMPVIN00000000001'),
+            self.row('IMPVIN00000000001'),
+            self.row('IMPVIN00000000009'),
+        ), batch_size=2)
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors, [
+            (3, "VIN IMPVIN00000000001 повторяется в файле"),
+            (4, "Автомобиль с VIN IMPVIN00000000009 уже есть в базе"),
+        ])
+
+    def test_dry_run(self):
+        result = self.run_import(self.csv(self.row('IMPVIN00000000001')), dry_run=True)
+        self.assertEqual(result.created, 1)
+        self.assertFalse(Vehicle.objects.exists())
+
+    def test_insert_batch_retries_without_taken_vins(self):
+        def vehicle(vin):
+            return Vehicle(
+                vin=vin, brand='Toyota', model_name='Camry', price=1, year=2019, license_plate=vin[-8:], mileage=0,
+            )
+
+        # VIN добавили в другом запросе уже после проверки пачки
+        make_vehicle(vin='IMPVIN00000000002')
+        result = importer.ImportResult()
+        saved = importer._insert_batch(
+            [(2, vehicle('IMPVIN00000000001')), (3, vehicle('IMPVIN00000000002'))], result, 500,
+        )
+        self.assertEqual([v.vin for v in saved], ['IMPVIN00000000001'])
+        self.assertEqual(result.errors, [
+            (3, "Автомобиль с VIN IMPVIN00000000002 уже есть в базе (добавлен во время импорта)"),
+        ])
+        self.assertTrue(Vehicle.objects.filter(vin='IMPVIN00000000001').exists())
+
+    def test_xlsx(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append([
+            'vin', 'full_name_of_contractor', 'brand', 'model_name', 'price', 'year', 'license_plate', 'mileage',
+            'wialon_imei',
+        ])
+        sheet.append(['IMPVIN00000000001', 'Иванов', 'Kia', 'Rio', 9000.0, 2018, '01KG001', 120000, 860000000000001])
+        sheet.append([None] * 9)
+        sheet.append(['IMPVIN00000000002', 'Иванов', 'Kia', 'Rio', 'дорого', 2018, '01KG002', 120000, None])
+        content = io.BytesIO()
+        workbook.save(content)
+
+        result = self.run_import(content.getvalue(), 'fleet.xlsx')
+        self.assertEqual((result.rows, result.created, result.wialon_pending), (2, 1, 1))
+        self.assertEqual([number for number, _ in result.errors], [4])
+        vehicle = Vehicle.objects.get()
+        self.assertEqual((vehicle.price, vehicle.wialon_imei), (9000, '860000000000001'))
+
+    def test_file_errors(self):
+        with self.assertRaisesMessage(importer.ImportFileError, "CSV и XLSX"):
+            self.run_import('vin\n', 'fleet.txt')
+        with self.assertRaisesMessage(importer.ImportFileError, "нет столбца VIN"):
+            self.run_import('brand;model_name\nKia;Rio\n')
+
+
+class HealthTests(TestCase):
+    def vehicle(self, **fields):
+        defaults = {
+            'engine_rating': 5, 'transmission_rating': 5, 'chassis_rating': 5, 'overall_status': 'ok',
+            'noise_in_engine_operation': False, 'switching_state_of_transmission': True,
+            'chassis_steering_of_the_car': True, **{flag: True for flag in health.EQUIPMENT_FLAGS},
+        }
+        return SimpleNamespace(**{**defaults, **fields})
+
+    def test_compute(self):
+        self.assertEqual(health.compute(self.vehicle()), {name: 100 for name in health.SCORE_FIELDS})
+
+        vehicle = self.vehicle(
+            engine_rating=3, noise_in_engine_operation=True,
+            switching_state_of_transmission=False,
+            chassis_rating=1,
+            window_operation=False, stove_in_the_salon=False,
+        )
+        words = checklist.pack(['brake_front_hose_l', 'steering_rack', 'alternator'])
+        self.assertEqual(health.compute(vehicle, words), {
+            'health_engine': 35,        # 50 × 0.7
+            'health_transmission': 70,  # 100 × 0.7
+            'health_chassis': 0,
+            'health_equipment': 67,     # 4 из 6
+            'health_diagnostic': 81,    # 100 − 8 − 6 − 5
+            # 35×0.25 + 70×0.2 + 0×0.2 + 66.7×0.1 + 81×0.25
+            'health_score': 50,
+        })
+        # Статус ограничивает итог, но не подоценки
+        capped = health.compute(self.vehicle(overall_status='broken'), words)
+        self.assertEqual((capped['health_score'], capped['health_diagnostic']), (30, 81))
+
+    def test_diagnostic_score_floor(self):
+        everything = checklist.pack(item.name for item in checklist.CHECKLIST_ITEMS)
+        self.assertEqual(health.diagnostic_score(everything), 0)
+        self.assertEqual(health.diagnostic_score(None), 100)
+
+    def test_scores_follow_saves_and_reports(self):
+        vehicle = make_vehicle(engine_rating=1)
+        self.assertEqual(vehicle.health_engine, 0)
+
+        DiagnosticReport.objects.create(vehicle=vehicle, brake_front_hose_l=True)
+        vehicle.refresh_from_db()
+        self.assertEqual(vehicle.health_diagnostic, 92)
+
+        vehicle.engine_rating = 5
+        vehicle.save(update_fields=['engine_rating'])
+        vehicle.refresh_from_db()
+        self.assertEqual((vehicle.health_engine, vehicle.health_diagnostic), (100, 92))
+        self.assertEqual(vehicle.health_score, round(100 * 0.75 + 92 * 0.25))
+
+    def test_dashboard_sort_and_filter(self):
+        good = make_vehicle('TESTVIN0000000001')
+        fair = make_vehicle('TESTVIN0000000002', overall_status='repair')
+        poor = make_vehicle('TESTVIN0000000003', overall_status='broken')
+        self.assertEqual([v.health_score for v in (good, fair, poor)], [100, 60, 30])
+        start = timezone.now()
+        for minutes, vehicle in enumerate((good, fair, poor)):
+            Vehicle.objects.filter(pk=vehicle.pk).update(created_at=start + datetime.timedelta(minutes=minutes))
+
+        self.client.force_login(User.objects.create(username='manager', is_staff_member=True))
+
+        def listed(**params):
+            response = self.client.get(reverse('app:staff_dashboard'), params)
+            self.assertEqual(response.status_code, 200)
+            return [vehicle.vin for vehicle in response.context['vehicles']]
+
+        self.assertEqual(listed(sort='health'), [poor.vin, fair.vin, good.vin])
+        self.assertEqual(listed(sort='-health'), [good.vin, fair.vin, poor.vin])
+        # По умолчанию и при неизвестной сортировке — сначала новые
+        self.assertEqual(listed(), [poor.vin, fair.vin, good.vin])
+        self.assertEqual(listed(sort='price'), listed())
+        self.assertEqual(listed(condition='good'), [good.vin])
+        self.assertEqual(listed(condition='fair', sort='health'), [fair.vin])
+        self.assertEqual(listed(condition='poor', filter='repair'), [poor.vin])
+        self.assertEqual(len(listed(condition='unknown')), 3)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create(username='owner')
+        self.stranger = User.objects.create(username='stranger')
+        self.vehicle = make_vehicle()
+        make_contract(self.vehicle, self.owner)
+        self.url = reverse('app:vehicle_detail', kwargs={'pk': self.vehicle.pk})
+
+    def get(self, user, url=None, **headers):
+        client = Client()
+        if user:
+            client.force_login(user)
+        return client.get(url or self.url, **headers)
+
+    def test_owner_gets_304(self):
+        first = self.get(self.owner)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('private', first['Cache-Control'])
+        etag = first['ETag']
+
+        repeat = self.get(self.owner, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(repeat.status_code, 304)
+        self.assertEqual(repeat['ETag'], etag)
+
+        # Изменение карточки меняет ETag
+        with self.captureOnCommitCallbacks(execute=True):
+            caching.touch_vehicle(self.vehicle.pk)
+        changed = self.get(self.owner, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+    def test_no_304_without_access(self):
+        first = self.get(self.owner)
+        etag, modified = first['ETag'], first['Last-Modified']
+
+        for headers in ({'HTTP_IF_NONE_MATCH': etag}, {'HTTP_IF_NONE_MATCH': '*'}, {'HTTP_IF_MODIFIED_SINCE': modified}):
+            with self.subTest(headers=headers):
+                response = self.get(self.stranger, **headers)
+                self.assertEqual(response.status_code, 403)
+                self.assertFalse(response.has_header('ETag'))
+
+                response = self.get(None, **headers)
+                self.assertEqual(response.status_code, 302)
+
+        # ETag с чужим пользователем владельцу тоже не подходит
+        self.assertNotEqual(
+            self.get(self.owner, HTTP_IF_NONE_MATCH=etag.replace(str(self.owner.pk), str(self.stranger.pk))).status_code,
+            304,
+        )
+
+    def test_client_dashboard(self):
+        url = reverse('app:client_dashboard')
+        etag = self.get(self.owner, url)['ETag']
+        self.assertEqual(self.get(self.owner, url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # У другого клиента свой ETag: чужой не даёт 304
+        self.assertEqual(self.get(self.stranger, url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        Contract.objects.filter(client=self.owner).delete()
+        self.assertEqual(self.get(self.owner, url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ReceivablesTests(TestCase):
+    """Векторный график отчёта по задолженности против построчного графика ledger."""
+
+    TODAY = datetime.date(2024, 6, 15)
+
+    def setUp(self):
+        self.today = mock.patch('django.utils.timezone.localdate', return_value=self.TODAY)
+        self.today.start()
+        self.addCleanup(self.today.stop)
+
+        vehicle = make_vehicle()
+        self.contracts = [
+            # 31-е: февраль високосного года, 30-дневные месяцы; первоначальный взнос 10% от 20000
+            make_contract(
+                vehicle, start_date=datetime.date(2024, 1, 31), end_date=datetime.date(2024, 12, 31),
+                payment_due_day=31, initial_payment_percent=10, total_amount=Decimal('13000'),
+            ),
+            # Срок оплаты 30-го, договор с прошлого года: февраль короче срока
+            make_contract(
+                vehicle, start_date=datetime.date(2023, 11, 30), end_date=datetime.date(2024, 5, 30),
+                payment_due_day=30, monthly_payment=Decimal('1500.50'),
+            ),
+            # Частично оплачен: 2500 гасят два платежа целиком и половину третьего
+            make_contract(vehicle),
+        ]
+        Payment.objects.create(contract=self.contracts[2], amount=Decimal('2500'), paid_at=self.TODAY)
+
+    def project(self):
+        columns = list(zip(*(
+            (c.start_date, c.end_date, c.payment_due_day, c.initial_payment, c.monthly_payment, c.paid_total)
+            for c in self.contracts
+        )))
+        due, amounts = receivables.project_schedules(
+            np.array(columns[0], dtype='datetime64[D]'),
+            np.array(columns[1], dtype='datetime64[D]'),
+            np.array(columns[2], dtype=np.int64),
+            receivables._cents(columns[3]),
+            receivables._cents(columns[4]),
+        )
+        return due, amounts, receivables.unpaid_amounts(amounts, receivables._cents(columns[5]))
+
+    def test_matches_ledger(self):
+        for contract in self.contracts:
+            contract.refresh_from_db()
+        due, amounts, unpaid = self.project()
+
+        for index, contract in enumerate(self.contracts):
+            with self.subTest(contract=contract.contract_number):
+                projected = [
+                    (day.item(), int(amount), int(left))
+                    for day, amount, left in zip(due[index], amounts[index], unpaid[index]) if amount
+                ]
+                expected = [
+                    (day, int(amount * 100), int((amount - paid) * 100))
+                    for day, amount, paid in contract.schedule.order_by('number')
+                    .values_list('due_date', 'amount', 'paid_amount')
+                ]
+                self.assertEqual(projected, expected)
+
+        first = [day.item() for day in due[0][1:6]]
+        self.assertEqual(first, [
+            datetime.date(2024, 2, 29), datetime.date(2024, 3, 31), datetime.date(2024, 4, 30),
+            datetime.date(2024, 5, 31), datetime.date(2024, 6, 30),
+        ])
+        self.assertEqual(due[1][3].item(), datetime.date(2024, 2, 29))
+        self.assertEqual(list(unpaid[2][1:4]), [0, 0, 50000])
+
+    def test_report_totals(self):
+        report = receivables.build_receivables_report(self.TODAY)
+        rows = list(Contract.objects.values_list('schedule__amount', 'schedule__paid_amount', 'schedule__due_date'))
+        self.assertEqual(report['contracts'], 3)
+        self.assertEqual(report['outstanding'], sum(amount - paid for amount, paid, _ in rows))
+        self.assertEqual(
+            report['overdue'],
+            sum(amount - paid for amount, paid, day in rows if day <= self.TODAY),
+        )
+        self.assertEqual(report['overdue'], sum(Contract.objects.values_list('debt_amount', flat=True)))
+
+
+class QuoteTests(TestCase):
+    def test_zero_rate(self):
+        grid = quotes.quote_grid(12000, terms=(12, 24), down_percents=(0, 25), rates=(0, 12))
+        self.assertEqual(grid['monthly_payment'].shape, (2, 2, 2))
+        self.assertFalse(np.isnan(grid['monthly_payment']).any())
+
+        # Без ставки: остаток делится поровну, переплаты нет
+        self.assertEqual(grid['monthly_payment'][:, :, 0].tolist(), [[1000, 750], [500, 375]])
+        self.assertEqual(grid['total_cost'][:, :, 0].tolist(), [[12000, 12000], [12000, 12000]])
+        self.assertEqual(grid['overpayment'][:, :, 0].tolist(), [[0, 0], [0, 0]])
+        self.assertEqual(grid['effective_rate'][0, 0, 0], 0)
+
+        # 12% годовых, 12 месяцев: аннуитет 1066.19 на 12000
+        self.assertEqual(grid['monthly_payment'][0, 0, 1], 1066.19)
+        self.assertEqual(grid['down_payment'][0, 1, 1], 3000)
+        self.assertEqual(grid['effective_rate'][0, 0, 1], 12.68)
+
+        offers = quotes.grid_as_json(12000, grid)['offers']
+        self.assertEqual(len(offers), 8)
+        self.assertEqual(offers[1], {
+            'term': 12, 'down_percent': 0.0, 'rate': 12.0, 'down_payment': 0.0,
+            'monthly_payment': 1066.19, 'total_cost': 12794.23, 'overpayment': 794.23, 'effective_rate': 12.68,
+        })
+
+    def test_api(self):
+        vehicle = make_vehicle(price=12000)
+        url = reverse('app:vehicle_quote_api', kwargs={'pk': vehicle.pk})
+        self.client.force_login(User.objects.create(username='manager', is_staff_member=True))
+
+        response = self.client.get(url, {'terms': '12', 'down': '0', 'rates': '0'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['offers'][0]['monthly_payment'], 1000)
+
+        for params in (
+            {'price': '0'}, {'price': 'nan'}, {'price': 'inf'}, {'price': 'дорого'},
+            {'terms': '0'}, {'terms': '12,abc'}, {'terms': '121'}, {'terms': ','},
+            {'terms': ','.join(str(n) for n in range(1, quotes.MAX_VALUES + 2))},
+            {'down': '100'}, {'rates': '-1'}, {'rates': 'nan'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+        self.client.force_login(User.objects.create(username='client'))
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class ContractAdminTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create(username='admin', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.first, self.second = make_vehicle(), make_vehicle('TESTVIN0000000002')
+        self.active = make_contract(self.first)
+        self.debt = make_contract(self.second, status='debt')
+
+    def run_action(self, action, *contracts):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('admin:app_contract_changelist'), {
+                'action': action, '_selected_action': [contract.pk for contract in contracts],
+            }, follow=True)
+
+    def test_change_status(self):
+        # Карточки и отчёт уже в кэше: у них есть версии
+        for vehicle in (self.first, self.second):
+            caching.vehicle_page(vehicle.pk)
+        receivables.cached_receivables_report()
+        versions = (caching.vehicle_version(self.first.pk), caching.vehicle_version(self.second.pk))
+        report_version = cache.get(receivables.CACHE_VERSION_KEY)
+
+        response = self.run_action('mark_debt', self.active, self.debt)
+        self.assertContains(response, "установлен у договоров: 1")
+
+        self.assertEqual(set(Contract.objects.values_list('status', flat=True)), {'debt'})
+        self.assertEqual(
+            list(ContractStatusChange.objects.values_list('contract', 'old_status', 'new_status', 'reason')),
+            [(self.active.pk, 'active', 'debt', "Изменено вручную: admin")],
+        )
+        # Карточка изменённого договора и отчёт сброшены, вторая карточка — нет
+        self.assertEqual(caching.vehicle_version(self.first.pk), versions[0] + 1)
+        self.assertEqual(caching.vehicle_version(self.second.pk), versions[1])
+        self.assertEqual(cache.get(receivables.CACHE_VERSION_KEY), report_version + 1)
+        self.first.refresh_from_db()
+        self.assertGreater(self.first.updated_at, self.active.updated_at)
+
+    def test_nothing_to_change(self):
+        response = self.run_action('mark_debt', self.debt)
+        self.assertContains(response, "Статус уже установлен")
+        self.assertFalse(ContractStatusChange.objects.exists())
@@ -0,0 +1,238 @@
+import datetime
+import hashlib
+import os
+import re
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from . import caching, metrics
+from .models import Vehicle, VehicleDocument, ChunkedUpload
+
+# Читаем тело запроса небольшими блоками, чтобы часть не висела в памяти целиком
+READ_BLOCK_SIZE = 64 * 1024
+
+CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ChunkError(Exception):
+    """
+    Часть файла отклонена: неверный диапазон, размер или контрольная сумма.
+    status — HTTP-код, который вернёт view (409 = клиенту нужно продолжить с offset).
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledFile(File):
+    """
+    Собранный файл-заготовка. FileSystemStorage видит temporary_file_path()
+    и просто переносит файл на место, а не копирует его заново.
+    """
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload):
+    return default_storage.path(upload.part_name)
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def start_upload(vehicle, user, target, filename, total_size, sha256='', title=''):
+    """
+    Регистрирует новую загрузку и создаёт пустой файл-заготовку.
+    """
+    if target not in dict(ChunkedUpload.TARGET_CHOICES):
+        raise ChunkError(f"Неизвестное поле для загрузки: {target}")
+
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise ChunkError("Не указан размер файла")
+
+    if total_size <= 0 or total_size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise ChunkError("Недопустимый размер файла")
+
+    filename = os.path.basename(filename or '')
+    if not filename:
+        raise ChunkError("Не указано имя файла")
+
+    upload = ChunkedUpload.objects.create(
+        vehicle=vehicle,
+        user=user,
+        target=target,
+        title=(title or '')[:100],
+        filename=filename[:255],
+        total_size=total_size,
+        sha256=(sha256 or '').lower(),
+    )
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+    return upload
+
+
+def parse_content_range(header):
+    match = CONTENT_RANGE_RE.match(header or '')
+    if not match:
+        raise ChunkError("Нужен заголовок Content-Range: bytes start-end/total")
+
+    start, end, total = (int(value) for value in match.groups())
+    if end < start:
+        raise ChunkError("Неверный диапазон Content-Range")
+
+    return start, end, total
+
+
+def write_chunk(upload, stream, content_range, chunk_sha256=''):
+    """
+    Пишет одну часть прямо в файл-заготовку по её смещению.
+    Часть принимается только если она продолжает уже загруженные данные
+    и её SHA-256 (если передан) совпадает, иначе файл обрезается обратно.
+    """
+    start, end, total = parse_content_range(content_range)
+
+    # Строка загрузки заблокирована, пока часть пишется в файл: два запроса с одним
+    # смещением не пишут одновременно, второй увидит сдвинутый offset и получит 409
+    with transaction.atomic():
+        locked = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+
+        if locked.is_complete:
+            raise ChunkError("Загрузка уже завершена", status=409)
+        if locked.is_expired:
+            raise ChunkError("Загрузка устарела, начните её заново", status=410)
+        if total != locked.total_size:
+            raise ChunkError("Размер файла не совпадает с заявленным")
+        if start != locked.offset:
+            raise ChunkError("Часть не продолжает загруженные данные", status=409)
+
+        length = end - start + 1
+        if length > settings.CHUNKED_UPLOAD_CHUNK_SIZE or end >= total:
+            raise ChunkError("Слишком большая часть файла")
+
+        digest = hashlib.sha256()
+        received = 0
+
+        with open(part_path(locked), 'r+b') as f:
+            f.seek(start)
+            while received < length:
+                block = stream.read(min(READ_BLOCK_SIZE, length - received))
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                received += len(block)
+
+            if received != length:
+                f.truncate(start)
+                raise ChunkError("Часть загружена не полностью")
+
+            if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+                f.truncate(start)
+                raise ChunkError("Контрольная сумма части не совпадает")
+
+        locked.offset = end + 1
+        locked.save(update_fields=['offset', 'updated_at'])
+
+    upload.offset = locked.offset
+    return upload
+
+
+def expire_uploads(dry_run=False):
+    """
+    Удаляет брошенные загрузки (см. ChunkedUpload.is_expired) и их файлы-заготовки.
+    Возвращает число удалённых загрузок.
+    """
+    cutoff = timezone.now() - datetime.timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    stale = ChunkedUpload.objects.filter(status='uploading', updated_at__lt=cutoff)
+    if dry_run:
+        return stale.count()
+
+    expired = 0
+    for upload_id in stale.values_list('pk', flat=True).iterator():
+        with transaction.atomic():
+            # Под блокировкой ещё раз: за это время могла прийти новая часть
+            upload = ChunkedUpload.objects.select_for_update().filter(
+                pk=upload_id, status='uploading', updated_at__lt=cutoff
+            ).first()
+            if upload is None:
+                continue
+            path = part_path(upload)
+            if os.path.exists(path):
+                os.remove(path)
+            upload.delete()
+            expired += 1
+    return expired
+
+
+def finish_upload(upload):
+    """
+    Проверяет собранный файл и привязывает его к автомобилю или документу.
+    """
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().select_related('vehicle').get(pk=upload.pk)
+
+        if upload.is_complete:
+            raise ChunkError("Загрузка уже завершена", status=409)
+        if upload.offset != upload.total_size:
+            raise ChunkError("Файл загружен не полностью", status=409)
+
+        path = part_path(upload)
+        corrupted = bool(upload.sha256) and file_sha256(path) != upload.sha256
+
+        if corrupted:
+            # Файл испорчен — начинаем загрузку заново. Ошибку бросаем после фиксации
+            # транзакции: иначе сброс offset откатился бы, а файл уже обрезан
+            open(path, 'wb').close()
+            upload.offset = 0
+            upload.save(update_fields=['offset', 'updated_at'])
+        else:
+            result = _attach_file(upload, path)
+
+    if corrupted:
+        raise ChunkError("Контрольная сумма файла не совпадает, загрузите файл заново", status=409)
+    return result
+
+
+def _attach_file(upload, path):
+    vehicle = upload.vehicle
+
+    with open(path, 'rb') as f:
+        content = AssembledFile(f, name=upload.filename)
+
+        if upload.target == 'document':
+            result = VehicleDocument(vehicle=vehicle, title=upload.title or upload.filename)
+            result.file.save(upload.filename, content, save=False)
+            result.save()
+        else:
+            field_file = getattr(vehicle, upload.target)
+            field_file.save(upload.filename, content, save=False)
+            # Обновляем только поле с файлом: Vehicle.save() заново сходил бы в Wialon
+            Vehicle.objects.filter(pk=vehicle.pk).update(
+                updated_at=timezone.now(), **{upload.target: field_file.name}
+            )
+            # update() не шлёт сигналов, карточку сбрасываем сами
+            caching.bump_vehicle_version(vehicle.pk)
+            result = vehicle
+
+    if os.path.exists(path):
+        os.remove(path)
+
+    upload.status = 'complete'
+    upload.save(update_fields=['status', 'updated_at'])
+    metrics.observe_upload(upload.target, upload.total_size)
+
+    return result
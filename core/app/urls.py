@@ -1,7 +1,5 @@
 from django.urls import path
-from . import views
-from django.conf import settings
-from django.conf.urls.static import static
+from . import api, metrics, views
 
 app_name = 'app'
 
@@ -10,6 +8,7 @@ urlpatterns = [
 
     # Для клиентов
     path('vehicle/new/', views.VehicleCreationView.as_view(), name='vehicle_create'),
+    path('vehicle/import/', views.VehicleImportView.as_view(), name='vehicle_import'),
     path('dashboard/', views.ClientDashboardView.as_view(), name='client_dashboard'),
     path('vehicle/<str:pk>/', views.VehicleDetailView.as_view(), name='vehicle_detail'),
     path('vehicle/<str:pk>/edit/', views.VehicleUpdateView.as_view(), name='vehicle_edit'),
@@ -18,8 +17,13 @@ urlpatterns = [
     path('vehicle/<str:pk>/add-doc/', views.AddDocumentView.as_view(), name='add_document'),
     path('vehicle/<str:pk>/create-contract/', views.CreateContractView.as_view(), name='contract_create'),
     path('vehicle/<str:pk>/location/', views.vehicle_location_api, name='vehicle_location_api'),
+    path('vehicle/<str:pk>/quote/', views.vehicle_quote_api, name='vehicle_quote_api'),
+    path('vehicle/<str:pk>/upload/', views.chunked_upload_start, name='chunked_upload_start'),
+    path('upload/<uuid:upload_id>/', views.chunked_upload_detail, name='chunked_upload_detail'),
+    path('upload/<uuid:upload_id>/complete/', views.chunked_upload_complete, name='chunked_upload_complete'),
     path('contract/<int:pk>/edit/', views.ContractUpdateView.as_view(), name='contract_edit'),
     path('contract/<int:pk>/print/', views.ContractPrintView.as_view(), name='contract_print'),
+    path('contract/<int:pk>/payments/', views.ContractPaymentsView.as_view(), name='contract_payments'),
     path('clients/', views.ClientListView.as_view(), name='client_list'),
     path('client/<int:pk>/', views.ClientDetailView.as_view(), name='client_detail'),
 
@@ -30,6 +34,19 @@ urlpatterns = [
     # Для сотрудников
     path('search/', views.StaffSearchView.as_view(), name='staff_search'),
     path('dashboard/staff', views.StaffDashboardView.as_view(), name='staff_dashboard'),
+    path('analytics/defects/', views.FleetDefectsView.as_view(), name='fleet_defects'),
+    path('analytics/open-defects/', views.OpenDefectsView.as_view(), name='open_defects'),
+    path('analytics/receivables/', views.ReceivablesView.as_view(), name='receivables'),
+    path('analytics/receivables/csv/', views.ReceivablesCsvView.as_view(), name='receivables_csv'),
+    path('export/vehicles/', views.VehicleExportView.as_view(), name='export_vehicles'),
+    path('export/clients/', views.ClientExportView.as_view(), name='export_clients'),
+    path('export/contracts/', views.ContractExportView.as_view(), name='export_contracts'),
+
+    # API для внешних систем (только чтение)
+    path('api/v1/', api.api_index, name='api_index'),
+    path('api/v1/<str:resource_name>/', api.resource_list, name='api_list'),
+    path('api/v1/<str:resource_name>/<str:pk>/', api.resource_detail, name='api_detail'),
+
+    # Метрики для Prometheus (доступ — как к API)
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
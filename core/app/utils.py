@@ -1,10 +1,11 @@
-import requests
 import json
 from django.conf import settings
 
 from bs4 import BeautifulSoup
 import re
 
+from . import metrics
+
 def get_wialon_location(wialon_unit_id):
     """
     Возвращает словарь {lat: float, lon: float} или None, если ошибка.
@@ -12,10 +13,12 @@ def get_wialon_location(wialon_unit_id):
     if not wialon_unit_id:
         return None
 
-    session = requests.Session()
+    session = metrics.ObservedSession()
     # Если вы используете Wialon Local, адрес может отличаться
     base_url = getattr(settings, 'WIALON_BASE_URL', 'https://hst-api.wialon.com/wialon/ajax.html')
     token = getattr(settings, 'WIALON_TOKEN', '')
+    # Без таймаута зависший Wialon держит воркер сколько угодно
+    timeout = getattr(settings, 'WIALON_TIMEOUT', 10)
 
     if not token:
         print("Ошибка: Не задан WIALON_TOKEN в settings.py")
@@ -33,7 +36,7 @@ def get_wialon_location(wialon_unit_id):
         login_resp = session.get(base_url, params={
             'svc': 'token/login',
             'params': json.dumps(login_params)
-        })
+        }, timeout=timeout)
         
         # Преобразуем ответ в JSON
         login_data = login_resp.json()
@@ -63,7 +66,7 @@ def get_wialon_location(wialon_unit_id):
             'svc': 'core/search_item',
             'params': json.dumps(search_params),
             'sid': sid
-        })
+        }, timeout=timeout)
         item_data = item_resp.json()
         
         # Разбираем ответ. Координаты лежат в 'lmsg' (last message) -> 'pos'
@@ -95,16 +98,19 @@ def find_wialon_id_by_imei(imei):
     if not imei:
         return None
 
-    session = requests.Session()
+    session = metrics.ObservedSession()
     base_url = getattr(settings, 'WIALON_BASE_URL', 'https://hst-api.wialon.com/wialon/ajax.html')
     token = getattr(settings, 'WIALON_TOKEN', '')
+    timeout = getattr(settings, 'WIALON_TIMEOUT', 10)
+    if not token:
+        return None
 
     # 1. ЛОГИН
     try:
         login_resp = session.get(base_url, params={
             'svc': 'token/login',
             'params': json.dumps({"token": token})
-        })
+        }, timeout=timeout)
         login_data = login_resp.json()
         if 'eid' not in login_data:
             return None
@@ -131,7 +137,7 @@ def find_wialon_id_by_imei(imei):
             'svc': 'core/search_items',
             'params': json.dumps(search_params),
             'sid': sid
-        })
+        }, timeout=timeout)
         data = resp.json()
 
         # Если нашли хотя бы одну машину
@@ -143,12 +149,73 @@ def find_wialon_id_by_imei(imei):
     return None
 
 
+def find_wialon_ids_by_imei(imeis):
+    """
+    Пакетный вариант find_wialon_id_by_imei для импорта: один логин и один запрос
+    на все объекты аккаунта вместо двух запросов на каждую машину.
+    Возвращает словарь {IMEI: ID}; ненайденных IMEI в нём нет.
+    """
+    imeis = {str(imei) for imei in imeis if imei}
+    if not imeis:
+        return {}
+
+    session = metrics.ObservedSession()
+    base_url = getattr(settings, 'WIALON_BASE_URL', 'https://hst-api.wialon.com/wialon/ajax.html')
+    token = getattr(settings, 'WIALON_TOKEN', '')
+    timeout = getattr(settings, 'WIALON_TIMEOUT', 10)
+    if not token:
+        print("Ошибка: Не задан WIALON_TOKEN в settings.py")
+        return {}
+
+    try:
+        login_data = session.get(base_url, params={
+            'svc': 'token/login',
+            'params': json.dumps({"token": token})
+        }, timeout=timeout).json()
+        if 'eid' not in login_data:
+            return {}
+        sid = login_data['eid']
+    except Exception as e:
+        print(f"Wialon Login Error: {e}")
+        return {}
+
+    search_params = {
+        "spec": {
+            "itemsType": "avl_unit",
+            "propName": "sys_unique_id",
+            "propValueMask": "*",
+            "sortType": "sys_name"
+        },
+        "force": 1,
+        # 0x1 — базовые свойства (id), 0x100 — дополнительные (uid = IMEI)
+        "flags": 0x1 | 0x100,
+        "from": 0,
+        "to": 0
+    }
+
+    try:
+        data = session.get(base_url, params={
+            'svc': 'core/search_items',
+            'params': json.dumps(search_params),
+            'sid': sid
+        }, timeout=timeout).json()
+    except Exception as e:
+        print(f"Wialon Search Error: {e}")
+        return {}
+
+    return {
+        str(item['uid']): item['id']
+        for item in data.get('items', [])
+        if str(item.get('uid')) in imeis
+    }
+
 def get_html(url):
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36'
     }
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        with metrics.ObservedSession() as session:
+            response = session.get(url, headers=headers, timeout=10)
         if response.status_code == 200:
             return response.text
     except Exception as e:
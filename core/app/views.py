@@ -1,24 +1,47 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.template.loader import get_template
-from django.urls import reverse_lazy, set_urlconf
+from django.urls import reverse, reverse_lazy, set_urlconf
 from django.views.generic import ListView, DetailView, View, UpdateView, DeleteView, CreateView, TemplateView, FormView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.db.models import Q, ProtectedError
-from django.core.exceptions import PermissionDenied
+from django.db.models import Prefetch, Q, ProtectedError
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import SuspiciousFileOperation
+from django.utils._os import safe_join
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.views.decorators.http import require_POST, condition
+from django.views.decorators.cache import cache_control
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.decorators import method_decorator
+from django.utils import timezone
+
+import hashlib
+import json
+import math
+import os
 
 import weasyprint
 from django.template.loader import render_to_string
 
-from .models import Vehicle, Contract, Inspection, VehiclePhoto, VehicleDocument, DiagnosticReport
+from .models import Vehicle, Contract, Inspection, VehiclePhoto, VehicleDocument, DiagnosticReport, ChunkedUpload, \
+    VehicleDefect, Payment
 from .forms import VehicleForm, VehicleCreationForm, AddPhotoForm, VehicleDocumentForm, ContractCreationForm, \
-    ContractChangeForm, DiagnosticReportForm
-from .utils import get_wialon_location, parse_external_url
+    ContractChangeForm, DiagnosticReportForm, PaymentForm, VehicleImportUploadForm
+from .utils import parse_external_url
+from .uploads import ChunkError, start_upload, write_chunk, finish_upload
+from .media import can_access_media, media_response
+from .sheet import render_pdf_sheet
+from . import analytics, caching, conditional, exports, health, importer, ledger, metrics, quotes, receivables
 
 User = get_user_model()
 
+def is_staff_user(user):
+    return user.is_authenticated and (user.is_staff_member or user.is_superuser)
+
+
 class StaffRequiredMixin(UserPassesTestMixin):
     def test_func(self):
         return self.request.user.is_staff_member or self.request.user.is_superuser
@@ -48,6 +71,35 @@ class VehicleCreationView(LoginRequiredMixin, StaffRequiredMixin, CreateView):
         return super().form_invalid(form)
 
 
+
+class VehicleImportView(LoginRequiredMixin, StaffRequiredMixin, FormView):
+    """
+    Загрузка парка из CSV/XLSX (см. app/importer.py). Результат показывается
+    на той же странице: сколько создано и какие строки не прошли проверку.
+    """
+    form_class = VehicleImportUploadForm
+    template_name = 'app/vehicle_import.html'
+    # Больше ошибок на странице не показываем — для полного списка есть manage.py import_vehicles
+    max_errors_shown = 200
+
+    def form_valid(self, form):
+        upload = form.cleaned_data['file']
+        try:
+            # Wialon ID здесь не ищем: ответ Wialon не должен держать страницу загрузки.
+            # Привязка — командой link_wialon или действием в админке
+            result = importer.import_vehicles(upload, upload.name, link_wialon=False)
+        except importer.ImportFileError as e:
+            form.add_error('file', str(e))
+            return self.form_invalid(form)
+
+        if result.created:
+            messages.success(self.request, f"Импортировано автомобилей: {result.created}")
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(),
+            result=result,
+            errors=result.errors[:self.max_errors_shown],
+        ))
+
 class VehicleUpdateView(LoginRequiredMixin, StaffRequiredMixin, UpdateView):
     model = Vehicle
     form_class = VehicleForm
@@ -84,6 +136,7 @@ class AddDocumentView(LoginRequiredMixin, StaffRequiredMixin, CreateView):
     def form_valid(self, form):
         vehicle = get_object_or_404(Vehicle, pk=self.kwargs['pk'])
         form.instance.vehicle = vehicle
+        metrics.observe_upload('document', form.instance.file.size)
         return super().form_valid(form)
 
     def get_success_url(self):
@@ -105,6 +158,7 @@ class AddPhotoView(LoginRequiredMixin, StaffRequiredMixin, FormView):
 
         for f in files:
             VehiclePhoto.objects.create(vehicle=vehicle, image=f)
+            metrics.observe_upload('photo', f.size)
 
         return super().form_valid(form)
 
@@ -129,6 +183,14 @@ class HomeRedirectView(LoginRequiredMixin, View):
         else:
             return redirect('app:client_dashboard')
 
+# Браузер хранит страницу у себя, но каждый раз сверяет ETag: неизменившаяся отдаётся 304
+revalidate = cache_control(private=True, no_cache=True)
+
+
+@method_decorator([revalidate, condition(
+    etag_func=conditional.client_dashboard_etag,
+    last_modified_func=conditional.client_dashboard_last_modified,
+)], name='dispatch')
 class ClientDashboardView(LoginRequiredMixin, ListView):
     model = Contract
     template_name = 'app/client_dashboard.html'
@@ -137,34 +199,42 @@ class ClientDashboardView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return Contract.objects.filter(client=self.request.user).select_related('vehicle')
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['debt_total'] = ledger.client_debt(self.request.user)
+        return context
+
+
+@method_decorator([revalidate, condition(
+    etag_func=conditional.vehicle_detail_etag,
+    last_modified_func=conditional.vehicle_detail_last_modified,
+)], name='dispatch')
 class VehicleDetailView(LoginRequiredMixin, DetailView):
     model = Vehicle
     template_name = 'app/vehicle_detail.html'
     context_object_name = 'vehicle'
 
     def get_object(self):
-        vehicle = super().get_object()
+        # Машина и связанные данные берутся из кэша (app/caching.py)
+        self.page = caching.vehicle_page(self.kwargs['pk'])
+        if self.page is None:
+            raise Http404("Автомобиль не найден")
 
         # Разрешаем доступ, если это сотрудник ИЛИ суперпользователь
         is_manager = self.request.user.is_staff_member or self.request.user.is_superuser
 
         # Если это НЕ менеджер и НЕ админ, то включаем проверку на владельца
-        if not is_manager:
-            has_contract = Contract.objects.filter(
-                vehicle=vehicle,
-                client=self.request.user
-            ).exists()
-
-            if not has_contract:
-                raise PermissionDenied("У вас нет доступа к этому автомобилю")
+        if not is_manager and self.request.user.pk not in self.page['client_ids']:
+            raise PermissionDenied("У вас нет доступа к этому автомобилю")
 
-        return vehicle
+        return self.page['vehicle']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        context['inspections'] = self.object.inspections.all().order_by('-date')
-        context['latest_diagnostic'] = self.object.diagnostic_reports.order_by('-created_at').first()
+        context.update({key: value for key, value in self.page.items() if key not in ('vehicle', 'client_ids')})
+        context['is_manager'] = self.request.user.is_staff_member or self.request.user.is_superuser
+        context['cache_timeout'] = caching.VEHICLE_CACHE_TIMEOUT
 
         return context
 
@@ -175,34 +245,144 @@ class StaffDashboardView(LoginRequiredMixin, StaffRequiredMixin, ListView):
     context_object_name = 'vehicles'
     paginate_by = 20
 
-    def get_queryset(self):
-        queryset = Vehicle.objects.all().order_by('-created_at')
+    # ?sort= -> порядок; по оценке сортируем по индексу health_score
+    SORT_ORDERS = {
+        'new': ('-created_at',),
+        'health': ('health_score', '-created_at'),
+        '-health': ('-health_score', '-created_at'),
+    }
+
+    @classmethod
+    def filter_vehicles(cls, params):
+        """Фильтры и сортировка списка по GET-параметрам. Ими же пользуется выгрузка."""
+        sort = params.get('sort', 'new')
+        queryset = Vehicle.objects.all().order_by(*cls.SORT_ORDERS.get(sort, cls.SORT_ORDERS['new']))
 
-        filter_type = self.request.GET.get('filter')
+        filter_type = params.get('filter')
 
         if filter_type == 'free':
-            queryset = queryset.exclude(contracts__status='active').filter(overall_status='ok')
+            queryset = queryset.exclude(contracts__status__in=Contract.OPEN_STATUSES).filter(overall_status='ok')
         elif filter_type == 'rented':
-            queryset = queryset.filter(contracts__status='active').distinct()
+            queryset = queryset.filter(contracts__status__in=Contract.OPEN_STATUSES).distinct()
         elif filter_type == 'repair':
             queryset = queryset.exclude(overall_status='ok')
 
+        condition = health.condition_range(params.get('condition'))
+        if condition:
+            queryset = queryset.filter(health_score__range=condition)
+
         return queryset
 
+    def get_queryset(self):
+        # Обложка и открытый договор для каждой строки — двумя запросами на страницу, а не на машину
+        return self.filter_vehicles(self.request.GET).prefetch_related(
+            Prefetch('photos', queryset=VehiclePhoto.objects.order_by('pk'), to_attr='prefetched_photos'),
+            Prefetch(
+                'contracts',
+                queryset=Contract.objects.filter(status__in=Contract.OPEN_STATUSES).order_by('pk'),
+                to_attr='open_contracts',
+            ),
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         all_vehicles = Vehicle.objects.all()
 
         context['total_vehicles'] = all_vehicles.count()
-        context['free_vehicles'] = all_vehicles.exclude(contracts__status='active').filter(overall_status='ok').count()
+        context['free_vehicles'] = all_vehicles.exclude(contracts__status__in=Contract.OPEN_STATUSES).filter(overall_status='ok').count()
         context['repair_needed'] = all_vehicles.exclude(overall_status='ok').count()
         context['active_contracts'] = Contract.objects.filter(status='active').count()
         context['current_filter'] = self.request.GET.get('filter', 'all')
+        context['current_sort'] = self.request.GET.get('sort', 'new')
+        context['current_condition'] = self.request.GET.get('condition', '')
+        context['condition_choices'] = [(value, label) for value, label, _, _ in health.CONDITION_CHOICES]
+
+        return context
+
+
+class FleetDefectsView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
+    """
+    Частота неисправностей по последним диагностикам автопарка
+    с группировкой по марке, модели, году или пробегу.
+    """
+    template_name = 'app/fleet_defects.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        group_by = self.request.GET.get('group', 'brand')
+        if group_by not in dict(analytics.GROUP_CHOICES):
+            group_by = 'brand'
+
+        brand = self.request.GET.get('brand', '').strip()
+        model_name = self.request.GET.get('model', '').strip()
+        year = self.request.GET.get('year', '').strip()
+        year = int(year) if year.isdigit() else None
+
+        context['report'] = analytics.cached_defect_report(group_by, brand, model_name, year)
+        context['group_choices'] = analytics.GROUP_CHOICES
+        context['current_group'] = group_by
+        context['brand'] = brand
+        context['model'] = model_name
+        context['year'] = year or ''
 
         return context
 
 
+class ReceivablesView(LoginRequiredMixin, StaffRequiredMixin, TemplateView):
+    """
+    Дебиторская задолженность: старение просрочки, ожидаемые поступления
+    по месяцам и остаток по маркам автомобилей.
+    """
+    template_name = 'app/receivables.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['report'] = receivables.cached_receivables_report()
+        return context
+
+
+class ReceivablesCsvView(LoginRequiredMixin, StaffRequiredMixin, View):
+    def get(self, request):
+        report = receivables.cached_receivables_report()
+
+        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="receivables_{report["today"]:%Y%m%d}.csv"'
+        # BOM, чтобы Excel распознал UTF-8
+        response.write('\ufeff')
+        receivables.write_csv(report, response)
+        return response
+
+
+class OpenDefectsView(LoginRequiredMixin, StaffRequiredMixin, ListView):
+    """
+    Замечания по автопарку, которые не устранены дольше N дней.
+    """
+    template_name = 'app/open_defects.html'
+    context_object_name = 'defects'
+    paginate_by = 50
+
+    DEFAULT_DAYS = 30
+
+    def get_days(self):
+        days = self.request.GET.get('days', '')
+        return int(days) if days.isdigit() else self.DEFAULT_DAYS
+
+    def get_queryset(self):
+        return (
+            VehicleDefect.objects
+            .open_longer_than(self.get_days())
+            .select_related('vehicle')
+            .order_by('opened_at')
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['days'] = self.get_days()
+        return context
+
+
 class StaffSearchView(LoginRequiredMixin, ListView):
     model = Vehicle
     template_name = 'app/staff_search.html'
@@ -242,7 +422,7 @@ class CreateContractView(LoginRequiredMixin, StaffRequiredMixin, CreateView):
     def dispatch(self, request, *args, **kwargs):
         self.vehicle = get_object_or_404(Vehicle, pk=self.kwargs.get('pk'))
 
-        if self.vehicle.contracts.filter(status='active').exists():
+        if self.vehicle.contracts.filter(status__in=Contract.OPEN_STATUSES).exists():
             messages.error(request, f'Автомобиль {self.vehicle.license_plate} уже находится в аренде')
             return redirect('app:vehicle_detail', pk=self.vehicle.pk)
 
@@ -294,22 +474,202 @@ class ContractUpdateView(LoginRequiredMixin, StaffRequiredMixin, UpdateView):
         return context
 
 
+class ContractPaymentsView(LoginRequiredMixin, StaffRequiredMixin, CreateView):
+    """
+    График платежей договора и приём оплаты.
+    Баланс пересчитывается в app/ledger.py при сохранении платежа.
+    """
+    model = Payment
+    form_class = PaymentForm
+    template_name = 'app/contract_payments.html'
+
+    def dispatch(self, request, *args, **kwargs):
+        self.contract = get_object_or_404(Contract.objects.select_related('vehicle', 'client'), pk=self.kwargs['pk'])
+        return super().dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        form.instance.contract = self.contract
+        form.instance.created_by = self.request.user
+        response = super().form_valid(form)
+        messages.success(self.request, f"Платёж {self.object.amount} ₽ по договору №{self.contract.contract_number} принят")
+        return response
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['contract'] = self.contract
+        context['vehicle'] = self.contract.vehicle
+        context['schedule'] = self.contract.schedule.all()
+        context['payments'] = self.contract.payments.select_related('created_by').order_by('-paid_at', '-pk')
+        context['today'] = timezone.localdate()
+        return context
+
+    def get_success_url(self):
+        return reverse('app:contract_payments', kwargs={'pk': self.contract.pk})
+
+
+def vehicle_quote_api(request, pk):
+    """
+    Сетка лизинговых предложений для машины: ?price=&terms=12,24&down=0,20&rates=16,20.
+    Пустые параметры — цена машины и варианты из settings.LEASE_QUOTE_*.
+    """
+    if not is_staff_user(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    vehicle = get_object_or_404(Vehicle.objects.only('price'), pk=pk)
+
+    try:
+        price = float(request.GET.get('price') or vehicle.price)
+        if not math.isfinite(price) or price <= 0:
+            raise quotes.QuoteError("Цена должна быть больше нуля")
+        terms = quotes.parse_values(request.GET.get('terms'), settings.LEASE_QUOTE_TERMS, cast=int, low=1, high=120)
+        down = quotes.parse_values(request.GET.get('down'), settings.LEASE_QUOTE_DOWN_PERCENTS, high=99)
+        rates = quotes.parse_values(request.GET.get('rates'), settings.LEASE_QUOTE_RATES, high=100)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    grid = quotes.quote_grid(price, terms, down, rates)
+    return JsonResponse(quotes.grid_as_json(price, grid))
+
+
 def vehicle_location_api(request, pk):
-    if not request.user.is_staff_member and not request.user.is_superuser:
+    if not is_staff_user(request.user):
         return JsonResponse({'error': 'Forbidden'}, status=403)
     
-    vehicle = get_object_or_404(Vehicle, pk=pk)
+    page = caching.vehicle_page(pk)
+    if page is None:
+        raise Http404("Автомобиль не найден")
+    vehicle = page['vehicle']
 
     if not vehicle.wialon_id:
         return JsonResponse({'error': 'No Wialon ID set'}, status=404)
     
-    location = get_wialon_location(vehicle.wialon_id)
+    location = caching.vehicle_location(vehicle.wialon_id)
 
-    if location:
-        return JsonResponse(location)
-    else:
+    if not location:
         return JsonResponse({'error': 'Could not fetch location'}, status=503)
 
+    # Машина стоит — координаты те же, отвечаем 304 без тела
+    etag = quote_etag(hashlib.md5(json.dumps(location, sort_keys=True).encode()).hexdigest())
+    response = get_conditional_response(request, etag=etag) or JsonResponse(location)
+    response.headers['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _upload_state(upload):
+    return {
+        'upload_id': str(upload.pk),
+        'offset': upload.offset,
+        'total_size': upload.total_size,
+        'chunk_size': settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        'status': upload.status,
+        'url': reverse('app:chunked_upload_detail', kwargs={'upload_id': upload.pk}),
+        'complete_url': reverse('app:chunked_upload_complete', kwargs={'upload_id': upload.pk}),
+    }
+
+
+@require_POST
+def chunked_upload_start(request, pk):
+    """
+    Начало загрузки большого файла частями.
+    Тело запроса (JSON): target, filename, size, [sha256], [title].
+    """
+    if not is_staff_user(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    vehicle = get_object_or_404(Vehicle, pk=pk)
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+
+    try:
+        upload = start_upload(
+            vehicle,
+            request.user,
+            target=data.get('target'),
+            filename=data.get('filename'),
+            total_size=data.get('size'),
+            sha256=data.get('sha256', ''),
+            title=data.get('title', ''),
+        )
+    except ChunkError as e:
+        return JsonResponse({'error': str(e)}, status=e.status)
+
+    return JsonResponse(_upload_state(upload), status=201)
+
+
+def chunked_upload_detail(request, upload_id):
+    """
+    GET — сколько уже загружено (для докачки).
+    PUT — очередная часть файла с заголовками Content-Range и X-Chunk-Sha256.
+    """
+    if not is_staff_user(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id)
+
+    if request.method == 'GET':
+        return JsonResponse(_upload_state(upload))
+
+    if request.method != 'PUT':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    try:
+        write_chunk(
+            upload,
+            request,
+            request.headers.get('Content-Range'),
+            request.headers.get('X-Chunk-Sha256', '')
+        )
+    except ChunkError as e:
+        upload.refresh_from_db()
+        return JsonResponse(dict(_upload_state(upload), error=str(e)), status=e.status)
+
+    return JsonResponse(_upload_state(upload))
+
+
+@require_POST
+def chunked_upload_complete(request, upload_id):
+    if not is_staff_user(request.user):
+        return JsonResponse({'error': 'Forbidden'}, status=403)
+
+    upload = get_object_or_404(ChunkedUpload, pk=upload_id)
+
+    try:
+        finish_upload(upload)
+    except ChunkError as e:
+        upload.refresh_from_db()
+        return JsonResponse(dict(_upload_state(upload), error=str(e)), status=e.status)
+
+    upload.refresh_from_db()
+    return JsonResponse(dict(
+        _upload_state(upload),
+        redirect_url=reverse('app:vehicle_detail', kwargs={'pk': upload.vehicle_id})
+    ))
+
+
+def serve_media(request, path):
+    """
+    Раздача загруженных файлов (фото, видео, документы, паспорта) с проверкой прав.
+    """
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    if not can_access_media(request.user, path):
+        raise PermissionDenied("У вас нет доступа к этому файлу")
+
+    return media_response(request, path, full_path)
+
 
 class ContractPrintView(LoginRequiredMixin, StaffRequiredMixin, DetailView):
     model = Contract
@@ -330,21 +690,99 @@ class ClientListView(LoginRequiredMixin, StaffRequiredMixin, ListView):
     context_object_name = 'clients'
     paginate_by = 20
 
-    def get_queryset(self):
+    @staticmethod
+    def search_filter(query, prefix=''):
+        """Поиск клиента по строке; prefix='client__' — тот же поиск по договорам."""
+        return (
+            Q(**{f'{prefix}username__icontains': query}) |
+            Q(**{f'{prefix}email__icontains': query}) |
+            Q(**{f'{prefix}phone__icontains': query}) |
+            Q(**{f'{prefix}client_profile__full_name__icontains': query}) |
+            Q(**{f'{prefix}client_profile__passport_number__icontains': query})
+        )
+
+    @classmethod
+    def filter_clients(cls, params):
         queryset = User.objects.filter(is_staff_member=False).select_related('client_profile')
 
-        query = self.request.GET.get('q')
+        query = params.get('q')
         if query:
-            queryset = queryset.filter(
-                Q(username__icontains=query) |
-                Q(email__icontains=query) |
-                Q(phone__icontains=query) |
-                Q(client_profile__fullname__icontains=query) |
-                Q(client_profile__passport_number__icontains=query)
-            ).distinct()
+            queryset = queryset.filter(cls.search_filter(query)).distinct()
 
         return queryset.order_by('-date_joined')
 
+    def get_queryset(self):
+        return self.filter_clients(self.request.GET)
+
+
+class BaseExportView(LoginRequiredMixin, StaffRequiredMixin, View):
+    """
+    Выгрузка списка в CSV (?format=csv, по умолчанию) или XLSX (?format=xlsx)
+    с теми же фильтрами, что и на странице списка. См. app/exports.py.
+
+    Подклассу достаточно задать model, columns, filename и sheet_title —
+    тогда выгружаются все записи модели. Фильтры списка подключаются
+    переопределением get_queryset().
+    """
+    model = None
+    columns = None
+    filename = None
+    sheet_title = None
+
+    def get_queryset(self):
+        if self.model is None:
+            raise ImproperlyConfigured(
+                f"{type(self).__name__}: задайте model или переопределите get_queryset()"
+            )
+        return self.model._default_manager.order_by('pk')
+
+    def get(self, request):
+        return exports.export_response(
+            self.get_queryset(), self.columns, self.filename, request.GET.get('format'), self.sheet_title
+        )
+
+
+class VehicleExportView(BaseExportView):
+    model = Vehicle
+    columns = exports.VEHICLE_COLUMNS
+    filename = 'vehicles'
+    sheet_title = 'Автомобили'
+
+    def get_queryset(self):
+        return StaffDashboardView.filter_vehicles(self.request.GET)
+
+
+class ClientExportView(BaseExportView):
+    model = User
+    columns = exports.CLIENT_COLUMNS
+    filename = 'clients'
+    sheet_title = 'Клиенты'
+
+    def get_queryset(self):
+        # Для выгрузки select_related не нужен: связанные поля берутся в values_list
+        return ClientListView.filter_clients(self.request.GET).select_related(None)
+
+
+class ContractExportView(BaseExportView):
+    """Договоры с машиной и клиентом. Фильтры: ?status= и поиск клиента ?q= как в списке клиентов."""
+    model = Contract
+    columns = exports.CONTRACT_COLUMNS
+    filename = 'contracts'
+    sheet_title = 'Договоры'
+
+    def get_queryset(self):
+        queryset = Contract.objects.order_by('-created_at')
+
+        status = self.request.GET.get('status')
+        if status in dict(Contract.STATUS_CHOICES):
+            queryset = queryset.filter(status=status)
+
+        query = self.request.GET.get('q')
+        if query:
+            queryset = queryset.filter(ClientListView.search_filter(query, prefix='client__'))
+
+        return queryset
+
 
 class ClientDetailView(LoginRequiredMixin, StaffRequiredMixin, DetailView):
     model = User
@@ -376,6 +814,7 @@ class DiagnosticEditView(LoginRequiredMixin, CreateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['vehicle'] = self.vehicle
+        context['axes'], context['equipment'] = context['form'].sheet()
         return context
 
     def form_valid(self, form):
@@ -388,12 +827,13 @@ class DiagnosticEditView(LoginRequiredMixin, CreateView):
 
 
 def diagnostic_pdf_view(request, pk):
-    report = get_object_or_404(DiagnosticReport, pk=pk)
+    report = get_object_or_404(DiagnosticReport.objects.select_related('vehicle'), pk=pk)
 
     # Контекст для шаблона
     context = {
         'report': report,
         'vehicle': report.vehicle,
+        'sheet': render_pdf_sheet(report),
         # WeasyPrint сам найдет статику, если правильно настроен settings.STATIC_ROOT
         # Но для надежности можно передать базовый URL
         'base_url': request.build_absolute_uri('/')
@@ -404,7 +844,8 @@ def diagnostic_pdf_view(request, pk):
 
     # 2. Генерируем PDF
     # base_url нужен, чтобы он нашел картинки и стили
-    pdf_file = weasyprint.HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
+    with metrics.PDF_SECONDS.labels('diagnostic').time():
+        pdf_file = weasyprint.HTML(string=html_string, base_url=request.build_absolute_uri('/')).write_pdf()
 
     # 3. Отдаем файл
     response = HttpResponse(pdf_file, content_type='application/pdf')
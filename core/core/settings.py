@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы считать все запросы к базе за запрос (app/profiler.py)
+    'app.profiler.ProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -99,6 +101,78 @@ if database_url:
     )
 
 
+# Кэш. Версии страниц (app/caching.py) должны быть общими для всех воркеров,
+# поэтому на сервере нужен Redis; без REDIS_URL — локальный кэш процесса для разработки
+redis_url = os.environ.get('REDIS_URL')
+
+if redis_url:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': redis_url,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
+
+# Профилировщик страниц (app/profiler.py). Бюджеты — по имени URL, 'default' — для остальных;
+# превышения и медленные запросы пишутся в лог app.profiler
+PERF_PROFILER_ENABLED = os.environ.get('PERF_PROFILER_ENABLED', '1') == '1'
+PERF_SERVER_TIMING = DEBUG
+PERF_BUDGETS = {
+    'default': {'queries': 50, 'db_ms': 300, 'total_ms': 1500},
+    'app:staff_dashboard': {'queries': 20},
+    'app:vehicle_detail': {'queries': 15},
+    'app:client_dashboard': {'queries': 15},
+    'app:client_list': {'queries': 10},
+    'app:vehicle_location_api': {'queries': 10, 'http_ms': 2000},
+    'app:api_list': {'queries': 10},
+    'app:api_detail': {'queries': 10},
+    'app:vehicle_import': {'total_ms': 60000, 'db_ms': 30000, 'queries': 5000},
+    'app:export_vehicles': {'total_ms': 60000},
+    'app:export_clients': {'total_ms': 60000},
+    'app:export_contracts': {'total_ms': 60000},
+    'app:diagnostic_pdf': {'total_ms': 5000},
+}
+# Запросы дольше PERF_SLOW_QUERY_MS пишутся в app.profiler.slow с вероятностью PERF_SLOW_QUERY_SAMPLE
+PERF_SLOW_QUERY_MS = 200
+PERF_SLOW_QUERY_SAMPLE = float(os.environ.get('PERF_SLOW_QUERY_SAMPLE', '0.1'))
+
+# Метрики Prometheus на /metrics (app/metrics.py). Метрики страниц считает профилировщик,
+# поэтому при PERF_PROFILER_ENABLED=0 остаются только внешние запросы, PDF, загрузки и кэш.
+# Под gunicorn общий каталог воркеров задаёт gunicorn.conf.py (PROMETHEUS_MULTIPROC_DIR)
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {
+            'format': '{asctime} {levelname} {name}: {message}',
+            'style': '{',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple',
+        },
+    },
+    'loggers': {
+        'app.profiler': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -138,6 +212,15 @@ STATIC_URL = 'static/'
 MEDIA_ROOT = 'media/'
 MEDIA_URL = '/media/'
 
+# Медиа отдаёт app.views.serve_media после проверки прав.
+# Если перед Django стоит nginx, сама передача файла уходит ему:
+#   location /protected-media/ { internal; alias /app/media/; }
+# и MEDIA_ACCEL_REDIRECT_PREFIX='/protected-media/'.
+# Для Apache (mod_xsendfile) — MEDIA_SENDFILE_HEADER='X-Sendfile'.
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX', '')
+MEDIA_SENDFILE_HEADER = os.environ.get('MEDIA_SENDFILE_HEADER', '')
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
 STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
@@ -146,11 +229,29 @@ LOGIN_URL = 'user:login'
 LOGIN_REDIRECT_URL = 'app:home'
 LOGOUT_REDIRECT_URL = 'user:login'
 
+# Загрузка больших файлов (видео, PDF) частями с докачкой
+CHUNKED_UPLOAD_DIR = 'chunked_uploads'
+CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024
+# Незавершённая загрузка без новых частей дольше стольких часов считается брошенной:
+# части не принимаются, expire_chunked_uploads (cron) удаляет её и файл-заготовку
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Подбор условий лизинга: варианты по умолчанию для сетки предложений
+LEASE_QUOTE_TERMS = (12, 18, 24, 36, 48, 60)  # месяцев
+LEASE_QUOTE_DOWN_PERCENTS = (0, 10, 20, 30, 40, 50)
+LEASE_QUOTE_RATES = (12, 16, 20, 24)  # годовых, %
+
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
 
-WIALON_TOKEN = 'dfddadc2e85747abcbfe5d8240e93bf4F5FBA1E1BCA29C433DBAE39974A3942CAC965ED8'
-WIALON_BASE_URL = 'https://hst-api.wialon.com/wialon/ajax.html'
+# Токен только из окружения: без него запросы к Wialon не делаются (app/utils.py).
+# Для тестов и нагрузочных прогонов: WIALON_BASE_URL=http://127.0.0.1:8765/wialon/ajax.html
+# и python manage.py fake_wialon (app/fake_wialon.py)
+WIALON_TOKEN = os.environ.get('WIALON_TOKEN', '')
+WIALON_BASE_URL = os.environ.get('WIALON_BASE_URL', 'https://hst-api.wialon.com/wialon/ajax.html')
+# Секунды на подключение и на ответ для каждого запроса к Wialon
+WIALON_TIMEOUT = 10
 
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
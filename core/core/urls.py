@@ -9,6 +9,8 @@ from django.conf.urls.static import static
 from django.http import HttpResponse
 from django.contrib.auth import get_user_model
 
+from app.views import serve_media
+
 def create_admin_view(request):
     User = get_user_model()
     if not User.objects.filter(username='admin').exists():
@@ -23,9 +25,11 @@ urlpatterns = [
 
     path('', include('app.urls')),
     path('auth/', include('user.urls')),
+
+    # Медиафайлы отдаются всегда через проверку прав (и в DEBUG, и на проде)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),
 ]
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
 if settings.DEBUG:
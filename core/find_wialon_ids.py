@@ -46,7 +46,7 @@ def find_units():
             "sortType": "sys_name"
         },
         "force": 1,
-        "flags": 1, # Флаг 1 возвращает базовые свойства, включая uid
+        "flags": 0x1 | 0x100, # 0x1 — базовые свойства (id, nm), 0x100 — дополнительные, включая uid
         "from": 0,
         "to": 0
     }
@@ -0,0 +1,23 @@
+"""
+Настройки gunicorn: читаются из текущего каталога сами (Procfile, Dockerfile).
+
+Метрики /metrics (app/metrics.py) у воркеров общие через каталог
+PROMETHEUS_MULTIPROC_DIR: переменная задаётся здесь, до запуска воркеров,
+каталог очищается при старте, а файлы умершего воркера помечаются в child_exit.
+"""
+import os
+import shutil
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def on_starting(server):
+    # Счётчики прошлого запуска иначе сложились бы с новыми
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
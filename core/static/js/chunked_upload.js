@@ -0,0 +1,158 @@
+// Загрузка больших файлов частями с докачкой после обрыва связи.
+//
+// Форма помечается атрибутом data-chunked-start="<url начала загрузки>",
+// файловые поля — атрибутом data-chunked-target="video|computer_assessment|document".
+// Если у формы есть data-chunked-redirect, после загрузки переходим туда,
+// иначе отправляем форму как обычно (уже без файлов).
+(function () {
+    var MAX_RETRIES = 8;
+
+    function getCookie(name) {
+        var match = document.cookie.match('(^|;)\\s*' + name + '=([^;]*)');
+        return match ? decodeURIComponent(match[2]) : '';
+    }
+
+    function sleep(ms) {
+        return new Promise(function (resolve) { setTimeout(resolve, ms); });
+    }
+
+    async function sha256Hex(blob) {
+        // crypto.subtle доступен только по HTTPS/localhost — без него сервер проверит только размер
+        if (!window.crypto || !window.crypto.subtle) {
+            return '';
+        }
+        var digest = await window.crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+        return Array.from(new Uint8Array(digest)).map(function (b) {
+            return b.toString(16).padStart(2, '0');
+        }).join('');
+    }
+
+    async function request(url, options) {
+        options.headers = Object.assign({'X-CSRFToken': getCookie('csrftoken')}, options.headers || {});
+        options.credentials = 'same-origin';
+        var response = await fetch(url, options);
+        var data = await response.json();
+        return {status: response.status, ok: response.ok, data: data};
+    }
+
+    async function resumeOrStart(startUrl, file, target, title) {
+        var key = 'chunked:' + startUrl + ':' + target + ':' + file.name + ':' + file.size + ':' + file.lastModified;
+        var savedUrl = localStorage.getItem(key);
+
+        if (savedUrl) {
+            try {
+                var saved = await request(savedUrl, {method: 'GET'});
+                if (saved.ok && saved.data.status === 'uploading') {
+                    return {key: key, state: saved.data};
+                }
+            } catch (e) {
+                // Не удалось — начинаем заново
+            }
+            localStorage.removeItem(key);
+        }
+
+        var started = await request(startUrl, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/json'},
+            body: JSON.stringify({target: target, filename: file.name, size: file.size, title: title || ''})
+        });
+        if (!started.ok) {
+            throw new Error(started.data.error || 'Не удалось начать загрузку');
+        }
+        localStorage.setItem(key, started.data.url);
+        return {key: key, state: started.data};
+    }
+
+    async function upload(startUrl, file, target, title, onProgress) {
+        var session = await resumeOrStart(startUrl, file, target, title);
+        var state = session.state;
+        var retries = 0;
+
+        while (state.offset < state.total_size) {
+            var end = Math.min(state.offset + state.chunk_size, state.total_size);
+            var chunk = file.slice(state.offset, end);
+
+            try {
+                var result = await request(state.url, {
+                    method: 'PUT',
+                    headers: {
+                        'Content-Type': 'application/octet-stream',
+                        'Content-Range': 'bytes ' + state.offset + '-' + (end - 1) + '/' + state.total_size,
+                        'X-Chunk-Sha256': await sha256Hex(chunk)
+                    },
+                    body: chunk
+                });
+
+                // 409 — сервер сообщает, с какого места продолжать
+                if (!result.ok && result.status !== 409) {
+                    throw new Error(result.data.error || 'Ошибка загрузки части');
+                }
+                state = result.data;
+                retries = 0;
+            } catch (e) {
+                if (++retries > MAX_RETRIES) {
+                    throw e;
+                }
+                await sleep(Math.min(1000 * Math.pow(2, retries), 30000));
+                state = (await request(state.url, {method: 'GET'})).data;
+            }
+
+            if (onProgress) {
+                onProgress(state.offset / state.total_size);
+            }
+        }
+
+        var completed = await request(state.complete_url, {method: 'POST'});
+        if (!completed.ok) {
+            throw new Error(completed.data.error || 'Не удалось собрать файл');
+        }
+        localStorage.removeItem(session.key);
+        return completed.data;
+    }
+
+    document.querySelectorAll('form[data-chunked-start]').forEach(function (form) {
+        var progress = form.querySelector('[data-chunked-progress]');
+
+        form.addEventListener('submit', async function (event) {
+            var inputs = Array.from(form.querySelectorAll('input[data-chunked-target]')).filter(function (input) {
+                return input.files && input.files.length;
+            });
+            if (!inputs.length) {
+                return;
+            }
+            event.preventDefault();
+
+            var titleInput = form.querySelector('[name="title"]');
+            var submit = form.querySelector('[type="submit"]');
+            if (submit) submit.disabled = true;
+            if (progress) progress.parentElement.classList.remove('d-none');
+
+            try {
+                var last = null;
+                for (var i = 0; i < inputs.length; i++) {
+                    last = await upload(
+                        form.dataset.chunkedStart,
+                        inputs[i].files[0],
+                        inputs[i].dataset.chunkedTarget,
+                        titleInput ? titleInput.value : '',
+                        function (ratio) {
+                            if (progress) progress.style.width = Math.round(ratio * 100) + '%';
+                        }
+                    );
+                    inputs[i].value = '';
+                }
+
+                if (form.dataset.chunkedRedirect) {
+                    window.location = last.redirect_url;
+                } else {
+                    form.submit();
+                }
+            } catch (e) {
+                alert(e.message + '. Выберите тот же файл ещё раз — загрузка продолжится с места обрыва.');
+                if (submit) submit.disabled = false;
+            }
+        });
+    });
+
+    window.ChunkedUpload = {upload: upload};
+})();
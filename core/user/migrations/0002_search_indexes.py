@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-19 05:05
+
+from django.db import migrations
+
+# Поиск договоров в админке по клиенту ('^client__username', '^client__last_name'),
+# см. app/migrations/0021_admin_search_indexes.py. Только PostgreSQL.
+INDEXES = [
+    ('user_user_username_upper_like', 'user_user', 'username'),
+    ('user_user_last_name_upper_like', 'user_user', 'last_name'),
+]
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}"::text) text_pattern_ops)'
+        )
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('user', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations
+
+# Поиск договоров в админке по клиенту по вхождению (client__username, client__first_name,
+# client__last_name): триграммные индексы вместо text_pattern_ops из 0002,
+# см. app/migrations/0023_admin_search_trigram.py. Только PostgreSQL.
+PREFIX_INDEXES = [
+    ('user_user_username_upper_like', 'user_user', 'username'),
+    ('user_user_last_name_upper_like', 'user_user', 'last_name'),
+]
+
+TRIGRAM_INDEXES = [
+    ('user_user_username_upper_trgm', 'user_user', 'username'),
+    ('user_user_first_name_upper_trgm', 'user_user', 'first_name'),
+    ('user_user_last_name_upper_trgm', 'user_user', 'last_name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" USING gin (UPPER("{column}"::text) gin_trgm_ops)'
+        )
+    for name, _, _ in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" ON "{table}" (UPPER("{column}"::text) text_pattern_ops)'
+        )
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('user', '0002_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]